@@ -18,6 +18,7 @@ RIZALTA Telegram Bot v2.1.0
 
 from datetime import datetime, timedelta
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, Any
@@ -29,6 +30,8 @@ from config.settings import (
     MAIN_MENU_TRIGGER_TEXTS,
     LINK_FIXATION,
     LINK_SHAHMATKA,
+    TG_WEBHOOK_SECRET,
+    WEBHOOK_INLINE_REPLY,
 )
 
 # Состояния
@@ -45,69 +48,52 @@ from models.state import (
 
 # Сервисы
 from services.monitoring import log_request, monitoring_loop
-from services.telegram import send_message, send_message_inline, answer_callback_query, send_document
+from services import update_queue
+from services.update_queue import submit_update
+from services.update_dedup import is_duplicate, forget_update, get_dedup_stats, flush_dedup
+from services.webhook_reply import run_inline, answer_callback_inline, get_reply_stats
+from services.logger import get_logger, set_debug_chat, get_debug_chat, shutdown_logging
+from services.telegram import send_message, send_message_inline, answer_callback_query, send_document, close_session, flush_file_ids
 from services.calculations import normalize_unit_code
+from services.callback_router import router as callback_router
+from services.lazy import lazy_module, get_lazy_stats
+from services import warmup
+from services import db
+from services import migrations
+from services import doc_jobs, layout_store, lots_api, pdf_workers, render_cache, units_db
 
 # Intent Router (NEW!)
 from services.intent_router import classify_intent
 
+# Редко используемые подсистемы — импорт при первом обращении
+corp3 = lazy_module("handlers.corp3")
+news = lazy_module("handlers.news")
+domoplaner = lazy_module("services.domoplaner_parser")
+
 # Обработчики
 from handlers import (
     handle_secretary_menu,
     handle_secretary_day,
     handle_secretary_week,
-    handle_secretary_task_detail,
-    handle_secretary_done,
-    handle_secretary_undone,
-    handle_secretary_delete,
-    handle_secretary_move_menu,
-    handle_secretary_move_to,
-    handle_secretary_add_prompt,
-    handle_timezone_menu,
-    handle_set_timezone,
-    process_secretary_input,
     # Динамические расчёты
-    handle_calculations_menu_new,
     handle_calc_roi_menu,
-    handle_calc_roi_by_area_menu,
-    handle_calc_roi_by_budget_menu,
-    handle_calc_roi_area_range,
-    handle_calc_roi_budget_range,
     handle_calc_roi_lot,
     handle_calc_finance_menu,
-    handle_calc_finance_by_area_menu,
-    handle_calc_finance_by_budget_menu,
-    handle_calc_finance_area_range,
-    handle_calc_finance_budget_range,
     handle_calc_finance_lot,
     # Меню
     handle_start,
     handle_help,
-    handle_back,
     handle_about_project,
-    handle_calculations_menu,
-    handle_why_rizalta,
-    handle_why_altai,
-    handle_architect,
-    handle_choose_unit_for_roi,
-    handle_choose_unit_for_finance,
-    handle_choose_unit_for_layout,
     handle_main_menu,
     handle_myid,
     
     # Юниты
     handle_base_roi,
-    handle_unit_roi,
     handle_finance_overview,
-    handle_layouts,
-    handle_select_lot,
     handle_budget_input,
     handle_format_input,
-    handle_download_pdf,
     
     # Запись на показ
-    handle_online_show_start,
-    handle_call_manager,
     handle_contact_shared,
     handle_quick_contact,
     handle_booking_step,
@@ -116,20 +102,20 @@ from handlers import (
     handle_free_text,
     
     # КП
-    handle_kp_menu,
     handle_kp_request,
     
     # Медиа
     handle_media_menu,
     handle_send_presentation,
-    handle_send_presentation_file,
-    handle_video_menu,
-    handle_send_video,
 )
 
 
 app = FastAPI(title="RIZALTA Bot v2.1.0")
 
+log = get_logger("app")
+log_webhook = get_logger("webhook")
+log_reminder = get_logger("reminder")
+
 # CORS для Mini App
 app.add_middleware(
     CORSMiddleware,
@@ -146,23 +132,21 @@ app.mount("/app", StaticFiles(directory="/opt/miniapp/dist", html=True), name="m
 # ====== Фоновая задача напоминаний ======
 
 async def reminder_loop():
-    import os
     """Проверяет и отправляет напоминания каждую минуту."""
-    import sqlite3
-    import aiohttp
     from datetime import datetime, timedelta
     from pathlib import Path
     
+    from services.send_queue import set_send_priority, PRIORITY_NOTIFY
+    
     DB_PATH = Path("/opt/bot/secretary.db")
-    BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     ALTAI_OFFSET = 4
     
+    # Напоминания уступают очередь интерактивным ответам
+    set_send_priority(PRIORITY_NOTIFY)
+    
     while True:
         try:
             if DB_PATH.exists():
-                conn = sqlite3.connect(str(DB_PATH))
-                cursor = conn.cursor()
-                
                 now_msk = datetime.now()
                 now_altai = now_msk + timedelta(hours=ALTAI_OFFSET)
                 remind_time = now_altai + timedelta(minutes=15)
@@ -171,7 +155,7 @@ async def reminder_loop():
                 current_time = now_altai.strftime("%H:%M")
                 remind_time_str = remind_time.strftime("%H:%M")
                 
-                cursor.execute("""
+                tasks = await db.run(db.fetchall, DB_PATH, """
                     SELECT id, user_id, task_text, due_date, due_time, client_name
                     FROM tasks 
                     WHERE status = 'pending' 
@@ -182,8 +166,6 @@ async def reminder_loop():
                     AND due_time > ?
                 """, (today, remind_time_str, current_time))
                 
-                tasks = cursor.fetchall()
-                
                 for task in tasks:
                     task_id, user_id, task_text, due_date, due_time, client_name = task
                     
@@ -193,37 +175,44 @@ async def reminder_loop():
 📋 {task_text}{client_info}
 🕐 Через 15 минут ({due_time})"""
                     
-                    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-                    payload = {
-                        "chat_id": user_id,
-                        "text": message,
-                        "parse_mode": "HTML",
-                        "disable_notification": False
-                    }
-                    
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(url, json=payload) as resp:
-                            result = await resp.json()
-                            if result.get("ok"):
-                                cursor.execute("UPDATE tasks SET reminder_sent = 1 WHERE id = ?", (task_id,))
-                                conn.commit()
-                                print(f"[REMINDER] ✅ {user_id}: {task_text}")
-                            else:
-                                print(f"[REMINDER] ❌ {user_id}: {result}")
-                
-                conn.close()
-        except Exception as e:
-            print(f"[REMINDER] Error: {e}")
+                    if await send_message(user_id, message):
+                        await db.run(db.execute, DB_PATH, "UPDATE tasks SET reminder_sent = 1 WHERE id = ?", (task_id,))
+                        log_reminder.info("отправлено", chat_id=user_id, task_id=task_id)
+                    else:
+                        log_reminder.warning("не отправлено", chat_id=user_id, task_id=task_id)
+        except Exception:
+            log_reminder.exception("ошибка цикла напоминаний")
         
         await asyncio.sleep(60)
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Запуск фоновых задач при старте бота."""
+    """Миграции БД, прогрев и запуск фоновых задач при старте бота."""
+    await db.run(migrations.run_all)
+    # uvicorn начинает принимать webhook только после startup —
+    # первый пользователь не ждёт импорта генераторов и шрифтов
+    await warmup.run_warmup()
     asyncio.create_task(reminder_loop())
     asyncio.create_task(monitoring_loop())
-    print("[PROD] Фоновые задачи запущены")
+    update_queue.start_workers(handle_update)
+    doc_jobs.start_workers()
+    # Планировки, которых ещё нет на диске (обычно их скачивает синхронизация)
+    asyncio.create_task(layout_store.prefetch_catalog())
+    log.info("фоновые задачи запущены")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Дорабатывает очереди, останавливает wkhtmltopdf, сохраняет кеш file_id, закрывает пул соединений Bot API и SQLite."""
+    await update_queue.stop_workers()
+    await doc_jobs.stop_workers()
+    pdf_workers.shutdown()
+    await flush_file_ids()
+    await flush_dedup()
+    await close_session()
+    db.shutdown()
+    shutdown_logging()
 
 
 # ====== Health check ======
@@ -231,63 +220,85 @@ async def startup_event():
 @app.get("/")
 async def health():
     """Health check."""
-    return {"ok": True, "bot": "RIZALTA", "version": "2.4.0"}
+    return {"ok": True, "bot": "RIZALTA", "version": "2.4.0", "ready": warmup.is_ready()}
 
 
+@app.get("/metrics/queue")
+async def queue_metrics():
+    """Метрики очереди входящих update (глубина, ожидание) и очереди документов."""
+    return {
+        "ok": True,
+        "updates": update_queue.get_queue_stats(),
+        "documents": doc_jobs.get_doc_jobs_stats(),
+        "pdf_workers": pdf_workers.get_pdf_workers_stats(),
+        "dedup": get_dedup_stats(),
+        "webhook_reply": get_reply_stats(),
+        "sqlite": db.get_db_stats(),
+    }
 
-# ====== API для Mini App ======
 
-@app.get("/api/lots")
-async def api_get_lots(building: int = None, floor: int = None, status: str = None):
-    """API для Mini App — список лотов."""
-    import sqlite3
-    
-    conn = sqlite3.connect("/opt/bot/properties.db")
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    query = "SELECT code, building, floor, area_m2, price_rub, COALESCE(status, 'available') as status, layout_url FROM units WHERE 1=1"
-    params = []
-    
-    if building:
-        query += " AND building = ?"
-        params.append(building)
-    if floor:
-        query += " AND floor = ?"
-        params.append(floor)
-    if status:
-        query += " AND COALESCE(status, 'available') = ?"
-        params.append(status)
-    
-    query += " ORDER BY building, floor DESC, code"
-    cursor.execute(query, params)
-    
-    lots = [{
-        "code": r["code"],
-        "building": r["building"],
-        "buildingName": "Family" if r["building"] == 1 else "Business",
-        "floor": r["floor"],
-        "area": float(r["area_m2"]) if r["area_m2"] else 0,
-        "price": int(r["price_rub"]) if r["price_rub"] else 0,
-        "status": r["status"] or "available",
-        "layout_url": r["layout_url"] or "",
-    } for r in cursor.fetchall()]
-    
-    conn.close()
-    
+@app.get("/metrics/startup")
+async def startup_metrics():
+    """Прогрев при старте и ленивые модули (какие уже загружены)."""
+    return {
+        "ok": True,
+        "warmup": warmup.get_startup_stats(),
+        "lazy": get_lazy_stats(),
+    }
+
+
+@app.get("/metrics/catalog")
+async def catalog_metrics():
+    """Каталог лотов в памяти, кеш ответов /api/lots, кеш PDF КП и планировки."""
     return {
         "ok": True,
-        "lots": lots,
-        "stats": {
-            "total": len(lots),
-            "available": len([l for l in lots if l["status"] == "available"]),
-            "booked": len([l for l in lots if l["status"] == "booked"]),
-            "sold": len([l for l in lots if l["status"] == "sold"]),
-        }
+        "catalog": units_db.get_catalog_info(),
+        "lots_api": lots_api.get_lots_api_stats(),
+        "render_cache": render_cache.get_render_cache_stats(),
+        "layouts": layout_store.get_layout_store_stats(),
     }
 
 
 
+# ====== API для Mini App ======
+
+@app.get("/api/lots")
+async def api_get_lots(request: Request, building: int = None, floor: int = None, status: str = None):
+    """API для Mini App — список лотов (готовые байты, см. services/lots_api.py)."""
+    response = lots_api.get_lots_response(building, floor, status)
+    status_code, body, headers = lots_api.respond(response, request.headers)
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+@app.get("/api/lots/search")
+async def api_search_lots(
+    building: int = None,
+    floor: int = None,
+    status: str = None,
+    rooms: str = None,
+    min_area: float = None,
+    max_area: float = None,
+    min_price: int = None,
+    max_price: int = None,
+    min_floor: int = None,
+    max_floor: int = None,
+    sort: str = None,
+    limit: int = lots_api.SEARCH_DEFAULT_LIMIT,
+    cursor: str = None,
+    fields: str = None,
+):
+    """API для Mini App — поиск с фасетами и страницами (services/lots_api.py)."""
+    try:
+        return lots_api.search_lots(
+            building=building, floor=floor, status=status, rooms=rooms,
+            min_area=min_area, max_area=max_area, min_price=min_price, max_price=max_price,
+            min_floor=min_floor, max_floor=max_floor,
+            sort=sort, limit=limit, cursor=cursor, fields=fields,
+        )
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+
+
 @app.post("/api/miniapp-action")
 async def api_miniapp_action(request: Request):
     """API для Mini App — передаёт выбранный лот в бота."""
@@ -308,7 +319,7 @@ async def api_miniapp_action(request: Request):
     code = lot.get("code")
     building = lot.get("building")
     
-    print(f"[MINIAPP] Lot: {code}, Building: {building}, User: {user_id}")
+    log.info("miniapp: выбор лота", chat_id=user_id, code=code, building=building)
     
     try:
         from handlers.kp import handle_nav_lot
@@ -316,33 +327,94 @@ async def api_miniapp_action(request: Request):
         return {"ok": True}
     
     except Exception as e:
-        print(f"[MINIAPP] Error: {e}")
+        log.exception("miniapp: ошибка", chat_id=user_id, code=code)
         return {"ok": False, "error": str(e)}
 
 # ====== Telegram Webhook ======
 
 @app.post("/telegram/webhook")
 async def telegram_webhook(request: Request):
-    """Главный webhook для обработки сообщений от Telegram."""
+    """
+    Главный webhook: проверяет update, ставит в очередь и сразу отвечает 200.
+    Обработка идёт в фоне воркерами services.update_queue (handle_update).
+    """
+    
+    if TG_WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != TG_WEBHOOK_SECRET:
+        log_webhook.warning("неверный secret token")
+        return JSONResponse({"ok": False}, status_code=403)
     
     try:
         upd = await request.json()
     except Exception as e:
-        print(f"[WEBHOOK] JSON parse error: {e}")
+        log_webhook.warning("не удалось разобрать JSON", error=str(e))
         return {"ok": False}
     
-    print(f"[WEBHOOK] update: {upd}")
+    if not isinstance(upd, dict) or "update_id" not in upd:
+        log_webhook.warning("некорректный update", update=upd)
+        return {"ok": False}
+    
+    chat_key = update_queue.get_chat_key(upd)
+    log_webhook.info("update", update_id=upd["update_id"], chat_id=chat_key, kind=_update_kind(upd))
+    log_webhook.debug("update payload", chat_id=chat_key, update=upd)
+    
+    # Повторная доставка — уже в обработке или обработан
+    if is_duplicate(upd["update_id"]):
+        return {"ok": True}
+    
+    # Простые ответы (главное меню, /help) — прямо в теле ответа webhook
+    if WEBHOOK_INLINE_REPLY and _is_inline_candidate(upd):
+        claimed = update_queue.claim_chat(upd)
+        if claimed is not None:
+            reply = await run_inline(
+                lambda: handle_update(upd),
+                on_done=lambda: update_queue.release_chat(claimed),
+            )
+            return reply or {"ok": True}
+    
+    if not submit_update(upd):
+        # Очередь переполнена — Telegram повторит доставку позже
+        forget_update(upd["update_id"])
+        return JSONResponse({"ok": False}, status_code=503)
+    
+    # Часики на кнопке убираем ответом webhook, кнопка обрабатывается в очереди
+    callback_id = (upd.get("callback_query") or {}).get("id")
+    if WEBHOOK_INLINE_REPLY and callback_id:
+        return answer_callback_inline(callback_id)
+    
+    return {"ok": True}
+
+
+# Тексты, ответ на которые — одно сообщение (handler'ы с @inline_returnable)
+INLINE_REPLY_TEXTS = set(MAIN_MENU_TRIGGER_TEXTS) | {"/start", "/help"}
+
+
+def _update_kind(upd: Dict[str, Any]) -> str:
+    """Тип update для лога (message, callback_query, ...)."""
+    for key in upd:
+        if key != "update_id":
+            return key
+    return "unknown"
+
+
+def _is_inline_candidate(upd: Dict[str, Any]) -> bool:
+    """Можно ли обработать update прямо в webhook."""
+    msg = upd.get("message")
+    return bool(msg) and (msg.get("text") or "").strip() in INLINE_REPLY_TEXTS
+
+
+async def handle_update(upd: Dict[str, Any]):
+    """Обработка одного update (вызывается воркером очереди)."""
     
     # ===== Callback Query (inline-кнопки) =====
     callback_query = upd.get("callback_query")
     if callback_query:
         await process_callback(callback_query)
-        return {"ok": True}
+        return
     
     # ===== Message =====
     msg = upd.get("message") or upd.get("edited_message")
     if not msg:
-        return {"ok": True}
+        return
     
     chat_id = msg["chat"]["id"]
     
@@ -352,16 +424,16 @@ async def telegram_webhook(request: Request):
     contact_data = msg.get("contact")
     if contact_data:
         await handle_contact_shared(chat_id, contact_data)
-        return {"ok": True}
+        return
     
     # Обработка голосового сообщения
     voice = msg.get("voice")
     if voice:
         await process_voice_message(chat_id, voice, msg.get("from", {}))
-        return {"ok": True}
+        return
     
     if not text:
-        return {"ok": True}
+        return
     
     user_info = msg.get("from", {})
     
@@ -369,9 +441,8 @@ async def telegram_webhook(request: Request):
     _start = _t.time()
     await process_message(chat_id, text, user_info)
     duration = int((_t.time() - _start) * 1000)
-    print(f"[TIMING] Response time: {duration} ms")
-    log_request(chat_id, "message", duration)
-    return {"ok": True}
+    log.info("ответ на сообщение", chat_id=chat_id, ms=duration)
+    await db.run(log_request, chat_id, "message", duration)
 
 
 async def process_callback(callback: Dict[str, Any]):
@@ -382,8 +453,6 @@ async def process_callback(callback: Dict[str, Any]):
     message = callback.get("message", {})
     chat_id = message.get("chat", {}).get("id")
     from_user = callback.get("from", {})
-    username = from_user.get("username", "")
-    user_info = from_user
     
     if not chat_id:
         return
@@ -393,670 +462,16 @@ async def process_callback(callback: Dict[str, Any]):
         await answer_callback_query(callback_id)
     
     # ===== Роутинг callback_data =====
-
-    # ===== Корпус 3 (whitelist) =====
-    if data.startswith("c3_"):
-        from handlers.corp3 import handle_corp3_callback
-        await handle_corp3_callback(chat_id, data)
-        return
-    
-    if data == "download_pdf":
-        await handle_download_pdf(chat_id, username)
-    
-    elif data == "select_lot":
-        await handle_select_lot(chat_id)
-    
-    elif data == "call_manager" or data == "online_show":
-        from handlers.booking_calendar import handle_booking_start
-        await handle_booking_start(chat_id)
-    
-    elif data == "calculate_roi":
-        await handle_choose_unit_for_roi(chat_id)
-    
-    elif data == "get_layouts":
-        from handlers.docs import handle_documents_menu
-        await handle_documents_menu(chat_id)
-    
-    elif data.startswith("roi_xlsx_code_"):
-        parts = data.replace("roi_xlsx_code_", "").rsplit("_", 1)
-        code, building = parts[0], int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
-        from services.units_db import get_lot_by_code
-        lot = get_lot_by_code(code, building)
-        if lot:
-            await send_message(chat_id, f"⏳ Создаю Excel для {lot['code']}...")
-            from services.calc_xlsx_generator import generate_roi_xlsx
-            xlsx_path = generate_roi_xlsx(unit_code=lot['code'], building=lot['building'])
-            if xlsx_path:
-                await send_document(chat_id, xlsx_path, f"ROI_{lot['code']}.xlsx")
-            else:
-                await send_message(chat_id, f"❌ Ошибка создания Excel")
-        else:
-            await send_message(chat_id, f"❌ Лот {code} не найден")
-
-    elif data.startswith("roi_xlsx_"):
-        area_x10 = int(data.replace("roi_xlsx_", ""))
-        area = area_x10 / 10
-        await send_message(chat_id, f"⏳ Создаю Excel для {area} м²...")
-        from services.calc_xlsx_generator import generate_roi_xlsx
-        xlsx_path = generate_roi_xlsx(area=area)
-        if xlsx_path:
-            await send_document(chat_id, xlsx_path, f"ROI_{area}m2.xlsx")
-        else:
-            await send_message(chat_id, f"❌ Ошибка создания Excel")
-
-    elif data.startswith("roi_"):
-        unit_code = data[4:]
-        await handle_base_roi(chat_id, unit_code=unit_code)
-    
-    elif data.startswith("finance_"):
-        unit_code = data[8:]
-        await handle_finance_overview(chat_id, unit_code=unit_code)
-    
-    elif data.startswith("layout_"):
-        unit_code = data[7:]
-        await handle_layouts(chat_id, unit_code=unit_code)
-    
-    # ===== Медиа =====
-    
-    elif data == "media_menu":
-        await handle_media_menu(chat_id)
-    
-    elif data == "media_presentation":
-        await handle_send_presentation(chat_id)
-    elif data.startswith("pres_"):
-        await handle_send_presentation_file(chat_id, data)
-    elif data == "media_video":
-        await handle_video_menu(chat_id)
-    
-    # === AI-Секретарь ===
-    elif data == "secretary_menu":
-        await handle_secretary_menu(chat_id)
-    elif data.startswith("sec_day_"):
-        date_str = data.replace("sec_day_", "")
-        await handle_secretary_day(chat_id, date_str)
-    elif data.startswith("sec_week_"):
-        date_str = data.replace("sec_week_", "")
-        await handle_secretary_week(chat_id, date_str)
-    elif data.startswith("sec_task_"):
-        task_id = int(data.replace("sec_task_", ""))
-        await handle_secretary_task_detail(chat_id, task_id)
-    elif data.startswith("sec_done_"):
-        task_id = int(data.replace("sec_done_", ""))
-        await handle_secretary_done(chat_id, task_id)
-    elif data.startswith("sec_undone_"):
-        task_id = int(data.replace("sec_undone_", ""))
-        await handle_secretary_undone(chat_id, task_id)
-    elif data.startswith("sec_del_"):
-        task_id = int(data.replace("sec_del_", ""))
-        await handle_secretary_delete(chat_id, task_id)
-    elif data.startswith("sec_move_") and not data.startswith("sec_moveto_"):
-        task_id = int(data.replace("sec_move_", ""))
-        await handle_secretary_move_menu(chat_id, task_id)
-    elif data.startswith("sec_moveto_"):
-        parts = data.replace("sec_moveto_", "").split("_")
-        task_id = int(parts[0])
-        new_date = parts[1]
-        await handle_secretary_move_to(chat_id, task_id, new_date)
-    elif data == "sec_add":
-        await handle_secretary_add_prompt(chat_id)
-    
-    elif data == "sec_timezone":
-        await handle_timezone_menu(chat_id)
-    
-    elif data.startswith("sec_set_tz_"):
-        tz = int(data.replace("sec_set_tz_", ""))
-        await handle_set_timezone(chat_id, tz)
-    elif data.startswith("sec_add_"):
-        preset_date = data.replace("sec_add_", "")
-        await handle_secretary_add_prompt(chat_id, preset_date)
-    elif data.startswith("video_"):
-        await handle_send_video(chat_id, data)
-    
-    elif data == "back_to_menu":
-        await handle_main_menu(chat_id)
-    
-    # ===== КП v2.1.0 - НОВЫЕ CALLBACK'И =====
-    
-    elif data == "kp_menu":
-        from handlers.kp import handle_kp_menu
-        await handle_kp_menu(chat_id)
-    
-    elif data == "kp_refine":
-        from handlers.kp import handle_kp_menu
-        await handle_kp_menu(chat_id)
-    
-    elif data == "kp_by_building":
-        from handlers.kp import handle_kp_by_building_menu
-        await handle_kp_by_building_menu(chat_id)
-    
-    elif data.startswith("kp_building_all_"):
-        from handlers.kp import handle_kp_building_all
-        building = int(data.replace("kp_building_all_", ""))
-        await handle_kp_building_all(chat_id, building)
-    
-    elif data.startswith("kp_building_"):
-        from handlers.kp import handle_kp_building
-        building = int(data.replace("kp_building_", ""))
-        await handle_kp_building(chat_id, building)
-    
-    elif data.startswith("kp_floors_"):
-        from handlers.kp import handle_kp_floors_range
-        parts = data.replace("kp_floors_", "").split("_")
-        building = int(parts[0])
-        floor_range = parts[1]  # "upper", "lower", "middle"
-        await handle_kp_floors_range(chat_id, building, floor_range)
-    
-    elif data.startswith("kp_floor_all_"):
-        from handlers.kp import handle_kp_floor
-        parts = data.replace("kp_floor_all_", "").split("_")
-        building = int(parts[0])
-        floor = int(parts[1])
-        await handle_kp_floor(chat_id, building, floor)
-    
-    elif data.startswith("kp_floor_"):
-        from handlers.kp import handle_kp_floor
-        parts = data.replace("kp_floor_", "").split("_")
-        building = int(parts[0])
-        floor = int(parts[1])
-        await handle_kp_floor(chat_id, building, floor)
-    
-    elif data.startswith("kp_lot_"):
-        from handlers.kp import handle_kp_lot
-        parts = data.replace("kp_lot_", "").split("_")
-        code = parts[0]
-        building = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
-        await handle_kp_lot(chat_id, code, building)
-    
-    elif data.startswith("kp_gen_"):
-        from handlers.kp import handle_kp_generate
-        # Формат: kp_gen_{code}_{building}_{mode} или kp_gen_{code}_{mode}
-        raw = data.replace("kp_gen_", "")
-        parts = raw.rsplit("_", 1)  # Отделяем mode от остального
-        if len(parts) == 2:
-            code_part = parts[0]  # Может быть "В708" или "В708_1"
-            mode = parts[1]       # "100", "12", "full"
-            await handle_kp_generate(chat_id, code_part, mode)
-    
-    elif data == "kp_by_code":
-        from handlers.kp import handle_kp_by_code_menu
-        await handle_kp_by_code_menu(chat_id)
-    
-    elif data == "kp_show_more":
-        from handlers.kp import handle_kp_show_more
-        await handle_kp_show_more(chat_id)
-    
-    # ===== Расчёты через универсальную навигацию =====
-    
-    elif data == "calc_nav_menu":
-        from handlers.kp import handle_nav_menu
-        await handle_nav_menu(chat_id, mode="calc")
-    
-    elif data == "calc_nav_by_building":
-        from handlers.kp import handle_nav_by_building_menu
-        await handle_nav_by_building_menu(chat_id, mode="calc")
-    
-    elif data == "calc_nav_by_area":
-        from handlers.kp import handle_kp_by_area_menu
-        await handle_kp_by_area_menu(chat_id)
-    
-    elif data == "calc_nav_by_budget":
-        from handlers.kp import handle_kp_by_budget_menu
-        await handle_kp_by_budget_menu(chat_id)
-    
-    elif data == "calc_nav_by_code":
-        from handlers.kp import handle_kp_by_code_menu
-        await handle_kp_by_code_menu(chat_id)
-    
-    elif data.startswith("calc_nav_building_all_"):
-        from handlers.kp import handle_kp_building_all
-        building = int(data.replace("calc_nav_building_all_", ""))
-        await handle_kp_building_all(chat_id, building)
-    
-    elif data.startswith("calc_nav_building_"):
-        from handlers.kp import handle_nav_building
-        building = int(data.replace("calc_nav_building_", ""))
-        await handle_nav_building(chat_id, building, mode="calc")
-    
-    elif data.startswith("calc_nav_floors_"):
-        from handlers.kp import handle_kp_floors_range
-        parts = data.replace("calc_nav_floors_", "").split("_")
-        building = int(parts[0])
-        floor_range = parts[1]
-        await handle_kp_floors_range(chat_id, building, floor_range)
-    
-    elif data.startswith("calc_nav_floor_"):
-        from handlers.kp import handle_nav_floor
-        parts = data.replace("calc_nav_floor_", "").split("_")
-        building = int(parts[0])
-        floor = int(parts[1])
-        await handle_nav_floor(chat_id, building, floor, mode="calc")
-    
-    elif data.startswith("calc_nav_lot_"):
-        from handlers.kp import handle_nav_lot
-        parts = data.replace("calc_nav_lot_", "").split("_")
-        code = parts[0]
-        building = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
-        await handle_nav_lot(chat_id, code, building, mode="calc")
-    
-    # ===== Сравнение через универсальную навигацию =====
-    
-    elif data == "compare_nav_menu":
-        from handlers.kp import handle_nav_menu
-        await handle_nav_menu(chat_id, mode="compare")
-    
-    elif data == "compare_nav_by_building":
-        from handlers.kp import handle_nav_by_building_menu
-        await handle_nav_by_building_menu(chat_id, mode="compare")
-    
-    elif data == "compare_nav_by_area":
-        from handlers.kp import handle_kp_by_area_menu
-        await handle_kp_by_area_menu(chat_id)
-    
-    elif data == "compare_nav_by_budget":
-        from handlers.kp import handle_kp_by_budget_menu
-        await handle_kp_by_budget_menu(chat_id)
-    
-    elif data == "compare_nav_by_code":
-        from handlers.kp import handle_kp_by_code_menu
-        await handle_kp_by_code_menu(chat_id)
-    
-    elif data.startswith("compare_nav_building_all_"):
-        from handlers.kp import handle_kp_building_all
-        building = int(data.replace("compare_nav_building_all_", ""))
-        await handle_kp_building_all(chat_id, building)
-    
-    elif data.startswith("compare_nav_building_"):
-        from handlers.kp import handle_nav_building
-        building = int(data.replace("compare_nav_building_", ""))
-        await handle_nav_building(chat_id, building, mode="compare")
-    
-    elif data.startswith("compare_nav_floors_"):
-        from handlers.kp import handle_kp_floors_range
-        parts = data.replace("compare_nav_floors_", "").split("_")
-        building = int(parts[0])
-        floor_range = parts[1]
-        await handle_kp_floors_range(chat_id, building, floor_range)
-    
-    elif data.startswith("compare_nav_floor_"):
-        from handlers.kp import handle_nav_floor
-        parts = data.replace("compare_nav_floor_", "").split("_")
-        building = int(parts[0])
-        floor = int(parts[1])
-        await handle_nav_floor(chat_id, building, floor, mode="compare")
-    
-    elif data.startswith("compare_nav_lot_"):
-        from handlers.kp import handle_nav_lot
-        parts = data.replace("compare_nav_lot_", "").split("_")
-        code = parts[0]
-        building = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
-        await handle_nav_lot(chat_id, code, building, mode="compare")
-    
-    elif data == "kp_by_area":
-        from handlers.kp import handle_kp_by_area_menu
-        await handle_kp_by_area_menu(chat_id)
-    
-    elif data == "kp_by_budget":
-        from handlers.kp import handle_kp_by_budget_menu
-        await handle_kp_by_budget_menu(chat_id)
-    
-    elif data.startswith("kp_area_"):
-        from handlers.kp import handle_kp_area_range
-        parts = data.replace("kp_area_", "").split("_")
-        min_area, max_area = float(parts[0]), float(parts[1])
-        await handle_kp_area_range(chat_id, min_area, max_area)
-    
-    elif data.startswith("kp_budget_"):
-        from handlers.kp import handle_kp_budget_range
-        parts = data.replace("kp_budget_", "").split("_")
-        min_budget, max_budget = int(parts[0]), int(parts[1])
-        await handle_kp_budget_range(chat_id, min_budget, max_budget)
-    
-    elif data.startswith("kp_send_"):
-        from handlers.kp import handle_kp_send_one
-        area_str = data.replace("kp_send_", "")
-        area = int(area_str) / 10.0 if area_str.isdigit() else 0
-        await handle_kp_send_one(chat_id, area=area)
-    
-    elif data.startswith("kp_show_area_"):
-        from handlers.kp import handle_kp_show_all_area
-        parts = data.replace("kp_show_area_", "").split("_")
-        min_area, max_area = float(parts[0]), float(parts[1])
-        offset = int(parts[2]) if len(parts) > 2 else 0
-        await handle_kp_show_all_area(chat_id, min_area, max_area, offset)
-    elif data.startswith("kp_show_budget_"):
-        from handlers.kp import handle_kp_show_all_budget
-        parts = data.replace("kp_show_budget_", "").split("_")
-        min_budget, max_budget = int(parts[0]), int(parts[1])
-        await handle_kp_show_all_budget(chat_id, min_budget, max_budget)
-
-    elif data.startswith("kp_select_"):
-        from handlers.kp import handle_kp_select_lot
-        area_x10 = int(data.replace("kp_select_", ""))
-        await handle_kp_select_lot(chat_id, area_x10)
-
-    # ===== Документы =====
-
-    elif data == "doc_menu":
-        from handlers.docs import handle_documents_menu
-        await handle_documents_menu(chat_id)
-
-    elif data == "doc_ddu":
-        from handlers.docs import handle_send_ddu
-        await handle_send_ddu(chat_id)
-
-    elif data == "doc_arenda":
-        from handlers.docs import handle_send_arenda
-        await handle_send_arenda(chat_id)
-
-    elif data == "doc_all":
-        from handlers.docs import handle_send_all_docs
-        await handle_send_all_docs(chat_id)
-
-    # ===== Динамические расчёты =====
-
-    elif data == "calc_main_menu":
-        from handlers.kp import handle_nav_menu
-        await handle_nav_menu(chat_id, mode="calc")
-
-    elif data == "calc_roi_menu":
-        await handle_calc_roi_menu(chat_id)
-
-    elif data == "calc_finance_menu":
-        await handle_calc_finance_menu(chat_id)
-
-    elif data == "calc_roi_by_area":
-        await handle_calc_roi_by_area_menu(chat_id)
-
-    elif data == "calc_roi_by_budget":
-        await handle_calc_roi_by_budget_menu(chat_id)
-
-    elif data == "calc_finance_by_area":
-        await handle_calc_finance_by_area_menu(chat_id)
-
-    elif data == "calc_finance_by_budget":
-        await handle_calc_finance_by_budget_menu(chat_id)
-
-    elif data.startswith("calc_roi_area_"):
-        parts = data.replace("calc_roi_area_", "").split("_")
-        min_area, max_area = float(parts[0]), float(parts[1])
-        await handle_calc_roi_area_range(chat_id, min_area, max_area)
-
-    elif data.startswith("calc_roi_budget_"):
-        parts = data.replace("calc_roi_budget_", "").split("_")
-        min_budget, max_budget = int(parts[0]), int(parts[1])
-        await handle_calc_roi_budget_range(chat_id, min_budget, max_budget)
-
-    elif data.startswith("calc_roi_show_area_"):
-        from handlers.calc_dynamic import handle_calc_roi_show_all_area
-        parts = data.replace("calc_roi_show_area_", "").split("_")
-        min_area, max_area = float(parts[0]), float(parts[1])
-        await handle_calc_roi_show_all_area(chat_id, min_area, max_area)
-
-    elif data.startswith("calc_roi_show_budget_"):
-        from handlers.calc_dynamic import handle_calc_roi_show_all_budget
-        parts = data.replace("calc_roi_show_budget_", "").split("_")
-        min_budget, max_budget = int(parts[0]), int(parts[1])
-        await handle_calc_roi_show_all_budget(chat_id, min_budget, max_budget)
-
-    elif data.startswith("calc_fin_show_area_"):
-        from handlers.calc_dynamic import handle_calc_finance_show_all_area
-        parts = data.replace("calc_fin_show_area_", "").split("_")
-        min_area, max_area = float(parts[0]), float(parts[1])
-        await handle_calc_finance_show_all_area(chat_id, min_area, max_area)
-
-    elif data.startswith("calc_fin_show_budget_"):
-        from handlers.calc_dynamic import handle_calc_finance_show_all_budget
-        parts = data.replace("calc_fin_show_budget_", "").split("_")
-        min_budget, max_budget = int(parts[0]), int(parts[1])
-        await handle_calc_finance_show_all_budget(chat_id, min_budget, max_budget)
-
-    elif data.startswith("calc_fin_area_"):
-        parts = data.replace("calc_fin_area_", "").split("_")
-        min_area, max_area = float(parts[0]), float(parts[1])
-        await handle_calc_finance_area_range(chat_id, min_area, max_area)
-
-    elif data.startswith("calc_fin_budget_"):
-        parts = data.replace("calc_fin_budget_", "").split("_")
-        min_budget, max_budget = int(parts[0]), int(parts[1])
-        await handle_calc_finance_budget_range(chat_id, min_budget, max_budget)
-
-    elif data.startswith("calc_roi_code_"):
-        parts = data.replace("calc_roi_code_", "").rsplit("_", 1)
-        code, building = parts[0], int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
-        from handlers.calc_dynamic import handle_calc_roi_by_code
-        await handle_calc_roi_by_code(chat_id, code, building)
-
-    elif data.startswith("calc_finance_code_"):
-        parts = data.replace("calc_finance_code_", "").rsplit("_", 1)
-        code, building = parts[0], int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
-        from handlers.calc_dynamic import handle_calc_finance_by_code
-        await handle_calc_finance_by_code(chat_id, code, building)
-
-    elif data.startswith("calc_roi_lot_"):
-        area_str = data.replace("calc_roi_lot_", "")
-        area = int(area_str) / 10.0 if area_str.isdigit() else 0
-        await handle_calc_roi_lot(chat_id, area)
-
-    elif data.startswith("calc_finance_lot_"):
-        area_str = data.replace("calc_finance_lot_", "")
-        area = int(area_str) / 10.0 if area_str.isdigit() else 0
-        await handle_calc_finance_lot(chat_id, area)
-
-    # ===== Календарь бронирования =====
-
-    elif data == "booking_calendar":
-        from handlers.booking_calendar import handle_booking_start
-        await handle_booking_start(chat_id)
-
-
-    elif data.startswith("book_date_"):
-        from handlers.booking_calendar import handle_select_date
-        date_str = data.replace("book_date_", "")
-        await handle_select_date(chat_id, date_str)
-
-    elif data == "book_tz_moscow":
-        from handlers.booking_calendar import handle_select_timezone
-        await handle_select_timezone(chat_id, "moscow")
-
-    elif data == "book_tz_altai":
-        from handlers.booking_calendar import handle_select_timezone
-        await handle_select_timezone(chat_id, "altai")
-
-    elif data == "book_time_confirmed":
-        from handlers.booking_calendar import handle_time_confirmed
-        await handle_time_confirmed(chat_id, from_user)
-
-    elif data.startswith("book_time_"):
-        from handlers.booking_calendar import handle_select_time
-        time_str = data.replace("book_time_", "")
-        await handle_select_time(chat_id, time_str, username)
-
-    elif data.startswith("book_take_"):
-        from handlers.booking_calendar import handle_take_booking
-        booking_id = int(data.replace("book_take_", ""))
-        await handle_take_booking(chat_id, booking_id, from_user)
-
-    elif data == "book_change_tz":
-        from handlers.booking_calendar import handle_change_timezone
-        await handle_change_timezone(chat_id)
-
-    elif data.startswith("book_set_tz_"):
-        from handlers.booking_calendar import handle_set_timezone
-        tz = data.replace("book_set_tz_", "")
-        await handle_set_timezone(chat_id, tz)
-
-    elif data == "book_add_phone":
-        from handlers.booking_calendar import handle_request_phone
-        await handle_request_phone(chat_id)
-
-    elif data == "book_submit":
-        from handlers.booking_calendar import handle_submit_booking
-        await handle_submit_booking(chat_id, from_user)
-
-    elif data == "book_edit_menu":
-        from handlers.booking_calendar import handle_edit_menu
-        await handle_edit_menu(chat_id)
-
-    # ===== Domoplaner =====
-    elif data == "domo_all":
-        flats = domoplaner_cache.get(chat_id, [])
-        if not flats:
-            await send_message(chat_id, "❌ Подборка не найдена. Отправьте ссылку заново.")
-        else:
-            await send_message(chat_id, f"⏳ Генерирую {len(flats)} КП...")
-            from services.kp_pdf_generator import generate_kp_pdf
-            success = 0
-            for flat in flats:
-                pdf_path = generate_kp_pdf(code=flat["code"], include_18m=True)
-                if pdf_path:
-                    await send_document(chat_id, pdf_path, f"КП_{flat['code']}.pdf")
-                    success += 1
-            await send_message(chat_id, f"✅ Создано {success} из {len(flats)} КП")
-
-
-    elif data.startswith("domo_"):
-        lot_code = data.replace("domo_", "")
-        await send_message(chat_id, f"⏳ Генерирую КП для {lot_code}...")
-        from services.kp_pdf_generator import generate_kp_pdf
-        pdf_path = generate_kp_pdf(code=lot_code, include_18m=True)
-        if pdf_path:
-            await send_document(chat_id, pdf_path, f"КП_{lot_code}.pdf")
-        else:
-            await send_message(chat_id, f"❌ Лот {lot_code} не найден в базе.")
-
-    # ===== Новости =====
-
-    elif data == "news_menu":
-        from handlers.news import handle_news_menu
-        await handle_news_menu(chat_id)
-
-    elif data == "news_currency":
-        from handlers.news import handle_currency_rates
-        await handle_currency_rates(chat_id)
-
-    elif data == "news_weather":
-        from handlers.news import handle_weather
-        await handle_weather(chat_id)
-
-    elif data == "news_digest":
-        from handlers.news import handle_news_digest
-        await handle_news_digest(chat_id)
-
-    elif data == "news_flights":
-        from handlers.news import handle_flights
-        await handle_flights(chat_id)
-
-    # ===== Сравнение депозит vs RIZALTA =====
-
-    elif data == "compare_menu":
-        from handlers.kp import handle_nav_menu
-        await handle_nav_menu(chat_id, mode="compare")
-
-    elif data == "compare_by_area":
-        from handlers.compare import handle_compare_by_area_menu
-        await handle_compare_by_area_menu(chat_id)
-
-    elif data == "compare_by_budget":
-        from handlers.compare import handle_compare_by_budget_menu
-        await handle_compare_by_budget_menu(chat_id)
-
-    elif data == "compare_quick":
-        from handlers.compare import handle_compare_quick
-        await handle_compare_quick(chat_id)
-
-    elif data.startswith("compare_area_"):
-        from handlers.compare import handle_compare_area_range
-        parts = data.split("_")
-        min_area = float(parts[2])
-        max_area = float(parts[3])
-        await handle_compare_area_range(chat_id, min_area, max_area)
-
-    elif data.startswith("compare_budget_"):
-        from handlers.compare import handle_compare_budget_range
-        parts = data.split("_")
-        min_budget = int(parts[2]) * 1_000_000
-        max_budget = int(parts[3]) * 1_000_000
-        await handle_compare_budget_range(chat_id, min_budget, max_budget)
-
-    elif data.startswith("compare_lot_back_"):
-        from handlers.compare import handle_compare_lot
-        amount = int(data.split("_")[3])
-        await handle_compare_lot(chat_id, "выбранный", amount)
-
-    elif data.startswith("compare_lot_"):
-        from handlers.compare import handle_compare_lot
-        parts = data.split("_")
-        lot_code = parts[2]
-        building = int(parts[3])
-        price = int(parts[4]) * 1000 if len(parts) > 4 else int(parts[3]) * 1000
-        await handle_compare_lot(chat_id, lot_code, price)
-
-    elif data.startswith("compare_table_"):
-        from handlers.compare import handle_compare_table
-        amount = int(data.split("_")[2])
-        await handle_compare_table(chat_id, amount)
-
-    elif data == "compare_table":
-        from handlers.compare import handle_compare_table
-        await handle_compare_table(chat_id)
-
-    elif data.startswith("compare_period_"):
-        from handlers.compare import handle_compare_period
-        parts = data.split("_")
-        years = int(parts[2])
-        amount = int(parts[3]) if len(parts) > 3 else 15_000_000
-        await handle_compare_period(chat_id, years, amount)
-
-    elif data.startswith("compare_full_"):
-        from handlers.compare import handle_compare_full
-        parts = data.split("_")
-        years = int(parts[2])
-        amount = int(parts[3]) if len(parts) > 3 else 15_000_000
-        await handle_compare_full(chat_id, years, amount)
-
-    elif data.startswith("compare_amount_"):
-        from handlers.compare import handle_compare_amount_menu
-        context = data.split("_")[2]
-        await handle_compare_amount_menu(chat_id, context)
-
-    elif data.startswith("compare_sum_"):
-        from handlers.compare import handle_compare_with_amount
-        parts = data.split("_")
-        amount_mln = int(parts[2])
-        context = parts[3]
-        await handle_compare_with_amount(chat_id, amount_mln, context)
-
-    elif data.startswith("compare_pdf_"):
-        from handlers.compare import handle_compare_pdf
-        parts = data.split("_")
-        years = int(parts[2])
-        amount = int(parts[3])
-        await handle_compare_pdf(chat_id, years, amount, username)
-
-
-    elif data == "booking_menu":
-        from handlers.booking_fixation import handle_booking_menu
-        await handle_booking_menu(chat_id, user_info.get("id", chat_id))
-
-    elif data == "booking_auth":
-        from handlers.booking_fixation import handle_booking_auth_start
-        await handle_booking_auth_start(chat_id, from_user.get("id", chat_id))
-
-    elif data == "booking_reauth":
-        from handlers.booking_fixation import handle_booking_reauth
-        await handle_booking_reauth(chat_id, from_user.get("id", chat_id))
-
-    elif data == "booking_new":
-        from handlers.booking_fixation import handle_booking_new
-        await handle_booking_new(chat_id, from_user.get("id", chat_id))
-
-    elif data == "booking_cancel":
-        from handlers.booking_fixation import handle_booking_cancel
-        await handle_booking_cancel(chat_id, from_user.get("id", chat_id))
-
-    elif data == "booking_skip_comment":
-        from handlers.booking_fixation import handle_booking_skip_comment
-        await handle_booking_skip_comment(chat_id, from_user.get("id", chat_id))
+    # Маршруты регистрируются в модулях handlers/* (services/callback_router.py)
+    context = {
+        "username": from_user.get("username", ""),
+        "from_user": from_user,
+        "user_info": from_user,
+        "telegram_id": from_user.get("id", chat_id),
+        "data": data,
+    }
+    if not await callback_router.dispatch(chat_id, data, context):
+        log.warning("неизвестный callback_data", chat_id=chat_id, data=data)
 
 
 # Кеш подборок domoplaner
@@ -1065,11 +480,9 @@ domoplaner_cache = {}
 
 async def handle_domoplaner_link(chat_id: int, url: str):
     """Обрабатывает ссылку на подборку domoplaner."""
-    from services.domoplaner_parser import parse_domoplaner_set
-    
     await send_message(chat_id, "⏳ Загружаю подборку...")
     
-    flats = parse_domoplaner_set(url)
+    flats = domoplaner.parse_domoplaner_set(url)
     
     if not flats:
         await send_message(chat_id, "❌ Не удалось загрузить подборку. Проверьте ссылку.")
@@ -1092,6 +505,51 @@ async def handle_domoplaner_link(chat_id: int, url: str):
     await send_message_inline(chat_id, text, buttons)
 
 
+async def handle_domo_all(chat_id: int):
+    """Генерирует КП на все квартиры подборки."""
+    flats = domoplaner_cache.get(chat_id, [])
+    if not flats:
+        await send_message(chat_id, "❌ Подборка не найдена. Отправьте ссылку заново.")
+        return
+    
+    from services.kp_pdf_generator import generate_kp_pdf
+    success = 0
+    for n, flat in enumerate(flats, 1):
+        # По одному, с низким приоритетом: одиночные КП других чатов — раньше
+        try:
+            pdf = await doc_jobs.generate(
+                chat_id, f"Генерирую КП {n} из {len(flats)}: {flat['code']}...", generate_kp_pdf,
+                code=flat["code"], include_18m=True, as_buffer=True, priority=doc_jobs.PRIORITY_BATCH,
+            )
+        except doc_jobs.JobRejected as e:
+            await send_message(chat_id, str(e))
+            break
+        if pdf:
+            await send_document(chat_id, pdf, f"КП_{flat['code']}.pdf")
+            success += 1
+    await send_message(chat_id, f"✅ Создано {success} из {len(flats)} КП")
+
+
+async def handle_domo_lot(chat_id: int, lot_code: str):
+    """Генерирует КП на одну квартиру из подборки."""
+    from services.kp_pdf_generator import generate_kp_pdf
+    try:
+        pdf = await doc_jobs.generate(
+            chat_id, f"Генерирую КП для {lot_code}...", generate_kp_pdf, code=lot_code, include_18m=True, as_buffer=True,
+        )
+    except doc_jobs.JobRejected as e:
+        await send_message(chat_id, str(e))
+        return
+    if pdf:
+        await send_document(chat_id, pdf, f"КП_{lot_code}.pdf")
+    else:
+        await send_message(chat_id, f"❌ Лот {lot_code} не найден в базе.")
+
+
+callback_router.add("domo_all", handle_domo_all)
+callback_router.add("domo_{lot_code:rest}", handle_domo_lot)
+
+
 # ====== GPT INTENT HANDLER ======
 
 async def handle_intent(chat_id: int, intent_result: Dict[str, Any], user_info: Dict[str, Any]):
@@ -1103,7 +561,7 @@ async def handle_intent(chat_id: int, intent_result: Dict[str, Any], user_info:
     params = intent_result.get("params", {})
     original_text = intent_result.get("original_text", "")
     
-    print(f"[ROUTER] Intent: {intent}, Params: {params}")
+    log.info("intent", chat_id=chat_id, intent=intent, params=params)
     
     # === НАВИГАЦИЯ ===
     
@@ -1138,7 +596,6 @@ async def handle_intent(chat_id: int, intent_result: Dict[str, Any], user_info:
         from handlers.kp import (
             handle_kp_menu, 
             handle_kp_smart_search,
-            handle_kp_lot,
         )
         
         # Извлекаем параметры
@@ -1329,23 +786,18 @@ async def handle_intent(chat_id: int, intent_result: Dict[str, Any], user_info:
     # === НОВОСТИ ===
     
     if intent == "show_news":
-        from handlers.news import (
-            handle_news_menu, handle_currency_rates, 
-            handle_weather, handle_flights, handle_news_digest
-        )
-        
         news_type = params.get("type")
         
         if news_type == "currency":
-            await handle_currency_rates(chat_id)
+            await news.handle_currency_rates(chat_id)
         elif news_type == "weather":
-            await handle_weather(chat_id)
+            await news.handle_weather(chat_id)
         elif news_type == "flights":
-            await handle_flights(chat_id)
+            await news.handle_flights(chat_id)
         elif news_type == "digest":
-            await handle_news_digest(chat_id)
+            await news.handle_news_digest(chat_id)
         else:
-            await handle_news_menu(chat_id)
+            await news.handle_news_menu(chat_id)
         return
     
     # === FALLBACK: AI CHAT ===
@@ -1357,17 +809,12 @@ async def handle_intent(chat_id: int, intent_result: Dict[str, Any], user_info:
 
 async def handle_whitelist_command(chat_id: int, text: str):
     """Управление whitelist Корпуса 3: /wl list | add | remove"""
-    import sqlite3
     db_path = "properties.db"
     parts = text.strip().split(maxsplit=2)
     cmd = parts[1] if len(parts) > 1 else "help"
     
     if cmd == "list":
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT chat_id, name, added_at FROM corp3_whitelist ORDER BY added_at")
-        rows = cursor.fetchall()
-        conn.close()
+        rows = db.fetchall(db_path, "SELECT chat_id, name, added_at FROM corp3_whitelist ORDER BY added_at")
         if not rows:
             await send_message(chat_id, "📋 Whitelist пуст.")
             return
@@ -1382,12 +829,7 @@ async def handle_whitelist_command(chat_id: int, text: str):
             add_parts = parts[2].split(maxsplit=1) if len(parts) > 2 else []
             new_id = int(add_parts[0])
             name = add_parts[1] if len(add_parts) > 1 else None
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("INSERT OR IGNORE INTO corp3_whitelist (chat_id, name) VALUES (?, ?)", (new_id, name))
-            conn.commit()
-            affected = cursor.rowcount
-            conn.close()
+            affected = db.execute(db_path, "INSERT OR IGNORE INTO corp3_whitelist (chat_id, name) VALUES (?, ?)", (new_id, name)).rowcount
             if affected:
                 await send_message(chat_id, f"✅ Добавлен: <code>{new_id}</code> — {name or "без имени"}")
             else:
@@ -1398,12 +840,7 @@ async def handle_whitelist_command(chat_id: int, text: str):
     elif cmd == "remove" and len(parts) >= 3:
         try:
             del_id = int(parts[2])
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM corp3_whitelist WHERE chat_id = ?", (del_id,))
-            conn.commit()
-            affected = cursor.rowcount
-            conn.close()
+            affected = db.execute(db_path, "DELETE FROM corp3_whitelist WHERE chat_id = ?", (del_id,)).rowcount
             if affected:
                 await send_message(chat_id, f"✅ Удалён: <code>{del_id}</code>")
             else:
@@ -1457,8 +894,8 @@ async def handle_corp3_admin_command(chat_id: int, text: str):
         if found:
             with open(json_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
-            from handlers.corp3 import _units_cache
-            _units_cache.clear()
+            if corp3.loaded:
+                corp3._units_cache.clear()
             await send_message(chat_id, f"✅ Лот <code>{code}</code> скрыт (sold).")
         else:
             await send_message(chat_id, f"❌ Лот <code>{code}</code> не найден в Корпусе 3.")
@@ -1477,8 +914,8 @@ async def handle_corp3_admin_command(chat_id: int, text: str):
         if found:
             with open(json_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
-            from handlers.corp3 import _units_cache
-            _units_cache.clear()
+            if corp3.loaded:
+                corp3._units_cache.clear()
             await send_message(chat_id, f"✅ Лот <code>{code}</code> открыт (available).")
         else:
             await send_message(chat_id, f"❌ Лот <code>{code}</code> не найден в Корпусе 3.")
@@ -1499,8 +936,8 @@ async def process_message(chat_id: int, text: str, user_info: Dict[str, Any]):
         return
     
     # === Проверка состояния поиска по коду в Корпусе 3 ===
-    from handlers.corp3 import handle_corp3_text
-    if await handle_corp3_text(chat_id, text):
+    # (пока модуль не загружен, ввода кода никто не ждёт)
+    if corp3.loaded and await corp3.handle_corp3_text(chat_id, text):
         return
     
     # === Админ-команда /parse ===
@@ -1508,8 +945,7 @@ async def process_message(chat_id: int, text: str, user_info: Dict[str, Any]):
 
     # === Команда /corp3 (whitelist) ===
     if text == "/corp3":
-        from handlers.corp3 import handle_corp3_start
-        await handle_corp3_start(chat_id)
+        await corp3.handle_corp3_start(chat_id)
         return
     # === Команда /wl (whitelist управление, только админ) ===
     if text.startswith("/wl") and chat_id in ADMIN_IDS:
@@ -1519,6 +955,18 @@ async def process_message(chat_id: int, text: str, user_info: Dict[str, Any]):
     if text.startswith("/ca") and chat_id in ADMIN_IDS:
         await handle_corp3_admin_command(chat_id, text)
         return
+    # === Команда /debuglog (полный лог одного чата, только админ) ===
+    if text.startswith("/debuglog") and chat_id in ADMIN_IDS:
+        arg = text.replace("/debuglog", "").strip()
+        if arg == "off":
+            set_debug_chat(None)
+            await send_message(chat_id, "🔇 Полный лог выключен")
+        elif arg.lstrip("-").isdigit():
+            set_debug_chat(int(arg))
+            await send_message(chat_id, f"🔊 Полный лог для чата <code>{arg}</code>")
+        else:
+            await send_message(chat_id, f"Сейчас: <code>{get_debug_chat()}</code>\n/debuglog &lt;chat_id&gt; или /debuglog off")
+        return
     if text == "/parse" and chat_id in ADMIN_IDS:
         import subprocess
         await send_message(chat_id, "⏳ Запускаю парсер...")
@@ -1575,8 +1023,7 @@ async def process_message(chat_id: int, text: str, user_info: Dict[str, Any]):
         return
     
     # === Ссылки domoplaner ===
-    from services.domoplaner_parser import is_domoplaner_link
-    domo_url = is_domoplaner_link(text)
+    domo_url = domoplaner.is_domoplaner_link(text) if "domoplaner" in text else None
     if domo_url:
         await handle_domoplaner_link(chat_id, domo_url)
         return
@@ -34,6 +34,78 @@ ARCHITECT_PDF_PATH = os.path.join(DOCS_DIR, "rizalta", "marketing", "architect_r
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TG_API = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
 
+# Пул соединений к Bot API (общая keep-alive сессия)
+TG_POOL_SIZE = int(os.getenv("TG_POOL_SIZE", "20"))
+TG_CONNECT_TIMEOUT = float(os.getenv("TG_CONNECT_TIMEOUT", "5"))
+TG_REQUEST_TIMEOUT = float(os.getenv("TG_REQUEST_TIMEOUT", "10"))
+TG_KEEPALIVE_TIMEOUT = float(os.getenv("TG_KEEPALIVE_TIMEOUT", "60"))
+
+# Лимиты отправки (см. services/send_queue.py)
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))             # сообщений/сек на бота
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))                  # сообщений/сек в личный чат
+TG_CHAT_BURST = int(os.getenv("TG_CHAT_BURST", "3"))
+TG_GROUP_RATE_PER_MIN = float(os.getenv("TG_GROUP_RATE_PER_MIN", "20"))  # сообщений/мин в группу
+TG_GROUP_BURST = int(os.getenv("TG_GROUP_BURST", "3"))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3"))                # повторов после 429
+
+# Кеш file_id загруженных файлов: sha256 содержимого -> file_id
+TG_FILE_ID_CACHE_PATH = os.getenv("TG_FILE_ID_CACHE_PATH", os.path.join(DATA_DIR, "tg_file_ids.json"))
+
+# Webhook: secret_token из setWebhook (пусто — не проверяем)
+TG_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+
+# Ответ в теле webhook (см. services/webhook_reply.py)
+WEBHOOK_INLINE_REPLY = os.getenv("WEBHOOK_INLINE_REPLY", "1") == "1"
+WEBHOOK_INLINE_TIMEOUT = float(os.getenv("WEBHOOK_INLINE_TIMEOUT", "1.5"))  # сек
+
+# Очередь входящих update (см. services/update_queue.py)
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+UPDATE_QUEUE_MAX = int(os.getenv("UPDATE_QUEUE_MAX", "1000"))
+
+# Дедупликация update_id (см. services/update_dedup.py); пустой путь — только память
+UPDATE_DEDUP_WINDOW = int(os.getenv("UPDATE_DEDUP_WINDOW", "5000"))
+UPDATE_DEDUP_DB = os.getenv("UPDATE_DEDUP_DB", os.path.join(BASE_DIR, "updates_seen.db"))
+
+# ====== Логирование (см. services/logger.py) ======
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")                       # "webhook=0.1,tg=0.5"
+LOG_MAX_FIELD_LEN = int(os.getenv("LOG_MAX_FIELD_LEN", "500"))
+LOG_DEBUG_CHAT_ID = int(os.getenv("LOG_DEBUG_CHAT_ID")) if os.getenv("LOG_DEBUG_CHAT_ID") else None
+
+# ====== Прогрев при старте (см. services/warmup.py) ======
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))      # сек, дальше стартуем без прогрева
+
+# ====== SQLite (см. services/db.py) ======
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))           # сек ожидания блокировки записи
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "8192"))        # page cache на соединение
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))  # байт, 0 — без mmap
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))     # подготовленных запросов на соединение
+DB_THREADS = int(os.getenv("DB_THREADS", "4"))                       # потоков для db.run из async-кода
+
+# ====== Генерация документов в фоне (см. services/doc_jobs.py) ======
+DOC_WORKERS = int(os.getenv("DOC_WORKERS", str(min(os.cpu_count() or 1, 4))))  # одновременных рендеров
+DOC_QUEUE_MAX = int(os.getenv("DOC_QUEUE_MAX", "50"))                  # задач в очереди, дальше — отказ
+DOC_JOBS_PER_USER = int(os.getenv("DOC_JOBS_PER_USER", "2"))          # задач одного чата (в очереди + в работе)
+DOC_JOB_TIMEOUT = float(os.getenv("DOC_JOB_TIMEOUT", "90"))           # сек, дальше рендер убивается
+# Постоянные процессы wkhtmltopdf (см. services/pdf_workers.py); 0 — процесс на каждый документ
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(DOC_WORKERS)))         # процессов на набор опций
+PDF_WORKER_MAX_JOBS = int(os.getenv("PDF_WORKER_MAX_JOBS", "200"))    # документов до перезапуска процесса
+
+# ====== Кеш отрендеренных документов (см. services/render_cache.py) ======
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join(DATA_DIR, "render_cache"))
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "256"))            # дальше вытесняются давно не нужные
+RENDER_CACHE_MAX_AGE = int(os.getenv("RENDER_CACHE_MAX_AGE", str(14 * 86400)))  # сек без обращений
+
+# ====== Ресурсы шаблонов (см. services/assets.py) ======
+ASSETS_DIR = os.getenv("ASSETS_DIR", os.path.join(DATA_DIR, "assets"))   # раскодированные шрифты и картинки
+
+# ====== Планировки лотов (см. services/layout_store.py) ======
+LAYOUTS_DIR = os.getenv("LAYOUTS_DIR", os.path.join(DATA_DIR, "layouts"))
+LAYOUTS_CONCURRENCY = int(os.getenv("LAYOUTS_CONCURRENCY", "8"))     # одновременных загрузок с rclick
+LAYOUT_FETCH_TIMEOUT = int(os.getenv("LAYOUT_FETCH_TIMEOUT", "30"))  # сек на картинку
+LAYOUT_PREVIEW_SIZE = int(os.getenv("LAYOUT_PREVIEW_SIZE", "1280"))  # px по длинной стороне, 0 — без превью
+
 # Менеджеры (ID через запятую)
 MANAGER_CHAT_ID = os.getenv("MANAGER_CHAT_ID", "").strip()
 
@@ -109,6 +181,11 @@ MAIN_MENU_TRIGGER_TEXTS = [
 
 # ====== Юниты ======
 TARGET_UNIT_CODES = {"A209", "B210", "A305"}
+# Каталог лотов в памяти (services/units_db.py): как часто сверять mtime properties.db
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "5"))   # сек, 0 — при каждом чтении
+# Ответы /api/lots (services/lots_api.py)
+API_LOTS_MAX_AGE = int(os.getenv("API_LOTS_MAX_AGE", "60"))        # сек, Cache-Control для webview
+API_LOTS_CACHE_SIZE = int(os.getenv("API_LOTS_CACHE_SIZE", "256"))  # комбинаций фильтров на версию каталога
 
 # Группа для уведомлений о показах
 SHOWS_GROUP_ID = -1003301897674
@@ -139,10 +139,29 @@ from .secretary import (
     process_secretary_input,
 )
 
-# Корпус 3 (временный доступ по whitelist)
-from .corp3 import (
-    handle_corp3_start,
-    handle_corp3_callback,
-    handle_corp3_text,
-    is_whitelisted as is_corp3_whitelisted,
-)
+# Модули, которые нужны только ради регистрации callback-маршрутов
+# (services.callback_router); остальные уже импортированы выше
+from . import booking_calendar
+
+# Редко используемые подсистемы (Корпус 3 по whitelist, новости)
+# не импортируются при старте: их кнопки подгружают модуль при первом
+# нажатии, а имена ниже — при первом обращении (handlers.handle_corp3_start)
+from services.callback_router import router as _router
+
+_router.add_lazy("c3_", "handlers.corp3")
+_router.add_lazy("news_", "handlers.news")
+
+_LAZY_NAMES = {
+    "handle_corp3_start": ("corp3", "handle_corp3_start"),
+    "handle_corp3_callback": ("corp3", "handle_corp3_callback"),
+    "handle_corp3_text": ("corp3", "handle_corp3_text"),
+    "is_corp3_whitelisted": ("corp3", "is_whitelisted"),
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        module, attr = _LAZY_NAMES[name]
+        from importlib import import_module
+        return getattr(import_module(f".{module}", __name__), attr)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
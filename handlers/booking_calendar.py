@@ -3,11 +3,12 @@
 Выбор даты → время → заявка в группу → специалист берёт.
 """
 
-import sqlite3
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 
+from services import db
 from services.telegram import send_message, send_message_inline
+from services.callback_router import router
 from services.user_profiles import get_profile, save_profile, convert_time, format_dual_time, validate_time
 
 # Путь к базе данных
@@ -36,58 +37,48 @@ MONTHS_RU = ["", "января", "февраля", "марта", "апреля",
 
 # === ИНИЦИАЛИЗАЦИЯ БД ===
 
+BOOKINGS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS bookings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        username TEXT,
+        specialist_id INTEGER NOT NULL,
+        specialist_name TEXT NOT NULL,
+        booking_date TEXT NOT NULL,
+        booking_time TEXT NOT NULL,
+        status TEXT DEFAULT 'pending',
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        contact_info TEXT,
+        group_message_id INTEGER,
+        taken_by_id INTEGER,
+        taken_by_name TEXT
+    )
+"""
+
+
 def init_bookings_db():
-    """Создаёт таблицу bookings если не существует."""
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS bookings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id INTEGER NOT NULL,
-            username TEXT,
-            specialist_id INTEGER NOT NULL,
-            specialist_name TEXT NOT NULL,
-            booking_date TEXT NOT NULL,
-            booking_time TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            contact_info TEXT,
-            group_message_id INTEGER,
-            taken_by_id INTEGER,
-            taken_by_name TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    """Создаёт таблицу bookings если не существует (один раз на процесс, индексы — services/migrations.py)."""
+    db.ensure_schema(BOT_DB_PATH, BOOKINGS_SCHEMA)
 
 
 def get_booked_slots(date_str: str) -> List[str]:
     """Возвращает список забронированных слотов на дату."""
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    rows = db.fetchall(BOT_DB_PATH, """
         SELECT booking_time FROM bookings 
         WHERE booking_date = ? AND status IN ('pending', 'taken', 'confirmed')
     """, (date_str,))
-    slots = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return slots
+    return [row[0] for row in rows]
 
 
 def save_booking(chat_id: int, username: str, date_str: str, time_str: str,
                  contact_info: str = None) -> int:
     """Сохраняет бронирование в БД. Возвращает ID записи."""
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    cursor = db.execute(BOT_DB_PATH, """
         INSERT INTO bookings (chat_id, username, specialist_id, specialist_name, 
                               booking_date, booking_time, contact_info)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     """, (chat_id, username, 0, "", date_str, time_str, contact_info))
-    booking_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return booking_id
+    return cursor.lastrowid
 
 
 # === ГЕНЕРАЦИЯ СЛОТОВ ===
@@ -302,15 +293,11 @@ async def handle_select_time(chat_id: int, time_str: str, username: str = None):
 
 def get_booking_by_id(booking_id: int) -> Optional[Dict]:
     """Получает запись по ID."""
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    row = db.fetchone(BOT_DB_PATH, """
         SELECT id, chat_id, username, specialist_id, specialist_name, 
                booking_date, booking_time, status
         FROM bookings WHERE id = ?
     """, (booking_id,))
-    row = cursor.fetchone()
-    conn.close()
     
     if row:
         return {
@@ -328,13 +315,9 @@ def get_booking_by_id(booking_id: int) -> Optional[Dict]:
 
 def update_booking_status(booking_id: int, status: str):
     """Обновляет статус записи."""
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    db.execute(BOT_DB_PATH, """
         UPDATE bookings SET status = ? WHERE id = ?
     """, (status, booking_id))
-    conn.commit()
-    conn.close()
 
 
 async def handle_take_booking(chat_id: int, booking_id: int, from_user: dict):
@@ -361,15 +344,11 @@ async def handle_take_booking(chat_id: int, booking_id: int, from_user: dict):
     full_name = f"{first_name} {last_name}".strip() or username or str(user_id)
     
     # Обновляем статус в БД
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    db.execute(BOT_DB_PATH, """
         UPDATE bookings 
         SET status = 'taken', taken_by_id = ?, taken_by_name = ?
         WHERE id = ?
     """, (user_id, full_name, booking_id))
-    conn.commit()
-    conn.close()
     
     date_display = format_date_display(booking["booking_date"])
     
@@ -415,21 +394,13 @@ async def handle_take_booking(chat_id: int, booking_id: int, from_user: dict):
 
 def get_booking_group_message_id(booking_id: int) -> Optional[int]:
     """Получает message_id сообщения в группе."""
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT group_message_id FROM bookings WHERE id = ?", (booking_id,))
-    row = cursor.fetchone()
-    conn.close()
+    row = db.fetchone(BOT_DB_PATH, "SELECT group_message_id FROM bookings WHERE id = ?", (booking_id,))
     return row[0] if row and row[0] else None
 
 
 def save_booking_group_message_id(booking_id: int, message_id: int):
     """Сохраняет message_id сообщения в группе."""
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("UPDATE bookings SET group_message_id = ? WHERE id = ?", (message_id, booking_id))
-    conn.commit()
-    conn.close()
+    db.execute(BOT_DB_PATH, "UPDATE bookings SET group_message_id = ? WHERE id = ?", (message_id, booking_id))
 
 
 async def handle_booking_text_input(chat_id: int, text: str, user_info: dict = None) -> bool:
@@ -682,9 +653,7 @@ async def handle_submit_booking(chat_id: int, from_user: dict = None):
         altai_time = user_time
     
     # Сохраняем в БД (всегда в Алтайском времени)
-    conn = sqlite3.connect(BOT_DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    cursor = db.execute(BOT_DB_PATH, """
         INSERT INTO bookings (
             chat_id, username, specialist_id, specialist_name,
             booking_date, booking_time, status,
@@ -692,8 +661,6 @@ async def handle_submit_booking(chat_id: int, from_user: dict = None):
         ) VALUES (?, ?, 0, '', ?, ?, 'pending', ?, ?, '', ?)
     """, (chat_id, username, date_str, altai_time, contact, phone, user_tz))
     booking_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
     
     date_display = format_date_display(date_str)
     
@@ -760,3 +727,21 @@ async def handle_edit_menu(chat_id: int):
             [{"text": "◀️ Назад", "callback_data": "book_back_to_confirm"}]
         ]
     )
+
+
+# ====== Callback-маршруты ======
+
+router.add("booking_calendar", handle_booking_start)
+router.add("call_manager", handle_booking_start)
+router.add("online_show", handle_booking_start)
+router.add("book_date_{date_str:rest}", handle_select_date)
+router.add("book_tz_moscow", handle_select_timezone, tz="moscow")
+router.add("book_tz_altai", handle_select_timezone, tz="altai")
+router.add("book_time_confirmed", handle_time_confirmed, ctx=("user_info",))
+router.add("book_time_{time_str:rest}", handle_select_time, ctx=("username",))
+router.add("book_take_{booking_id:int}", handle_take_booking, ctx=("from_user",))
+router.add("book_change_tz", handle_change_timezone)
+router.add("book_set_tz_{tz:rest}", handle_set_timezone)
+router.add("book_add_phone", handle_request_phone)
+router.add("book_submit", handle_submit_booking, ctx=("from_user",))
+router.add("book_edit_menu", handle_edit_menu)
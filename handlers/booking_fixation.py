@@ -11,6 +11,7 @@
 
 from typing import Dict, Any
 from services.telegram import send_message, send_message_inline
+from services.callback_router import router
 from services.rclick_service import (
     is_authorized,
     get_token,
@@ -315,3 +316,13 @@ def has_active_booking_state(telegram_id: int) -> bool:
     """Проверяет есть ли активное состояние фиксации."""
     state_data = get_state(telegram_id)
     return bool(state_data.get("state"))
+
+
+# ====== Callback-маршруты ======
+
+router.add("booking_menu", handle_booking_menu, ctx=("telegram_id",))
+router.add("booking_auth", handle_booking_auth_start, ctx=("telegram_id",))
+router.add("booking_reauth", handle_booking_reauth, ctx=("telegram_id",))
+router.add("booking_new", handle_booking_new, ctx=("telegram_id",))
+router.add("booking_cancel", handle_booking_cancel, ctx=("telegram_id",))
+router.add("booking_skip_comment", handle_booking_skip_comment, ctx=("telegram_id",))
@@ -3,7 +3,8 @@
 """
 
 from typing import List, Dict, Any
-from services.telegram import send_message, send_message_inline
+from services.telegram import send_message, send_message_inline, send_document
+from services.callback_router import router
 from services.calc_universal import (
     calculate_roi_for_lot, format_roi_text,
     calculate_installment_for_lot, format_installment_text,
@@ -12,6 +13,8 @@ from handlers.kp import (
     get_lots_by_area_range, get_lots_by_budget_range,
     normalize_code, format_price_short,
 )
+from services.units_db import get_lot_by_area
+from services import doc_jobs
 
 DEFAULT_DISPLAY_LIMIT = 8
 
@@ -132,12 +135,7 @@ async def handle_calc_roi_show_all_budget(chat_id: int, min_budget: int, max_bud
 
 
 async def handle_calc_roi_lot(chat_id: int, area: float):
-    lots = get_lots_by_area_range(0, 9999)
-    lot = None
-    for l in lots:
-        if abs(l['area'] - area) < 0.05:
-            lot = l
-            break
+    lot = get_lot_by_area(area)
     if not lot:
         await send_message(chat_id, f"❌ Лот не найден.")
         return
@@ -264,12 +262,7 @@ async def handle_calc_finance_show_all_budget(chat_id: int, min_budget: int, max
 
 
 async def handle_calc_finance_lot(chat_id: int, area: float):
-    lots = get_lots_by_area_range(0, 9999)
-    lot = None
-    for l in lots:
-        if abs(l['area'] - area) < 0.05:
-            lot = l
-            break
+    lot = get_lot_by_area(area)
     if not lot:
         await send_message(chat_id, f"❌ Лот не найден.")
         return
@@ -328,3 +321,65 @@ async def handle_calc_finance_by_code(chat_id: int, code: str, building: int = N
         [{"text": "🔙 К списку", "callback_data": "calc_finance_menu"}],
     ]
     await send_message_inline(chat_id, text, inline_buttons)
+
+
+async def handle_roi_xlsx_by_code(chat_id: int, code: str, building: int = None):
+    """Excel-расчёт доходности по коду лота."""
+    from services.units_db import get_lot_by_code
+    
+    lot = get_lot_by_code(code, building)
+    if not lot:
+        await send_message(chat_id, f"❌ Лот {code} не найден")
+        return
+    
+    from services.calc_xlsx_generator import generate_roi_xlsx
+    try:
+        xlsx = await doc_jobs.generate(
+            chat_id, f"Создаю Excel для {lot['code']}...", generate_roi_xlsx,
+            unit_code=lot['code'], building=lot['building'], as_buffer=True,
+        )
+    except doc_jobs.JobRejected as e:
+        await send_message(chat_id, str(e))
+        return
+    if xlsx:
+        await send_document(chat_id, xlsx, f"ROI_{lot['code']}.xlsx")
+    else:
+        await send_message(chat_id, "❌ Ошибка создания Excel")
+
+
+async def handle_roi_xlsx_by_area(chat_id: int, area: float):
+    """Excel-расчёт доходности по площади."""
+    from services.calc_xlsx_generator import generate_roi_xlsx
+    try:
+        xlsx = await doc_jobs.generate(chat_id, f"Создаю Excel для {area} м²...", generate_roi_xlsx, area=area, as_buffer=True)
+    except doc_jobs.JobRejected as e:
+        await send_message(chat_id, str(e))
+        return
+    if xlsx:
+        await send_document(chat_id, xlsx, f"ROI_{area}m2.xlsx")
+    else:
+        await send_message(chat_id, "❌ Ошибка создания Excel")
+
+
+# ====== Callback-маршруты ======
+
+router.add("calc_roi_menu", handle_calc_roi_menu)
+router.add("calc_finance_menu", handle_calc_finance_menu)
+router.add("calc_roi_by_area", handle_calc_roi_by_area_menu)
+router.add("calc_roi_by_budget", handle_calc_roi_by_budget_menu)
+router.add("calc_finance_by_area", handle_calc_finance_by_area_menu)
+router.add("calc_finance_by_budget", handle_calc_finance_by_budget_menu)
+router.add("calc_roi_area_{min_area:float}_{max_area:float}", handle_calc_roi_area_range)
+router.add("calc_roi_budget_{min_budget:int}_{max_budget:int}", handle_calc_roi_budget_range)
+router.add("calc_roi_show_area_{min_area:float}_{max_area:float}", handle_calc_roi_show_all_area)
+router.add("calc_roi_show_budget_{min_budget:int}_{max_budget:int}", handle_calc_roi_show_all_budget)
+router.add("calc_fin_show_area_{min_area:float}_{max_area:float}", handle_calc_finance_show_all_area)
+router.add("calc_fin_show_budget_{min_budget:int}_{max_budget:int}", handle_calc_finance_show_all_budget)
+router.add("calc_fin_area_{min_area:float}_{max_area:float}", handle_calc_finance_area_range)
+router.add("calc_fin_budget_{min_budget:int}_{max_budget:int}", handle_calc_finance_budget_range)
+router.add("calc_roi_code_{code:rest}_{building:int?}", handle_calc_roi_by_code)
+router.add("calc_finance_code_{code:rest}_{building:int?}", handle_calc_finance_by_code)
+router.add("calc_roi_lot_{area:x10}", handle_calc_roi_lot)
+router.add("calc_finance_lot_{area:x10}", handle_calc_finance_lot)
+router.add("roi_xlsx_code_{code:rest}_{building:int?}", handle_roi_xlsx_by_code)
+router.add("roi_xlsx_{area:x10}", handle_roi_xlsx_by_area)
@@ -10,6 +10,8 @@
 
 from typing import Optional, List, Dict, Any
 from services.telegram import send_message, send_message_inline, send_document
+from services.callback_router import router
+from services import doc_jobs
 from services.investment_compare import (
     compare_investments,
     format_comparison_short,
@@ -179,6 +181,13 @@ async def handle_compare_lot(chat_id: int, lot_code: str, price: int):
     await send_message_inline(chat_id, text, inline_buttons)
 
 
+async def handle_compare_lot_callback(chat_id: int, lot_code: str, building: int, price: int = None):
+    """Кнопка compare_lot_{код}_{корпус}_{цена/1000} (старый формат — без корпуса)."""
+    if price is None:
+        price = building * 1000
+    await handle_compare_lot(chat_id, lot_code, price)
+
+
 async def handle_compare_quick(chat_id: int):
     """Быстрое сравнение на 15 млн."""
     await handle_compare_lot(chat_id, "пример", DEFAULT_AMOUNT)
@@ -275,17 +284,17 @@ async def handle_compare_pdf(chat_id: int, years: int, amount: int, username: st
     """Генерирует и отправляет PDF со сравнением."""
     from services.compare_pdf_generator import generate_compare_pdf
     
-    await send_message(chat_id, "⏳ Создаю PDF-документ...")
-    
-    pdf_path = generate_compare_pdf(amount, years, username)
+    try:
+        pdf = await doc_jobs.generate(
+            chat_id, "Создаю PDF-документ...", generate_compare_pdf, amount, years, username, as_buffer=True,
+        )
+    except doc_jobs.JobRejected as e:
+        await send_message(chat_id, str(e))
+        return
     
-    if pdf_path:
+    if pdf:
         filename = f"RIZALTA_vs_Депозит_{years}лет_{amount // 1_000_000}млн.pdf"
-        await send_document(chat_id, pdf_path, filename)
-        
-        # Удаляем временный файл
-        import os
-        os.unlink(pdf_path)
+        await send_document(chat_id, pdf, filename)
     else:
         await send_message(chat_id, "❌ Ошибка создания PDF. Попробуйте позже.")
 
@@ -319,3 +328,21 @@ def get_quick_comparison_text(amount: int = DEFAULT_AMOUNT) -> str:
 • <b>RIZALTA выгоднее на {fmt(result_11y.advantage_vs_base)} ₽</b>
 
 💡 RIZALTA выгоднее депозита на всех сроках!"""
+
+
+# ====== Callback-маршруты ======
+
+router.add("compare_by_area", handle_compare_by_area_menu)
+router.add("compare_by_budget", handle_compare_by_budget_menu)
+router.add("compare_quick", handle_compare_quick)
+router.add("compare_area_{min_area:float}_{max_area:float}", handle_compare_area_range)
+router.add("compare_budget_{min_budget:mln}_{max_budget:mln}", handle_compare_budget_range)
+router.add("compare_lot_back_{price:int}", handle_compare_lot, lot_code="выбранный")
+router.add("compare_lot_{lot_code:str}_{building:int}_{price:k?}", handle_compare_lot_callback)
+router.add("compare_table", handle_compare_table)
+router.add("compare_table_{amount:int}", handle_compare_table)
+router.add("compare_period_{years:int}_{amount:int?}", handle_compare_period)
+router.add("compare_full_{years:int}_{amount:int?}", handle_compare_full)
+router.add("compare_amount_{context:str}", handle_compare_amount_menu)
+router.add("compare_sum_{amount_mln:int}_{context:str}", handle_compare_with_amount)
+router.add("compare_pdf_{years:int}_{amount:int}", handle_compare_pdf, ctx=("username",))
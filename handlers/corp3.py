@@ -8,15 +8,18 @@ v1.0.0 — 23.01.2026
 """
 
 import json
-import base64
-import os
-import tempfile
-import subprocess
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 from services.telegram import send_message, send_message_inline, send_document, send_photo_inline
-import sqlite3
+from services.callback_router import router
+from services.doc_output import DocumentOutput, html_to_pdf, write_output
+from services import db, doc_jobs
+from services.lot_codes import code_key
+from services.logger import get_logger
+
+
+log = get_logger("corp3")
 
 DB_PATH = "/opt/bot-dev/properties.db"
 
@@ -26,6 +29,8 @@ DATA_PATH = Path(__file__).parent.parent / "data" / "corp3_units.json"
 # Кеш данных
 _units_cache: List[Dict[str, Any]] = []
 _filter_cache: Dict[int, Dict[str, Any]] = {}  # chat_id -> {filter_type, params, units}
+_code_index: Dict[str, Dict[str, Any]] = {}
+_code_index_units: Optional[List[Dict[str, Any]]] = None
 
 
 def load_units() -> List[Dict[str, Any]]:
@@ -46,12 +51,7 @@ def load_units() -> List[Dict[str, Any]]:
 
 def is_whitelisted(chat_id: int) -> bool:
     """Проверяет, есть ли пользователь в whitelist (из БД)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM corp3_whitelist WHERE chat_id = ?", (chat_id,))
-    result = cursor.fetchone() is not None
-    conn.close()
-    return result
+    return db.fetchone(DB_PATH, "SELECT 1 FROM corp3_whitelist WHERE chat_id = ?", (chat_id,)) is not None
 
 
 def fmt(price: int) -> str:
@@ -59,18 +59,21 @@ def fmt(price: int) -> str:
     return f"{price:,}".replace(",", " ")
 
 
-def get_unit_by_code(code: str) -> Optional[Dict[str, Any]]:
-    """Находит лот по коду."""
+def _get_code_index() -> Dict[str, Dict[str, Any]]:
+    """{code_key: лот} поверх _units_cache; пересобирается вместе с кешем."""
+    global _code_index, _code_index_units
     units = load_units()
-    code_upper = code.strip().upper()
-    # Нормализация: латиница ↔ кириллица
-    code_cyr = code_upper.replace('A', 'А').replace('B', 'В')
-    code_lat = code_upper.replace('А', 'A').replace('В', 'B')
-    
-    for u in units:
-        if u['code'].upper() in (code_upper, code_cyr, code_lat):
-            return u
-    return None
+    if _code_index_units is not units:
+        index: Dict[str, Dict[str, Any]] = {}
+        for u in units:
+            index.setdefault(code_key(u['code']), u)
+        _code_index, _code_index_units = index, units
+    return _code_index
+
+
+def get_unit_by_code(code: str) -> Optional[Dict[str, Any]]:
+    """Находит лот по коду (кириллица/латиница)."""
+    return _get_code_index().get(code_key(code))
 
 
 def filter_units(
@@ -365,45 +368,39 @@ async def handle_corp3_generate_kp(chat_id: int, code: str, include_18m: bool =
         await send_message(chat_id, f"❌ Лот {code} не найден.")
         return
     
-    await send_message(chat_id, f"⏳ Генерирую КП для {code}...")
-    
     try:
-        pdf_path = generate_corp3_kp_pdf(unit, include_18m=include_18m)
+        pdf = await doc_jobs.generate(
+            chat_id, f"Генерирую КП для {code}...", generate_corp3_kp_pdf,
+            unit, include_18m=include_18m, as_buffer=True,
+        )
         
-        if pdf_path and Path(pdf_path).exists():
+        if pdf:
             suffix = "12+18m" if include_18m else "12m"
             filename = f"KP_Corp3_{code}_{suffix}.pdf"
             
-            await send_document(chat_id, pdf_path, filename)
-            
-            # Удаляем временный файл
-            Path(pdf_path).unlink(missing_ok=True)
+            await send_document(chat_id, pdf, filename)
         else:
             await send_message(chat_id, "❌ Ошибка генерации КП.")
+    except doc_jobs.JobRejected as e:
+        await send_message(chat_id, str(e))
     except Exception as e:
-        print(f"[CORP3] Ошибка генерации КП: {e}")
+        log.error("ошибка генерации КП", chat_id=chat_id, code=code, error=repr(e))
         await send_message(chat_id, f"❌ Ошибка: {str(e)}")
 
 
 # ==================== KP GENERATOR ====================
 
-def generate_corp3_kp_pdf(unit: Dict[str, Any], include_18m: bool = False) -> Optional[str]:
-    """Генерирует PDF КП для лота корпуса 3."""
+def generate_corp3_kp_pdf(unit: Dict[str, Any], include_18m: bool = False, as_buffer: bool = False) -> Optional[DocumentOutput]:
+    """Генерирует PDF КП для лота корпуса 3 (путь или BytesIO при as_buffer=True)."""
     from services.installment_calculator import calc_12m, calc_18m
-    from services.kp_pdf_generator import load_resource, CUSTOM_INSTALLMENT_UNITS
+    from services import assets
+    from services.kp_pdf_generator import CUSTOM_INSTALLMENT_UNITS, KP_PDF_OPTIONS
     
-    # Загружаем планировку
+    # Планировка, шрифты и логотип — файлами (wkhtmltopdf читает их сам)
     layout_path = Path(unit['layout_path'])
-    layout_b64 = ""
-    if layout_path.exists():
-        with open(layout_path, 'rb') as f:
-            layout_b64 = base64.b64encode(f.read()).decode()
-    
-    # Загружаем ресурсы
-    logo_b64 = load_resource("logo_mono_trim_base64.txt")
-    font_regular = load_resource("montserrat_regular_base64.txt")
-    font_medium = load_resource("montserrat_medium_base64.txt")
-    font_semibold = load_resource("montserrat_semibold_base64.txt")
+    layout = layout_path.resolve().as_uri() if layout_path.exists() else ""
+    logo = assets.file_url("kp_logo")
+    fonts = assets.font_face_css("Montserrat", assets.MONTSERRAT)
     
     # Расчёты рассрочки
     price = unit["price"]
@@ -452,9 +449,7 @@ def generate_corp3_kp_pdf(unit: Dict[str, Any], include_18m: bool = False) -> Op
     html = f'''<!DOCTYPE html>
 <html><head><meta charset="UTF-8">
 <style>
-@font-face {{ font-family: 'Montserrat'; src: url(data:font/truetype;base64,{font_regular}) format('truetype'); font-weight: 400; }}
-@font-face {{ font-family: 'Montserrat'; src: url(data:font/truetype;base64,{font_medium}) format('truetype'); font-weight: 500; }}
-@font-face {{ font-family: 'Montserrat'; src: url(data:font/truetype;base64,{font_semibold}) format('truetype'); font-weight: 600; }}
+{fonts}
 
 * {{ margin: 0; padding: 0; box-sizing: border-box; }}
 body {{ font-family: 'Montserrat', Arial, sans-serif; background: #F6F0E3; color: #313D20; font-size: 15px; line-height: 1.4; }}
@@ -508,7 +503,7 @@ body {{ font-family: 'Montserrat', Arial, sans-serif; background: #F6F0E3; color
 <body>
 
 <table class="header-table"><tr><td>
-{"<img class='logo-header' src='data:image/png;base64," + logo_b64 + "'>" if logo_b64 else ""}
+{"<img class='logo-header' src='" + logo + "'>" if logo else ""}
 </td></tr></table>
 
 <div class="title-bar">
@@ -528,7 +523,7 @@ body {{ font-family: 'Montserrat', Arial, sans-serif; background: #F6F0E3; color
 
 <div class="unit-body">
 <div class="unit-image">
-{"<img src='data:image/jpeg;base64," + layout_b64 + "'>" if layout_b64 else ""}
+{"<img src='" + layout + "'>" if layout else ""}
 </div>
 <div class="unit-details">
 <table class="detail-table">
@@ -610,35 +605,15 @@ body {{ font-family: 'Montserrat', Arial, sans-serif; background: #F6F0E3; color
 
 </body></html>'''
 
-    # Конвертируем в PDF
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-        f.write(html)
-        html_path = f.name
-    
+    # Конвертируем в PDF (без временных файлов)
     suffix = "_12m_18m" if include_18m else "_12m"
-    pdf_path = os.path.join(tempfile.gettempdir(), f"KP_Corp3_{unit['code']}{suffix}.pdf")
-    
     try:
-        cmd = [
-            'wkhtmltopdf', '--page-size', 'A4', '--orientation', 'Portrait',
-            '--margin-top', '0', '--margin-bottom', '0', '--margin-left', '0', '--margin-right', '0',
-            '--enable-local-file-access', '--disable-smart-shrinking', '--quiet',
-            html_path, pdf_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        
-        if result.returncode != 0:
-            print(f"[CORP3 KP] Ошибка wkhtmltopdf: {result.stderr}")
-            return None
-        
-        print(f"[CORP3 KP] ✅ Создан: {pdf_path}")
-        return pdf_path
+        pdf = html_to_pdf(html, KP_PDF_OPTIONS)
+        log.info("КП создан", code=unit["code"], mode=suffix.lstrip("_"), size=len(pdf))
+        return write_output(pdf, f"KP_Corp3_{unit['code']}{suffix}.pdf", as_buffer)
     except Exception as e:
-        print(f"[CORP3 KP] Ошибка: {e}")
+        log.error("ошибка рендера КП", code=unit["code"], error=repr(e))
         return None
-    finally:
-        if os.path.exists(html_path):
-            os.remove(html_path)
 
 
 # ==================== CALLBACK ROUTER ====================
@@ -649,7 +624,7 @@ async def handle_corp3_callback(chat_id: int, data: str):
         await send_message(chat_id, "🔒 Доступ ограничен.")
         return
     
-    print(f"[CORP3] callback: {data}")
+    log.info("callback", chat_id=chat_id, data=data)
     
     if data == "c3_menu":
         await handle_corp3_start(chat_id)
@@ -727,14 +702,14 @@ async def handle_corp3_text(chat_id: int, text: str) -> bool:
     Обрабатывает текстовый ввод для корпуса 3 (поиск по коду).
     Возвращает True если обработано, False если нет.
     """
-    if not is_whitelisted(chat_id):
-        return False
-    
-    # Проверяем, ожидаем ли ввод кода
+    # Проверяем, ожидаем ли ввод кода (до запроса whitelist в БД)
     cache = _filter_cache.get(chat_id, {})
     if not cache.get("awaiting_code"):
         return False
     
+    if not is_whitelisted(chat_id):
+        return False
+    
     # Сбрасываем флаг ожидания
     _filter_cache[chat_id] = {}
     
@@ -748,3 +723,9 @@ async def handle_corp3_text(chat_id: int, text: str) -> bool:
     else:
         await send_message(chat_id, f"❌ Лот «{text_clean}» не найден в Корпусе 3.\n\nПопробуйте другой код или вернитесь в меню.")
         return True
+
+
+# ==================== РЕГИСТРАЦИЯ В ОБЩЕМ РОУТЕРЕ ====================
+
+# Корпус 3 разбирает свои callback'и сам (с проверкой whitelist)
+router.add("c3_", handle_corp3_callback, raw=True)
@@ -3,10 +3,13 @@
 """
 
 from services.telegram import send_message, send_message_inline, send_document
+from services.callback_router import router
+from services.webhook_reply import inline_returnable
 
 DOCS_DIR = "/opt/bot/docs"
 
 
+@inline_returnable
 async def handle_documents_menu(chat_id: int):
     """Показывает меню документов."""
     
@@ -52,3 +55,12 @@ async def handle_send_all_docs(chat_id: int):
     """Отправляет оба договора."""
     await handle_send_ddu(chat_id)
     await handle_send_arenda(chat_id)
+
+
+# ====== Callback-маршруты ======
+
+router.add("doc_menu", handle_documents_menu)
+router.add("get_layouts", handle_documents_menu)
+router.add("doc_ddu", handle_send_ddu)
+router.add("doc_arenda", handle_send_arenda)
+router.add("doc_all", handle_send_all_docs)
@@ -6,6 +6,7 @@ v2.1.0 — Все 348 лотов, навигация по корпусам и э
 
 from typing import Optional, List, Dict, Any
 from services.telegram import send_message, send_message_inline, send_document
+from services.callback_router import router
 from services.units_db import (
     get_all_available_lots,
     get_lots_by_building,
@@ -20,8 +21,9 @@ from services.units_db import (
     format_price_full,
     get_building_name,
     parse_floor_query,
-    normalize_code,
 )
+from services.lot_codes import to_cyrillic
+from services import doc_jobs
 from services.kp_pdf_generator import generate_kp_pdf, CUSTOM_INSTALLMENT_UNITS
 
 # Константы
@@ -730,21 +732,30 @@ async def handle_kp_generate(chat_id: int, code: str, mode: str, building: int =
             code = parts[0]
             building = int(parts[1])
     
-    await send_message(chat_id, f"⏳ Создаю КП для лота {code}...")
-    
     # Определяем параметры генерации
     if mode == "100":
-        pdf_path = generate_kp_pdf(code=code, building=building, include_18m=False, full_payment=True)
+        include_18m, full_payment = False, True
         filename = f"КП_{code}_100.pdf"
     elif mode == "12":
-        pdf_path = generate_kp_pdf(code=code, building=building, include_18m=False, full_payment=False)
+        include_18m, full_payment = False, False
         filename = f"КП_{code}_12m.pdf"
     else:  # full
-        pdf_path = generate_kp_pdf(code=code, building=building, include_18m=True, full_payment=False)
+        include_18m, full_payment = True, False
         filename = f"КП_{code}_12m_18m.pdf"
     
-    if pdf_path:
-        await send_document(chat_id, pdf_path, filename)
+    # PDF собирается в пуле документов (services/doc_jobs.py), в памяти,
+    # и уходит в Telegram без временного файла
+    try:
+        pdf = await doc_jobs.generate(
+            chat_id, f"Создаю КП для лота {code}...", generate_kp_pdf,
+            code=code, building=building, include_18m=include_18m, full_payment=full_payment, as_buffer=True,
+        )
+    except doc_jobs.JobRejected as e:
+        await send_message(chat_id, str(e))
+        return
+    
+    if pdf:
+        await send_document(chat_id, pdf, filename)
         
         # Формируем callback для возврата к лоту
         lot_callback = f"kp_lot_{code}_{building}" if building else f"kp_lot_{code}"
@@ -755,13 +766,6 @@ async def handle_kp_generate(chat_id: int, code: str, mode: str, building: int =
             [{"text": "✅ Записаться на показ", "callback_data": "online_show"}],
         ]
         await send_message_inline(chat_id, "✅ КП готово!", inline_buttons)
-        
-        # Удаляем временный файл
-        import os
-        try:
-            os.unlink(pdf_path)
-        except:
-            pass
     else:
         await send_message(chat_id, f"❌ Ошибка создания КП для {code}. Попробуйте позже.")
 
@@ -960,7 +964,44 @@ def get_lots_by_budget_range(min_budget: int, max_budget: int) -> List[Dict[str,
 
 
 def normalize_code(code: str) -> str:
-    """Для совместимости — возвращает нормализованный код."""
-    from services.units_db import normalize_code as nc
-    cyr, lat = nc(code)
-    return cyr
+    """Для совместимости — возвращает нормализованный код (кириллица)."""
+    return to_cyrillic(code)
+
+
+# ====== Callback-маршруты ======
+
+router.add("kp_menu", handle_kp_menu)
+router.add("kp_refine", handle_kp_menu)
+router.add("kp_by_building", handle_kp_by_building_menu)
+router.add("kp_building_{building:int}", handle_kp_building)
+router.add("kp_floors_{building:int}_{floor_range:str}", handle_kp_floors_range)
+router.add("kp_floor_all_{building:int}_{floor:int}", handle_kp_floor)
+router.add("kp_floor_{building:int}_{floor:int}", handle_kp_floor)
+router.add("kp_lot_{code:str}_{building:int?}", handle_kp_lot)
+# kp_gen_{code}_{building}_{mode} или kp_gen_{code}_{mode}: код вместе с корпусом
+router.add("kp_gen_{code:rest}_{mode:str}", handle_kp_generate)
+router.add("kp_by_code", handle_kp_by_code_menu)
+router.add("kp_show_more", handle_kp_show_more)
+router.add("kp_by_area", handle_kp_by_area_menu)
+router.add("kp_by_budget", handle_kp_by_budget_menu)
+router.add("kp_area_{min_area:float}_{max_area:float}", handle_kp_area_range)
+router.add("kp_budget_{min_budget:int}_{max_budget:int}", handle_kp_budget_range)
+router.add("kp_send_{area:x10?}", handle_kp_send_one)
+router.add("kp_show_area_{min_area:float}_{max_area:float}_{offset:int?}", handle_kp_show_all_area)
+router.add("kp_show_budget_{min_budget:int}_{max_budget:int}", handle_kp_show_all_budget)
+router.add("kp_select_{area_x10:int}", handle_kp_select_lot)
+
+# Универсальная навигация: расчёты и сравнение
+for _mode in ("calc", "compare"):
+    router.add(f"{_mode}_nav_menu", handle_nav_menu, mode=_mode)
+    router.add(f"{_mode}_nav_by_building", handle_nav_by_building_menu, mode=_mode)
+    router.add(f"{_mode}_nav_by_area", handle_kp_by_area_menu)
+    router.add(f"{_mode}_nav_by_budget", handle_kp_by_budget_menu)
+    router.add(f"{_mode}_nav_by_code", handle_kp_by_code_menu)
+    router.add(f"{_mode}_nav_building_{{building:int}}", handle_nav_building, mode=_mode)
+    router.add(f"{_mode}_nav_floors_{{building:int}}_{{floor_range:str}}", handle_kp_floors_range)
+    router.add(f"{_mode}_nav_floor_{{building:int}}_{{floor:int}}", handle_nav_floor, mode=_mode)
+    router.add(f"{_mode}_nav_lot_{{code:str}}_{{building:int?}}", handle_nav_lot, mode=_mode)
+
+router.add("calc_main_menu", handle_nav_menu, mode="calc")
+router.add("compare_menu", handle_nav_menu, mode="compare")
@@ -7,17 +7,18 @@ from typing import List, Dict, Any
 import os
 import re
 
+from services import kp_search
+from services.lot_codes import to_latin
 from services.telegram import send_message, send_message_inline, send_photo
 from services.units_db import (
     get_unique_lots, get_lots_by_area, get_lots_by_budget,
     get_lot_by_area, get_lot_by_code, format_price_short
 )
 from models.state import clear_dialog_state
-from config.settings import BASE_DIR
 
 
 # Путь к папке с готовыми КП (JPG)
-KP_DIR = os.path.join(BASE_DIR, "kp_all")
+KP_DIR = kp_search.KP_DIR
 
 # Сколько кнопок показывать по умолчанию
 DEFAULT_DISPLAY_LIMIT = 8
@@ -25,18 +26,8 @@ DEFAULT_DISPLAY_LIMIT = 8
 
 def find_kp_by_area(area: float) -> str:
     """Ищет готовый JPG файл КП по площади."""
-    if not os.path.exists(KP_DIR):
-        return None
-    
-    for f in os.listdir(KP_DIR):
-        if not f.endswith(".jpg"):
-            continue
-        match = re.match(r"kp_([\d.]+)m_", f)
-        if match:
-            file_area = float(match.group(1))
-            if abs(file_area - area) < 0.05:
-                return os.path.join(KP_DIR, f)
-    return None
+    files = kp_search.find_kp_by_area(area, tolerance=0.05)
+    return files[0] if files else None
 
 
 def get_lots_by_area_range(min_area: float, max_area: float) -> List[Dict[str, Any]]:
@@ -50,12 +41,10 @@ def get_lots_by_budget_range(min_budget: int, max_budget: int) -> List[Dict[str,
 
 
 def normalize_code(code: str) -> str:
-    """Нормализует код лота."""
+    """Нормализует код лота (латиница, см. services/lot_codes.py)."""
     if not code:
         return ""
-    code = str(code).strip().upper()
-    table = str.maketrans({"А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P", "С": "S", "Т": "T"})
-    return code.translate(table)
+    return to_latin(str(code))
 
 
 # Re-export format_price_short for calc_dynamic.py
@@ -3,10 +3,13 @@
 """
 
 from services.telegram import send_message, send_message_inline, send_document, send_video
+from services.callback_router import router
+from services.webhook_reply import inline_returnable
 
 MEDIA_DIR = "/opt/bot/media"
 
 
+@inline_returnable
 async def handle_media_menu(chat_id: int):
     """Показывает меню медиа-материалов."""
     
@@ -128,3 +131,13 @@ async def handle_send_presentation_file(chat_id: int, pres_key: str):
             [{"text": "✅ Записаться на показ", "callback_data": "online_show"}],
         ]
         await send_message_inline(chat_id, "✅ Документ отправлен!", inline_buttons)
+
+
+# ====== Callback-маршруты ======
+
+router.add("media_menu", handle_media_menu)
+router.add("media_presentation", handle_send_presentation)
+router.add("media_video", handle_video_menu)
+# Ключ презентации/видео — вся строка callback_data
+router.add("pres_", handle_send_presentation_file, raw=True)
+router.add("video_", handle_send_video, raw=True)
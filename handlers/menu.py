@@ -21,8 +21,11 @@ from models.state import (
 )
 from services.telegram import send_message, send_message_inline, send_document, send_photo_inline
 from services.data_loader import load_why_rizalta_text
+from services.callback_router import router
+from services.webhook_reply import inline_returnable
 
 
+@inline_returnable
 async def handle_start(chat_id: int, text: str = "", user_info: Dict[str, Any] = None):
     """
     Обработка /start — приветствие и главное меню.
@@ -50,6 +53,7 @@ async def handle_start(chat_id: int, text: str = "", user_info: Dict[str, Any] =
     await send_message(chat_id, welcome, with_keyboard=True, buttons=MAIN_MENU_BUTTONS)
 
 
+@inline_returnable
 async def handle_help(chat_id: int):
     """Обработка /help."""
     text = (
@@ -66,6 +70,7 @@ async def handle_help(chat_id: int):
     await send_message(chat_id, text, with_keyboard=True, buttons=MAIN_MENU_BUTTONS)
 
 
+@inline_returnable
 async def handle_back(chat_id: int):
     """
     Обработка кнопки "Назад" — возврат в главное меню.
@@ -80,6 +85,7 @@ async def handle_back(chat_id: int):
     )
 
 
+@inline_returnable
 async def handle_main_menu(chat_id: int):
     """Показ главного меню."""
     await send_message(
@@ -248,3 +254,9 @@ async def handle_myid(chat_id: int, user_info: dict = None):
     text += "\n💡 <i>Chat ID используется для системы бронирования.</i>"
     
     await send_message(chat_id, text)
+
+
+# ====== Callback-маршруты ======
+
+router.add("calculate_roi", handle_choose_unit_for_roi)
+router.add("back_to_menu", handle_main_menu)
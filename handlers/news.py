@@ -11,6 +11,8 @@ import xml.etree.ElementTree as ET
 import re
 
 from services.telegram import send_message, send_message_inline
+from services.callback_router import router
+from services.webhook_reply import inline_returnable
 
 
 # ==================== КУРСЫ ВАЛЮТ (ЦБ РФ) ====================
@@ -497,6 +499,7 @@ async def handle_news_digest(chat_id: int):
 
 # ==================== ГЛАВНОЕ МЕНЮ НОВОСТЕЙ ====================
 
+@inline_returnable
 async def handle_news_menu(chat_id: int):
     """Показывает меню новостей."""
     text = """📰 <b>Инвест-дайджест</b>
@@ -512,3 +515,12 @@ async def handle_news_menu(chat_id: int):
     ]
     
     await send_message_inline(chat_id, text, inline_buttons, disable_web_page_preview=True)
+
+
+# ==================== CALLBACK-МАРШРУТЫ ====================
+
+router.add("news_menu", handle_news_menu)
+router.add("news_currency", handle_currency_rates)
+router.add("news_weather", handle_weather)
+router.add("news_digest", handle_news_digest)
+router.add("news_flights", handle_flights)
@@ -5,6 +5,7 @@ AI-Секретарь — личный ежедневник с голосовы
 
 from datetime import datetime, timedelta
 from services.telegram import send_message, send_message_inline
+from services.callback_router import router
 from services.secretary_db import (
     get_user_timezone, get_timezone_name, add_task, get_tasks_for_date, get_tasks_for_week, get_task_by_id,
     update_task_status, update_task_date, delete_task, count_tasks_for_date
@@ -351,3 +352,20 @@ async def handle_set_timezone(chat_id: int, timezone: int):
     
     await send_message(chat_id, f"✅ Часовой пояс установлен: <b>{tz_name}</b>\n\nНапоминания будут приходить по вашему местному времени.")
     await handle_secretary_menu(chat_id)
+
+
+# ====== Callback-маршруты ======
+
+router.add("secretary_menu", handle_secretary_menu)
+router.add("sec_day_{date_str:rest}", handle_secretary_day)
+router.add("sec_week_{start_date:rest}", handle_secretary_week)
+router.add("sec_task_{task_id:int}", handle_secretary_task_detail)
+router.add("sec_done_{task_id:int}", handle_secretary_done)
+router.add("sec_undone_{task_id:int}", handle_secretary_undone)
+router.add("sec_del_{task_id:int}", handle_secretary_delete)
+router.add("sec_move_{task_id:int}", handle_secretary_move_menu)
+router.add("sec_moveto_{task_id:int}_{new_date:str}", handle_secretary_move_to)
+router.add("sec_add", handle_secretary_add_prompt)
+router.add("sec_add_{preset_date:rest}", handle_secretary_add_prompt)
+router.add("sec_timezone", handle_timezone_menu)
+router.add("sec_set_tz_{timezone:int}", handle_set_timezone)
@@ -21,6 +21,8 @@ from models.state import (
     DialogStates,
 )
 from services.telegram import send_message, send_message_inline, send_document
+from services.callback_router import router
+from services import doc_jobs
 from services.data_loader import load_finance, get_finance_defaults, get_min_lot
 from services.calculations import (
     fmt_rub,
@@ -34,8 +36,6 @@ from services.calculations import (
     generate_investment_pdf,
 )
 
-import requests
-
 
 # ====== Готовые тексты для юнитов ======
 
@@ -420,23 +420,9 @@ async def handle_layouts(chat_id: int, unit_code: Optional[str] = None):
     await send_message(chat_id, "📎 Отправляю планировки...")
     
     # Отправляем документы
-    from config.settings import TELEGRAM_BOT_TOKEN
-    token = TELEGRAM_BOT_TOKEN
-    
     for filename in files:
         filepath = os.path.join(layouts_dir, filename)
-        try:
-            with open(filepath, "rb") as f:
-                url = f"https://api.telegram.org/bot{token}/sendDocument"
-                response = requests.post(
-                    url,
-                    data={"chat_id": chat_id},
-                    files={"document": (filename, f, "application/pdf")},
-                    timeout=60,
-                )
-                print(f"[TG] sendDocument {filename} status={response.status_code}")
-        except Exception as e:
-            print(f"[TG] Error sending {filename}: {e}")
+        if not await send_document(chat_id, filepath):
             await send_message(chat_id, f"⚠️ Ошибка при отправке файла {filename}")
     
     # Inline-кнопки после отправки
@@ -549,8 +535,6 @@ async def handle_download_pdf(chat_id: int, username: str = ""):
     """
     Генерирует и отправляет PDF с инвестиционным планом.
     """
-    import os
-    
     budget = get_budget(chat_id)
     
     if not budget:
@@ -560,13 +544,16 @@ async def handle_download_pdf(chat_id: int, username: str = ""):
         )
         return
     
-    # Отправляем сообщение о генерации
-    await send_message(chat_id, "⏳ Генерирую PDF...")
-    
-    # Генерируем PDF
-    filepath = generate_investment_pdf(budget, chat_id, username)
+    # Генерируем PDF (в пуле документов, со статусом «⏳ ...» в чате)
+    try:
+        pdf = await doc_jobs.generate(
+            chat_id, "Генерирую PDF...", generate_investment_pdf, budget, chat_id, username, as_buffer=True,
+        )
+    except doc_jobs.JobRejected as e:
+        await send_message(chat_id, str(e))
+        return
     
-    if not filepath or not os.path.exists(filepath):
+    if not pdf:
         await send_message(
             chat_id,
             "Не удалось сгенерировать PDF. Попробуйте позже или свяжитесь с менеджером.",
@@ -575,16 +562,19 @@ async def handle_download_pdf(chat_id: int, username: str = ""):
     
     # Отправляем файл
     caption = f"📄 Инвестиционный план RIZALTA\nБюджет: {fmt_rub(budget)}"
-    success = await send_document(chat_id, filepath, caption)
-    
-    # Удаляем временный файл
-    try:
-        os.remove(filepath)
-    except Exception:
-        pass
+    success = await send_document(chat_id, pdf, caption)
     
     if not success:
         await send_message(
             chat_id,
             "Не удалось отправить файл. Попробуйте позже.",
         )
+
+
+# ====== Callback-маршруты ======
+
+router.add("download_pdf", handle_download_pdf, ctx=("username",))
+router.add("select_lot", handle_select_lot)
+router.add("roi_{unit_code:rest}", handle_base_roi)
+router.add("finance_{unit_code:rest}", handle_finance_overview)
+router.add("layout_{unit_code:rest}", handle_layouts)
@@ -4,7 +4,7 @@
 ====================
 
 Использование:
-1. Положить рядом: properties.db, header_image_base64.txt
+1. Положить рядом: properties.db, header_image_base64.txt (корень проекта)
 2. Запустить: python kp_generator.py
 
 Функции:
@@ -14,14 +14,18 @@
 """
 
 import sqlite3
-import base64
 from collections import defaultdict
 from pathlib import Path
 
+from services import assets
+from services.logger import get_logger
+
+
+log = get_logger("kp_html")
+
 # === НАСТРОЙКИ ===
 SERVICE_FEE = 150_000  # Вычет с каждого лота перед расчётом
 DB_PATH = "properties.db"
-HEADER_IMAGE_PATH = "header_image_base64.txt"
 
 # === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 
@@ -197,12 +201,8 @@ def calc_portfolio_installment(units: list):
     }
 
 def load_header_image():
-    """Загружает base64 картинку для шапки"""
-    try:
-        with open(HEADER_IMAGE_PATH, 'r') as f:
-            return f.read().strip()
-    except:
-        return ""
+    """data: URI картинки шапки (читается один раз за процесс, services/assets.py)"""
+    return assets.data_uri("kp_header")
 
 def get_units_from_db(where_clause: str = "1=1", params: tuple = ()):
     """Получает лоты из базы"""
@@ -221,7 +221,7 @@ def get_units_from_db(where_clause: str = "1=1", params: tuple = ()):
 
 # === ГЕНЕРАЦИЯ HTML ===
 
-def generate_lot_card(group_units: list, header_image_b64: str, mode: str = "default") -> str:
+def generate_lot_card(group_units: list, header_image: str, mode: str = "default") -> str:
     """
     Генерирует HTML карточку для группы лотов.
     mode: "default" или "two_installments"
@@ -381,7 +381,7 @@ def generate_html(units: list, title: str, subtitle: str, output_path: str, extr
     Генерирует полный HTML документ.
     mode: "default" или "two_installments"
     """
-    header_image_b64 = load_header_image()
+    header_image = load_header_image()
     is_single = len(units) == 1
     
     # Для одного лота — особый subtitle
@@ -400,7 +400,7 @@ def generate_html(units: list, title: str, subtitle: str, output_path: str, extr
     # Генерируем карточки
     lot_cards = ""
     for area_key, group_units in groups.items():
-        lot_cards += generate_lot_card(group_units, header_image_b64, mode)
+        lot_cards += generate_lot_card(group_units, header_image, mode)
     
     # Расчёт портфеля
     portfolio = calc_portfolio_installment(units)
@@ -533,7 +533,7 @@ def generate_html(units: list, title: str, subtitle: str, output_path: str, extr
             text-align: center;
             background-image: 
                 linear-gradient(to bottom, rgba(6, 78, 59, 0.7), rgba(2, 44, 34, 0.95)),
-                url('data:image/png;base64,{header_image_b64}');
+                url('{header_image}');
             background-size: cover;
             background-position: center;
             padding: 100px 20px 60px;
@@ -661,9 +661,7 @@ def generate_html(units: list, title: str, subtitle: str, output_path: str, extr
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(html)
     
-    print(f"✅ КП сохранено: {output_path}")
-    print(f"   Лотов: {len(units)}")
-    print(f"   Сумма: {format_price(portfolio['total_price'])}")
+    log.info("КП сохранено", path=output_path, lots=len(units), total=portfolio['total_price'])
     
     return output_path
 
@@ -680,7 +678,7 @@ def generate_kp_by_codes(codes: list, output_name: str = "kp_custom.html"):
     units = get_units_from_db(f"code IN ({placeholders})", tuple(codes))
     
     if not units:
-        print("❌ Лоты не найдены")
+        log.warning("лоты не найдены", codes=codes)
         return None
     
     return generate_html(
@@ -717,7 +715,7 @@ def generate_kp_by_filter(
     units = get_units_from_db(where, tuple(params))
     
     if not units:
-        print("❌ Лоты не найдены")
+        log.warning("лоты не найдены", area_min=area_min, area_max=area_max, floor=floor, block_section=block_section)
         return None
     
     # Формируем subtitle
@@ -760,7 +758,7 @@ def generate_kp_by_budget(
             total += u['price']
     
     if not selected:
-        print("❌ Не удалось подобрать лоты")
+        log.warning("лоты под бюджет не подобраны", budget=budget, block_section=block_section)
         return None
     
     remaining = budget - total
@@ -4,40 +4,39 @@ DEV режим — polling вместо webhook.
 """
 
 import asyncio
-import aiohttp
-import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TG_API = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
-
 # Импортируем обработчики из app.py
 from app import process_callback, process_message, process_voice_message, handle_contact_shared
 from services.monitoring import log_request, monitoring_loop
+from services.telegram import api_request, send_message, close_session
+from services.update_dedup import is_duplicate
 
-async def get_updates(session, offset=None, timeout=30):
+async def get_updates(offset=None, timeout=30):
     """Получает обновления через long polling."""
-    url = f"{TG_API}/getUpdates"
     params = {"timeout": timeout}
     if offset:
         params["offset"] = offset
     
-    async with session.get(url, params=params) as resp:
-        data = await resp.json()
-        return data.get("result", [])
+    # Таймаут HTTP-запроса должен быть больше таймаута long polling
+    data = await api_request("getUpdates", params, timeout=timeout + 10)
+    if data is None:
+        raise ConnectionError("getUpdates: нет ответа от Bot API")
+    return data.get("result", [])
 
-async def delete_webhook(session):
+async def delete_webhook():
     """Удаляет webhook перед запуском polling."""
-    url = f"{TG_API}/deleteWebhook"
-    async with session.post(url) as resp:
-        result = await resp.json()
-        print(f"[DEV] Webhook deleted: {result.get('ok')}")
+    result = await api_request("deleteWebhook")
+    print(f"[DEV] Webhook deleted: {bool(result and result.get('ok'))}")
 
 async def handle_update(upd):
     """Обработка одного update — копия логики из webhook."""
     
+    if is_duplicate(upd.get("update_id")):
+        return
+    
     # Callback Query (inline-кнопки)
     callback_query = upd.get("callback_query")
     if callback_query:
@@ -81,7 +80,10 @@ async def reminder_loop():
     from datetime import datetime, timedelta
     from pathlib import Path
     
+    from services.send_queue import set_send_priority, PRIORITY_NOTIFY
+    
     DB_PATH = Path("/opt/bot-dev/secretary.db")
+    set_send_priority(PRIORITY_NOTIFY)
     
     await asyncio.sleep(5)  # Даём боту запуститься
     print("[DEV] Фоновая задача напоминаний запущена")
@@ -136,23 +138,12 @@ async def reminder_loop():
 📋 {task_text}{client_info}
 🕐 Через 15 минут ({due_time})"""
                     
-                    url = f"{TG_API}/sendMessage"
-                    payload = {
-                        "chat_id": user_id,
-                        "text": message,
-                        "parse_mode": "HTML",
-                        "disable_notification": False
-                    }
-                    
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(url, json=payload) as resp:
-                            result = await resp.json()
-                            if result.get("ok"):
-                                cursor.execute("UPDATE tasks SET reminder_sent = 1 WHERE id = ?", (task_id,))
-                                conn.commit()
-                                print(f"[REMINDER] ✅ {user_id}: {task_text}")
-                            else:
-                                print(f"[REMINDER] ❌ {user_id}: {result}")
+                    if await send_message(user_id, message):
+                        cursor.execute("UPDATE tasks SET reminder_sent = 1 WHERE id = ?", (task_id,))
+                        conn.commit()
+                        print(f"[REMINDER] ✅ {user_id}: {task_text}")
+                    else:
+                        print(f"[REMINDER] ❌ {user_id}: {task_text}")
                 
                 conn.close()
         except Exception as e:
@@ -172,13 +163,13 @@ async def main():
     # Запускаем мониторинг
     asyncio.create_task(monitoring_loop())
     
-    async with aiohttp.ClientSession() as session:
-        await delete_webhook(session)
-        
-        offset = None
+    await delete_webhook()
+    
+    offset = None
+    try:
         while True:
             try:
-                updates = await get_updates(session, offset)
+                updates = await get_updates(offset)
                 for update in updates:
                     offset = update["update_id"] + 1
                     print(f"[DEV] update: {update}")
@@ -194,6 +185,8 @@ async def main():
             except Exception as e:
                 print(f"[DEV] Ошибка polling: {e}")
                 await asyncio.sleep(5)
+    finally:
+        await close_session()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Микро-бенчмарк диспетчеризации callback_data.
+
+Сравнивает поиск обработчика в services.callback_router с прежней
+цепочкой if/elif из app.process_callback. Цепочка собирается из тех же
+маршрутов (data == ... для точных, data.startswith(...) для префиксов),
+проверяемая кнопка стоит последней — худший случай для if/elif.
+
+Запуск из корня проекта:
+    python scripts/bench_callback_router.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import handlers  # регистрирует маршруты
+from services.callback_router import router
+
+# Худшие случаи прежней цепочки: последняя точная кнопка
+# и последняя кнопка с параметрами
+CASES = {
+    "booking_skip_comment": "hit = True",
+    "compare_pdf_5_15000000": (
+        "parts = data.split('_')\n"
+        "        years = int(parts[2])\n"
+        "        amount = int(parts[3])\n"
+        "        hit = True"
+    ),
+}
+
+NUMBER = 200_000
+
+
+def build_legacy_chain(target: str, target_body: str):
+    """Собирает функцию с цепочкой if/elif по всем маршрутам, target — последним."""
+    lines = ["def legacy(data):", "    hit = False"]
+    keyword = "if"
+    target_route, _ = router.resolve(target)
+
+    for route in router.routes():
+        if route is target_route:
+            continue
+        if route.front or route.rest or route.raw:
+            cond = f"data.startswith({route.prefix!r})"
+        else:
+            cond = f"data == {route.pattern!r}"
+        lines.append(f"    {keyword} {cond}:")
+        lines.append("        hit = True")
+        keyword = "elif"
+
+    if target_route.front or target_route.rest:
+        cond = f"data.startswith({target_route.prefix!r})"
+    else:
+        cond = f"data == {target!r}"
+    lines.append(f"    {keyword} {cond}:")
+    lines.append(f"        {target_body}")
+    lines.append("    return hit")
+
+    namespace = {}
+    exec(compile("\n".join(lines), "<legacy_chain>", "exec"), namespace)
+    return namespace["legacy"]
+
+
+def main():
+    print(f"Маршрутов: {len(router)}, итераций: {NUMBER}\n")
+
+    for data, body in CASES.items():
+        legacy = build_legacy_chain(data, body)
+        assert legacy(data)
+
+        t_legacy = timeit.timeit(lambda: legacy(data), number=NUMBER)
+        t_router = timeit.timeit(lambda: router.resolve(data), number=NUMBER)
+
+        per_legacy = t_legacy / NUMBER * 1e6
+        per_router = t_router / NUMBER * 1e6
+        print(f"{data}")
+        print(f"  if/elif:  {per_legacy:.2f} мкс")
+        print(f"  router:   {per_router:.2f} мкс  (x{per_legacy / per_router:.1f})")
+
+
+if __name__ == "__main__":
+    main()
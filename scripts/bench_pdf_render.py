@@ -0,0 +1,139 @@
+"""
+Бенчмарк рендера HTML -> PDF: одноразовый wkhtmltopdf против постоянных
+процессов services/pdf_workers.py.
+
+Документы — КП (kp_pdf_generator.generate_html на тестовом лоте, без
+планировки) и сравнение депозит/RIZALTA (HTML из compare_pdf_generator).
+Для каждого режима:
+- время на документ (среднее, p50, p95); у пула отдельно первый
+  документ — запуск процесса и прогрев движка
+- процессорное время wkhtmltopdf на документ (RUSAGE_CHILDREN: процессы
+  пула учитываются после остановки, вместе с запуском)
+
+Запуск из корня проекта:
+    python scripts/bench_pdf_render.py [-n 20] [--docs kp,compare]
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import pdf_workers
+from services.doc_output import run_renderer
+
+SAMPLE_LOT = {
+    "code": "В708",
+    "building": 1,
+    "floor": 7,
+    "area": 32.5,
+    "price": 15_000_000,
+    "rooms": 1,
+    "block_section": 2,
+    "layout_url": "",
+}
+
+
+def kp_document() -> Tuple[str, Sequence[str]]:
+    from services.kp_pdf_generator import KP_PDF_OPTIONS, generate_html
+    return generate_html(SAMPLE_LOT, include_18m=True), KP_PDF_OPTIONS
+
+
+def compare_document() -> Tuple[str, Sequence[str]]:
+    # HTML собирается внутри generate_compare_pdf — перехватываем его на входе в рендер
+    from services import compare_pdf_generator
+
+    captured = {}
+
+    def capture(html: str, options: Sequence[str], timeout: float = 60) -> bytes:
+        captured["html"] = html
+        return b"%PDF"
+
+    original = compare_pdf_generator.html_to_pdf
+    compare_pdf_generator.html_to_pdf = capture
+    try:
+        compare_pdf_generator.generate_compare_pdf(15_000_000, 5, as_buffer=True)
+    finally:
+        compare_pdf_generator.html_to_pdf = original
+    return captured["html"], compare_pdf_generator.COMPARE_PDF_OPTIONS
+
+
+DOCUMENTS: Dict[str, Callable[[], Tuple[str, Sequence[str]]]] = {
+    "kp": kp_document,
+    "compare": compare_document,
+}
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def render_one_shot(html: str, options: Sequence[str]) -> None:
+    cmd = ["wkhtmltopdf", *options, "--quiet", "-", "-"]
+    returncode, stdout, stderr = run_renderer(cmd, html.encode("utf-8"))
+    if returncode != 0 or not stdout.startswith(b"%PDF"):
+        raise RuntimeError(f"wkhtmltopdf: код {returncode}: {stderr.decode('utf-8', 'replace')[-300:]}")
+
+
+def render_pooled(html: str, options: Sequence[str]) -> None:
+    if pdf_workers.render(html, options) is None:
+        raise RuntimeError(f"пул не справился: {pdf_workers.get_pdf_workers_stats()}")
+
+
+def timed(func: Callable[[], None]) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def report(label: str, latencies: List[float], cpu: float, count: int) -> float:
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    mean = statistics.mean(latencies)
+    print(
+        f"  {label:<12} {mean * 1000:7.0f} мс  p50 {statistics.median(latencies) * 1000:6.0f}"
+        f"  p95 {p95 * 1000:6.0f}  CPU {cpu / count * 1000:6.0f} мс/док"
+    )
+    return mean
+
+
+def bench(name: str, number: int) -> None:
+    html, options = DOCUMENTS[name]()
+    print(f"{name}: HTML {len(html) / 1024:.0f} КБ, документов: {number}")
+
+    cpu = children_cpu()
+    one_shot = [timed(lambda: render_one_shot(html, options)) for _ in range(number)]
+    mean_one_shot = report("одноразовый", one_shot, children_cpu() - cpu, number)
+
+    cpu = children_cpu()
+    first = timed(lambda: render_pooled(html, options))
+    pooled = [timed(lambda: render_pooled(html, options)) for _ in range(number)]
+    # Процессы пула учтутся в RUSAGE_CHILDREN только после завершения
+    pdf_workers.shutdown()
+    mean_pooled = report("пул", pooled, children_cpu() - cpu, number + 1)
+    print(f"  первый документ пула: {first * 1000:.0f} мс, ускорение: x{mean_one_shot / mean_pooled:.1f}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=20, help="документов на режим")
+    parser.add_argument("--docs", default=",".join(DOCUMENTS), help="какие документы: " + ",".join(DOCUMENTS))
+    args = parser.parse_args()
+
+    if not shutil.which("wkhtmltopdf"):
+        sys.exit("wkhtmltopdf не найден в PATH")
+
+    for name in args.docs.split(","):
+        bench(name.strip(), args.number)
+    print(f"Пул: {pdf_workers.get_pdf_workers_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Проверка планов горячих запросов: ни один не должен читать таблицу целиком.
+
+Создаёт во временной папке units/unit_changes/tasks/bookings по схемам модулей-
+владельцев, заполняет правдоподобными данными, применяет миграции
+(services/migrations.py) и прогоняет EXPLAIN QUERY PLAN для запросов
+из HOT_QUERIES. Полное сканирование (SCAN <таблица> без индекса) —
+ошибка, код выхода 1.
+
+С --live проверяются рабочие БД (пути из модулей), без миграций.
+
+Запуск из корня проекта:
+    python scripts/check_query_plans.py [--live] [-v]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from typing import Dict, List, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# (группа, описание, SQL, параметры) — те же запросы, что в коде бота.
+# Поиск лотов по коду, бюджету и фильтрам /api/lots идёт по каталогу в
+# памяти (units_db); его загрузка читает units целиком и здесь не проверяется.
+HOT_QUERIES: List[Tuple[str, str, str, Sequence]] = [
+    ("units", "лоты по кодам (kp_generator)",
+     "SELECT code, block_section, floor, rooms, area_m2, price_rub, layout_url FROM units "
+     "WHERE code IN (?, ?, ?) ORDER BY area_m2, price_rub", ("А419", "В401", "В403")),
+    ("units", "лоты по площади (kp_generator)",
+     "SELECT code, block_section, floor, rooms, area_m2, price_rub, layout_url FROM units "
+     "WHERE area_m2 >= ? AND area_m2 <= ? ORDER BY area_m2, price_rub", (22.0, 25.0)),
+    ("units", "лоты по площади и этажу (kp_generator)",
+     "SELECT code, block_section, floor, rooms, area_m2, price_rub, layout_url FROM units "
+     "WHERE area_m2 >= ? AND area_m2 <= ? AND floor = ? ORDER BY area_m2, price_rub", (22.0, 25.0, 4)),
+    ("units", "лот по точной площади (calc_xlsx)",
+     "SELECT code, area_m2, price_rub FROM units WHERE area_m2 = ? LIMIT 1", (30.1,)),
+    ("units", "КП по этажу и секции (kp_search)",
+     "SELECT code FROM units WHERE floor = ? AND block_section = ? ORDER BY code", (5, 1)),
+    ("units", "КП по этажу (kp_search)",
+     "SELECT code FROM units WHERE floor = ? ORDER BY code", (5,)),
+    ("unit_changes", "история за период (unit_history)",
+     "SELECT * FROM unit_changes WHERE ts >= ? ORDER BY ts DESC, sync_id DESC LIMIT ?", (1_767_000_000, 500)),
+    ("unit_changes", "история лота (unit_history)",
+     "SELECT * FROM unit_changes WHERE code IN (?, ?) ORDER BY ts DESC, sync_id DESC LIMIT ?", ("В708", "B708", 100)),
+    ("unit_changes", "история корпуса по полю (unit_history)",
+     "SELECT * FROM unit_changes WHERE building = ? AND field = ? AND ts >= ? ORDER BY ts DESC, sync_id DESC LIMIT ?",
+     (1, "price_rub", 1_767_000_000, 500)),
+    ("unit_changes", "лента изменений (unit_history)",
+     "SELECT * FROM unit_changes WHERE sync_id > ? ORDER BY sync_id, unit_id, field", (40,)),
+    ("tasks", "задачи на дату (secretary_db)",
+     "SELECT * FROM tasks WHERE user_id = ? AND due_date = ? AND status != 'cancelled'", (1, "2026-01-10")),
+    ("tasks", "задачи на неделю",
+     "SELECT * FROM tasks WHERE user_id = ? AND due_date BETWEEN ? AND ? AND status != 'cancelled' ORDER BY due_date, due_time",
+     (1, "2026-01-10", "2026-01-16")),
+    ("tasks", "напоминания (app.reminder_loop)",
+     "SELECT id FROM tasks WHERE status = 'pending' AND reminder_sent = 0 AND due_date = ? "
+     "AND due_time IS NOT NULL AND due_time <= ? AND due_time > ?", ("2026-01-10", "10:15", "10:00")),
+    ("tasks", "напоминания (secretary_db)",
+     "SELECT * FROM tasks WHERE due_date = ? AND due_time LIKE ? AND status = 'pending' AND reminder_sent = 0",
+     ("2026-01-10", "10:%")),
+    ("bookings", "занятые слоты (booking_calendar)",
+     "SELECT booking_time FROM bookings WHERE booking_date = ? AND status IN ('pending', 'taken', 'confirmed')",
+     ("2026-01-10",)),
+]
+
+TABLES = {"units": "units", "unit_changes": "unit_changes", "tasks": "tasks", "bookings": "bookings"}
+
+
+def _fill(conn: sqlite3.Connection, group: str) -> None:
+    """~размер продовых таблиц, чтобы планировщик видел реальную статистику."""
+    rnd = random.Random(1)
+    if group == "units":
+        rows = []
+        for building in (1, 2):
+            for floor in range(1, 10):
+                for n in range(1, 21):
+                    letter = "В" if building == 1 else "А"
+                    rows.append((
+                        len(rows) + 1, f"{letter}{floor}{n:02d}", building, floor, 1,
+                        rnd.choice([22.1, 25.4, 30.1, 33.3, 41.2]), rnd.randrange(15, 45) * 1_000_000,
+                        2 if building == 1 else 1,
+                    ))
+        conn.executemany(
+            "INSERT INTO units (id, code, building, floor, rooms, area_m2, price_rub, block_section) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    elif group == "unit_changes":
+        rows = []
+        for sync_id in range(1, 51):
+            for unit_id in rnd.sample(range(1, 361), 20):
+                rows.append((sync_id, unit_id, rnd.choice(["price_rub", "status"]), f"В{unit_id}",
+                             rnd.choice([1, 2]), 1, 2, 1_766_000_000 + sync_id * 86_400))
+        conn.executemany("INSERT INTO unit_changes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    elif group == "tasks":
+        conn.executemany(
+            "INSERT INTO tasks (user_id, task_text, due_date, due_time, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(rnd.randrange(50), "t", f"2026-01-{rnd.randrange(1, 29):02d}", f"{rnd.randrange(9, 19)}:00",
+              rnd.choice(["pending", "done", "cancelled"]), "2026-01-01") for _ in range(2000)])
+    elif group == "bookings":
+        conn.executemany(
+            "INSERT INTO bookings (chat_id, specialist_id, specialist_name, booking_date, booking_time, status) "
+            "VALUES (?, 0, '', ?, ?, ?)",
+            [(rnd.randrange(500), f"2026-01-{rnd.randrange(1, 29):02d}", f"{rnd.randrange(10, 16)}:00",
+              rnd.choice(["pending", "taken", "cancelled"])) for _ in range(1000)])
+    conn.commit()
+
+
+def fresh_databases(tmp: str) -> Dict[str, str]:
+    from services.parser_rclick import UNITS_SCHEMA, UNIT_CHANGES_SCHEMA
+    from services.secretary_db import TASKS_SCHEMA
+    from handlers.booking_calendar import BOOKINGS_SCHEMA
+    from services.migrations import migrate
+
+    schemas = {"units": UNITS_SCHEMA, "unit_changes": UNIT_CHANGES_SCHEMA, "tasks": TASKS_SCHEMA, "bookings": BOOKINGS_SCHEMA}
+    paths = {}
+    for group, schema in schemas.items():
+        path = paths[group] = os.path.join(tmp, f"{group}.db")
+        conn = sqlite3.connect(path)
+        conn.execute(schema)
+        conn.commit()
+        _fill(conn, group)
+        conn.close()
+        migrate(path, group)
+    return paths
+
+
+def live_databases() -> Dict[str, str]:
+    from services.migrations import _database_paths
+    return _database_paths()
+
+
+def check(paths: Dict[str, str], verbose: bool) -> int:
+    failures = 0
+    for group, title, sql, params in HOT_QUERIES:
+        conn = sqlite3.connect(paths[group])
+        try:
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.OperationalError as e:
+            print(f"ERR   {title}: {e}")
+            failures += 1
+            continue
+        finally:
+            conn.close()
+
+        table = TABLES[group]
+        full_scan = any(
+            step.startswith(f"SCAN {table}") and "INDEX" not in step
+            for step in plan
+        )
+        failures += full_scan
+        print(f"{'SCAN' if full_scan else 'ok  '}  {title}")
+        if verbose or full_scan:
+            for step in plan:
+                print(f"        {step}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="проверить рабочие БД")
+    parser.add_argument("-v", "--verbose", action="store_true", help="печатать планы всех запросов")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = live_databases() if args.live else fresh_databases(tmp)
+        failures = check(paths, args.verbose)
+
+    print(f"\nПолных сканирований: {failures}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
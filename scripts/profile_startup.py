@@ -0,0 +1,107 @@
+"""
+Профиль старта бота: время импорта каждого модуля.
+
+Запускает `python -X importtime -c "import app"` в отдельном процессе
+(чтобы ничего не было импортировано заранее) и сводит результат:
+- самые тяжёлые модули по собственному времени импорта
+- сторонние пакеты и модули проекта по суммарному времени
+- с --warmup — дополнительно время шагов прогрева (services/warmup.py)
+
+Запуск из корня проекта:
+    python scripts/profile_startup.py [--top 20] [--warmup]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROJECT_PACKAGES = ("app", "config", "handlers", "models", "services")
+
+
+def run_importtime(module: str) -> List[Tuple[str, int, int]]:
+    """Импортирует module в новом процессе -> [(имя, self мкс, cumulative мкс)]."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        tail = "\n".join(proc.stderr.splitlines()[-15:])
+        sys.exit(f"Импорт {module} завершился ошибкой:\n{tail}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:      6491 |    1789830 |   services.telegram"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def ms(us: int) -> str:
+    return f"{us / 1000:8.1f} ms"
+
+
+def report(rows: List[Tuple[str, int, int]], top: int) -> None:
+    total = sum(self_us for _, self_us, _ in rows)
+    print(f"Модулей: {len(rows)}, суммарно: {ms(total).strip()}\n")
+
+    print(f"Топ-{top} по собственному времени импорта:")
+    for name, self_us, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"  {ms(self_us)}  {name}")
+
+    # Сторонние пакеты: сумма собственного времени всех их модулей
+    packages: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        root = name.split(".")[0]
+        if root not in PROJECT_PACKAGES:
+            packages[root] += self_us
+    print(f"\nТоп-{top} сторонних пакетов:")
+    for name, self_us in sorted(packages.items(), key=lambda r: r[1], reverse=True)[:top]:
+        print(f"  {ms(self_us)}  {name}")
+
+    # Модули проекта: cumulative — сколько стоит импорт вместе с зависимостями
+    print(f"\nТоп-{top} модулей проекта (с зависимостями):")
+    project = [r for r in rows if r[0].split(".")[0] in PROJECT_PACKAGES]
+    for name, _, cumulative_us in sorted(project, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"  {ms(cumulative_us)}  {name}")
+
+
+def report_warmup() -> None:
+    """Прогрев в текущем процессе (после импорта app, как при старте)."""
+    import asyncio
+
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    import app  # noqa: F401
+    from services import warmup
+
+    asyncio.run(warmup.run_warmup())
+    stats = warmup.get_startup_stats()
+    print(f"\nПрогрев: {stats['warmup_ms']} ms")
+    for name, value in stats["steps"].items():
+        value = f"{value:8.1f} ms" if isinstance(value, float) else value
+        print(f"  {value}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="что импортировать (по умолчанию app)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--warmup", action="store_true", help="показать и время прогрева")
+    args = parser.parse_args()
+
+    report(run_importtime(args.module), args.top)
+    if args.warmup:
+        report_warmup()
+
+
+if __name__ == "__main__":
+    main()
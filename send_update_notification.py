@@ -2,11 +2,12 @@
 """Отправка уведомления об обновлении всем пользователям."""
 
 import asyncio
-import aiohttp
 import sqlite3
 from pathlib import Path
 
-BOT_TOKEN = "8343378629:AAE4OlxArGXPpju0oEzk19Wmp4ofummP788"
+from services.telegram import api_request, close_session
+from services.send_queue import set_send_priority, PRIORITY_BROADCAST
+
 DB_PATH = Path("/opt/bot/secretary.db")
 
 MESSAGE = """📋 <b>Обновление RIZALTA AI System до v2.1.0</b>
@@ -82,27 +83,26 @@ def get_all_users():
 
 async def send_silent_message(chat_id: int):
     """Отправляет бесшумное сообщение."""
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": MESSAGE,
         "parse_mode": "HTML",
         "disable_notification": True
     }
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, json=payload) as resp:
-            result = await resp.json()
-            status = "✅" if result.get("ok") else "❌"
-            print(f"{status} {chat_id}: {result.get('ok', result)}")
+    result = await api_request("sendMessage", payload)
+    status = "✅" if result and result.get("ok") else "❌"
+    print(f"{status} {chat_id}: {result.get('ok', result) if result else result}")
 
 
 async def main():
     users = get_all_users()
     print(f"Отправка {len(users)} пользователям...")
     
-    for user in users:
-        await send_silent_message(user)
-        await asyncio.sleep(0.5)
+    # Темп задаёт диспетчер send_queue (лимиты + retry_after),
+    # рассылка идёт в низшем приоритете и не тормозит ответы бота
+    set_send_priority(PRIORITY_BROADCAST)
+    await asyncio.gather(*(send_silent_message(user) for user in users))
+    await close_session()
     
     print("Готово!")
 
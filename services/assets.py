@@ -0,0 +1,138 @@
+"""
+Статические ресурсы шаблонов документов: шрифты, логотипы, картинки шапки.
+
+Раньше каждый генератор сам читал base64-файлы (kp_resources, шапка
+kp_generator) и вставлял их в HTML: КП весил ~1.5 МБ, почти всё —
+шрифты, и wkhtmltopdf каждый раз разбирал этот base64 заново.
+Теперь ресурсы описаны в ASSETS один раз и отдаются шаблонам:
+
+- file_url(name) — file:// на бинарный файл (для wkhtmltopdf с
+  --enable-local-file-access); base64-исходники один раз
+  раскодируются в ASSETS_DIR, имя файла содержит хеш содержимого
+- data_uri(name) — data: URI для документов, которые уходят
+  пользователю как самостоятельный HTML (kp_generator)
+- font_face_css — блок @font-face для семейства шрифтов
+- version() — хеш всех ресурсов, входит в ключ кеша рендеров
+
+Всё мемоизируется на процесс (load_all — в прогреве при старте);
+поменялся файл ресурса — нужен рестарт бота, как и раньше.
+"""
+
+import base64
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Mapping
+
+from config.settings import ASSETS_DIR, BASE_DIR
+from services.logger import get_logger
+
+
+log = get_logger("assets")
+
+KP_RESOURCES_DIR = os.path.join(BASE_DIR, "services", "kp_resources")
+
+
+class Asset:
+    """Ресурс: файл (encoded — в нём base64, а не сами байты) и его MIME-тип."""
+
+    __slots__ = ("path", "mime", "encoded")
+
+    def __init__(self, path: str, mime: str, encoded: bool = False):
+        self.path = path
+        self.mime = mime
+        self.encoded = encoded
+
+
+ASSETS: Dict[str, Asset] = {
+    "montserrat_400": Asset(os.path.join(KP_RESOURCES_DIR, "montserrat_regular_base64.txt"), "font/truetype", encoded=True),
+    "montserrat_500": Asset(os.path.join(KP_RESOURCES_DIR, "montserrat_medium_base64.txt"), "font/truetype", encoded=True),
+    "montserrat_600": Asset(os.path.join(KP_RESOURCES_DIR, "montserrat_semibold_base64.txt"), "font/truetype", encoded=True),
+    "kp_logo": Asset(os.path.join(KP_RESOURCES_DIR, "logo_mono_trim_base64.txt"), "image/png", encoded=True),
+    "kp_header": Asset(os.path.join(BASE_DIR, "header_image_base64.txt"), "image/webp", encoded=True),
+}
+
+# Шрифт КП: вес -> ресурс
+MONTSERRAT = {400: "montserrat_400", 500: "montserrat_500", 600: "montserrat_600"}
+
+_EXTENSIONS = {"font/truetype": ".ttf", "image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}
+
+_write_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _encoded(name: str) -> str:
+    """Содержимое ресурса в base64; "" — файла нет."""
+    asset = ASSETS[name]
+    try:
+        if asset.encoded:
+            return Path(asset.path).read_text().strip()
+        return base64.b64encode(Path(asset.path).read_bytes()).decode()
+    except OSError:
+        log.warning("ресурс не найден", asset=name, path=asset.path)
+        return ""
+
+
+@lru_cache(maxsize=None)
+def digest(name: str) -> str:
+    """Хеш содержимого ресурса."""
+    return hashlib.sha256(_encoded(name).encode()).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def data_uri(name: str) -> str:
+    """data: URI ресурса (строка строится один раз); "" — файла нет."""
+    encoded = _encoded(name)
+    return f"data:{ASSETS[name].mime};base64,{encoded}" if encoded else ""
+
+
+@lru_cache(maxsize=None)
+def file_url(name: str) -> str:
+    """file:// URL бинарного файла ресурса; "" — файла нет."""
+    asset = ASSETS[name]
+    if not asset.encoded:
+        return Path(asset.path).resolve().as_uri() if os.path.isfile(asset.path) else ""
+
+    encoded = _encoded(name)
+    if not encoded:
+        return ""
+    path = os.path.join(ASSETS_DIR, f"{name}-{digest(name)}{_EXTENSIONS.get(asset.mime, '')}")
+    with _write_lock:
+        if not os.path.isfile(path):
+            os.makedirs(ASSETS_DIR, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(base64.b64decode(encoded))
+            os.replace(tmp, path)
+    return Path(path).resolve().as_uri()
+
+
+def url(name: str, inline: bool = False) -> str:
+    """Ссылка на ресурс для шаблона: data: URI (inline) или file://."""
+    return data_uri(name) if inline else file_url(name)
+
+
+def font_face_css(family: str, faces: Mapping[int, str], inline: bool = False) -> str:
+    """Блок @font-face: вес -> имя ресурса (например, MONTSERRAT)."""
+    return "\n".join(
+        f"@font-face {{ font-family: '{family}'; src: url({url(name, inline)}) format('truetype'); font-weight: {weight}; }}"
+        for weight, name in faces.items()
+    )
+
+
+@lru_cache(maxsize=None)
+def version() -> str:
+    """Хеш всех ресурсов (для ключей кеша рендеров)."""
+    combined = hashlib.sha256()
+    for name in sorted(ASSETS):
+        combined.update(f"{name}={digest(name)};".encode())
+    return combined.hexdigest()[:16]
+
+
+def load_all() -> None:
+    """Читает все ресурсы и раскладывает файлы (прогрев при старте); data: URI — при первом запросе."""
+    for name in ASSETS:
+        file_url(name)
+    version()
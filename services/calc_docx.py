@@ -2,11 +2,14 @@
 """Генератор DOCX для инвестиционных расчётов"""
 
 import json
-import subprocess
 import tempfile
-import sqlite3
 from pathlib import Path
 from typing import Dict, Optional
+from services import units_db
+from services.doc_output import run_renderer
+from services.logger import get_logger
+
+log = get_logger("calc_docx")
 
 BASE_DIR = Path(__file__).parent.parent
 DB_PATH = BASE_DIR / "properties.db"
@@ -14,22 +17,15 @@ DB_PATH = BASE_DIR / "properties.db"
 def get_lot_from_db(code: str) -> Optional[Dict]:
     if not DB_PATH.exists():
         return None
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    code_upper = code.strip().upper()
-    table = str.maketrans({"А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P", "С": "S", "Т": "T"})
-    code_latin = code_upper.translate(table)
-    cursor.execute("SELECT code, area_m2, price_rub FROM units WHERE code = ? OR code = ? LIMIT 1", (code_upper, code_latin))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return {"code": row[0], "area": row[1], "price": row[2], "price_m2": int(row[2] / row[1])}
+    lot = units_db.get_lot_by_code(code)
+    if lot:
+        return {"code": lot["code"], "area": lot["area"], "price": lot["price"], "price_m2": int(lot["price"] / lot["area"])}
     return None
 
 def generate_roi_docx(unit_code: str, output_dir: str = None) -> Optional[str]:
     lot = get_lot_from_db(unit_code)
     if not lot:
-        print(f"[DOCX] Лот {unit_code} не найден")
+        log.warning("лот не найден", code=unit_code)
         return None
     
     # Используем инвестиционный калькулятор
@@ -70,14 +66,14 @@ def generate_roi_docx(unit_code: str, output_dir: str = None) -> Optional[str]:
     
     try:
         cmd = ["node", str(script_path), json.dumps(data), str(output_path)]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30, cwd=str(BASE_DIR))
-        if result.returncode != 0:
-            print(f"[DOCX] Ошибка: {result.stderr}")
+        returncode, _, stderr = run_renderer(cmd, timeout=30, cwd=str(BASE_DIR))
+        if returncode != 0:
+            log.error("node: ошибка", code=lot["code"], stderr=stderr.decode("utf-8", "replace"))
             return None
-        print(f"[DOCX] ✅ Создан: {output_path}")
+        log.info("файл создан", code=lot["code"], path=str(output_path))
         return str(output_path)
     except Exception as e:
-        print(f"[DOCX] Ошибка: {e}")
+        log.error("ошибка генерации", code=lot["code"], error=repr(e))
         return None
 
 if __name__ == "__main__":
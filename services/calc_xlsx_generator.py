@@ -4,12 +4,16 @@
 Записывает вычисленные значения (не формулы) для совместимости с просмотрщиками
 """
 
-import sqlite3
 from pathlib import Path
-from typing import Optional, Dict
+from typing import BinaryIO, Dict, Optional, Union
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, Border, Side
 import tempfile
+from services import db, units_db
+from services.logger import get_logger
+from services.doc_output import DocumentOutput, named_buffer
+
+log = get_logger("calc_xlsx")
 
 BASE_DIR = Path(__file__).parent.parent
 DB_PATH = BASE_DIR / "properties.db"
@@ -19,19 +23,9 @@ def get_lot_from_db(code: str, building: int = None) -> Optional[Dict]:
     """Получить лот из БД по коду и корпусу"""
     if not DB_PATH.exists():
         return None
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    code_upper = code.strip().upper()
-    table = str.maketrans({"А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P", "С": "S", "Т": "T"})
-    code_latin = code_upper.translate(table)
-    if building is not None:
-        cursor.execute("SELECT code, area_m2, price_rub FROM units WHERE (code = ? OR code = ?) AND building = ? LIMIT 1", (code_upper, code_latin, building))
-    else:
-        cursor.execute("SELECT code, area_m2, price_rub FROM units WHERE code = ? OR code = ? LIMIT 1", (code_upper, code_latin))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return {"code": row[0], "area": row[1], "price": row[2], "price_m2": int(row[2] / row[1])}
+    lot = units_db.get_lot_by_code(code, building)
+    if lot:
+        return {"code": lot["code"], "area": lot["area"], "price": lot["price"], "price_m2": int(lot["price"] / lot["area"])}
     return None
 
 
@@ -39,11 +33,9 @@ def get_lot_by_area(area: float) -> Optional[Dict]:
     """Получить лот из БД по площади"""
     if not DB_PATH.exists():
         return None
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
+    cursor = db.get_connection(DB_PATH).cursor()
     cursor.execute("SELECT code, area_m2, price_rub FROM units WHERE area_m2 = ? LIMIT 1", (area,))
     row = cursor.fetchone()
-    conn.close()
     if row:
         return {"code": row[0], "area": row[1], "price": row[2], "price_m2": int(row[2] / row[1])}
     return None
@@ -183,8 +175,8 @@ class ProfitCalculatorGenerator:
         avg_rent_profit = total_rent_profit_for_avg / 8 if total_rent_profit_for_avg > 0 else 1
         self.payback_rent_years = round(self.total_cost / avg_rent_profit, 2) if avg_rent_profit > 0 else 0
     
-    def generate(self, output_path: Optional[str] = None) -> str:
-        """Генерирует Excel-файл"""
+    def generate(self, output_path: Union[str, BinaryIO, None] = None) -> Union[str, BinaryIO]:
+        """Генерирует Excel-файл (путь или файловый объект, например BytesIO)"""
         wb = Workbook()
         ws = wb.active
         ws.title = "Расчет прибыли"
@@ -457,9 +449,10 @@ class ProfitCalculatorGenerator:
         ws['N22'].number_format = '0.00'
 
 
-def generate_roi_xlsx(unit_code: str = None, area: float = None, output_dir: str = None, building: int = None) -> Optional[str]:
+def generate_roi_xlsx(unit_code: str = None, area: float = None, output_dir: str = None, building: int = None, as_buffer: bool = False) -> Optional[DocumentOutput]:
     """
     Генерирует Excel-файл с расчётом прибыли
+    (путь к файлу или BytesIO при as_buffer=True)
     """
     lot = None
     if unit_code:
@@ -468,7 +461,7 @@ def generate_roi_xlsx(unit_code: str = None, area: float = None, output_dir: str
         lot = get_lot_by_area(area)
     
     if not lot:
-        print(f"[XLSX] Лот не найден: code={unit_code}, area={area}")
+        log.warning("лот не найден", code=unit_code, area=area)
         return None
     
     generator = ProfitCalculatorGenerator(
@@ -478,17 +471,22 @@ def generate_roi_xlsx(unit_code: str = None, area: float = None, output_dir: str
         growth_rate=0.2
     )
     
-    if output_dir is None:
-        output_dir = tempfile.gettempdir()
-    
-    output_path = Path(output_dir) / f"ROI_{lot['code']}.xlsx"
+    filename = f"ROI_{lot['code']}.xlsx"
     
     try:
+        if as_buffer:
+            buf = named_buffer(b"", filename)
+            generator.generate(buf)
+            buf.seek(0)
+            log.info("файл создан", code=lot["code"], size=buf.getbuffer().nbytes)
+            return buf
+        
+        output_path = Path(output_dir or tempfile.gettempdir()) / filename
         generator.generate(str(output_path))
-        print(f"[XLSX] ✅ Создан: {output_path}")
+        log.info("файл создан", code=lot["code"], path=str(output_path))
         return str(output_path)
     except Exception as e:
-        print(f"[XLSX] Ошибка: {e}")
+        log.error("ошибка генерации", code=lot["code"], error=repr(e))
         return None
 
 
@@ -8,9 +8,17 @@
 - Форматирование сумм
 """
 
-from typing import Dict, Any, List, Optional
+import os
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 
 from services.data_loader import load_finance, get_finance_defaults, get_min_lot
+from services.doc_output import DocumentOutput, named_buffer
+from services.lot_codes import code_key
+from services.logger import get_logger
+
+
+log = get_logger("calculations")
 
 
 # ====== Утилиты ======
@@ -23,41 +31,9 @@ def fmt_rub(value: float) -> str:
         return str(value)
 
 
-def normalize_unit_code(raw: str) -> str:
-    """
-    Нормализует код юнита:
-    - Верхний регистр
-    - Кириллица → латиница (А→A, В→B, ...)
-    - Убирает пробелы и спецсимволы
-    """
-    if not raw:
-        return ""
-    
-    code = str(raw).strip().upper()
-    
-    # Кириллица → латиница
-    table = str.maketrans({
-        "А": "A",
-        "В": "B",
-        "Е": "E",
-        "К": "K",
-        "М": "M",
-        "Н": "H",
-        "О": "O",
-        "Р": "P",
-        "С": "S",
-        "Т": "T",
-        "У": "Y",
-        "Х": "X",
-        "№": "",
-        " ": "",
-    })
-    code = code.translate(table)
-    
-    # Только буквы и цифры
-    code = "".join(ch for ch in code if ch.isalnum())
-    
-    return code
+# Нормализация кода юнита (верхний регистр, латиница, только буквы и
+# цифры) — общая для бота, см. services/lot_codes.py
+normalize_unit_code = code_key
 
 
 # ====== Поиск юнита ======
@@ -564,6 +540,49 @@ def generate_finance_text(unit_code: str, finance: dict) -> str:
 
 # ====== Инвестиционный план ======
 
+@lru_cache(maxsize=1)
+def register_pdf_fonts() -> Tuple[str, str]:
+    """
+    Регистрирует в reportlab шрифт с кириллицей (DejaVuSans).
+
+    Разбор TTF занимает заметное время, поэтому делается один раз
+    (при прогреве или первом PDF), а не на каждый документ.
+
+    Returns:
+        (обычный, жирный) — имена шрифтов для canvas.setFont
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    try:
+        # Пробуем DejaVuSans (обычно есть в Linux)
+        font_paths = [
+            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+            "/usr/share/fonts/TTF/DejaVuSans.ttf",
+            "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+        ]
+        font_path = None
+        font_path_bold = None
+        for fp in font_paths:
+            if os.path.exists(fp):
+                font_path = fp
+                font_path_bold = fp.replace("DejaVuSans.ttf", "DejaVuSans-Bold.ttf")
+                break
+
+        if font_path and os.path.exists(font_path):
+            pdfmetrics.registerFont(TTFont("DejaVu", font_path))
+            if os.path.exists(font_path_bold):
+                pdfmetrics.registerFont(TTFont("DejaVu-Bold", font_path_bold))
+            else:
+                pdfmetrics.registerFont(TTFont("DejaVu-Bold", font_path))
+            return "DejaVu", "DejaVu-Bold"
+    except Exception as e:
+        log.warning("ошибка регистрации шрифта PDF", error=repr(e))
+
+    # Fallback на встроенный шрифт (без кириллицы)
+    return "Helvetica", "Helvetica-Bold"
+
+
 def fmt_millions(value: float) -> str:
     """Форматирует число в миллионы."""
     m = value / 1_000_000
@@ -572,22 +591,19 @@ def fmt_millions(value: float) -> str:
     return f"{m:.1f} млн"
 
 
-def generate_investment_pdf(budget_rub: int, chat_id: int, username: str = "") -> Optional[str]:
+def generate_investment_pdf(budget_rub: int, chat_id: int, username: str = "", as_buffer: bool = False) -> Optional[DocumentOutput]:
     """
     Генерирует PDF с инвестиционным планом.
-    Возвращает путь к файлу или None при ошибке.
+    Возвращает путь к файлу (BytesIO при as_buffer=True) или None при ошибке.
     """
     try:
         from reportlab.lib.pagesizes import A4
         from reportlab.lib.units import mm
         from reportlab.pdfgen import canvas
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
         from reportlab.lib.colors import HexColor
-        import os
         from datetime import datetime
     except ImportError as e:
-        print(f"[PDF] reportlab не установлен: {e}")
+        log.error("reportlab не установлен", chat_id=chat_id, error=repr(e))
         return None
     
     finance = load_finance()
@@ -700,44 +716,17 @@ def generate_investment_pdf(budget_rub: int, chat_id: int, username: str = "") -
     final_capital = final_value + total_income
     profit_pct = ((final_capital - budget_rub) / budget_rub) * 100
     
-    # Создаём PDF
-    filepath = f"/tmp/rizalta_plan_{chat_id}_{int(datetime.now().timestamp())}.pdf"
+    # Создаём PDF (reportlab пишет и в файл, и в BytesIO)
+    if as_buffer:
+        filepath = named_buffer(b"", "RIZALTA_investment_plan.pdf")
+    else:
+        filepath = f"/tmp/rizalta_plan_{chat_id}_{int(datetime.now().timestamp())}.pdf"
     
     c = canvas.Canvas(filepath, pagesize=A4)
     width, height = A4
     
-    # Регистрируем шрифт с поддержкой кириллицы
-    try:
-        # Пробуем DejaVuSans (обычно есть в Linux)
-        font_paths = [
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-            "/usr/share/fonts/TTF/DejaVuSans.ttf",
-            "/usr/share/fonts/dejavu/DejaVuSans.ttf",
-        ]
-        font_path = None
-        font_path_bold = None
-        for fp in font_paths:
-            if os.path.exists(fp):
-                font_path = fp
-                font_path_bold = fp.replace("DejaVuSans.ttf", "DejaVuSans-Bold.ttf")
-                break
-        
-        if font_path and os.path.exists(font_path):
-            pdfmetrics.registerFont(TTFont("DejaVu", font_path))
-            if os.path.exists(font_path_bold):
-                pdfmetrics.registerFont(TTFont("DejaVu-Bold", font_path_bold))
-            else:
-                pdfmetrics.registerFont(TTFont("DejaVu-Bold", font_path))
-            FONT = "DejaVu"
-            FONT_BOLD = "DejaVu-Bold"
-        else:
-            # Fallback на встроенный шрифт (без кириллицы)
-            FONT = "Helvetica"
-            FONT_BOLD = "Helvetica-Bold"
-    except Exception as e:
-        print(f"[PDF] Ошибка регистрации шрифта: {e}")
-        FONT = "Helvetica"
-        FONT_BOLD = "Helvetica-Bold"
+    # Шрифт с поддержкой кириллицы (регистрируется один раз за процесс)
+    FONT, FONT_BOLD = register_pdf_fonts()
     
     # Цвета
     DARK_BLUE = HexColor("#1a365d")
@@ -952,6 +941,8 @@ def generate_investment_pdf(budget_rub: int, chat_id: int, username: str = "") -
     
     c.save()
     
+    if as_buffer:
+        filepath.seek(0)
     return filepath
 
 
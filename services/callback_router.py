@@ -0,0 +1,310 @@
+"""
+Маршрутизация callback_data inline-кнопок.
+
+Вместо цепочки if/elif в app.process_callback каждый модуль handlers/*
+регистрирует свои кнопки декларативно:
+
+    router.add("kp_floor_{building:int}_{floor:int}", handle_kp_floor)
+    router.add("book_take_{booking_id:int}", handle_take_booking, ctx=("from_user",))
+
+Поиск обработчика:
+- шаблоны без параметров — точное совпадение (dict)
+- остальные — по литеральному префиксу (до первого параметра, всегда
+  заканчивается на "_") в trie по сегментам, побеждает самый длинный
+Стоимость поиска — O(длины callback_data) и не зависит от числа маршрутов.
+
+Маршруты редко используемых модулей можно не импортировать при старте:
+router.add_lazy("c3_", "handlers.corp3") — модуль импортируется (и
+регистрирует свои кнопки) при первом callback с этим префиксом.
+
+Параметры шаблона — {имя:тип}, разделитель сегментов — "_":
+- int, float, str — один сегмент
+- rest — «жадный» параметр, может содержать "_" (коды вида "В708_1"),
+  параметры после него разбираются с конца (как rsplit)
+- x10 — int / 10 (площадь в кнопках хранится ×10)
+- k — int × 1000, mln — int × 1 000 000
+Суффикс "?" — необязательный параметр: если сегмента нет или он не
+разбирается, параметр не передаётся и работает значение по умолчанию handler'а.
+Лишние сегменты в конце игнорируются.
+"""
+
+import importlib
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+CallbackHandler = Callable[..., Awaitable[Any]]
+
+# Контекст, который handler может запросить через ctx=(...)
+CONTEXT_KEYS = ("username", "from_user", "user_info", "telegram_id", "data")
+
+_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "int": int,
+    "float": float,
+    "str": str,
+    "rest": str,
+    "x10": lambda s: int(s) / 10.0,
+    "k": lambda s: int(s) * 1000,
+    "mln": lambda s: int(s) * 1_000_000,
+}
+
+_FIELD_RE = re.compile(r"\{(\w+)(?::(\w+))?(\?)?\}")
+
+# Ключ в узле trie, под которым лежат маршруты с этим префиксом
+# (сегмент callback_data не может содержать "_", коллизий нет)
+_ROUTES = "_"
+
+
+class _Field:
+    __slots__ = ("name", "convert", "optional")
+
+    def __init__(self, name: str, convert: Callable[[str], Any], optional: bool):
+        self.name = name
+        self.convert = convert
+        self.optional = optional
+
+
+class Route:
+    """Один зарегистрированный шаблон callback_data."""
+
+    __slots__ = ("pattern", "prefix", "handler", "ctx", "raw", "fixed", "front", "rest", "back")
+
+    def __init__(
+        self,
+        pattern: str,
+        handler: CallbackHandler,
+        ctx: Sequence[str] = (),
+        raw: bool = False,
+        fixed: Optional[Dict[str, Any]] = None,
+    ):
+        for key in ctx:
+            if key not in CONTEXT_KEYS:
+                raise ValueError(f"{pattern}: неизвестный ключ контекста {key!r}")
+
+        self.pattern = pattern
+        self.handler = handler
+        self.ctx = tuple(ctx)
+        self.raw = raw
+        self.fixed = fixed or {}
+
+        # Поля до rest-параметра, сам rest и поля после него
+        self.front: List[_Field] = []
+        self.rest: Optional[_Field] = None
+        self.back: List[_Field] = []
+
+        brace = pattern.find("{")
+        self.prefix = pattern if brace < 0 else pattern[:brace]
+        if brace < 0:
+            return
+        if not self.prefix.endswith("_"):
+            raise ValueError(f"{pattern}: перед параметрами должен быть '_'")
+
+        pos = brace
+        while pos < len(pattern):
+            if pos > brace:
+                if pattern[pos] != "_":
+                    raise ValueError(f"{pattern}: параметры должны разделяться '_'")
+                pos += 1
+            match = _FIELD_RE.match(pattern, pos)
+            if not match:
+                raise ValueError(f"{pattern}: ожидался параметр {{имя:тип}} с позиции {pos}")
+            pos = match.end()
+            name, kind, optional = match.group(1), match.group(2) or "str", bool(match.group(3))
+            if kind not in _CONVERTERS:
+                raise ValueError(f"{pattern}: неизвестный тип {kind!r}")
+
+            field = _Field(name, _CONVERTERS[kind], optional)
+            if kind == "rest":
+                if self.rest is not None:
+                    raise ValueError(f"{pattern}: допускается один rest-параметр")
+                self.rest = field
+            elif self.rest is None:
+                self.front.append(field)
+            else:
+                self.back.append(field)
+
+    def decode(self, segments: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Разбирает сегменты callback_data после префикса.
+
+        Returns:
+            kwargs для handler или None, если данные не подходят под шаблон
+        """
+        values: Dict[str, Any] = {}
+        if not self.front and self.rest is None:
+            return values
+        if self.rest is None:
+            front_segments, back_segments = segments, []
+        else:
+            n_front = len(self.front)
+            # rest занимает минимум один сегмент, поля после него — с конца
+            n_back = min(len(self.back), max(len(segments) - n_front - 1, 0))
+            split = len(segments) - n_back
+            front_segments = segments[:n_front]
+            back_segments = segments[split:]
+            values[self.rest.name] = "_".join(segments[n_front:split])
+
+        if not _convert(self.front, front_segments, values):
+            return None
+        if self.back and not _convert(self.back, back_segments, values):
+            return None
+        return values
+
+
+def _convert(fields: List[_Field], parts: List[str], values: Dict[str, Any]) -> bool:
+    """Заполняет values значениями полей; False — обязательное поле не разобрано."""
+    for field, part in zip(fields, parts):
+        try:
+            values[field.name] = field.convert(part)
+        except ValueError:
+            if not field.optional:
+                return False
+    # Сегментов меньше, чем полей — недостающие должны быть необязательными
+    for field in fields[len(parts):]:
+        if not field.optional:
+            return False
+    return True
+
+
+class CallbackRouter:
+    """Таблица маршрутов: точные совпадения + trie по префиксам."""
+
+    def __init__(self):
+        self._exact: Dict[str, Route] = {}
+        self._trie: Dict[str, Any] = {}
+        self._count = 0
+        # (префикс callback_data, модуль), ещё не импортированные
+        self._lazy: List[Tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(
+        self,
+        pattern: str,
+        handler: CallbackHandler,
+        ctx: Sequence[str] = (),
+        raw: bool = False,
+        **fixed: Any,
+    ) -> Route:
+        """
+        Регистрирует маршрут.
+
+        Args:
+            pattern: Шаблон callback_data ("kp_lot_{code:str}_{building:int?}")
+            handler: async handler(chat_id, **params)
+            ctx: Что ещё передать из callback (username, from_user, telegram_id, ...)
+            raw: Передать handler'у всю строку callback_data вторым аргументом
+            **fixed: Постоянные kwargs (например mode="calc")
+        """
+        route = Route(pattern, handler, ctx=ctx, raw=raw, fixed=fixed)
+
+        if not route.front and route.rest is None and not raw:
+            if pattern in self._exact:
+                raise ValueError(f"callback {pattern!r} уже зарегистрирован")
+            self._exact[pattern] = route
+        else:
+            if not route.prefix.endswith("_"):
+                raise ValueError(f"{pattern}: префикс должен заканчиваться на '_'")
+            node = self._trie
+            for segment in route.prefix[:-1].split("_"):
+                node = node.setdefault(segment, {})
+            node.setdefault(_ROUTES, []).append(route)
+
+        self._count += 1
+        return route
+
+    def add_lazy(self, prefix: str, module: str) -> None:
+        """
+        Откладывает импорт модуля с маршрутами до первого callback с префиксом.
+
+        Args:
+            prefix: Общий префикс callback_data модуля ("c3_", "news_")
+            module: Модуль, который при импорте регистрирует маршруты
+        """
+        self._lazy.append((prefix, module))
+
+    def resolve(self, data: str) -> Optional[Tuple[Route, Dict[str, Any]]]:
+        """
+        Находит маршрут и разбирает параметры.
+
+        Returns:
+            (route, params) или None, если callback не зарегистрирован
+        """
+        route = self._exact.get(data)
+        if route is not None:
+            return route, {}
+
+        # Все префиксы, совпавшие по пути, — от короткого к длинному.
+        # Последний сегмент не может быть частью префикса (после него нет "_")
+        segments = data.split("_")
+        candidates: List[Tuple[int, List[Route]]] = []
+        node = self._trie
+        for depth in range(len(segments) - 1):
+            node = node.get(segments[depth])
+            if node is None:
+                break
+            routes = node.get(_ROUTES)
+            if routes:
+                candidates.append((depth + 1, routes))
+
+        for depth, routes in reversed(candidates):
+            tail = segments[depth:]
+            for route in routes:
+                params = route.decode(tail)
+                if params is not None:
+                    return route, params
+
+        return self._resolve_lazy(data)
+
+    def _resolve_lazy(self, data: str) -> Optional[Tuple[Route, Dict[str, Any]]]:
+        """Импортирует отложенный модуль под data и повторяет поиск."""
+        for i, (prefix, module) in enumerate(self._lazy):
+            if data.startswith(prefix):
+                del self._lazy[i]
+                importlib.import_module(module)
+                return self.resolve(data)
+        return None
+
+    async def dispatch(self, chat_id: int, data: str, context: Dict[str, Any]) -> bool:
+        """
+        Вызывает handler для callback_data.
+
+        Args:
+            context: username / from_user / user_info / telegram_id / data
+
+        Returns:
+            False, если маршрут не найден
+        """
+        resolved = self.resolve(data)
+        if resolved is None:
+            return False
+
+        route, params = resolved
+        if route.fixed:
+            params.update(route.fixed)
+        for key in route.ctx:
+            params[key] = context.get(key)
+
+        if route.raw:
+            await route.handler(chat_id, data, **params)
+        else:
+            await route.handler(chat_id, **params)
+        return True
+
+    def routes(self) -> List[Route]:
+        """Все маршруты (для отладки и бенчмарка)."""
+        result = list(self._exact.values())
+        stack = [self._trie]
+        while stack:
+            node = stack.pop()
+            for key, value in node.items():
+                if key == _ROUTES:
+                    result.extend(value)
+                else:
+                    stack.append(value)
+        return result
+
+
+# Общий роутер бота; handlers/* регистрируют в нём свои кнопки при импорте
+router = CallbackRouter()
@@ -3,15 +3,26 @@
 Генератор PDF для сравнения Депозит vs RIZALTA
 """
 
-import os
-import subprocess
-import tempfile
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
 
 from services.deposit_calculator import calculate_all_scenarios
 from services.investment_compare import calculate_rizalta, pluralize_years
+from services.logger import get_logger
+from services.doc_output import DocumentOutput, html_to_pdf, write_output
+
+log = get_logger("compare_pdf")
+
+COMPARE_PDF_OPTIONS = (
+    '--enable-local-file-access',
+    '--encoding', 'UTF-8',
+    '--page-size', 'A4',
+    '--margin-top', '10mm',
+    '--margin-bottom', '10mm',
+    '--margin-left', '10mm',
+    '--margin-right', '10mm',
+)
 
 
 def fmt(value: float) -> str:
@@ -19,12 +30,12 @@ def fmt(value: float) -> str:
     return f"{int(round(value)):,}".replace(",", " ")
 
 
-def generate_compare_pdf(amount: int, years: int, username: str = "") -> Optional[str]:
+def generate_compare_pdf(amount: int, years: int, username: str = "", as_buffer: bool = False) -> Optional[DocumentOutput]:
     """
     Генерирует PDF со сравнением депозит vs RIZALTA.
     
     Returns:
-        Путь к PDF файлу или None при ошибке.
+        Путь к PDF файлу (или BytesIO при as_buffer=True), None при ошибке.
     """
     # Расчёты
     deposit = calculate_all_scenarios(amount, years)
@@ -345,40 +356,16 @@ def generate_compare_pdf(amount: int, years: int, username: str = "") -> Optiona
 </body>
 </html>"""
 
-    # Создаём PDF через wkhtmltopdf
+    # Создаём PDF через wkhtmltopdf (без временных файлов)
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-            f.write(html)
-            html_path = f.name
-        
-        pdf_path = html_path.replace('.html', '.pdf')
-        
-        cmd = [
-            'wkhtmltopdf',
-            '--quiet',
-            '--enable-local-file-access',
-            '--encoding', 'UTF-8',
-            '--page-size', 'A4',
-            '--margin-top', '10mm',
-            '--margin-bottom', '10mm',
-            '--margin-left', '10mm',
-            '--margin-right', '10mm',
-            html_path,
-            pdf_path
-        ]
-        
-        subprocess.run(cmd, check=True, capture_output=True)
-        
-        # Удаляем HTML
-        os.unlink(html_path)
-        
-        return pdf_path
+        pdf = html_to_pdf(html, COMPARE_PDF_OPTIONS)
+        filename = f"RIZALTA_vs_Депозит_{years}лет_{amount // 1_000_000}млн.pdf"
+        return write_output(pdf, filename, as_buffer)
         
     except Exception as e:
-        print(f"[PDF] Ошибка генерации: {e}")
+        log.error("ошибка генерации", error=repr(e))
         return None
 
-
 if __name__ == "__main__":
     # Тест
     pdf = generate_compare_pdf(15_000_000, 3, "test_user")
@@ -0,0 +1,225 @@
+"""
+Общий доступ к SQLite для всех баз бота.
+
+Раньше каждый запрос открывал новое соединение (sqlite3.connect на
+каждое нажатие кнопки) с настройками по умолчанию. Здесь:
+
+- одно постоянное соединение на (поток, файл БД) — properties.db,
+  secretary.db, rclick_tokens.db, monitoring.db и т.д.
+- при открытии: WAL, synchronous=NORMAL, mmap_size, cache_size,
+  busy_timeout; кеш подготовленных запросов (cached_statements)
+- хелперы fetchall/fetchone/execute и transaction() — коммит или
+  откат, соединение остаётся открытым
+- run() — выполнить функцию с запросами в пуле потоков БД, не блокируя
+  event loop
+
+    from services import db
+
+    rows = db.fetchall(DB_PATH, "SELECT * FROM tasks WHERE user_id = ?", (uid,), row=True)
+    db.execute(DB_PATH, "UPDATE tasks SET status = ? WHERE id = ?", ("done", task_id))
+    lots = await db.run(load_lots, building)
+"""
+
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from config.settings import (
+    DB_BUSY_TIMEOUT,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE,
+    DB_STATEMENT_CACHE,
+    DB_THREADS,
+)
+from services.logger import get_logger
+
+
+log = get_logger("db")
+
+DbPath = Union[str, "os.PathLike[str]"]
+
+_local = threading.local()
+
+# Все открытые соединения (для close_all) и поколение: после close_all
+# потоки открывают соединения заново
+_connections: List[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+_schemas: Set[Tuple[str, Tuple[str, ...]]] = set()
+_executor: Optional[ThreadPoolExecutor] = None
+
+_stats = {"opened": 0, "transactions": 0, "rollbacks": 0}
+
+
+# ====== Соединения ======
+
+def _key(path: DbPath) -> str:
+    return os.path.abspath(os.fspath(path))
+
+
+def _open(key: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        key,
+        timeout=DB_BUSY_TIMEOUT,
+        cached_statements=DB_STATEMENT_CACHE,
+        # Соединение используется только своим потоком; флаг нужен,
+        # чтобы close_all мог закрыть его из другого
+        check_same_thread=False,
+    )
+    journal_mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    with _connections_lock:
+        _connections.append(conn)
+        _stats["opened"] += 1
+    log.debug("соединение открыто", db=key, journal_mode=journal_mode, thread=threading.current_thread().name)
+    return conn
+
+
+def _thread_state() -> Dict[str, Any]:
+    state = getattr(_local, "state", None)
+    if state is None or state["generation"] != _generation:
+        state = _local.state = {"generation": _generation, "conns": {}, "depth": {}}
+    return state
+
+
+def get_connection(path: DbPath) -> sqlite3.Connection:
+    """
+    Постоянное соединение текущего потока с файлом path.
+
+    Не закрывайте его — оно переиспользуется следующими запросами.
+    """
+    conns = _thread_state()["conns"]
+    key = _key(path)
+    conn = conns.get(key)
+    if conn is None:
+        conn = conns[key] = _open(key)
+    return conn
+
+
+def close_all() -> None:
+    """Закрывает все соединения (при остановке бота)."""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+# ====== Запросы ======
+
+@contextmanager
+def transaction(path: DbPath) -> Iterator[sqlite3.Connection]:
+    """
+    Транзакция на постоянном соединении: commit при выходе, rollback
+    при исключении. Вложенные transaction()/execute() коммитятся
+    вместе с внешней.
+    """
+    conn = get_connection(path)
+    depth = _thread_state()["depth"]
+    key = _key(path)
+    outer = depth.get(key, 0) == 0
+    depth[key] = depth.get(key, 0) + 1
+    try:
+        yield conn
+        if outer:
+            conn.commit()
+            _stats["transactions"] += 1
+    except BaseException:
+        if outer:
+            conn.rollback()
+            _stats["rollbacks"] += 1
+        raise
+    finally:
+        depth[key] -= 1
+
+
+def execute(path: DbPath, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+    """Выполняет изменяющий запрос и коммитит (курсор — для rowcount/lastrowid)."""
+    with transaction(path) as conn:
+        return conn.execute(sql, params)
+
+
+def executemany(path: DbPath, sql: str, seq: Iterable[Sequence[Any]]) -> sqlite3.Cursor:
+    with transaction(path) as conn:
+        return conn.executemany(sql, seq)
+
+
+def _cursor(path: DbPath, row: bool) -> sqlite3.Cursor:
+    cursor = get_connection(path).cursor()
+    if row:
+        cursor.row_factory = sqlite3.Row
+    return cursor
+
+
+def fetchall(path: DbPath, sql: str, params: Sequence[Any] = (), row: bool = False) -> List[Any]:
+    """Строки запроса: кортежи или sqlite3.Row (row=True)."""
+    return _cursor(path, row).execute(sql, params).fetchall()
+
+
+def fetchone(path: DbPath, sql: str, params: Sequence[Any] = (), row: bool = False) -> Optional[Any]:
+    return _cursor(path, row).execute(sql, params).fetchone()
+
+
+def ensure_schema(path: DbPath, *statements: str) -> None:
+    """
+    CREATE TABLE/INDEX IF NOT EXISTS — один раз на процесс, а не перед
+    каждым запросом.
+    """
+    key = (_key(path), statements)
+    if key in _schemas:
+        return
+    with transaction(path) as conn:
+        for sql in statements:
+            conn.execute(sql)
+    _schemas.add(key)
+
+
+# ====== Async ======
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+    return _executor
+
+
+async def run(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Выполняет func(*args, **kwargs) в пуле потоков БД.
+
+    У каждого потока пула свои постоянные соединения, поэтому их число
+    ограничено DB_THREADS × число файлов БД.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown() -> None:
+    """Останавливает пул потоков и закрывает соединения."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    close_all()
+
+
+def get_db_stats() -> Dict[str, Any]:
+    """Открытые соединения и счётчики транзакций."""
+    with _connections_lock:
+        open_now = len(_connections)
+    return {**_stats, "open": open_now, "threads": DB_THREADS}
@@ -0,0 +1,333 @@
+"""
+Генерация документов (КП, Excel, PDF) вне event loop.
+
+Генераторы синхронные: wkhtmltopdf, openpyxl, node работают секунды, и
+вызов прямо из async-обработчика останавливал бота для всех чатов.
+Теперь обработчик делает
+
+    pdf = await doc_jobs.generate(chat_id, f"Создаю КП для {code}...", generate_kp_pdf, code=code, as_buffer=True)
+
+и задача выполняется в пуле потоков:
+
+- одновременно не больше DOC_WORKERS рендеров (по умолчанию — по числу
+  CPU, но не больше 4), остальные ждут в очереди с приоритетом:
+  документ, который ждёт человек, раньше пакетной генерации
+- у чата не больше DOC_JOBS_PER_USER задач, очередь — не больше
+  DOC_QUEUE_MAX; сверх лимита — JobRejected с текстом для пользователя
+- сообщение «⏳ ...» показывает место в очереди и примерное время
+  (по средней длительности задач этого генератора) и удаляется, когда
+  документ готов
+- задача дольше DOC_JOB_TIMEOUT: её wkhtmltopdf/node убивается
+  (doc_output.kill_renderer), обработчик получает None
+
+Пул — потоки, а не процессы: генераторы читают каталог лотов и кеш
+рендеров этого процесса, а тяжёлая часть (wkhtmltopdf, node) — и так
+отдельный процесс, GIL на это время свободен.
+"""
+
+import asyncio
+import functools
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from config.settings import DOC_JOB_TIMEOUT, DOC_JOBS_PER_USER, DOC_QUEUE_MAX, DOC_WORKERS
+from services import doc_output
+from services.logger import get_logger
+from services.telegram import delete_message, edit_message_inline, send_message_inline_return_id
+
+
+log = get_logger("doc_jobs")
+
+PRIORITY_INTERACTIVE = 0   # документ, который пользователь ждёт прямо сейчас
+PRIORITY_BATCH = 5         # пакетная генерация (все КП подборки)
+
+# Оценка длительности задачи, пока генератор ещё ни разу не отработал
+DEFAULT_DURATION = 3.0
+# Сколько ждать поток после того, как его рендерер убит по таймауту
+KILL_GRACE = 5.0
+# Не чаще одной правки «⏳ ...» за столько секунд (кроме начала работы над задачей)
+PROGRESS_INTERVAL = 3.0
+
+
+class JobRejected(Exception):
+    """Задача не принята (лимит чата или очередь переполнена); текст — для пользователя."""
+
+
+class _Job:
+    __slots__ = ("id", "chat_id", "title", "kind", "priority", "call", "future",
+                 "created", "started", "thread", "message_id", "shown", "edited")
+
+    def __init__(self, chat_id: Any, title: str, kind: str, priority: int, call: Callable[[], Any]):
+        self.id = next(_ids)
+        self.chat_id = chat_id
+        self.title = title
+        self.kind = kind
+        self.priority = priority
+        self.call = call
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.created = time.monotonic()
+        self.started: Optional[float] = None
+        self.thread: Optional[int] = None
+        self.message_id: Optional[int] = None
+        self.shown = ""
+        self.edited = 0.0
+
+
+_ids = itertools.count(1)
+_queue: List[Tuple[int, int, _Job]] = []
+_running: Dict[int, _Job] = {}
+_per_chat: Dict[Any, int] = {}
+_durations: Dict[str, float] = {}
+_wakeup: Optional[asyncio.Condition] = None
+_workers: List[asyncio.Task] = []
+_executor: Optional[ThreadPoolExecutor] = None
+# Фоновые правки сообщений «⏳ ...» (ссылки, чтобы задачи не собрал GC)
+_edits: Set[asyncio.Task] = set()
+
+_stats = {"submitted": 0, "done": 0, "failed": 0, "timeouts": 0, "killed": 0, "rejected": 0, "max_wait_ms": 0}
+
+
+# ====== Оценка времени ======
+
+def _expected(kind: str) -> float:
+    return _durations.get(kind, DEFAULT_DURATION)
+
+
+def _remember_duration(kind: str, seconds: float) -> None:
+    previous = _durations.get(kind)
+    _durations[kind] = seconds if previous is None else previous * 0.7 + seconds * 0.3
+
+
+def _queued() -> List[_Job]:
+    return [job for _, _, job in sorted(_queue) if not job.future.done()]
+
+
+def _eta(job: _Job, ahead: List[_Job]) -> float:
+    """Секунд до готовности: очередь перед задачей и остаток текущих рендеров делятся на пул."""
+    now = time.monotonic()
+    if job.started is not None:
+        return max(_expected(job.kind) - (now - job.started), 1.0)
+    busy = sum(max(_expected(j.kind) - (now - j.started), 0.5) for j in _running.values())
+    waiting = sum(_expected(j.kind) for j in ahead)
+    return (busy + waiting) / max(DOC_WORKERS, 1) + _expected(job.kind)
+
+
+def _status_text(job: _Job, position: int, eta: float) -> str:
+    seconds = int(eta) + 1 if eta < 10 else int(eta / 5 + 1) * 5
+    if job.started is not None:
+        return f"⏳ {job.title}\nОсталось ≈ {seconds} с"
+    return f"⏳ {job.title}\nВ очереди: {position}-й, ≈ {seconds} с"
+
+
+# ====== Сообщения о ходе ======
+
+def _show(job: _Job, text: str, force: bool = False) -> None:
+    if job.message_id is None or text == job.shown:
+        return
+    now = time.monotonic()
+    if not force and now - job.edited < PROGRESS_INTERVAL:
+        return
+    job.shown, job.edited = text, now
+    task = asyncio.create_task(edit_message_inline(job.chat_id, job.message_id, text))
+    _edits.add(task)
+    task.add_done_callback(_edits.discard)
+
+
+def _report_progress() -> None:
+    """Обновляет «⏳ ...» у всех задач, чьё место в очереди или оценка поменялись."""
+    queued = _queued()
+    for position, job in enumerate(queued):
+        _show(job, _status_text(job, position + 1, _eta(job, queued[:position])))
+    for job in _running.values():
+        # Взятые в работу сразу (а это и попадания в кеш) не правим — только удалим
+        if job.shown != f"⏳ {job.title}":
+            # Переход из очереди в работу показываем сразу
+            _show(job, _status_text(job, 0, _eta(job, [])), force="В очереди" in job.shown)
+
+
+# ====== Пул ======
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Запас потоков: поток задачи, у которой убили рендер по таймауту,
+        # может ещё дорабатывать, пока воркер берёт следующую
+        _executor = ThreadPoolExecutor(max_workers=DOC_WORKERS * 2, thread_name_prefix="doc")
+    return _executor
+
+
+def _call(job: _Job) -> Any:
+    job.thread = threading.get_ident()
+    return job.call()
+
+
+def _release(job: _Job) -> None:
+    left = _per_chat.get(job.chat_id, 1) - 1
+    if left > 0:
+        _per_chat[job.chat_id] = left
+    else:
+        _per_chat.pop(job.chat_id, None)
+
+
+async def _stop_runaway(job: _Job, future: asyncio.Future) -> None:
+    """Таймаут: убиваем рендерер задачи и даём потоку завершиться."""
+    killed = job.thread is not None and doc_output.kill_renderer(job.thread)
+    _stats["killed"] += killed
+    try:
+        await asyncio.wait_for(asyncio.shield(future), KILL_GRACE)
+    except Exception:
+        pass
+    log.error("документ не готов за отведённое время", kind=job.kind, chat_id=job.chat_id,
+              timeout=DOC_JOB_TIMEOUT, killed=killed, thread_busy=not future.done())
+
+
+async def _worker(n: int) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        async with _wakeup:
+            await _wakeup.wait_for(lambda: bool(_queue))
+            _, _, job = heapq.heappop(_queue)
+        if job.future.done():
+            # Обработчик уже не ждёт (отменён)
+            _release(job)
+            continue
+
+        job.started = time.monotonic()
+        wait_ms = int((job.started - job.created) * 1000)
+        _stats["max_wait_ms"] = max(_stats["max_wait_ms"], wait_ms)
+        _running[job.id] = job
+        _report_progress()
+
+        result = None
+        future = loop.run_in_executor(_get_executor(), _call, job)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), DOC_JOB_TIMEOUT)
+            _stats["done"] += 1
+            _remember_duration(job.kind, time.monotonic() - job.started)
+            log.info("документ готов", kind=job.kind, chat_id=job.chat_id, wait_ms=wait_ms,
+                     ms=int((time.monotonic() - job.started) * 1000), worker=n)
+        except asyncio.TimeoutError:
+            _stats["timeouts"] += 1
+            await _stop_runaway(job, future)
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            _stats["failed"] += 1
+            log.error("ошибка генерации документа", kind=job.kind, chat_id=job.chat_id, error=repr(e))
+        finally:
+            del _running[job.id]
+            _release(job)
+
+        if not job.future.done():
+            job.future.set_result(result)
+        _report_progress()
+
+
+def start_workers(workers: int = DOC_WORKERS) -> None:
+    """Запускает воркеров (в startup приложения; иначе — при первой задаче)."""
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Condition()
+    for n in range(workers):
+        _workers.append(asyncio.create_task(_worker(n)))
+    log.info("воркеры документов запущены", workers=workers, per_user=DOC_JOBS_PER_USER, timeout=DOC_JOB_TIMEOUT)
+
+
+async def stop_workers() -> None:
+    """Останавливает воркеров; ожидающие обработчики получают отмену."""
+    global _executor
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    for _, _, job in _queue:
+        job.future.cancel()
+    _queue.clear()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ====== API ======
+
+async def generate(
+    chat_id: Any,
+    title: str,
+    func: Callable[..., Any],
+    *args: Any,
+    priority: int = PRIORITY_INTERACTIVE,
+    **kwargs: Any,
+) -> Any:
+    """
+    Выполняет func(*args, **kwargs) в пуле и возвращает результат.
+
+    Пока задача ждёт и выполняется, в чате — сообщение «⏳ {title}» с
+    местом в очереди и оценкой времени; после — удаляется.
+
+    Returns:
+        результат func или None (исключение в генераторе, таймаут)
+
+    Raises:
+        JobRejected: у чата уже DOC_JOBS_PER_USER задач или очередь полна
+    """
+    start_workers()
+    if _per_chat.get(chat_id, 0) >= DOC_JOBS_PER_USER:
+        _stats["rejected"] += 1
+        raise JobRejected("⏳ Уже готовлю ваш документ — пришлю, как только он будет готов.")
+    if len(_queue) >= DOC_QUEUE_MAX:
+        _stats["rejected"] += 1
+        log.warning("очередь документов переполнена", depth=len(_queue))
+        raise JobRejected("⚠️ Сейчас много запросов на документы. Попробуйте через минуту.")
+
+    job = _Job(chat_id, title, getattr(func, "__name__", "document"), priority,
+               functools.partial(func, *args, **kwargs))
+    _per_chat[chat_id] = _per_chat.get(chat_id, 0) + 1
+    _stats["submitted"] += 1
+
+    queued = _queued()
+    ahead = [j for j in queued if j.priority <= priority]
+    job.shown = _status_text(job, len(ahead) + 1, _eta(job, ahead))
+    if len(_running) < DOC_WORKERS and not ahead:
+        job.shown = f"⏳ {title}"
+    job.edited = time.monotonic()
+    try:
+        try:
+            job.message_id = await send_message_inline_return_id(chat_id, job.shown)
+        except Exception as e:
+            log.warning("не удалось показать статус задачи", chat_id=chat_id, error=repr(e))
+
+        async with _wakeup:
+            heapq.heappush(_queue, (priority, job.id, job))
+            _wakeup.notify()
+    except BaseException:
+        # Отмена до постановки в очередь: воркер задачу не увидит,
+        # слот чата освобождаем здесь
+        _release(job)
+        raise
+    _report_progress()
+
+    try:
+        return await job.future
+    finally:
+        if not job.future.done():
+            # Обработчик отменён, пока задача в очереди: воркер её пропустит
+            job.future.cancel()
+        if job.message_id is not None:
+            await delete_message(chat_id, job.message_id)
+
+
+def get_doc_jobs_stats() -> Dict[str, Any]:
+    """Счётчики очереди документов (для /metrics)."""
+    return {
+        **_stats,
+        "queued": len(_queue),
+        "running": len(_running),
+        "workers": len(_workers),
+        "expected_s": {kind: round(seconds, 2) for kind, seconds in _durations.items()},
+    }
@@ -0,0 +1,123 @@
+"""
+Вывод сгенерированных документов: в память или в файл.
+
+Генераторы (КП, сравнение, ROI Excel, инвест-план) по умолчанию, как
+и раньше, возвращают путь к файлу. С as_buffer=True они возвращают
+io.BytesIO с атрибутом name — services.telegram.send_document отправляет
+его без записи на диск, и временный файл не нужно ни читать повторно,
+ни удалять (в том числе когда отправка не удалась).
+
+    buf = generate_kp_pdf(code="В708", as_buffer=True)
+    await send_document(chat_id, buf, caption)
+"""
+
+import io
+import os
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+from config.settings import PDF_WORKERS
+
+DocumentOutput = Union[str, io.BytesIO]
+
+# Поток -> запущенный им рендерер (wkhtmltopdf, node)
+_renderers: Dict[int, subprocess.Popen] = {}
+
+
+def named_buffer(data: bytes, name: str) -> io.BytesIO:
+    """BytesIO с именем файла (его увидит получатель в Telegram)."""
+    buf = io.BytesIO(data)
+    buf.name = name
+    return buf
+
+
+def write_output(
+    data: bytes,
+    filename: str,
+    as_buffer: bool = False,
+    output_dir: Optional[str] = None,
+) -> DocumentOutput:
+    """
+    Возвращает документ в нужном виде.
+
+    Returns:
+        BytesIO (as_buffer=True) или путь к записанному файлу в output_dir
+    """
+    if as_buffer:
+        return named_buffer(data, filename)
+
+    path = os.path.join(output_dir or tempfile.gettempdir(), filename)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def run_renderer(cmd: Sequence[str], input: bytes = b"", timeout: float = 60, cwd: Optional[str] = None) -> Tuple[int, bytes, bytes]:
+    """
+    Запускает внешний рендерер (wkhtmltopdf, node) и ждёт результат.
+
+    Процесс регистрируется по потоку, чтобы services/doc_jobs.py мог
+    убить зависший рендер своей задачи (kill_renderer).
+
+    Returns:
+        (код возврата, stdout, stderr)
+
+    Raises:
+        RuntimeError: нет результата за timeout секунд (процесс убит)
+    """
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+    with track_renderer(proc):
+        try:
+            stdout, stderr = proc.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise RuntimeError(f"{os.path.basename(cmd[0])}: нет результата за {timeout} с") from None
+    return proc.returncode, stdout, stderr
+
+
+@contextmanager
+def track_renderer(proc: subprocess.Popen) -> Iterator[None]:
+    """Пока блок выполняется, процесс proc — рендерер текущего потока (для kill_renderer)."""
+    thread_id = threading.get_ident()
+    _renderers[thread_id] = proc
+    try:
+        yield
+    finally:
+        _renderers.pop(thread_id, None)
+
+
+def html_to_pdf(html: str, options: Sequence[str], timeout: float = 60) -> bytes:
+    """
+    Рендерит HTML в PDF через wkhtmltopdf: постоянным процессом из пула
+    (services/pdf_workers.py), а если пул выключен или не справился —
+    отдельным процессом, без временных файлов (HTML — через stdin,
+    PDF — из stdout).
+
+    Raises:
+        RuntimeError: wkhtmltopdf завершился с ошибкой, по таймауту или убит
+    """
+    if PDF_WORKERS > 0:
+        from services import pdf_workers
+        pdf = pdf_workers.render(html, options, timeout)
+        if pdf is not None:
+            return pdf
+
+    cmd = ["wkhtmltopdf", *options, "--quiet", "-", "-"]
+    returncode, stdout, stderr = run_renderer(cmd, html.encode("utf-8"), timeout)
+    if returncode != 0 or not stdout.startswith(b"%PDF"):
+        stderr = stderr.decode("utf-8", "replace").strip()
+        raise RuntimeError(f"wkhtmltopdf: код {returncode}: {stderr[-500:]}")
+    return stdout
+
+
+def kill_renderer(thread_id: int) -> bool:
+    """Убивает рендерер, запущенный потоком thread_id. Returns: был ли процесс."""
+    proc = _renderers.get(thread_id)
+    if proc is None or proc.poll() is not None:
+        return False
+    proc.kill()
+    return True
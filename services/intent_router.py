@@ -14,6 +14,10 @@ from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from openai import OpenAI
 from config.settings import OPENAI_API_KEY
+from services.logger import get_logger
+from services.lot_codes import to_cyrillic
+
+log = get_logger("intent")
 
 client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
@@ -266,12 +270,12 @@ def classify_intent(text: str) -> Dict[str, Any]:
     # 1. Пробуем быстрый матч
     quick_result = try_quick_match(text)
     if quick_result:
-        print(f"[INTENT] Quick match: {quick_result['intent']}")
+        log.info("quick match", intent=quick_result["intent"])
         return quick_result
     
     # 2. GPT классификация
     if not client:
-        print("[INTENT] OpenAI client not available")
+        log.warning("OpenAI client недоступен")
         return {"intent": "chat", "params": {}, "confidence": 0.5, "source": "fallback"}
     
     today = datetime.now()
@@ -307,15 +311,15 @@ def classify_intent(text: str) -> Dict[str, Any]:
         # Пост-обработка параметров
         result["params"] = normalize_params(result.get("params", {}))
         
-        print(f"[INTENT] GPT: {result.get('intent')} | params: {result.get('params')} | conf: {result.get('confidence', 0)}")
+        log.info("gpt", intent=result.get("intent"), params=result.get("params"), confidence=result.get("confidence", 0))
         return result
         
     except json.JSONDecodeError as e:
-        print(f"[INTENT] JSON parse error: {e}, raw: {result_text}")
+        log.warning("ошибка разбора JSON", error=str(e), raw=result_text)
         return {"intent": "chat", "params": {}, "confidence": 0.3, "source": "error"}
         
     except Exception as e:
-        print(f"[INTENT] GPT error: {e}")
+        log.error("ошибка GPT", error=repr(e))
         return {"intent": "chat", "params": {}, "confidence": 0.3, "source": "error"}
 
 
@@ -327,10 +331,8 @@ def normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
     
     # Код лота
     if params.get("code"):
-        code = str(params["code"]).upper().strip()
         # Нормализуем к кириллице
-        code = code.replace("A", "А").replace("B", "В")
-        result["code"] = code
+        result["code"] = to_cyrillic(str(params["code"]))
     
     # Корпус
     if params.get("building"):
@@ -4,10 +4,11 @@
 Расчёт по формулам из таблицы застройщика
 """
 
-import sqlite3
 from pathlib import Path
 from typing import Dict, Optional, List
 
+from services import units_db
+
 BASE_DIR = Path(__file__).parent.parent
 DB_PATH = BASE_DIR / "properties.db"
 
@@ -32,16 +33,9 @@ DAYS_IN_YEAR = {
 def get_lot_from_db(code: str) -> Optional[Dict]:
     if not DB_PATH.exists():
         return None
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    code_upper = code.strip().upper()
-    table = str.maketrans({"А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P", "С": "S", "Т": "T"})
-    code_latin = code_upper.translate(table)
-    cursor.execute("SELECT code, area_m2, price_rub FROM units WHERE code = ? OR code = ? LIMIT 1", (code_upper, code_latin))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return {"code": row[0], "area": row[1], "price": row[2], "price_m2": int(row[2] / row[1])}
+    lot = units_db.get_lot_by_code(code)
+    if lot:
+        return {"code": lot["code"], "area": lot["area"], "price": lot["price"], "price_m2": int(lot["price"] / lot["area"])}
     return None
 
 
@@ -6,56 +6,49 @@
 - Новые проценты удорожания: ПВ30%→+9%, ПВ40%→+7%, ПВ50%→+4%
 """
 
-import os, sqlite3, subprocess, tempfile, requests, base64
-from services.installment_calculator import calc_12m, calc_18m, get_service_fee as get_sf
+import hashlib
+from services.installment_calculator import calc_12m, calc_18m, get_service_fee as get_sf, CONFIG_PATH as INSTALLMENT_CONFIG_PATH
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any, Optional
+from services.logger import get_logger
+from services import assets, layout_store, render_cache, unit_history, units_db
+from services.doc_output import DocumentOutput, html_to_pdf, write_output
+from services.lot_codes import code_key
+
+log = get_logger("kp_pdf")
 
 BASE_DIR = Path(__file__).parent.parent
 DB_PATH = BASE_DIR / "properties.db"
-RESOURCES_DIR = BASE_DIR / "services" / "kp_resources"
 SERVICE_FEE = 150_000
 
 # Апартаменты с индивидуальными условиями рассрочки (только 50% ПВ, 12 мес)
 CUSTOM_INSTALLMENT_UNITS = ['В327', 'В615', 'В527', 'В517', 'В617', 'В525', 'В625', 'А101']
 
-def load_resource(filename: str) -> str:
-    path = RESOURCES_DIR / filename
-    return path.read_text().strip() if path.exists() else ""
+# Параметры wkhtmltopdf для КП (A4 без полей)
+KP_PDF_OPTIONS = (
+    '--page-size', 'A4', '--orientation', 'Portrait',
+    '--margin-top', '0', '--margin-bottom', '0', '--margin-left', '0', '--margin-right', '0',
+    '--enable-local-file-access', '--disable-smart-shrinking',
+)
 
 def get_lot_from_db(area: float = 0, code: str = "", building: int = None) -> Optional[Dict[str, Any]]:
     if not DB_PATH.exists():
         return None
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
     if code:
-        code_upper = code.strip().upper()
-        table = str.maketrans({"А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P", "С": "S", "Т": "T"})
-        code_latin = code_upper.translate(table)
-        if building:
-            cursor.execute("SELECT code, building, floor, rooms, area_m2, price_rub, layout_url, block_section FROM units WHERE (code = ? OR code = ?) AND building = ? LIMIT 1", (code_upper, code_latin, building))
-        else:
-            cursor.execute("SELECT code, building, floor, rooms, area_m2, price_rub, layout_url, block_section FROM units WHERE code = ? OR code = ? LIMIT 1", (code_upper, code_latin))
+        lot = units_db.get_lot_by_code(code, building or None)
     elif area > 0:
-        cursor.execute("SELECT code, building, floor, rooms, area_m2, price_rub, layout_url, block_section FROM units WHERE ABS(area_m2 - ?) < 0.1 ORDER BY price_rub LIMIT 1", (area,))
+        lot = units_db.get_lot_by_area(area, tolerance=0.1)
     else:
-        conn.close()
         return None
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return {"code": row[0], "building": row[1], "floor": row[2], "rooms": row[3], "area": row[4], "price": row[5], "layout_url": row[6], "block_section": row[7]}
+    if lot:
+        return {key: lot[key] for key in units_db.COLUMNS}
     return None
 
-def download_layout(url: str) -> str:
-    if not url:
-        return ""
-    try:
-        resp = requests.get(url, timeout=30)
-        resp.raise_for_status()
-        return base64.b64encode(resp.content).decode()
-    except:
-        return ""
+def layout_src(url: str) -> str:
+    """Планировка для <img>: file:// из services/layout_store.py, "" — картинки нет."""
+    path = layout_store.ensure(url)
+    return layout_store.file_url(path) if path else ""
 
 def fmt(price: int) -> str:
     return f"{price:,}".replace(",", " ") + " ₽"
@@ -89,11 +82,10 @@ def calc_18(price: int) -> Dict:
     }
 
 def generate_html(lot: Dict[str, Any], include_18m: bool = True, full_payment: bool = False) -> str:
-    layout_b64 = download_layout(lot.get("layout_url", ""))
-    logo_b64 = load_resource("logo_mono_trim_base64.txt")
-    font_regular = load_resource("montserrat_regular_base64.txt")
-    font_medium = load_resource("montserrat_medium_base64.txt")
-    font_semibold = load_resource("montserrat_semibold_base64.txt")
+    layout = layout_src(lot.get("layout_url", ""))
+    # Шрифты и логотип — файлами (services/assets.py), а не base64 в HTML
+    logo = assets.file_url("kp_logo")
+    fonts = assets.font_face_css("Montserrat", assets.MONTSERRAT)
     
     i12 = calc_12(lot["price"])
     i18 = calc_18(lot["price"]) if include_18m else {}
@@ -104,9 +96,7 @@ def generate_html(lot: Dict[str, Any], include_18m: bool = True, full_payment: b
     html = f'''<!DOCTYPE html>
 <html><head><meta charset="UTF-8">
 <style>
-@font-face {{ font-family: 'Montserrat'; src: url(data:font/truetype;base64,{font_regular}) format('truetype'); font-weight: 400; }}
-@font-face {{ font-family: 'Montserrat'; src: url(data:font/truetype;base64,{font_medium}) format('truetype'); font-weight: 500; }}
-@font-face {{ font-family: 'Montserrat'; src: url(data:font/truetype;base64,{font_semibold}) format('truetype'); font-weight: 600; }}
+{fonts}
 
 * {{ margin: 0; padding: 0; box-sizing: border-box; }}
 body {{ font-family: 'Montserrat', Arial, sans-serif; background: #F6F0E3; color: #313D20; font-size: 15px; line-height: 1.4; }}
@@ -177,7 +167,7 @@ body {{ font-family: 'Montserrat', Arial, sans-serif; background: #F6F0E3; color
 <body>
 
 <table class="header-table"><tr><td>
-{"<img class='logo-header' src='data:image/png;base64," + logo_b64 + "'>" if logo_b64 else ""}
+{"<img class='logo-header' src='" + logo + "'>" if logo else ""}
 </td></tr></table>
 
 <div class="title-bar">
@@ -197,7 +187,7 @@ body {{ font-family: 'Montserrat', Arial, sans-serif; background: #F6F0E3; color
 
 <div class="unit-body">
 {'<div class="fp-layout"><div class="fp-image">' if full_payment else '<div class="unit-image">'}
-{"<img src='data:image/jpeg;base64," + layout_b64 + "'>" if layout_b64 else ""}
+{"<img src='" + layout + "'>" if layout else ""}
 </div>
 {'<div class="fp-benefit"><div class="fp-benefit-title">Ваша выгода<span style="display: block; font-size: 44px; font-weight: 700; text-transform: none; letter-spacing: 0; margin-top: 5px;">при 100% оплате</span></div><div class="fp-benefit-saving"><span>' + fmt(int(lot["price"] * 0.05)) + '</span></div><div class="fp-benefit-badge">Скидка 5%</div><div class="fp-benefit-price">' + fmt(int(lot["price"] * 0.95)) + '</div><span style="font-size: 23px; font-weight: 700; color: #313D20;">Вместо</span><span class="fp-benefit-old" style="margin-left: 10px;">' + fmt(lot["price"]) + '</span></div></div>' if full_payment else ''}
 <div class="{'unit-details-full' if full_payment else 'unit-details'}">
@@ -303,34 +293,82 @@ body {{ font-family: 'Montserrat', Arial, sans-serif; background: #F6F0E3; color
 </body></html>'''
     return html
 
-def generate_kp_pdf(area: float = 0, code: str = "", building: int = None, include_18m: bool = True, full_payment: bool = False, output_dir: str = None) -> Optional[str]:
+# ====== Кеш PDF (services/render_cache.py) ======
+
+@lru_cache(maxsize=None)
+def _template_version() -> str:
+    """Хеш шаблона: код генератора и калькулятора, шрифты/логотип, опции wkhtmltopdf."""
+    digest = hashlib.sha256()
+    for source in (__file__, calc_12m.__code__.co_filename):
+        digest.update(Path(source).read_bytes())
+    digest.update(assets.version().encode())
+    digest.update(repr(KP_PDF_OPTIONS).encode())
+    return digest.hexdigest()[:16]
+
+
+def _installment_version() -> str:
+    """Хеш installment_config.json (читается калькулятором на каждом расчёте)."""
+    try:
+        return hashlib.sha256(INSTALLMENT_CONFIG_PATH.read_bytes()).hexdigest()[:16]
+    except OSError:
+        return ""
+
+
+def _kp_tag(code: str, building: Any) -> str:
+    return f"{code_key(code)}-{building or 0}"
+
+
+def _on_lot_changes(batch) -> None:
+    """Лента изменений лотов: удаляем КП изменившихся лотов сразу, не дожидаясь вытеснения."""
+    tags = set()
+    for change in batch.changes:
+        tags.add(_kp_tag(change["code"], change["building"]))
+        # Лот сменил код или корпус — КП лежат под старым
+        if change["field"] == "code" and change["old_value"]:
+            tags.add(_kp_tag(change["old_value"], change["building"]))
+        elif change["field"] == "building":
+            tags.add(_kp_tag(change["code"], change["old_value"]))
+    removed = sum(render_cache.invalidate("kp", tag) for tag in tags)
+    if removed:
+        log.info("КП изменившихся лотов удалены из кеша", lots=len(tags), files=removed)
+
+
+unit_history.subscribe(_on_lot_changes)
+
+
+def generate_kp_pdf(area: float = 0, code: str = "", building: int = None, include_18m: bool = True, full_payment: bool = False, output_dir: str = None, as_buffer: bool = False) -> Optional[DocumentOutput]:
+    """
+    КП в PDF: путь к файлу в output_dir или BytesIO (as_buffer=True).
+
+    PDF берётся из кеша рендеров, если лот, режим, шаблон, условия
+    рассрочки и планировка не менялись; иначе рендерится wkhtmltopdf
+    и кешируется.
+    """
     lot = get_lot_from_db(area=area, code=code, building=building)
     if not lot:
-        print(f"[KP PDF] Лот не найден: area={area}, code={code}")
+        log.warning("лот не найден", area=area, code=code)
         return None
-    print(f"[KP PDF] Генерируем КП для {lot['code']} ({lot['area']} м²)")
-    html = generate_html(lot, include_18m=include_18m, full_payment=full_payment)
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-        f.write(html)
-        html_path = f.name
-    if output_dir is None:
-        output_dir = tempfile.gettempdir()
     suffix = "_100" if full_payment else ("_12m_18m" if include_18m else "_12m")
-    pdf_path = os.path.join(output_dir, f"KP_{lot['code']}{suffix}.pdf")
+    # Планировка — файлом в шаблоне; её версия входит в ключ
+    layout_store.ensure(lot["layout_url"])
+    key = render_cache.render_key(
+        lot, include_18m, full_payment, _template_version(), _installment_version(),
+        layout_store.version(lot["layout_url"]),
+    )
+
+    def render() -> bytes:
+        log.info("генерация КП", code=lot["code"], area=lot["area"])
+        html = generate_html(lot, include_18m=include_18m, full_payment=full_payment)
+        return html_to_pdf(html, KP_PDF_OPTIONS)
+
     try:
-        cmd = ['wkhtmltopdf', '--page-size', 'A4', '--orientation', 'Portrait', '--margin-top', '0', '--margin-bottom', '0', '--margin-left', '0', '--margin-right', '0', '--enable-local-file-access', '--disable-smart-shrinking', '--quiet', html_path, pdf_path]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        if result.returncode != 0:
-            print(f"[KP PDF] Ошибка: {result.stderr}")
-            return None
-        print(f"[KP PDF] ✅ Создан: {pdf_path}")
-        return pdf_path
+        pdf = render_cache.get_or_render("kp", key, render, tag=_kp_tag(lot["code"], lot["building"]))
+        output = write_output(pdf, f"KP_{lot['code']}{suffix}.pdf", as_buffer, output_dir)
+        log.info("КП создан", code=lot["code"], size=len(pdf), path=output if isinstance(output, str) else None)
+        return output
     except Exception as e:
-        print(f"[KP PDF] Ошибка: {e}")
+        log.error("ошибка генерации КП", code=lot["code"], error=repr(e))
         return None
-    finally:
-        if os.path.exists(html_path):
-            os.remove(html_path)
 
 if __name__ == "__main__":
     import sys
@@ -4,11 +4,12 @@
 
 import os
 import re
-import sqlite3
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
 from config.settings import BASE_DIR
+from services import db, units_db
+from services.lot_codes import code_key
 
 
 # Путь к папке с КП
@@ -18,47 +19,49 @@ KP_DIR = os.path.join(BASE_DIR, "kp_all")
 DB_PATH = os.path.join(BASE_DIR, "properties.db")
 
 
-def normalize_unit_code(raw: str) -> str:
-    """Нормализует код лота (кириллица → латиница)."""
-    if not raw:
-        return ""
-    
-    code = str(raw).strip().upper()
-    
-    # Кириллица → латиница
-    table = str.maketrans({
-        "А": "A", "В": "B", "Е": "E", "К": "K",
-        "М": "M", "Н": "H", "О": "O", "Р": "P",
-        "С": "S", "Т": "T", "У": "Y", "Х": "X",
-    })
-    code = code.translate(table)
-    
-    return "".join(ch for ch in code if ch.isalnum())
+# Нормализация кода лота — общая, см. services/lot_codes.py
+normalize_unit_code = code_key
+
+# Паттерн: kp_{площадь}m_{тип}_{код}.jpg
+# Пример: kp_24.5m_business_А209.jpg
+_KP_FILENAME = re.compile(r"kp_([\d.]+)m_\w+_(.+)\.jpg")
+
+# Индекс папки КП: {код: [(путь, площадь), ...]}, пересобирается при
+# изменении mtime папки (добавили/удалили файлы)
+_kp_index: Dict[str, List[Tuple[str, float]]] = {}
+_kp_index_mtime: Optional[float] = None
+
+
+def _get_kp_index() -> Dict[str, List[Tuple[str, float]]]:
+    global _kp_index, _kp_index_mtime
+
+    try:
+        mtime = os.stat(KP_DIR).st_mtime
+    except OSError:
+        return {}
+    if mtime == _kp_index_mtime:
+        return _kp_index
+
+    index: Dict[str, List[Tuple[str, float]]] = {}
+    for filename in sorted(os.listdir(KP_DIR)):
+        match = _KP_FILENAME.match(filename)
+        if match:
+            key = code_key(match.group(2))
+            index.setdefault(key, []).append((os.path.join(KP_DIR, filename), float(match.group(1))))
+
+    _kp_index, _kp_index_mtime = index, mtime
+    return index
 
 
 def get_all_kp_files() -> Dict[str, str]:
     """
     Возвращает словарь {normalized_code: filepath} для всех КП.
     """
-    result = {}
-    
     if not os.path.exists(KP_DIR):
         print(f"[KP] Папка не найдена: {KP_DIR}")
-        return result
-    
-    for filename in os.listdir(KP_DIR):
-        if not filename.endswith(".jpg"):
-            continue
-        
-        # Паттерн: kp_{площадь}m_{тип}_{код}.jpg
-        # Пример: kp_24.5m_business_А209.jpg
-        match = re.match(r"kp_[\d.]+m_\w+_(.+)\.jpg", filename)
-        if match:
-            raw_code = match.group(1)
-            normalized = normalize_unit_code(raw_code)
-            result[normalized] = os.path.join(KP_DIR, filename)
+        return {}
     
-    return result
+    return {key: files[-1][0] for key, files in _get_kp_index().items()}
 
 
 def find_kp_by_code(unit_code: str, area: float = 0) -> Optional[str]:
@@ -66,23 +69,7 @@ def find_kp_by_code(unit_code: str, area: float = 0) -> Optional[str]:
     Ищет КП по коду лота и площади.
     Возвращает путь к JPG или None.
     """
-    normalized = normalize_unit_code(unit_code)
-    
-    if not os.path.exists(KP_DIR):
-        return None
-    
-    candidates = []
-    for filename in os.listdir(KP_DIR):
-        if not filename.endswith(".jpg"):
-            continue
-        
-        # Паттерн: kp_{площадь}m_{тип}_{код}.jpg
-        match = re.match(r"kp_([\d.]+)m_\w+_(.+)\.jpg", filename)
-        if match:
-            file_area = float(match.group(1))
-            raw_code = match.group(2)
-            if normalize_unit_code(raw_code) == normalized:
-                candidates.append((os.path.join(KP_DIR, filename), file_area))
+    candidates = _get_kp_index().get(code_key(unit_code))
     
     if not candidates:
         return None
@@ -102,23 +89,12 @@ def find_kp_by_area(area: float, tolerance: float = 0.5) -> List[str]:
     Ищет КП по площади (±tolerance м²).
     Возвращает список путей к JPG.
     """
-    result = []
-    
-    if not os.path.exists(KP_DIR):
-        return result
-    
-    for filename in os.listdir(KP_DIR):
-        if not filename.endswith(".jpg"):
-            continue
-        
-        # Извлекаем площадь из имени файла
-        match = re.match(r"kp_([\d.]+)m_", filename)
-        if match:
-            file_area = float(match.group(1))
-            if abs(file_area - area) <= tolerance:
-                result.append(os.path.join(KP_DIR, filename))
-    
-    return result
+    return sorted(
+        filepath
+        for files in _get_kp_index().values()
+        for filepath, file_area in files
+        if abs(file_area - area) <= tolerance
+    )
 
 
 def find_kp_by_budget(budget: int) -> List[str]:
@@ -135,24 +111,15 @@ def find_kp_by_budget(budget: int) -> List[str]:
     min_price = int(budget * 0.9)
     max_price = int(budget * 1.1)
     
-    # Ищем лоты в базе
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT code FROM units 
-        WHERE price_rub >= ? AND price_rub <= ?
-        ORDER BY price_rub
-    """, (min_price, max_price))
-    
-    codes = [row[0] for row in cursor.fetchall()]
-    conn.close()
+    # Лоты в диапазоне цен — срез каталога (services/units_db.py)
+    codes = [lot["code"] for lot in units_db.get_lots_by_budget(min_price, max_price)]
     
     # Ищем КП по кодам
     all_kp = get_all_kp_files()
     result = []
     
     for code in codes:
-        normalized = normalize_unit_code(code)
+        normalized = code_key(code)
         if normalized in all_kp:
             result.append(all_kp[normalized])
     
@@ -170,8 +137,7 @@ def find_kp_by_floor(floor: int, block_section: int = None) -> List[str]:
         return []
     
     # Ищем лоты в базе
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = db.get_connection(DB_PATH).cursor()
     
     if block_section:
         cursor.execute("""
@@ -187,14 +153,13 @@ def find_kp_by_floor(floor: int, block_section: int = None) -> List[str]:
         """, (floor,))
     
     codes = [row[0] for row in cursor.fetchall()]
-    conn.close()
     
     # Ищем КП по кодам
     all_kp = get_all_kp_files()
     result = []
     
     for code in codes:
-        normalized = normalize_unit_code(code)
+        normalized = code_key(code)
         if normalized in all_kp:
             result.append(all_kp[normalized])
     
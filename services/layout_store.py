@@ -0,0 +1,342 @@
+"""
+Локальное хранилище планировок лотов (картинки rclick по layout_url).
+
+Раньше каждый рендер КП скачивал планировку с rclick (requests, до 30 с)
+и вставлял её в HTML в base64. Теперь картинки лежат в LAYOUTS_DIR:
+
+- prefetch: параллельная загрузка через одну aiohttp-сессию; уже
+  скачанные проверяются условным запросом (If-None-Match /
+  If-Modified-Since) и при 304 не перекачиваются. Вызывается из
+  parser_rclick.sync_from_rclick (все планировки каталога, с удалением
+  ненужных) и при старте бота в фоне (только недостающие —
+  prefetch_catalog)
+- имя файла — хеш URL, поэтому путь известен без индекса и виден
+  другим процессам сразу после записи (запись атомарная, через .tmp);
+  index.json хранит только ETag/Last-Modified для следующей проверки
+- шаблоны ссылаются на файл (file_url), а не встраивают base64;
+  version(url) меняется вместе с содержимым — её добавляют в ключ кеша
+  рендеров
+- превью для Telegram (JPEG до LAYOUT_PREVIEW_SIZE px) — если установлен
+  Pillow; без него get_preview отдаёт оригинал
+- ensure(url): картинки нет (загрузка не удалась) — скачивает её сразу,
+  как раньше; счётчик misses показывает, как часто так бывает
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+
+from config.settings import LAYOUT_FETCH_TIMEOUT, LAYOUT_PREVIEW_SIZE, LAYOUTS_CONCURRENCY, LAYOUTS_DIR
+from services.logger import get_logger
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+log = get_logger("layouts")
+
+INDEX_PATH = os.path.join(LAYOUTS_DIR, "index.json")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".svg")
+PREVIEW_SUFFIX = "_preview.jpg"
+
+_index_lock = threading.Lock()
+
+_stats = {
+    "hits": 0, "misses": 0, "fetched": 0, "not_modified": 0,
+    "errors": 0, "previews": 0, "pruned": 0, "bytes": 0,
+}
+
+
+# ====== Пути ======
+
+def _key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+def _extension(url: str) -> str:
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return ext if ext in IMAGE_EXTENSIONS else ".jpg"
+
+
+def local_path(url: str) -> str:
+    """Где лежит (или будет лежать) картинка url."""
+    return os.path.join(LAYOUTS_DIR, _key(url) + _extension(url))
+
+
+def _preview_path(url: str) -> str:
+    return os.path.join(LAYOUTS_DIR, _key(url) + PREVIEW_SUFFIX)
+
+
+def file_url(path: str) -> str:
+    """file:// URL для шаблона (wkhtmltopdf с --enable-local-file-access)."""
+    return Path(path).resolve().as_uri()
+
+
+# ====== Чтение ======
+
+def get_path(url: str) -> Optional[str]:
+    """Путь к скачанной картинке или None. Сеть не трогает."""
+    if not url:
+        return None
+    path = local_path(url)
+    return path if os.path.isfile(path) else None
+
+
+def version(url: str) -> str:
+    """Версия картинки для ключей кеша: меняется при перезаписи файла; "" — картинки нет."""
+    if not url:
+        return ""
+    try:
+        st = os.stat(local_path(url))
+    except OSError:
+        return ""
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def get_preview(url: str) -> Optional[str]:
+    """Картинка для Telegram: уменьшенная копия, если есть, иначе оригинал."""
+    if not url:
+        return None
+    preview = _preview_path(url)
+    if os.path.isfile(preview):
+        return preview
+    return get_path(url)
+
+
+def ensure(url: str) -> Optional[str]:
+    """
+    Путь к картинке; если её нет — скачивает сейчас (синхронно, как
+    раньше при каждом рендере). Для потоков рендера, не для event loop.
+    """
+    if not url:
+        return None
+    path = get_path(url)
+    if path is not None:
+        _stats["hits"] += 1
+        return path
+
+    _stats["misses"] += 1
+    try:
+        resp = requests.get(url, timeout=LAYOUT_FETCH_TIMEOUT)
+        resp.raise_for_status()
+        if not resp.content:
+            raise ValueError("пустой ответ")
+    except (requests.RequestException, ValueError) as e:
+        _stats["errors"] += 1
+        log.warning("планировка не скачана", url=url, error=repr(e))
+        return None
+    entry = _store(url, resp.content, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+    _save_index({url: entry})
+    return local_path(url)
+
+
+# ====== Запись ======
+
+def _read_index() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(INDEX_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(updates: Dict[str, Optional[Dict[str, Any]]]) -> None:
+    """
+    Дописывает записи в index.json (None — удалить запись). Индекс
+    перечитывается перед записью: его же пишет синхронизация в другом
+    процессе.
+    """
+    with _index_lock:
+        index = _read_index()
+        for url, entry in updates.items():
+            if entry is None:
+                index.pop(url, None)
+            else:
+                index[url] = entry
+        tmp = f"{INDEX_PATH}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(LAYOUTS_DIR, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp, INDEX_PATH)
+        except OSError as e:
+            log.warning("индекс планировок не сохранён", error=repr(e))
+
+
+def _write_file(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _make_preview(url: str, path: str) -> None:
+    if Image is None or LAYOUT_PREVIEW_SIZE <= 0 or path.endswith(".svg"):
+        return
+    preview = _preview_path(url)
+    tmp = f"{preview}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with Image.open(path) as image:
+            image.thumbnail((LAYOUT_PREVIEW_SIZE, LAYOUT_PREVIEW_SIZE))
+            if image.mode in ("RGBA", "LA", "P"):
+                # Прозрачный фон планировки — на белый, JPEG без альфы
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            image.convert("RGB").save(tmp, "JPEG", quality=85, optimize=True)
+        os.replace(tmp, preview)
+        _stats["previews"] += 1
+    except Exception as e:
+        log.warning("превью планировки не создано", url=url, error=repr(e))
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _same_content(path: str, data: bytes) -> bool:
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def _store(url: str, data: bytes, etag: Optional[str], last_modified: Optional[str]) -> Dict[str, Any]:
+    """Записывает картинку и превью. Returns: запись индекса."""
+    os.makedirs(LAYOUTS_DIR, exist_ok=True)
+    path = local_path(url)
+    # Сервер без ETag/Last-Modified отдаёт ту же картинку заново — файл
+    # не трогаем, иначе version() сменится и КП перерендерятся
+    if not _same_content(path, data):
+        _write_file(path, data)
+        _make_preview(url, path)
+    elif not os.path.isfile(_preview_path(url)):
+        _make_preview(url, path)
+    _stats["fetched"] += 1
+    _stats["bytes"] += len(data)
+    return {"etag": etag, "last_modified": last_modified, "size": len(data), "fetched": int(time.time())}
+
+
+# ====== Загрузка пачкой ======
+
+async def _fetch(
+    session: aiohttp.ClientSession,
+    limit: asyncio.Semaphore,
+    url: str,
+    entry: Optional[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """Новая запись индекса, entry без изменений (304) или None — ошибка."""
+    headers = {}
+    if entry and get_path(url):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    async with limit:
+        try:
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 304 and headers:
+                    _stats["not_modified"] += 1
+                    return entry
+                resp.raise_for_status()
+                data = await resp.read()
+                etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+                if resp.status != 200 or not data:
+                    raise ValueError(f"HTTP {resp.status}, {len(data)} байт")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            _stats["errors"] += 1
+            log.warning("планировка не скачана", url=url, error=repr(e))
+            return None
+    # Запись и уменьшение картинки — не в event loop
+    return await asyncio.to_thread(_store, url, data, etag, last_modified)
+
+
+def _prune(keep: Iterable[str]) -> Dict[str, None]:
+    """Удаляет картинки, которых нет среди keep. Returns: обновления индекса."""
+    keys = {_key(url) for url in keep}
+    if not os.path.isdir(LAYOUTS_DIR):
+        return {}
+    for entry in os.scandir(LAYOUTS_DIR):
+        if entry.name == os.path.basename(INDEX_PATH) or entry.name.endswith(".tmp"):
+            continue
+        if entry.name[:32] not in keys:
+            os.remove(entry.path)
+            _stats["pruned"] += 1
+    return {url: None for url in _read_index() if _key(url) not in keys}
+
+
+async def prefetch(urls: Iterable[Optional[str]], revalidate: bool = True, prune: bool = False) -> Dict[str, Any]:
+    """
+    Скачивает планировки urls в LAYOUTS_DIR.
+
+    Args:
+        revalidate: проверять уже скачанные (условный запрос);
+            False — только недостающие
+        prune: удалить картинки, которых нет в urls (urls — весь каталог)
+
+    Returns:
+        статистика загрузки
+    """
+    urls = sorted({url for url in urls if url})
+    index = _read_index()
+    todo = urls if revalidate else [url for url in urls if get_path(url) is None]
+    before = dict(_stats)
+    started = time.perf_counter()
+
+    updates: Dict[str, Optional[Dict[str, Any]]] = {}
+    if todo:
+        timeout = aiohttp.ClientTimeout(total=LAYOUT_FETCH_TIMEOUT)
+        limit = asyncio.Semaphore(LAYOUTS_CONCURRENCY)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            entries = await asyncio.gather(*(_fetch(session, limit, url, index.get(url)) for url in todo))
+        updates.update({url: entry for url, entry in zip(todo, entries) if entry is not None})
+    if prune:
+        updates.update(_prune(urls))
+    if updates:
+        _save_index(updates)
+
+    stats = {name: _stats[name] - before[name] for name in ("fetched", "not_modified", "errors", "pruned", "bytes")}
+    stats.update(urls=len(urls), checked=len(todo), elapsed_s=round(time.perf_counter() - started, 2))
+    log.info("планировки загружены", **stats)
+    return stats
+
+
+async def prefetch_catalog() -> Dict[str, Any]:
+    """Недостающие планировки текущего каталога (фоновая задача при старте бота)."""
+    from services.units_db import get_catalog
+
+    try:
+        catalog = await asyncio.to_thread(get_catalog)
+        return await prefetch((lot["layout_url"] for lot in catalog.lots), revalidate=False)
+    except Exception:
+        # Фоновая задача: без планировок КП скачает их сам (ensure)
+        log.exception("планировки каталога не загружены")
+        return {}
+
+
+def get_layout_store_stats() -> Dict[str, Any]:
+    """Счётчики хранилища (для /metrics)."""
+    files = 0
+    size = 0
+    if os.path.isdir(LAYOUTS_DIR):
+        for entry in os.scandir(LAYOUTS_DIR):
+            if entry.is_file() and not entry.name.endswith((".tmp", ".json")):
+                files += 1
+                size += entry.stat().st_size
+    return {**_stats, "files": files, "size_mb": round(size / 1024 / 1024, 2), "previews_enabled": Image is not None}
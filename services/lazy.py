@@ -0,0 +1,76 @@
+"""
+Ленивые модули для редко используемых подсистем.
+
+Модуль импортируется при первом обращении к атрибуту, а не при старте
+бота. Пока никто его не использовал, его состояния (кешей, ожидания
+ввода) не существует — проверки можно пропускать через .loaded:
+
+    corp3 = lazy_module("handlers.corp3")
+
+    if corp3.loaded and await corp3.handle_corp3_text(chat_id, text):
+        return
+    await corp3.handle_corp3_start(chat_id)
+"""
+
+import importlib
+import sys
+import time
+from typing import Any, Dict
+
+from services.logger import get_logger
+
+
+log = get_logger("startup")
+
+
+class LazyModule:
+    """Прокси модуля: import при первом обращении к атрибуту."""
+
+    __slots__ = ("name", "_module")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._module = None
+
+    @property
+    def loaded(self) -> bool:
+        """True, если модуль уже импортирован (через прокси или напрямую)."""
+        return self._module is not None or self.name in sys.modules
+
+    def load(self) -> Any:
+        """Импортирует модуль (один раз) и возвращает его."""
+        module = self._module
+        if module is None:
+            started = time.perf_counter()
+            was_loaded = self.name in sys.modules
+            module = self._module = importlib.import_module(self.name)
+            if not was_loaded:
+                log.info(
+                    "ленивый импорт",
+                    module=self.name,
+                    ms=round((time.perf_counter() - started) * 1000, 1),
+                )
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self.name} ({state})>"
+
+
+_proxies: Dict[str, LazyModule] = {}
+
+
+def lazy_module(name: str) -> LazyModule:
+    """Общий прокси для модуля name."""
+    proxy = _proxies.get(name)
+    if proxy is None:
+        proxy = _proxies[name] = LazyModule(name)
+    return proxy
+
+
+def get_lazy_stats() -> Dict[str, bool]:
+    """Какие ленивые модули уже загружены."""
+    return {name: proxy.loaded for name, proxy in _proxies.items()}
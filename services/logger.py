@@ -0,0 +1,198 @@
+"""
+Структурированное логирование без блокировки event loop.
+
+Запись в stdout/journald идёт из отдельного потока (QueueHandler +
+QueueListener), обработчик update только кладёт запись в очередь.
+
+- JSON lines: {"ts", "level", "cat", "msg", ...поля}
+- уровни: LOG_LEVEL (DEBUG/INFO/WARNING/ERROR)
+- выборка по категориям: LOG_SAMPLE="webhook=0.1,tg=0.5" — доля
+  INFO/DEBUG-записей, которые попадают в лог (WARNING и выше — всегда)
+- длинные поля (update, payload) обрезаются до LOG_MAX_FIELD_LEN
+- LOG_DEBUG_CHAT_ID (или set_debug_chat) — для этого чата пишется всё:
+  DEBUG, без выборки и без обрезки
+
+    from services.logger import get_logger
+    log = get_logger("tg")
+    log.info("sendMessage ok", chat_id=chat_id, ms=42)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config.settings import LOG_LEVEL, LOG_SAMPLE, LOG_MAX_FIELD_LEN, LOG_DEBUG_CHAT_ID
+
+
+_ROOT = "rizalta"
+
+_debug_chat_id: Optional[int] = LOG_DEBUG_CHAT_ID
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _parse_sample(spec: str) -> Dict[str, float]:
+    """'webhook=0.1,tg=0.5' -> {"webhook": 0.1, "tg": 0.5}"""
+    rates = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        category, rate = item.split("=", 1)
+        try:
+            rates[category.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+_sample_rates = _parse_sample(LOG_SAMPLE)
+
+
+def set_debug_chat(chat_id: Optional[int]) -> None:
+    """Включает полный лог для одного чата (None — выключить)."""
+    global _debug_chat_id
+    _debug_chat_id = chat_id
+
+
+def get_debug_chat() -> Optional[int]:
+    return _debug_chat_id
+
+
+def _truncate(value: Any, limit: int) -> Any:
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = value if isinstance(value, str) else repr(value)
+    if limit and len(text) > limit:
+        return text[:limit] + f"...(+{len(text) - limit})"
+    return text
+
+
+# ====== Форматирование (в потоке listener'а) ======
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "cat": record.name.rpartition(".")[2],
+            "msg": record.getMessage(),
+        }
+
+        fields = getattr(record, "fields", None)
+        if fields:
+            limit = 0 if getattr(record, "full", False) else LOG_MAX_FIELD_LEN
+            for key, value in fields.items():
+                entry[key] = _truncate(value, limit)
+
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Кладёт запись в очередь как есть — форматирование в потоке listener'а."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # traceback нужно снять сейчас, пока исключение живо
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# ====== Логгер категории ======
+
+class CategoryLogger:
+    """Тонкая обёртка над logging.Logger: поля передаются как kwargs."""
+
+    __slots__ = ("category", "_logger")
+
+    def __init__(self, category: str):
+        self.category = category
+        self._logger = logging.getLogger(f"{_ROOT}.{category}")
+
+    def _log(self, level: int, msg: str, exc_info: Any, fields: Dict[str, Any]) -> None:
+        full = _debug_chat_id is not None and fields.get("chat_id") == _debug_chat_id
+
+        if not full:
+            if not self._logger.isEnabledFor(level):
+                return
+            if level < logging.WARNING:
+                rate = _sample_rates.get(self.category, 1.0)
+                if rate < 1.0 and random.random() >= rate:
+                    return
+
+        self._logger.handle(self._logger.makeRecord(
+            self._logger.name, level, "", 0, msg, None, exc_info,
+            extra={"fields": fields, "full": full},
+        ))
+
+    def debug(self, msg: str, **fields: Any) -> None:
+        self._log(logging.DEBUG, msg, None, fields)
+
+    def info(self, msg: str, **fields: Any) -> None:
+        self._log(logging.INFO, msg, None, fields)
+
+    def warning(self, msg: str, **fields: Any) -> None:
+        self._log(logging.WARNING, msg, None, fields)
+
+    def error(self, msg: str, exc_info: bool = False, **fields: Any) -> None:
+        self._log(logging.ERROR, msg, sys.exc_info() if exc_info else None, fields)
+
+    def exception(self, msg: str, **fields: Any) -> None:
+        """ERROR с traceback текущего исключения."""
+        self._log(logging.ERROR, msg, sys.exc_info(), fields)
+
+    def is_full(self, chat_id: Any) -> bool:
+        """True, если для chat_id включён полный лог (отладка одного чата)."""
+        return _debug_chat_id is not None and chat_id == _debug_chat_id
+
+
+_loggers: Dict[str, CategoryLogger] = {}
+
+
+def get_logger(category: str) -> CategoryLogger:
+    """Логгер категории (webhook, tg, intent, kp_pdf, ...)."""
+    setup_logging()
+    logger = _loggers.get(category)
+    if logger is None:
+        logger = _loggers[category] = CategoryLogger(category)
+    return logger
+
+
+def setup_logging() -> None:
+    """Настраивает очередь и фоновый поток записи (один раз)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+
+    level = logging.getLevelName(LOG_LEVEL.upper())
+    root = logging.getLogger(_ROOT)
+    root.setLevel(level if isinstance(level, int) else logging.INFO)
+    root.propagate = False
+    root.addHandler(_QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Дописывает очередь и останавливает поток записи."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,53 @@
+"""
+Коды лотов: единая нормализация.
+
+В кодах лотов встречаются и кириллица, и латиница одинакового
+начертания ("В708" и "B708" — один лот). Каноническая форма — ключ
+code_key(): верхний регистр, латиница, только буквы и цифры. По нему
+строятся индексы (каталог units_db, КП, Корпус 3), поэтому поиск по коду —
+одно обращение к словарю независимо от того, как код набрал пользователь.
+
+    code_key(" в-708 ")   → "B708"
+    to_latin("в708")      → "B708"
+    to_cyrillic("B708")   → "В708"
+    code_variants("B708") → ("В708", "B708")
+"""
+
+import re
+from typing import Tuple
+
+# Буквы одинакового начертания кириллица → латиница
+CYRILLIC_TO_LATIN = {
+    "А": "A", "В": "B", "Е": "E", "К": "K",
+    "М": "M", "Н": "H", "О": "O", "Р": "P",
+    "С": "S", "Т": "T", "У": "Y", "Х": "X",
+}
+LATIN_TO_CYRILLIC = {v: k for k, v in CYRILLIC_TO_LATIN.items()}
+
+_TO_LATIN = str.maketrans(CYRILLIC_TO_LATIN)
+_TO_CYRILLIC = str.maketrans(LATIN_TO_CYRILLIC)
+
+# Всё, кроме букв и цифр (пробелы, "№", дефисы, подчёркивания)
+_NOT_ALNUM = re.compile(r"[\W_]+")
+
+
+def code_key(raw) -> str:
+    """Канонический ключ кода: верхний регистр, латиница, только буквы и цифры."""
+    if not raw:
+        return ""
+    return _NOT_ALNUM.sub("", str(raw).upper().translate(_TO_LATIN))
+
+
+def to_latin(code: str) -> str:
+    """Код в латинице (без удаления символов — как хранится в БД)."""
+    return code.strip().upper().translate(_TO_LATIN)
+
+
+def to_cyrillic(code: str) -> str:
+    """Код в кириллице (так коды показываются пользователю)."""
+    return code.strip().upper().translate(_TO_CYRILLIC)
+
+
+def code_variants(code: str) -> Tuple[str, str]:
+    """(код_кириллица, код_латиница)."""
+    return to_cyrillic(code), to_latin(code)
@@ -0,0 +1,437 @@
+"""
+Ответы /api/lots (Mini App) — готовые байты.
+
+Раньше каждое открытие Mini App шло в SQLite, собирало список словарей,
+считало статистику тремя проходами и кодировало JSON через FastAPI.
+Теперь ответ на каждую комбинацию (building, floor, status) собирается
+один раз на версию каталога лотов (services/units_db.py):
+
+- JSON кодируется в байты, тут же сжимается gzip (и brotli, если модуль
+  установлен); маленькие ответы не сжимаются
+- ETag — хеш тела; If-None-Match с тем же ETag → 304 без тела
+- Cache-Control (API_LOTS_MAX_AGE) — webview Telegram переиспользует ответ
+
+Пока каталог не перечитан, запрос — поиск в словаре. Если новая версия
+каталога пришла с лентой изменений (services/unit_history.py), сбрасываются
+только ответы затронутых корпусов; остальные переживают синхронизацию.
+
+/api/lots/search — серверный поиск вместо фильтрации всего списка на
+телефоне: диапазоны площади/цены/этажа, комнаты, сортировка, страницы
+по курсору, выбор полей и фасеты (корпус, этаж, статус, комнаты).
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import API_LOTS_CACHE_SIZE, API_LOTS_MAX_AGE
+from services import unit_history, units_db
+from services.logger import get_logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+log = get_logger("lots_api")
+
+STATUSES = ("available", "booked", "sold")
+
+# Меньше — сжатие не окупается
+MIN_COMPRESS_SIZE = 1024
+
+# Предпочтение при нескольких подходящих Accept-Encoding
+ENCODINGS = ("br", "gzip")
+
+
+class EncodedResponse:
+    """Тело ответа, его сжатые варианты и ETag."""
+
+    __slots__ = ("body", "etag", "variants")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.variants: Dict[str, bytes] = {}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=5)
+
+    def select(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """(тело, Content-Encoding) под заголовок Accept-Encoding клиента."""
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in ENCODINGS:
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return self.variants[encoding], encoding
+        return self.body, None
+
+
+_responses: Dict[Tuple[Any, ...], EncodedResponse] = {}
+# Выборки /api/lots/search: (фильтры, сортировка) -> (лоты, фасеты)
+_searches: Dict[Tuple[Any, ...], Tuple[List[dict], Dict[str, Dict[Any, int]]]] = {}
+_responses_version: Optional[int] = None
+_ordered: List[dict] = []
+_lock = threading.Lock()
+# Версия каталога -> (предыдущая версия, затронутые корпуса) из ленты изменений
+_affected: Dict[int, Tuple[Optional[int], set]] = {}
+
+_stats = {"hits": 0, "builds": 0, "not_modified": 0, "searches": 0, "search_builds": 0, "kept": 0}
+
+
+# ====== Заголовки ======
+
+def _accepted_encodings(header: str) -> set:
+    """Кодировки из Accept-Encoding, кроме явно запрещённых (q=0)."""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.partition(";")
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        name = name.strip().lower()
+        if name:
+            accepted.add(name)
+    return accepted
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+# ====== Сборка ответа ======
+
+def _api_order(lots) -> List[dict]:
+    """Порядок прежнего SQL: ORDER BY building, floor DESC, code (NULL как в SQLite)."""
+    return sorted(lots, key=lambda l: (
+        l["building"] is not None, l["building"] or 0,
+        l["floor"] is None, -(l["floor"] or 0),
+        l["code"] is not None, l["code"] or "",
+    ))
+
+
+def _api_lot(lot: dict) -> Dict[str, Any]:
+    """Лот каталога в формате Mini App."""
+    return {
+        "code": lot["code"],
+        "building": lot["building"],
+        "buildingName": "Family" if lot["building"] == 1 else "Business",
+        "floor": lot["floor"],
+        "area": float(lot["area"]) if lot["area"] else 0,
+        "price": int(lot["price"]) if lot["price"] else 0,
+        "status": lot["status"] or "available",
+        "layout_url": lot["layout_url"] or "",
+    }
+
+
+def _build(building: Optional[int], floor: Optional[int], status: Optional[str]) -> EncodedResponse:
+    lots = []
+    counts = dict.fromkeys(STATUSES, 0)
+    for lot in _ordered:
+        if building and lot["building"] != building:
+            continue
+        if floor and lot["floor"] != floor:
+            continue
+        if status and lot["status"] != status:
+            continue
+        api_lot = _api_lot(lot)
+        if api_lot["status"] in counts:
+            counts[api_lot["status"]] += 1
+        lots.append(api_lot)
+
+    payload = {
+        "ok": True,
+        "lots": lots,
+        "stats": {"total": len(lots), **counts},
+    }
+    # Как JSONResponse FastAPI: без ASCII-экранирования и пробелов
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return EncodedResponse(body)
+
+
+def _on_changes(batch) -> None:
+    """Лента изменений: запоминаем корпуса, которых коснулась новая версия каталога."""
+    with _lock:
+        _affected[batch.catalog_version] = (batch.previous_version, batch.buildings())
+        for version in [v for v in _affected if v < batch.catalog_version - 8]:
+            del _affected[version]
+
+
+unit_history.subscribe(_on_changes)
+
+
+def _sync_version(catalog) -> None:
+    """
+    Новая версия каталога — сбрасываем ответы и выборки (под _lock).
+
+    Если лента изменений пришла для перехода с нашей версии на новую,
+    остаются записи с фильтром по незатронутому корпусу; иначе (правка БД
+    вручную, пропущенная версия) сбрасывается всё.
+    """
+    global _responses_version, _ordered
+    if _responses_version == catalog.version:
+        return
+
+    previous_version, affected = _affected.pop(catalog.version, (None, None))
+    if affected is not None and previous_version == _responses_version:
+        for cache in (_responses, _searches):
+            for key in [k for k in cache if _filter_building(k) in affected or _filter_building(k) is None]:
+                del cache[key]
+        _stats["kept"] += len(_responses) + len(_searches)
+        log.info("кеш /api/lots сброшен частично", buildings=sorted(b for b in affected if b is not None),
+                 kept=len(_responses) + len(_searches), version=catalog.version)
+    else:
+        _responses.clear()
+        _searches.clear()
+    _ordered = _api_order(catalog.lots)
+    _responses_version = catalog.version
+
+
+def _filter_building(key: Tuple[Any, ...]) -> Optional[int]:
+    """Корпус из ключа кеша: (building, floor, status) или ((building, ...), sort)."""
+    first = key[0]
+    return first[0] if isinstance(first, tuple) else first
+
+
+def get_lots_response(building: int = None, floor: int = None, status: str = None) -> EncodedResponse:
+    """Готовый ответ /api/lots; собирается при первом запросе после смены каталога."""
+
+    catalog = units_db.get_catalog()
+    key = (building or None, floor or None, status or None)
+
+    response = _responses.get(key) if _responses_version == catalog.version else None
+    if response is not None:
+        _stats["hits"] += 1
+        return response
+
+    with _lock:
+        _sync_version(catalog)
+        response = _responses.get(key)
+        if response is None:
+            # Параметры приходят от клиента — размер кеша ограничен
+            if len(_responses) >= API_LOTS_CACHE_SIZE:
+                _responses.clear()
+            response = _responses[key] = _build(*key)
+            _stats["builds"] += 1
+            log.debug("ответ /api/lots собран", filters=key, size=len(response.body),
+                      version=catalog.version, variants=list(response.variants))
+    return response
+
+
+def respond(response: EncodedResponse, headers) -> Tuple[int, bytes, Dict[str, str]]:
+    """
+    (статус, тело, заголовки) HTTP-ответа с учётом If-None-Match и
+    Accept-Encoding запроса.
+    """
+    out = {
+        "ETag": response.etag,
+        "Cache-Control": f"public, max-age={API_LOTS_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(headers.get("if-none-match", ""), response.etag):
+        _stats["not_modified"] += 1
+        return 304, b"", out
+
+    body, encoding = response.select(headers.get("accept-encoding", ""))
+    if encoding:
+        out["Content-Encoding"] = encoding
+    return 200, body, out
+
+
+# ====== Поиск (/api/lots/search) ======
+
+# Поля лота в ответе поиска (fields= выбирает подмножество)
+SEARCH_FIELDS = ("code", "building", "buildingName", "floor", "rooms", "area", "price", "status", "layout_url")
+
+# sort= : поле каталога; "-" в начале — по убыванию
+SEARCH_SORTS = {"price": "price", "area": "area", "floor": "floor", "code": "code", "rooms": "rooms"}
+
+FACETS = ("building", "floor", "status", "rooms")
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+
+def _in_range(value, low, high) -> bool:
+    if low is None and high is None:
+        return True
+    if value is None:
+        return False
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def _sorted(lots: List[dict], sort: Optional[str]) -> List[dict]:
+    """Стабильная сортировка поверх порядка /api/lots; пустые значения — в конце."""
+    if not sort:
+        return lots
+    descending = sort.startswith("-")
+    field = SEARCH_SORTS.get(sort.lstrip("-"))
+    if field is None:
+        raise ValueError(f"sort: одно из {', '.join(SEARCH_SORTS)} (с '-' — по убыванию)")
+    present = [l for l in lots if l[field] is not None]
+    present.sort(key=lambda l: l[field], reverse=descending)
+    return present + [l for l in lots if l[field] is None]
+
+
+def _select(filters: Tuple[Any, ...], sort: Optional[str]) -> Tuple[List[dict], Dict[str, Dict[Any, int]]]:
+    """Лоты под фильтры и фасеты по ним — за один проход по каталогу."""
+    (building, floor, status, rooms, min_area, max_area,
+     min_price, max_price, min_floor, max_floor) = filters
+
+    matched = []
+    facets: Dict[str, Dict[Any, int]] = {name: {} for name in FACETS}
+    for lot in _ordered:
+        if building and lot["building"] != building:
+            continue
+        if floor and lot["floor"] != floor:
+            continue
+        if status and lot["status"] != status:
+            continue
+        if rooms and lot["rooms"] not in rooms:
+            continue
+        if not (_in_range(lot["area"], min_area, max_area)
+                and _in_range(lot["price"], min_price, max_price)
+                and _in_range(lot["floor"], min_floor, max_floor)):
+            continue
+        matched.append(lot)
+        for name in FACETS:
+            value = (lot["status"] or "available") if name == "status" else lot[name]
+            if value is not None:
+                counts = facets[name]
+                counts[value] = counts.get(value, 0) + 1
+
+    facets = {name: dict(sorted(counts.items())) for name, counts in facets.items()}
+    return _sorted(matched, sort), facets
+
+
+def _parse_rooms(rooms: Optional[str]) -> Optional[Tuple[int, ...]]:
+    if not rooms:
+        return None
+    try:
+        return tuple(sorted({int(r) for r in rooms.split(",") if r.strip()}))
+    except ValueError:
+        raise ValueError("rooms: числа через запятую, например 1,2") from None
+
+
+def _parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return SEARCH_FIELDS
+    selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in selected if f not in SEARCH_FIELDS]
+    if unknown:
+        raise ValueError(f"fields: неизвестные поля {', '.join(unknown)}")
+    return selected
+
+
+def _encode_cursor(version: int, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    """Смещение из курсора. Курсор прошлой версии каталога тоже принимается —
+    страницы могут сдвинуться, но клиент не получает ошибку посреди прокрутки."""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        offset = int(raw.split(":", 1)[1])
+    except (ValueError, IndexError):
+        raise ValueError("cursor: некорректное значение") from None
+    return max(offset, 0)
+
+
+def search_lots(
+    building: int = None,
+    floor: int = None,
+    status: str = None,
+    rooms: str = None,
+    min_area: float = None,
+    max_area: float = None,
+    min_price: int = None,
+    max_price: int = None,
+    min_floor: int = None,
+    max_floor: int = None,
+    sort: str = None,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+    cursor: str = None,
+    fields: str = None,
+) -> Dict[str, Any]:
+    """
+    Поиск для Mini App: фильтры, сортировка, страница и фасеты.
+
+    Выборка (фильтры + сортировка) кешируется до смены версии каталога,
+    так что следующие страницы — срез готового списка.
+
+    Raises:
+        ValueError: некорректные параметры (текст — для клиента)
+    """
+    limit = min(max(int(limit or SEARCH_DEFAULT_LIMIT), 1), SEARCH_MAX_LIMIT)
+    projection = _parse_fields(fields)
+    offset = _decode_cursor(cursor)
+    filters = (
+        building or None, floor or None, status or None, _parse_rooms(rooms),
+        min_area, max_area, min_price, max_price, min_floor, max_floor,
+    )
+    key = (filters, sort or None)
+
+    catalog = units_db.get_catalog()
+    _stats["searches"] += 1
+    with _lock:
+        _sync_version(catalog)
+        selection = _searches.get(key)
+        if selection is None:
+            selection = _select(filters, sort or None)
+            if len(_searches) >= API_LOTS_CACHE_SIZE:
+                _searches.clear()
+            _searches[key] = selection
+            _stats["search_builds"] += 1
+
+    matched, facets = selection
+    page = matched[offset:offset + limit]
+    next_offset = offset + len(page)
+
+    lots = []
+    for lot in page:
+        api_lot = _api_lot(lot)
+        api_lot["rooms"] = lot["rooms"]
+        lots.append({field: api_lot[field] for field in projection})
+
+    return {
+        "ok": True,
+        "total": len(matched),
+        "lots": lots,
+        "next_cursor": _encode_cursor(catalog.version, next_offset) if next_offset < len(matched) else None,
+        "facets": facets,
+        "version": catalog.version,
+    }
+
+
+def get_lots_api_stats() -> Dict[str, Any]:
+    """Счётчики кеша ответов (для /metrics)."""
+    return {
+        **_stats,
+        "cached": len(_responses),
+        "catalog_version": _responses_version,
+        "brotli": brotli is not None,
+    }
+
+
+def prebuild() -> None:
+    """Ответ без фильтров — его Mini App запрашивает при открытии."""
+    get_lots_response()
@@ -0,0 +1,190 @@
+"""
+Миграции схемы SQLite: индексы и служебные колонки.
+
+Таблицы создаются там, где с ними работают (parser_rclick — units,
+secretary_db — tasks, booking_calendar — bookings), а индексы под
+горячие запросы добавляются здесь, версионно: каждая миграция
+выполняется один раз и записывается в schema_migrations той же БД
+(unit_changes — история лотов, её тоже создаёт parser_rclick).
+
+Миграции группы применяются к файлу БД только если её таблица уже
+существует (свежая properties.db до первой синхронизации с rclick —
+пропускаем, догоним при следующем старте).
+
+Запуск — в startup приложения (run_all) или вручную:
+    python -m services.migrations
+Проверка планов горячих запросов — scripts/check_query_plans.py.
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple, Union
+
+from services import db
+from services.logger import get_logger
+
+
+log = get_logger("migrations")
+
+Migration = Tuple[str, Union[str, Callable[[sqlite3.Connection], None]]]
+
+
+def _column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+# ====== units (properties.db) ======
+
+def _units_drop_code_norm(conn: sqlite3.Connection) -> None:
+    """
+    Убирает code_norm (units_002/003): поиск по коду идёт по каталогу в
+    памяти (units_db), колонку никто не читал, а триггеры добавляли
+    UPDATE на каждую строку синхронизации.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS units_code_norm_insert")
+    conn.execute("DROP TRIGGER IF EXISTS units_code_norm_update")
+    conn.execute("DROP INDEX IF EXISTS idx_units_code_norm")
+    if _column_exists(conn, "units", "code_norm"):
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            conn.execute("ALTER TABLE units DROP COLUMN code_norm")
+        else:
+            # Старый SQLite без DROP COLUMN: колонка остаётся, без триггеров не пишется
+            log.warning("SQLite без DROP COLUMN, code_norm оставлена", sqlite=sqlite3.sqlite_version)
+
+
+UNITS_MIGRATIONS: List[Migration] = [
+    ("units_001_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_units_building_floor ON units(building, floor);
+        CREATE INDEX IF NOT EXISTS idx_units_floor_section ON units(floor, block_section);
+        CREATE INDEX IF NOT EXISTS idx_units_area ON units(area_m2);
+        CREATE INDEX IF NOT EXISTS idx_units_price ON units(price_rub);
+        CREATE INDEX IF NOT EXISTS idx_units_code ON units(code);
+        CREATE INDEX IF NOT EXISTS idx_units_status ON units(COALESCE(status, 'available'));
+    """),
+    # units_002/003 (code_norm с триггерами) убраны; на БД, где они
+    # успели выполниться, их следы удаляет units_004
+    ("units_004_drop_code_norm", _units_drop_code_norm),
+]
+
+
+# ====== unit_changes (properties.db) ======
+
+UNIT_CHANGES_MIGRATIONS: List[Migration] = [
+    ("unit_changes_001_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_unit_changes_code_ts ON unit_changes(code, ts);
+        CREATE INDEX IF NOT EXISTS idx_unit_changes_building_ts ON unit_changes(building, ts);
+        CREATE INDEX IF NOT EXISTS idx_unit_changes_ts ON unit_changes(ts);
+    """),
+]
+
+
+# ====== tasks (secretary.db) ======
+
+TASKS_MIGRATIONS: List[Migration] = [
+    ("tasks_001_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_date ON tasks(user_id, due_date);
+        CREATE INDEX IF NOT EXISTS idx_tasks_reminders ON tasks(due_date, status, reminder_sent);
+    """),
+]
+
+
+# ====== bookings (properties.db бота) ======
+
+BOOKINGS_MIGRATIONS: List[Migration] = [
+    ("bookings_001_indexes", """
+        CREATE INDEX IF NOT EXISTS idx_bookings_date_status ON bookings(booking_date, status);
+    """),
+]
+
+
+# Группа -> (таблица, миграции)
+MIGRATIONS: Dict[str, Tuple[str, List[Migration]]] = {
+    "units": ("units", UNITS_MIGRATIONS),
+    "unit_changes": ("unit_changes", UNIT_CHANGES_MIGRATIONS),
+    "tasks": ("tasks", TASKS_MIGRATIONS),
+    "bookings": ("bookings", BOOKINGS_MIGRATIONS),
+}
+
+
+def _database_paths() -> Dict[str, str]:
+    """Группа -> файл БД (пути берутся у модулей-владельцев таблиц)."""
+    from services.units_db import DB_PATH as properties_db
+    from services.secretary_db import DB_PATH as secretary_db
+    from handlers.booking_calendar import BOT_DB_PATH
+
+    return {
+        "units": str(properties_db),
+        "unit_changes": str(properties_db),
+        "tasks": str(secretary_db),
+        "bookings": BOT_DB_PATH,
+    }
+
+
+# ====== Запуск ======
+
+def migrate(path: str, group: str) -> List[str]:
+    """
+    Применяет недостающие миграции группы к файлу path.
+
+    Returns:
+        имена применённых миграций
+    """
+    table, migrations = MIGRATIONS[group]
+    applied: List[str] = []
+
+    with db.transaction(path) as conn:
+        if not _table_exists(conn, table):
+            log.info("таблицы ещё нет, миграции отложены", group=group, db=path)
+            return applied
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TEXT NOT NULL
+            )
+        """)
+        done = {row[0] for row in conn.execute("SELECT name FROM schema_migrations")}
+
+        for name, step in migrations:
+            if name in done:
+                continue
+            if callable(step):
+                step(conn)
+            else:
+                for sql in step.split(";"):
+                    if sql.strip():
+                        conn.execute(sql)
+            conn.execute(
+                "INSERT INTO schema_migrations (name, applied_at) VALUES (?, ?)",
+                (name, datetime.now().isoformat()),
+            )
+            applied.append(name)
+
+    if applied:
+        # Статистика для планировщика запросов по новым индексам
+        db.get_connection(path).execute("PRAGMA optimize")
+        log.info("миграции применены", group=group, db=path, applied=applied)
+    return applied
+
+
+def run_all() -> Dict[str, List[str]]:
+    """Применяет миграции ко всем БД. Ошибка одной группы не мешает остальным."""
+    result = {}
+    for group, path in _database_paths().items():
+        try:
+            result[group] = migrate(path, group)
+        except sqlite3.Error as e:
+            log.error("миграция не выполнена", group=group, db=path, error=repr(e))
+            result[group] = []
+    return result
+
+
+if __name__ == "__main__":
+    for group, applied in run_all().items():
+        print(f"{group}: {', '.join(applied) or 'без изменений'}")
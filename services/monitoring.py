@@ -3,14 +3,14 @@
 """
 
 import asyncio
-import aiohttp
 import psutil
-import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
 from collections import deque
 import os
 
+from services import db
+
 # Настройки
 ADMIN_CHAT_ID = 512319063
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -25,10 +25,8 @@ RAM_THRESHOLD_PERCENT = 50
 
 
 def init_db():
-    """Создаёт таблицу статистики."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("""
+    """Создаёт таблицы статистики (один раз на процесс)."""
+    db.ensure_schema(DB_PATH, """
         CREATE TABLE IF NOT EXISTS stats (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             timestamp TEXT NOT NULL,
@@ -36,9 +34,7 @@ def init_db():
             request_type TEXT,
             response_time_ms INTEGER
         )
-    """)
-    conn.commit()
-    cursor.execute("""
+    """, """
         CREATE TABLE IF NOT EXISTS daily_peaks (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             date TEXT NOT NULL,
@@ -48,8 +44,6 @@ def init_db():
             UNIQUE(date, metric)
         )
     """)
-    conn.commit()
-    conn.close()
 
 
 
@@ -58,43 +52,33 @@ def log_peak(metric: str, value: float):
     today = datetime.now().strftime("%Y-%m-%d")
     now = datetime.now().isoformat()
     
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT value FROM daily_peaks WHERE date = ? AND metric = ?",
-        (today, metric)
-    )
-    row = cursor.fetchone()
-    
-    if row is None:
-        cursor.execute(
-            "INSERT INTO daily_peaks (date, metric, value, timestamp) VALUES (?, ?, ?, ?)",
-            (today, metric, value, now)
-        )
-    elif value > row[0]:
-        cursor.execute(
-            "UPDATE daily_peaks SET value = ?, timestamp = ? WHERE date = ? AND metric = ?",
-            (value, now, today, metric)
-        )
-    
-    conn.commit()
-    conn.close()
+    with db.transaction(DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT value FROM daily_peaks WHERE date = ? AND metric = ?",
+            (today, metric)
+        ).fetchone()
+        
+        if row is None:
+            conn.execute(
+                "INSERT INTO daily_peaks (date, metric, value, timestamp) VALUES (?, ?, ?, ?)",
+                (today, metric, value, now)
+            )
+        elif value > row[0]:
+            conn.execute(
+                "UPDATE daily_peaks SET value = ?, timestamp = ? WHERE date = ? AND metric = ?",
+                (value, now, today, metric)
+            )
 
 
 def get_daily_peaks() -> dict:
     """Возвращает пиковые значения за сегодня."""
     today = datetime.now().strftime("%Y-%m-%d")
     
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    
-    cursor.execute(
+    rows = db.fetchall(
+        DB_PATH,
         "SELECT metric, value, timestamp FROM daily_peaks WHERE date = ?",
         (today,)
     )
-    rows = cursor.fetchall()
-    conn.close()
     
     return {row[0]: {"value": row[1], "time": row[2].split("T")[1][:5]} for row in rows}
 
@@ -109,14 +93,11 @@ def log_request(user_id: int, request_type: str = "message", response_time_ms: i
     now = datetime.now()
     request_times.append(now)
     
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute(
+    db.execute(
+        DB_PATH,
         "INSERT INTO stats (timestamp, user_id, request_type, response_time_ms) VALUES (?, ?, ?, ?)",
         (now.isoformat(), user_id, request_type, response_time_ms)
     )
-    conn.commit()
-    conn.close()
 
 
 def get_requests_per_minute() -> int:
@@ -135,8 +116,7 @@ def get_daily_stats() -> dict:
     """Статистика за сегодня."""
     today = datetime.now().strftime("%Y-%m-%d")
     
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
+    cursor = db.get_connection(DB_PATH).cursor()
     
     # Всего запросов
     cursor.execute(
@@ -166,8 +146,6 @@ def get_daily_stats() -> dict:
     )
     errors = cursor.fetchone()[0]
     
-    conn.close()
-    
     return {
         "total_requests": total_requests,
         "unique_users": unique_users,
@@ -178,18 +156,19 @@ def get_daily_stats() -> dict:
 
 async def send_alert(message: str):
     """Отправляет алерт админу."""
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+    from services.telegram import api_request
+    from services.send_queue import send_priority, PRIORITY_NOTIFY
+    
     payload = {
         "chat_id": ADMIN_CHAT_ID,
         "text": message,
         "parse_mode": "HTML"
     }
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as resp:
-                return await resp.json()
-    except Exception as e:
-        print(f"[MONITOR] Alert error: {e}")
+    with send_priority(PRIORITY_NOTIFY):
+        result = await api_request("sendMessage", payload)
+    if result is None:
+        print("[MONITOR] Alert error: нет ответа от Bot API")
+    return result
 
 
 # Флаги для предотвращения спама алертов
@@ -220,9 +199,9 @@ async def check_thresholds():
 
 async def send_daily_report():
     """Отправляет ежедневный отчёт с данными watchdog и пиками."""
-    stats = get_daily_stats()
+    stats = await db.run(get_daily_stats)
     ram = get_ram_usage()
-    peaks = get_daily_peaks()
+    peaks = await db.run(get_daily_peaks)
     
     # Пиковые значения
     ram_peak = peaks.get("ram", {}).get("value", 0)
@@ -278,7 +257,7 @@ async def send_daily_report():
 
 async def monitoring_loop():
     """Фоновая задача мониторинга."""
-    init_db()
+    await db.run(init_db)
     print("[MONITOR] Мониторинг запущен")
     
     last_daily_report = None
@@ -290,15 +269,15 @@ async def monitoring_loop():
             
             # Записываем пиковые значения RAM и CPU
             ram = get_ram_usage()
-            log_peak("ram", ram)
+            await db.run(log_peak, "ram", ram)
             
             import psutil
             cpu = psutil.cpu_percent(interval=None)
-            log_peak("cpu", cpu)
+            await db.run(log_peak, "cpu", cpu)
             
             # Пик запросов в минуту
             rpm = get_requests_per_minute()
-            log_peak("rpm", rpm)
+            await db.run(log_peak, "rpm", rpm)
             
             # Ежедневный отчёт в 20:00
             now = datetime.now()
@@ -16,6 +16,7 @@ from config.settings import (
     get_manager_ids,
 )
 from services.telegram import send_message
+from services.send_queue import send_priority, PRIORITY_NOTIFY
 from services.calculations import fmt_rub
 
 
@@ -34,7 +35,8 @@ async def notify_managers_telegram(
     success_count = 0
     for manager_id in manager_ids:
         try:
-            result = await send_message(manager_id, message)
+            with send_priority(PRIORITY_NOTIFY):
+                result = await send_message(manager_id, message)
             if result:
                 print(f"[NOTIFY] ✅ Sent to manager {manager_id}")
                 success_count += 1
@@ -56,7 +58,8 @@ async def notify_shows_group(message: str) -> bool:
         return False
     
     try:
-        result = await send_message(SHOWS_GROUP_ID, message)
+        with send_priority(PRIORITY_NOTIFY):
+            result = await send_message(SHOWS_GROUP_ID, message)
         if result:
             print(f"[NOTIFY] ✅ Sent to shows group {SHOWS_GROUP_ID}")
             return True
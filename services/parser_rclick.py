@@ -3,192 +3,462 @@
 Парсер данных с сайта застройщика ri.rclick.ru
 """
 
+import asyncio
+import hashlib
+import json
+import os
 import re
-import requests
 import sqlite3
-from typing import List, Dict, Any
+import sys
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
+import aiohttp
+
 BASE_URL = "https://ri.rclick.ru"
 CATALOG_ID = 340
 
+# Загрузка страниц каталога
+FETCH_CONCURRENCY = int(os.getenv("RCLICK_CONCURRENCY", "4"))   # одновременных запросов
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 1.0        # сек, удваивается с каждой попыткой
+FETCH_TIMEOUT = 30         # сек на запрос
+PAGE_SIZE = 8              # карточек на полной странице
+MAX_PAGES = 100
+
+# Хеши и разобранные карточки страниц прошлого запуска
+PAGE_CACHE_PATH = Path(__file__).parent.parent / "data" / "rclick_pages.json"
+PAGE_CACHE_FORMAT = 1      # увеличить при изменении разбора карточек
+
+UNITS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS units (
+        id INTEGER PRIMARY KEY,
+        code TEXT,
+        project TEXT DEFAULT 'Rizalta',
+        building INTEGER,
+        floor INTEGER,
+        rooms INTEGER,
+        area_m2 REAL,
+        price_rub INTEGER,
+        price_per_m2_rub INTEGER,
+        completion TEXT,
+        layout_url TEXT,
+        page_url TEXT,
+        status TEXT DEFAULT 'available',
+        block_section INTEGER DEFAULT 1,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Журнал синхронизаций, изменивших units; version — версия данных каталога
+UNITS_SYNC_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS units_sync (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        total INTEGER,
+        added INTEGER,
+        removed INTEGER,
+        changed INTEGER,
+        price_changed INTEGER,
+        status_changed INTEGER
+    )
+'''
+
+# История изменений лотов (только добавление строк): по строке на поле.
+# field — колонка units или 'unit' (лот добавлен: old NULL, удалён: new NULL).
+# Индексы под запросы истории — services/migrations.py
+UNIT_CHANGES_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS unit_changes (
+        sync_id INTEGER NOT NULL,
+        unit_id INTEGER NOT NULL,
+        field TEXT NOT NULL,
+        code TEXT,
+        building INTEGER,
+        old_value,
+        new_value,
+        ts INTEGER NOT NULL,
+        PRIMARY KEY (sync_id, unit_id, field)
+    ) WITHOUT ROWID
+'''
+
+
+# ====== Разбор карточек ======
+
+# Шаблоны компилируются один раз; страница режется на карточки за один
+# проход, каждое поле карточки — один поиск
+_CARD_START = re.compile(r'<a class="f_card"')
+_RE_ID = re.compile(r'href="/flat/(\d+)/"')
+_RE_HOUSE = re.compile(r'f_card-micro--house">([^<]+)<')
+_RE_CORP = re.compile(r'Корпус\s*(\d+)')
+_RE_CODE = re.compile(r'№\s*([А-Яа-яA-Za-z0-9]+)')
+_RE_NAME = re.compile(r'f_card-name">([^<]+)<sup>2</sup>')
+_RE_ROOMS = re.compile(r'(\d+)\s*комн')
+_RE_AREA = re.compile(r'([\d.,]+)\s*м')
+_RE_PRICE = re.compile(r'f_card-price">([^<]+)<')
+_RE_PRICE_M2 = re.compile(r'([\d\s]+)\s*руб\.\s*за\s*м')
+_RE_FLOOR = re.compile(r'>(\d+)\s*этаж<')
+_RE_COMPLETION = re.compile(r'date_finish.*?f_card-micro">([^<]+)<', re.DOTALL)
+_RE_LAYOUT = re.compile(r'f_card-wrap-img">\s*<img src="([^"]+)"')
+_RE_NOT_DIGIT = re.compile(r'[^\d]')
+
 
-def fetch_page(page: int) -> str:
-    """Загружает одну страницу каталога."""
-    url = f"{BASE_URL}/catalog/more/"
-    data = {"id": CATALOG_ID, "page": page}
+def _parse_card(block: str) -> Dict[str, Any]:
+    card = {}
+    
+    # ID квартиры
+    id_match = _RE_ID.search(block)
+    card['id'] = int(id_match.group(1)) if id_match else None
+    
+    # Корпус и номер квартиры: "Корпус 1, кв. №В227"
+    house_match = _RE_HOUSE.search(block)
+    if house_match:
+        house_text = house_match.group(1).strip()
+        corp_match = _RE_CORP.search(house_text)
+        card['building'] = int(corp_match.group(1)) if corp_match else None
+        code_match = _RE_CODE.search(house_text)
+        card['code'] = code_match.group(1) if code_match else None
+    
+    # Комнаты и площадь: "1 комн., 22 м"
+    name_match = _RE_NAME.search(block)
+    if name_match:
+        name_text = name_match.group(1).strip()
+        rooms_match = _RE_ROOMS.search(name_text)
+        card['rooms'] = int(rooms_match.group(1)) if rooms_match else 1
+        area_match = _RE_AREA.search(name_text)
+        card['area_m2'] = float(area_match.group(1).replace(',', '.')) if area_match else None
+    
+    # Цена
+    price_match = _RE_PRICE.search(block)
+    if price_match:
+        price_clean = _RE_NOT_DIGIT.sub('', price_match.group(1))
+        card['price_rub'] = int(price_clean) if price_clean else None
+    
+    # Цена за м²
+    price_m2_match = _RE_PRICE_M2.search(block)
+    if price_m2_match:
+        price_m2_clean = _RE_NOT_DIGIT.sub('', price_m2_match.group(1))
+        card['price_per_m2_rub'] = int(price_m2_clean) if price_m2_clean else None
+    
+    # Этаж
+    floor_match = _RE_FLOOR.search(block)
+    card['floor'] = int(floor_match.group(1)) if floor_match else None
+    
+    # Срок сдачи
+    completion_match = _RE_COMPLETION.search(block)
+    card['completion'] = completion_match.group(1).strip() if completion_match else None
+    
+    # URL планировки
+    img_match = _RE_LAYOUT.search(block)
+    card['layout_url'] = img_match.group(1) if img_match else None
     
-    resp = requests.post(url, data=data, timeout=30)
-    resp.raise_for_status()
-    return resp.text
+    # URL страницы
+    card['page_url'] = f"{BASE_URL}/flat/{card['id']}/" if card['id'] else None
+    return card
 
 
 def parse_cards(html: str) -> List[Dict[str, Any]]:
     """Парсит карточки квартир из HTML."""
     cards = []
     
-    # Паттерн для карточки
-    card_pattern = r'<a class="f_card" href="/flat/(\d+)/"[^>]*>.*?</a>'
-    card_matches = re.findall(card_pattern, html, re.DOTALL)
-    
-    # Более детальный парсинг
-    card_blocks = re.split(r'<a class="f_card"', html)[1:]
-    
-    for block in card_blocks:
+    for block in _CARD_START.split(html)[1:]:
         try:
-            card = {}
-            
-            # ID квартиры
-            id_match = re.search(r'href="/flat/(\d+)/"', block)
-            card['id'] = int(id_match.group(1)) if id_match else None
-            
-            # Корпус и номер квартиры
-            house_match = re.search(r'f_card-micro--house">([^<]+)<', block)
-            if house_match:
-                house_text = house_match.group(1).strip()
-                # "Корпус 1, кв. №В227"
-                corp_match = re.search(r'Корпус\s*(\d+)', house_text)
-                card['building'] = int(corp_match.group(1)) if corp_match else None
-                
-                code_match = re.search(r'№\s*([А-Яа-яA-Za-z0-9]+)', house_text)
-                card['code'] = code_match.group(1) if code_match else None
-            
-            # Комнаты и площадь
-            name_match = re.search(r'f_card-name">([^<]+)<sup>2</sup>', block)
-            if name_match:
-                name_text = name_match.group(1).strip()
-                # "1 комн., 22 м"
-                rooms_match = re.search(r'(\d+)\s*комн', name_text)
-                card['rooms'] = int(rooms_match.group(1)) if rooms_match else 1
-                
-                area_match = re.search(r'([\d.,]+)\s*м', name_text)
-                card['area_m2'] = float(area_match.group(1).replace(',', '.')) if area_match else None
-            
-            # Цена
-            price_match = re.search(r'f_card-price">([^<]+)<', block)
-            if price_match:
-                price_text = price_match.group(1).strip()
-                price_clean = re.sub(r'[^\d]', '', price_text)
-                card['price_rub'] = int(price_clean) if price_clean else None
-            
-            # Цена за м²
-            price_m2_match = re.search(r'([\d\s]+)\s*руб\.\s*за\s*м', block)
-            if price_m2_match:
-                price_m2_text = price_m2_match.group(1).strip()
-                price_m2_clean = re.sub(r'[^\d]', '', price_m2_text)
-                card['price_per_m2_rub'] = int(price_m2_clean) if price_m2_clean else None
-            
-            # Этаж
-            floor_match = re.search(r'>(\d+)\s*этаж<', block)
-            card['floor'] = int(floor_match.group(1)) if floor_match else None
-            
-            # Срок сдачи
-            completion_match = re.search(r'date_finish.*?f_card-micro">([^<]+)<', block, re.DOTALL)
-            card['completion'] = completion_match.group(1).strip() if completion_match else None
-            
-            # URL планировки
-            img_match = re.search(r'f_card-wrap-img">\s*<img src="([^"]+)"', block)
-            card['layout_url'] = img_match.group(1) if img_match else None
-            
-            # URL страницы
-            card['page_url'] = f"{BASE_URL}/flat/{card['id']}/" if card['id'] else None
-            
-            if card.get('id') and card.get('price_rub'):
-                cards.append(card)
-                
+            card = _parse_card(block)
         except Exception as e:
             print(f"[PARSER] Ошибка парсинга карточки: {e}")
             continue
+        if card.get('id') and card.get('price_rub'):
+            cards.append(card)
     
     return cards
 
 
-def fetch_all_units() -> List[Dict[str, Any]]:
-    """Загружает все квартиры со всех страниц."""
-    all_units = []
-    page = 1
+# ====== Загрузка каталога ======
+
+async def _fetch_page(
+    session: aiohttp.ClientSession,
+    limit: asyncio.Semaphore,
+    page: int,
+    cached: Optional[Dict[str, Any]],
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (html, etag) страницы; html=None — сервер ответил 304 на If-None-Match.
+    Сетевые ошибки и 5xx — повтор с экспоненциальной паузой.
+    """
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
     
-    while True:
-        print(f"[PARSER] Загружаем страницу {page}...")
-        html = fetch_page(page)
-        cards = parse_cards(html)
-        
-        if not cards:
-            break
-        
-        all_units.extend(cards)
-        print(f"[PARSER] Найдено {len(cards)} квартир, всего {len(all_units)}")
-        
-        # Проверяем есть ли ещё страницы
-        if len(cards) < 8:
-            break
-        
-        page += 1
-        
-        # Защита от бесконечного цикла
-        if page > 100:
-            break
-    
-    return all_units
-
-
-def update_database(units: List[Dict[str, Any]], db_path: str):
-    """Обновляет базу данных."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Создаём таблицу если нет
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS units (
-            id INTEGER PRIMARY KEY,
-            code TEXT,
-            project TEXT DEFAULT 'Rizalta',
-            building INTEGER,
-            floor INTEGER,
-            rooms INTEGER,
-            area_m2 REAL,
-            price_rub INTEGER,
-            price_per_m2_rub INTEGER,
-            completion TEXT,
-            layout_url TEXT,
-            page_url TEXT,
-            status TEXT DEFAULT 'available',
-            block_section INTEGER DEFAULT 1,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    async with limit:
+        for attempt in range(1, FETCH_RETRIES + 1):
+            try:
+                async with session.post(
+                    f"{BASE_URL}/catalog/more/",
+                    data={"id": CATALOG_ID, "page": page},
+                    headers=headers,
+                ) as resp:
+                    if resp.status == 304 and cached:
+                        return None, cached.get("etag")
+                    resp.raise_for_status()
+                    return await resp.text(), resp.headers.get("ETag")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == FETCH_RETRIES:
+                    raise
+                delay = FETCH_BACKOFF * 2 ** (attempt - 1)
+                print(f"[PARSER] Страница {page}: {e!r}, повтор через {delay:.0f} с")
+                await asyncio.sleep(delay)
+
+
+async def _load_page(
+    session: aiohttp.ClientSession,
+    limit: asyncio.Semaphore,
+    page: int,
+    cached: Optional[Dict[str, Any]],
+    stats: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Запись кеша страницы {hash, etag, cards}; неизменённая страница не разбирается."""
+    html, etag = await _fetch_page(session, limit, page, cached)
+    stats["pages"] += 1
+    if html is None:
+        stats["not_modified"] += 1
+        return cached
+    
+    stats["bytes"] += len(html)
+    digest = hashlib.sha1(html.encode("utf-8")).hexdigest()
+    if cached and cached.get("hash") == digest:
+        stats["unchanged"] += 1
+        return {**cached, "etag": etag}
+    return {"hash": digest, "etag": etag, "cards": parse_cards(html)}
+
+
+def _read_page_cache() -> Dict[str, Any]:
+    try:
+        with open(PAGE_CACHE_PATH, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Другая версия разбора — карточки из кеша не годятся
+    if cache.get("format") != PAGE_CACHE_FORMAT:
+        return {}
+    return cache.get("pages", {})
+
+
+def _write_page_cache(pages: Dict[str, Any]) -> None:
+    tmp = PAGE_CACHE_PATH.with_name(PAGE_CACHE_PATH.name + ".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": PAGE_CACHE_FORMAT, "pages": pages}, f, ensure_ascii=False)
+        os.replace(tmp, PAGE_CACHE_PATH)
+    except OSError as e:
+        print(f"[PARSER] Кеш страниц не сохранён: {e}")
+
+
+async def crawl_units(concurrency: int = FETCH_CONCURRENCY) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Загружает все квартиры: страницы запрашиваются пачками по
+    concurrency через одну сессию, разбираются по порядку до первой
+    неполной страницы.
+
+    Returns:
+        (квартиры, статистика загрузки)
+    """
+    cache = _read_page_cache()
+    pages: Dict[str, Any] = {}
+    all_units: List[Dict[str, Any]] = []
+    stats = {"pages": 0, "not_modified": 0, "unchanged": 0, "bytes": 0}
+    started = time.perf_counter()
     
-    # Очищаем старые данные
-    cursor.execute('DELETE FROM units')
+    timeout = aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+    limit = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        page, done = 1, False
+        # Защита от бесконечного цикла — не больше MAX_PAGES страниц
+        while not done and page <= MAX_PAGES:
+            batch = range(page, min(page + concurrency, MAX_PAGES + 1))
+            entries = await asyncio.gather(*(
+                _load_page(session, limit, n, cache.get(str(n)), stats) for n in batch
+            ))
+            for n, entry in zip(batch, entries):
+                cards = entry["cards"]
+                if not cards:
+                    done = True
+                    break
+                pages[str(n)] = entry
+                all_units.extend(cards)
+                print(f"[PARSER] Страница {n}: {len(cards)} квартир, всего {len(all_units)}")
+                # Неполная страница — последняя
+                if len(cards) < PAGE_SIZE:
+                    done = True
+                    break
+            page += len(batch)
     
-    # Вставляем новые
-    for unit in units:
-        # block_section: 1 = Корпус 2 (А), 2 = Корпус 1 (В) — по логике бота
-        block_section = 2 if unit.get('building') == 1 else 1
-        
-        cursor.execute('''
-            INSERT INTO units (id, code, building, floor, rooms, area_m2, 
-                              price_rub, price_per_m2_rub, completion, 
-                              layout_url, page_url, block_section)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            unit.get('id'),
-            unit.get('code'),
-            unit.get('building'),
-            unit.get('floor'),
-            unit.get('rooms'),
-            unit.get('area_m2'),
-            unit.get('price_rub'),
-            unit.get('price_per_m2_rub'),
-            unit.get('completion'),
-            unit.get('layout_url'),
-            unit.get('page_url'),
-            block_section
-        ))
-    
-    conn.commit()
-    conn.close()
-    print(f"[PARSER] База обновлена: {len(units)} записей")
+    _write_page_cache(pages)
+    
+    elapsed = time.perf_counter() - started
+    stats.update(
+        cards=len(all_units),
+        elapsed_s=round(elapsed, 2),
+        pages_per_s=round(stats["pages"] / elapsed, 1) if elapsed else None,
+        cards_per_s=round(len(all_units) / elapsed, 1) if elapsed else None,
+    )
+    return all_units, stats
+
+
+def fetch_all_units() -> List[Dict[str, Any]]:
+    """Загружает все квартиры со всех страниц."""
+    units, _ = asyncio.run(crawl_units())
+    return units
+
+
+# Поля units, которые приходят из каталога rclick
+SYNC_COLUMNS = (
+    "code", "building", "floor", "rooms", "area_m2", "price_rub",
+    "price_per_m2_rub", "completion", "layout_url", "page_url",
+    "status", "block_section",
+)
+
+
+def _unit_row(unit: Dict[str, Any]) -> tuple:
+    # block_section: 1 = Корпус 2 (А), 2 = Корпус 1 (В) — по логике бота
+    block_section = 2 if unit.get('building') == 1 else 1
+    return (
+        unit.get('id'),
+        unit.get('code'),
+        unit.get('building'),
+        unit.get('floor'),
+        unit.get('rooms'),
+        unit.get('area_m2'),
+        unit.get('price_rub'),
+        unit.get('price_per_m2_rub'),
+        unit.get('completion'),
+        unit.get('layout_url'),
+        unit.get('page_url'),
+        unit.get('status') or 'available',
+        block_section,
+    )
+
+
+def update_database(units: List[Dict[str, Any]], db_path: str) -> Dict[str, int]:
+    """
+    Обновляет базу данных: применяет только изменения.
+
+    Новые данные грузятся во временную таблицу units_staging (executemany),
+    сравниваются с units, и в той же транзакции удаляются пропавшие лоты,
+    обновляются изменившиеся и добавляются новые. Читатели (бот, /api/lots)
+    видят либо старую таблицу, либо новую — пустой или недозаполненной
+    units больше не бывает. Если изменения есть, в units_sync пишется
+    новая версия данных, а в unit_changes — что именно поменялось
+    (services/unit_history.py).
+
+    Returns:
+        {"total", "added", "removed", "changed", "price_changed",
+         "status_changed", "version"}
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    columns = ", ".join(SYNC_COLUMNS)
+    differs = " OR ".join(f"u.{c} IS NOT s.{c}" for c in SYNC_COLUMNS)
+
+    try:
+        # Создаём таблицы если нет (индексы — services/migrations.py)
+        conn.execute(UNITS_SCHEMA)
+        conn.execute(UNITS_SYNC_SCHEMA)
+        conn.execute(UNIT_CHANGES_SCHEMA)
+        conn.execute("DROP TABLE IF EXISTS temp.units_staging")
+        conn.execute(f"""
+            CREATE TEMP TABLE units_staging AS
+            SELECT id, {columns} FROM units WHERE 0
+        """)
+        conn.execute("CREATE UNIQUE INDEX temp.idx_units_staging_id ON units_staging(id)")
+
+        with conn:
+            # Повтор id между страницами каталога — берётся последняя карточка
+            conn.executemany(
+                f"INSERT OR REPLACE INTO units_staging (id, {columns}) "
+                f"VALUES ({', '.join('?' * (len(SYNC_COLUMNS) + 1))})",
+                [_unit_row(unit) for unit in units],
+            )
+
+            # Разница с units: пропавшие, изменившиеся (новые и старые значения), новые
+            removed = conn.execute(
+                "SELECT id, code, building FROM units WHERE id NOT IN (SELECT id FROM units_staging)"
+            ).fetchall()
+            changed = conn.execute(f"""
+                SELECT s.id, {', '.join('s.' + c for c in SYNC_COLUMNS)},
+                       {', '.join('u.' + c for c in SYNC_COLUMNS)}
+                FROM units_staging s JOIN units u ON u.id = s.id
+                WHERE {differs}
+            """).fetchall()
+            added = conn.execute(
+                "SELECT id, code, building FROM units_staging WHERE id NOT IN (SELECT id FROM units)"
+            ).fetchall()
+
+            # История: по строке на изменившееся поле, 'unit' — лот добавлен/удалён
+            history = [(unit_id, "unit", code, building, None, code) for unit_id, code, building in added]
+            history += [(unit_id, "unit", code, building, code, None) for unit_id, code, building in removed]
+            width = len(SYNC_COLUMNS)
+            for row in changed:
+                unit_id, new, old = row[0], row[1:1 + width], row[1 + width:]
+                for column, old_value, new_value in zip(SYNC_COLUMNS, old, new):
+                    if old_value != new_value:
+                        history.append((unit_id, column, new[0], new[1], old_value, new_value))
+
+            stats = {
+                "total": conn.execute("SELECT COUNT(*) FROM units_staging").fetchone()[0],
+                "added": len(added),
+                "removed": len(removed),
+                "changed": len(changed),
+                "price_changed": sum(1 for h in history if h[1] == "price_rub"),
+                "status_changed": sum(1 for h in history if h[1] == "status"),
+            }
+
+            version = None
+            if history:
+                version = conn.execute("""
+                    INSERT INTO units_sync (total, added, removed, changed, price_changed, status_changed)
+                    VALUES (:total, :added, :removed, :changed, :price_changed, :status_changed)
+                """, stats).lastrowid
+                ts = int(time.time())
+                conn.executemany(
+                    "INSERT INTO unit_changes (sync_id, unit_id, field, code, building, old_value, new_value, ts) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(version, *h, ts) for h in history],
+                )
+
+                conn.execute("DELETE FROM units WHERE id NOT IN (SELECT id FROM units_staging)")
+                assignments = ", ".join(f"{c} = ?" for c in SYNC_COLUMNS)
+                conn.executemany(
+                    f"UPDATE units SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    [(*row[1:1 + width], row[0]) for row in changed],
+                )
+                conn.execute(f"""
+                    INSERT INTO units (id, {columns})
+                    SELECT id, {columns} FROM units_staging
+                    WHERE id NOT IN (SELECT id FROM units)
+                """)
+            stats["version"] = version or _data_version(conn)
+
+        conn.execute("DROP TABLE IF EXISTS temp.units_staging")
+    finally:
+        conn.close()
+
+    print(
+        f"[PARSER] База обновлена: {stats['total']} записей "
+        f"(+{stats['added']} −{stats['removed']} ~{stats['changed']}, "
+        f"цена: {stats['price_changed']}, статус: {stats['status_changed']}, "
+        f"версия данных: {stats['version']})"
+    )
+
+    # Каталог лотов в этом же процессе (если загружен) перечитает БД сразу
+    units_db = sys.modules.get("services.units_db")
+    if units_db is not None and version is not None:
+        units_db.bump_catalog_version()
+
+    return stats
+
+
+def _data_version(conn: sqlite3.Connection) -> int:
+    """Версия данных units — номер последней синхронизации с изменениями."""
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM units_sync").fetchone()[0]
 
 
 def sync_from_rclick(db_path: str = None):
@@ -198,11 +468,23 @@ def sync_from_rclick(db_path: str = None):
     
     print("[PARSER] Начинаем синхронизацию с ri.rclick.ru...")
     
-    units = fetch_all_units()
-    print(f"[PARSER] Загружено {len(units)} квартир")
+    units, stats = asyncio.run(crawl_units())
+    print(
+        f"[PARSER] Загружено {len(units)} квартир за {stats['elapsed_s']} с: "
+        f"{stats['pages']} стр. ({stats['pages_per_s']} стр/с, {stats['cards_per_s']} квартир/с), "
+        f"без изменений {stats['unchanged']}, 304: {stats['not_modified']}"
+    )
     
     if units:
         update_database(units, str(db_path))
+        
+        # Планировки — заранее, чтобы рендер КП не ходил на rclick
+        from services import layout_store
+        layouts = asyncio.run(layout_store.prefetch((u.get('layout_url') for u in units), prune=True))
+        print(
+            f"[PARSER] Планировки: {layouts['urls']}, скачано {layouts['fetched']}, "
+            f"304: {layouts['not_modified']}, ошибок {layouts['errors']}, удалено {layouts['pruned']}"
+        )
         print("[PARSER] ✅ Синхронизация завершена!")
     else:
         print("[PARSER] ❌ Не удалось загрузить данные")
@@ -211,4 +493,6 @@ def sync_from_rclick(db_path: str = None):
 
 
 if __name__ == "__main__":
+    # Запуск файлом (python services/parser_rclick.py) — корень проекта для import services
+    sys.path.insert(0, str(Path(__file__).parent.parent))
     sync_from_rclick()
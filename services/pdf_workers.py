@@ -0,0 +1,303 @@
+"""
+Постоянные процессы wkhtmltopdf для doc_output.html_to_pdf.
+
+Каждый запуск wkhtmltopdf заново инициализирует Qt/WebKit и разбирает
+шрифты — это заметная часть 1–4 секунд рендера КП. wkhtmltopdf умеет
+брать задания из stdin (--read-args-from-stdin): строка «вход выход» —
+один документ, а процесс с движком остаётся живым. Здесь пул таких
+процессов:
+
+- процессы отдельно на каждый набор опций (у КП и сравнения разные
+  поля), до PDF_WORKERS на набор; поток берёт свободный процесс, пишет
+  HTML во временный файл (в /dev/shm, если есть), отправляет строку и
+  ждёт в stderr «Done» (или «Exit with code ...» — ошибка рендера),
+  а если сборка ничего не пишет в stderr — конца PDF в выходном файле
+- новый процесс сначала рендерит пустую страницу: проверка, что эта
+  версия wkhtmltopdf понимает протокол, и заодно прогрев движка
+- процесс перезапускается после PDF_WORKER_MAX_JOBS документов (память
+  WebKit растёт) и после любой ошибки
+- пока идёт рендер, процесс зарегистрирован в doc_output — doc_jobs
+  убивает его по таймауту задачи так же, как одноразовый
+- не сработал протокол (нет ответа, процесс упал, нет PDF) — render()
+  возвращает None и html_to_pdf рендерит одноразовым процессом; после
+  MAX_FAILURES таких сбоев подряд пул выключается до перезапуска бота
+
+Сравнение с одноразовым процессом — scripts/bench_pdf_render.py.
+"""
+
+import os
+import queue
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config.settings import PDF_WORKER_MAX_JOBS, PDF_WORKERS
+from services.doc_output import track_renderer
+from services.logger import get_logger
+
+
+log = get_logger("pdf_workers")
+
+# Сбоев протокола подряд, после которых пул выключается
+MAX_FAILURES = 3
+# Ответ на пробную страницу при запуске процесса
+HANDSHAKE_TIMEOUT = 20.0
+HANDSHAKE_HTML = "<html><head><meta charset='utf-8'></head><body></body></html>"
+# Как часто проверять выходной файл, пока нет строки в stderr
+FILE_POLL = 0.1
+
+_TMP_DIR = "/dev/shm" if os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+
+Options = Tuple[str, ...]
+
+_idle: Dict[Options, List["_Worker"]] = {}
+_total: Dict[Options, int] = {}
+_cond = threading.Condition()
+_failures = 0
+_disabled = False
+
+_stats = {"renders": 0, "started": 0, "recycled": 0, "fallbacks": 0, "render_errors": 0, "busy_ms": 0}
+
+
+class _ProtocolError(Exception):
+    """Процесс не ответил так, как ожидалось, — документ рендерится одноразовым wkhtmltopdf."""
+
+
+class _Worker:
+    """Процесс wkhtmltopdf --read-args-from-stdin и поток, читающий его stderr."""
+
+    def __init__(self, options: Options):
+        self.options = options
+        self.jobs = 0
+        self.silent = False
+        self.lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.proc = subprocess.Popen(
+            ["wkhtmltopdf", *options, "--read-args-from-stdin"],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, bufsize=0,
+        )
+        threading.Thread(target=self._read_stderr, name=f"pdf-worker-{self.proc.pid}", daemon=True).start()
+        _stats["started"] += 1
+
+    def _read_stderr(self) -> None:
+        # Прогресс wkhtmltopdf перерисовывается через \r — делим и по нему
+        buf = b""
+        while True:
+            chunk = self.proc.stderr.read(4096)
+            if not chunk:
+                self.lines.put(None)
+                return
+            buf += chunk.replace(b"\r", b"\n")
+            *lines, buf = buf.split(b"\n")
+            for line in lines:
+                line = line.strip()
+                if line:
+                    self.lines.put(line.decode("utf-8", "replace"))
+
+    def render(self, html: str, timeout: float) -> bytes:
+        """
+        Raises:
+            _ProtocolError: нет ответа или процесс завершился (не по kill)
+            RuntimeError: wkhtmltopdf сообщил об ошибке или процесс убит
+        """
+        fd, html_path = tempfile.mkstemp(prefix="wkpdf-", suffix=".html", dir=_TMP_DIR)
+        pdf_path = html_path[:-len(".html")] + ".pdf"
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(html.encode("utf-8"))
+            with track_renderer(self.proc):
+                self._run_job(html_path, pdf_path, timeout)
+            with open(pdf_path, "rb") as f:
+                pdf = f.read()
+        finally:
+            for path in (html_path, pdf_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self.jobs += 1
+        if not pdf.startswith(b"%PDF"):
+            raise _ProtocolError("в выходном файле не PDF")
+        return pdf
+
+    def _run_job(self, html_path: str, pdf_path: str, timeout: float) -> None:
+        try:
+            self.proc.stdin.write(f'"{html_path}" "{pdf_path}"\n'.encode("utf-8"))
+        except OSError as e:
+            raise _ProtocolError(f"stdin: {e!r}") from None
+
+        deadline = time.monotonic() + timeout
+        errors: List[str] = []
+        while True:
+            try:
+                line = self.lines.get(timeout=min(FILE_POLL, max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                if _pdf_complete(pdf_path):
+                    # PDF дописан, а «Done» нет: эта сборка молчит в stderr без
+                    # терминала — дальше ориентируемся только на файл
+                    if self.silent or not self._wait_done(FILE_POLL * 5):
+                        self.silent = True
+                    return
+                if time.monotonic() >= deadline:
+                    raise _ProtocolError(f"нет ответа за {timeout} с") from None
+                continue
+            if line is None:
+                if self.proc.wait() == -signal.SIGKILL:
+                    raise RuntimeError("wkhtmltopdf: рендер остановлен")
+                raise _ProtocolError(f"процесс завершился, код {self.proc.returncode}")
+            if line == "Done":
+                return
+            if line.startswith("Exit with code"):
+                raise RuntimeError(f"wkhtmltopdf: {line}: {'; '.join(errors)[-500:]}")
+            if line.startswith(("Error", "Warning")):
+                errors.append(line)
+
+    def _wait_done(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if self.lines.get(timeout=max(deadline - time.monotonic(), 0)) == "Done":
+                    return True
+            except queue.Empty:
+                break
+        return False
+
+    def stop(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+
+
+def _pdf_complete(path: str) -> bool:
+    """Файл PDF дописан до конца (%%EOF в хвосте)."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 32, 0))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+# ====== Пул ======
+
+def _acquire(options: Options) -> Optional[_Worker]:
+    """Свободный процесс для набора опций (новый, если можно); ждёт, если все заняты."""
+    with _cond:
+        while not _idle.get(options) and _total.get(options, 0) >= PDF_WORKERS:
+            _cond.wait()
+        if _idle.get(options):
+            return _idle[options].pop()
+        _total[options] = _total.get(options, 0) + 1
+
+    worker = None
+    try:
+        worker = _Worker(options)
+        worker.render(HANDSHAKE_HTML, HANDSHAKE_TIMEOUT)
+        return worker
+    except Exception as e:
+        if worker is not None:
+            worker.stop()
+        with _cond:
+            _total[options] -= 1
+            _cond.notify()
+        _failed(f"запуск: {e!r}")
+        return None
+
+
+def _release(worker: _Worker, reusable: bool) -> None:
+    if reusable and worker.jobs >= PDF_WORKER_MAX_JOBS:
+        _stats["recycled"] += 1
+        reusable = False
+    if not reusable:
+        worker.stop()
+    with _cond:
+        if reusable:
+            _idle.setdefault(worker.options, []).append(worker)
+        else:
+            _total[worker.options] -= 1
+        _cond.notify()
+
+
+def _failed(reason: str) -> None:
+    global _failures, _disabled
+    _failures += 1
+    _stats["fallbacks"] += 1
+    log.warning("сбой постоянного wkhtmltopdf, документ — одноразовым процессом", reason=reason, failures=_failures)
+    if _failures >= MAX_FAILURES and not _disabled:
+        _disabled = True
+        log.error("пул wkhtmltopdf выключен: протокол --read-args-from-stdin не работает", failures=_failures)
+        shutdown()
+
+
+def render(html: str, options: Sequence[str], timeout: float = 60) -> Optional[bytes]:
+    """
+    PDF постоянным процессом.
+
+    Returns:
+        байты PDF или None — пул выключен или не справился (рендерить
+        одноразовым процессом)
+
+    Raises:
+        RuntimeError: ошибка рендера самого документа
+    """
+    global _failures
+    if _disabled or PDF_WORKERS <= 0:
+        return None
+
+    options = tuple(options)
+    worker = _acquire(options)
+    if worker is None:
+        return None
+
+    started = time.perf_counter()
+    reusable = False
+    try:
+        pdf = worker.render(html, timeout)
+        reusable = True
+        _failures = 0
+        _stats["renders"] += 1
+        return pdf
+    except _ProtocolError as e:
+        _failed(repr(e))
+        return None
+    except RuntimeError:
+        _stats["render_errors"] += 1
+        raise
+    finally:
+        _stats["busy_ms"] += int((time.perf_counter() - started) * 1000)
+        _release(worker, reusable)
+
+
+def prestart(options: Sequence[str]) -> bool:
+    """Запускает и прогревает процесс заранее (при старте бота). Returns: получилось ли."""
+    if _disabled or PDF_WORKERS <= 0:
+        return False
+    options = tuple(options)
+    worker = _acquire(options)
+    if worker is None:
+        return False
+    _release(worker, True)
+    return True
+
+
+def shutdown() -> None:
+    """Останавливает свободные процессы (занятые остановятся при возврате в пул)."""
+    with _cond:
+        workers = [worker for idle in _idle.values() for worker in idle]
+        for options, idle in _idle.items():
+            _total[options] -= len(idle)
+            idle.clear()
+        _cond.notify_all()
+    for worker in workers:
+        worker.stop()
+
+
+def get_pdf_workers_stats() -> Dict[str, Any]:
+    """Счётчики пула (для /metrics)."""
+    with _cond:
+        processes = sum(_total.values())
+        idle = sum(len(workers) for workers in _idle.values())
+    return {**_stats, "processes": processes, "idle": idle, "disabled": _disabled, "limit": PDF_WORKERS}
@@ -4,12 +4,13 @@
 - Фиксация клиентов
 """
 
-import sqlite3
 import requests
 from pathlib import Path
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 
+from services import db
+
 BASE_DIR = Path(__file__).parent.parent
 DB_PATH = BASE_DIR / "rclick_tokens.db"
 
@@ -20,10 +21,8 @@ PROJECT_ID = "340"  # ID проекта RIZALTA
 
 
 def init_db():
-    """Создаёт таблицу токенов если не существует."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("""
+    """Создаёт таблицу токенов если не существует (один раз на процесс)."""
+    db.ensure_schema(DB_PATH, """
         CREATE TABLE IF NOT EXISTS rclick_tokens (
             telegram_id INTEGER PRIMARY KEY,
             phone TEXT NOT NULL,
@@ -33,21 +32,16 @@ def init_db():
             created_at TEXT NOT NULL
         )
     """)
-    conn.commit()
-    conn.close()
 
 
 def get_token(telegram_id: int) -> Optional[str]:
     """Получает действующий токен риэлтора."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute(
+    row = db.fetchone(
+        DB_PATH,
         "SELECT token, expires_at FROM rclick_tokens WHERE telegram_id = ?",
         (telegram_id,)
     )
-    row = cursor.fetchone()
-    conn.close()
     
     if not row:
         return None
@@ -64,31 +58,22 @@ def get_token(telegram_id: int) -> Optional[str]:
 def save_token(telegram_id: int, phone: str, token: str, agent_name: str = ""):
     """Сохраняет токен риэлтора."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
     
     # Токен действует ~100 дней
     expires_at = (datetime.now() + timedelta(days=90)).isoformat()
     created_at = datetime.now().isoformat()
     
-    cursor.execute("""
+    db.execute(DB_PATH, """
         INSERT OR REPLACE INTO rclick_tokens 
         (telegram_id, phone, token, agent_name, expires_at, created_at)
         VALUES (?, ?, ?, ?, ?, ?)
     """, (telegram_id, phone, token, agent_name, expires_at, created_at))
-    
-    conn.commit()
-    conn.close()
 
 
 def delete_token(telegram_id: int):
     """Удаляет токен риэлтора."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM rclick_tokens WHERE telegram_id = ?", (telegram_id,))
-    conn.commit()
-    conn.close()
+    db.execute(DB_PATH, "DELETE FROM rclick_tokens WHERE telegram_id = ?", (telegram_id,))
 
 
 def login_rclick(phone: str, password: str) -> Dict[str, Any]:
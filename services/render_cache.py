@@ -0,0 +1,240 @@
+"""
+Кеш отрендеренных документов на диске (КП в PDF и т.п.).
+
+wkhtmltopdf рендерит КП 1–4 секунды, хотя результат зависит только от
+данных лота, режима и шаблона. Ключ кеша — хеш всех входных данных
+рендера (render_key), поэтому устаревших записей не бывает: изменилась
+цена или шаблон — это другой ключ, старый файл просто перестаёт
+запрашиваться и вытесняется.
+
+- get_or_render: файл есть — байты с диска, нет — рендер и запись
+  (атомарно, через .tmp); одинаковые запросы, пришедшие одновременно,
+  ждут один рендер
+- вытеснение: записи без обращений дольше RENDER_CACHE_MAX_AGE и давно
+  не нужные сверх RENDER_CACHE_MAX_MB (LRU по mtime, он обновляется
+  при каждом попадании)
+- invalidate(namespace, tag): сразу удалить файлы лота (tag — в имени
+  файла), например по ленте изменений services/unit_history.py
+
+    key = render_cache.render_key(lot, mode, template_version)
+    pdf = render_cache.get_or_render("kp", key, lambda: html_to_pdf(...), tag="B708-1")
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config.settings import RENDER_CACHE_DIR, RENDER_CACHE_MAX_AGE, RENDER_CACHE_MAX_MB
+from services.logger import get_logger
+
+
+log = get_logger("render_cache")
+
+_TAG_SEPARATOR = "--"
+_UNSAFE = re.compile(r"[^\w-]+")
+
+# Путь -> (размер, время последнего обращения); строится сканированием папки
+_index: Optional[Dict[str, Tuple[int, float]]] = None
+_inflight: Dict[str, "_Flight"] = {}
+_lock = threading.Lock()
+
+_stats = {"hits": 0, "misses": 0, "shared": 0, "renders_ms": 0, "evicted": 0, "invalidated": 0, "write_errors": 0}
+
+
+class _Flight:
+    """Рендер, который уже идёт: остальные запросы того же ключа ждут его."""
+
+    __slots__ = ("done", "data", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+def render_key(*parts: Any) -> str:
+    """Хеш входных данных рендера (словари — с сортировкой ключей)."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _safe_tag(tag: str) -> str:
+    return _UNSAFE.sub("_", tag).strip("_")
+
+
+def _path(namespace: str, key: str, tag: str, suffix: str) -> str:
+    name = f"{_safe_tag(tag)}{_TAG_SEPARATOR}{key}{suffix}" if tag else f"{key}{suffix}"
+    return os.path.join(RENDER_CACHE_DIR, namespace, name)
+
+
+def _load_index() -> Dict[str, Tuple[int, float]]:
+    """Содержимое кеша на диске (под _lock; один раз за процесс)."""
+    global _index
+    if _index is None:
+        _index = {}
+        if os.path.isdir(RENDER_CACHE_DIR):
+            for namespace in os.scandir(RENDER_CACHE_DIR):
+                if not namespace.is_dir():
+                    continue
+                for entry in os.scandir(namespace.path):
+                    if entry.is_file() and not entry.name.endswith(".tmp"):
+                        st = entry.stat()
+                        _index[entry.path] = (st.st_size, st.st_mtime)
+    return _index
+
+
+def _remove(path: str) -> None:
+    """Удаляет запись (под _lock)."""
+    _load_index().pop(path, None)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log.warning("не удалось удалить файл кеша", path=path, error=repr(e))
+
+
+def _evict() -> None:
+    """Старые записи и самые давно не нужные сверх лимита размера (под _lock)."""
+    index = _load_index()
+    expired_before = time.time() - RENDER_CACHE_MAX_AGE
+    evicted = {path for path, (_, used) in index.items() if used < expired_before}
+
+    limit = RENDER_CACHE_MAX_MB * 1024 * 1024
+    total = sum(size for path, (size, _) in index.items() if path not in evicted)
+    if total > limit:
+        # С запасом до 90% лимита, чтобы не вытеснять на каждой записи
+        for path, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if total <= limit * 0.9:
+                break
+            if path not in evicted:
+                evicted.add(path)
+                total -= size
+
+    for path in evicted:
+        _remove(path)
+    if evicted:
+        _stats["evicted"] += len(evicted)
+        log.info("кеш рендеров: вытеснено", files=len(evicted), total_mb=round(total / 1024 / 1024, 1))
+
+
+def _read(path: str) -> Optional[bytes]:
+    """Байты записи или None (нет, устарела). Обращение продлевает жизнь записи."""
+    with _lock:
+        entry = _load_index().get(path)
+        if entry is None:
+            return None
+        if entry[1] < time.time() - RENDER_CACHE_MAX_AGE:
+            _remove(path)
+            return None
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+    except OSError:
+        with _lock:
+            _load_index().pop(path, None)
+        return None
+    with _lock:
+        _load_index()[path] = (len(data), time.time())
+    return data
+
+
+def _write(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # Без кеша документ всё равно отдаём
+        _stats["write_errors"] += 1
+        log.warning("не удалось записать в кеш рендеров", path=path, error=repr(e))
+        return
+    with _lock:
+        _load_index()[path] = (len(data), time.time())
+        _evict()
+
+
+# ====== API ======
+
+def get_or_render(
+    namespace: str,
+    key: str,
+    render: Callable[[], bytes],
+    tag: str = "",
+    suffix: str = ".pdf",
+) -> bytes:
+    """
+    Документ из кеша или render() с записью в кеш.
+
+    Пока идёт рендер ключа, такие же запросы из других потоков ждут его
+    результат (или его исключение), а не запускают wkhtmltopdf повторно.
+
+    Raises:
+        то же, что render()
+    """
+    path = _path(namespace, key, tag, suffix)
+    data = _read(path)
+    if data is not None:
+        _stats["hits"] += 1
+        return data
+
+    with _lock:
+        flight = _inflight.get(path)
+        leader = flight is None
+        if leader:
+            flight = _inflight[path] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        _stats["shared"] += 1
+        if flight.error is not None:
+            raise flight.error
+        return flight.data
+
+    _stats["misses"] += 1
+    started = time.perf_counter()
+    try:
+        flight.data = render()
+        _stats["renders_ms"] += int((time.perf_counter() - started) * 1000)
+        _write(path, flight.data)
+        return flight.data
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(path, None)
+        flight.done.set()
+
+
+def invalidate(namespace: str, tag: str) -> int:
+    """Удаляет все записи namespace с этим tag. Returns: сколько удалено."""
+    prefix = os.path.join(RENDER_CACHE_DIR, namespace, _safe_tag(tag) + _TAG_SEPARATOR)
+    with _lock:
+        paths = [path for path in _load_index() if path.startswith(prefix)]
+        for path in paths:
+            _remove(path)
+    _stats["invalidated"] += len(paths)
+    return len(paths)
+
+
+def get_render_cache_stats() -> Dict[str, Any]:
+    """Счётчики и размер кеша (для /metrics)."""
+    with _lock:
+        index = _load_index()
+        size = sum(size for size, _ in index.values())
+        files = len(index)
+    return {
+        **_stats,
+        "files": files,
+        "size_mb": round(size / 1024 / 1024, 2),
+        "limit_mb": RENDER_CACHE_MAX_MB,
+        "rendering": len(_inflight),
+    }
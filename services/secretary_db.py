@@ -4,11 +4,12 @@
 Версия 2.0 — без режима секретаря
 """
 
-import sqlite3
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 
+from services import db
+
 BASE_DIR = Path(__file__).parent.parent
 DB_PATH = BASE_DIR / "secretary.db"
 
@@ -25,81 +26,65 @@ def set_secretary_mode(user_id: int, enabled: bool):
     pass
 
 
+TASKS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        task_text TEXT NOT NULL,
+        due_date TEXT,
+        due_time TEXT,
+        client_name TEXT,
+        client_phone TEXT,
+        priority TEXT DEFAULT 'normal',
+        status TEXT DEFAULT 'pending',
+        description TEXT,
+        reminder_sent INTEGER DEFAULT 0,
+        created_at TEXT NOT NULL,
+        completed_at TEXT
+    )
+"""
+
+
 def init_db():
-    """Создаёт таблицу задач."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            task_text TEXT NOT NULL,
-            due_date TEXT,
-            due_time TEXT,
-            client_name TEXT,
-            client_phone TEXT,
-            priority TEXT DEFAULT 'normal',
-            status TEXT DEFAULT 'pending',
-            description TEXT,
-            reminder_sent INTEGER DEFAULT 0,
-            created_at TEXT NOT NULL,
-            completed_at TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    """Создаёт таблицу задач (один раз на процесс, индексы — services/migrations.py)."""
+    db.ensure_schema(DB_PATH, TASKS_SCHEMA)
 
 
 def add_task(user_id, task_text, due_date=None, due_time=None, client_name=None,
              client_phone=None, priority="normal", description=None):
     """Добавляет задачу. Возвращает ID."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("""
+    cursor = db.execute(DB_PATH, """
         INSERT INTO tasks
         (user_id, task_text, due_date, due_time, client_name, client_phone,
          priority, description, created_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (user_id, task_text, due_date, due_time, client_name, client_phone,
           priority, description, datetime.now().isoformat()))
-    task_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return task_id
+    return cursor.lastrowid
 
 
 def get_tasks_for_date(user_id, target_date):
     """Получает задачи на дату (YYYY-MM-DD)."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("""
+    rows = db.fetchall(DB_PATH, """
         SELECT * FROM tasks
         WHERE user_id = ? AND due_date = ? AND status != 'cancelled'
         ORDER BY CASE WHEN due_time IS NULL THEN 1 ELSE 0 END, due_time
-    """, (user_id, target_date))
-    rows = cursor.fetchall()
-    conn.close()
+    """, (user_id, target_date), row=True)
     return [dict(row) for row in rows]
 
 
 def get_tasks_for_week(user_id, start_date):
     """Получает задачи на неделю."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     start = datetime.strptime(start_date, "%Y-%m-%d")
     end = start + timedelta(days=6)
-    cursor.execute("""
+    rows = db.fetchall(DB_PATH, """
         SELECT * FROM tasks
         WHERE user_id = ? AND due_date BETWEEN ? AND ? AND status != 'cancelled'
         ORDER BY due_date, due_time
-    """, (user_id, start_date, end.strftime("%Y-%m-%d")))
-    rows = cursor.fetchall()
-    conn.close()
+    """, (user_id, start_date, end.strftime("%Y-%m-%d")), row=True)
     week = {}
     for i in range(7):
         day = (start + timedelta(days=i)).strftime("%Y-%m-%d")
@@ -114,99 +99,66 @@ def get_tasks_for_week(user_id, start_date):
 def get_task_by_id(task_id):
     """Получает задачу по ID."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tasks WHERE id = ?", (task_id,))
-    row = cursor.fetchone()
-    conn.close()
+    row = db.fetchone(DB_PATH, "SELECT * FROM tasks WHERE id = ?", (task_id,), row=True)
     return dict(row) if row else None
 
 
 def update_task_status(task_id, status):
     """Обновляет статус задачи."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
     completed_at = datetime.now().isoformat() if status == "done" else None
-    cursor.execute("UPDATE tasks SET status = ?, completed_at = ? WHERE id = ?",
-                   (status, completed_at, task_id))
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+    cursor = db.execute(DB_PATH, "UPDATE tasks SET status = ?, completed_at = ? WHERE id = ?",
+                        (status, completed_at, task_id))
+    return cursor.rowcount > 0
 
 
 def update_task_date(task_id, new_date, new_time=None):
     """Переносит задачу."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
     if new_time:
-        cursor.execute("UPDATE tasks SET due_date = ?, due_time = ? WHERE id = ?",
-                       (new_date, new_time, task_id))
+        cursor = db.execute(DB_PATH, "UPDATE tasks SET due_date = ?, due_time = ? WHERE id = ?",
+                            (new_date, new_time, task_id))
     else:
-        cursor.execute("UPDATE tasks SET due_date = ? WHERE id = ?", (new_date, task_id))
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+        cursor = db.execute(DB_PATH, "UPDATE tasks SET due_date = ? WHERE id = ?", (new_date, task_id))
+    return cursor.rowcount > 0
 
 
 def delete_task(task_id):
     """Удаляет задачу."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+    cursor = db.execute(DB_PATH, "DELETE FROM tasks WHERE id = ?", (task_id,))
+    return cursor.rowcount > 0
 
 
 def count_tasks_for_date(user_id, target_date):
     """Считает задачи на дату."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("""
+    row = db.fetchone(DB_PATH, """
         SELECT COUNT(*) as total,
                SUM(CASE WHEN priority IN ('urgent','high') THEN 1 ELSE 0 END) as urgent,
                SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END) as done
         FROM tasks WHERE user_id = ? AND due_date = ? AND status != 'cancelled'
     """, (user_id, target_date))
-    row = cursor.fetchone()
-    conn.close()
     return {"total": row[0] or 0, "urgent": row[1] or 0, "done": row[2] or 0}
 
 
 def get_pending_reminders():
     """Задачи для напоминаний."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     now = datetime.now()
     today = now.strftime("%Y-%m-%d")
     current_hour = now.strftime("%H")
-    cursor.execute("""
+    rows = db.fetchall(DB_PATH, """
         SELECT * FROM tasks
         WHERE due_date = ? AND due_time LIKE ? AND status = 'pending' AND reminder_sent = 0
-    """, (today, f"{current_hour}:%"))
-    rows = cursor.fetchall()
-    conn.close()
+    """, (today, f"{current_hour}:%"), row=True)
     return [dict(row) for row in rows]
 
 
 def mark_reminder_sent(task_id):
     """Отмечает напоминание отправленным."""
     init_db()
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("UPDATE tasks SET reminder_sent = 1 WHERE id = ?", (task_id,))
-    conn.commit()
-    conn.close()
+    db.execute(DB_PATH, "UPDATE tasks SET reminder_sent = 1 WHERE id = ?", (task_id,))
 
 
 init_db()
@@ -231,24 +183,16 @@ TIMEZONES = {
 
 def get_user_timezone(user_id: int) -> int:
     """Возвращает timezone пользователя (по умолчанию 3 = Москва)."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("SELECT timezone FROM users WHERE user_id = ?", (user_id,))
-    row = cursor.fetchone()
-    conn.close()
+    row = db.fetchone(DB_PATH, "SELECT timezone FROM users WHERE user_id = ?", (user_id,))
     return row[0] if row else 3
 
 
 def set_user_timezone(user_id: int, timezone: int) -> bool:
     """Устанавливает timezone пользователя."""
-    conn = sqlite3.connect(str(DB_PATH))
-    cursor = conn.cursor()
-    cursor.execute("""
+    db.execute(DB_PATH, """
         INSERT INTO users (user_id, timezone) VALUES (?, ?)
         ON CONFLICT(user_id) DO UPDATE SET timezone = ?
     """, (user_id, timezone, timezone))
-    conn.commit()
-    conn.close()
     return True
 
 
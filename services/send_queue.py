@@ -0,0 +1,275 @@
+"""
+Диспетчер исходящих сообщений Telegram с учётом лимитов.
+
+- Глобальный token bucket (~30 сообщений/сек на бота)
+- Token bucket на каждый чат (~1 сообщение/сек в личке, 20/мин в группах)
+- Приоритеты: интерактивные ответы идут раньше уведомлений и рассылок
+- Автоматический повтор после 429 с учётом retry_after
+
+Приоритет задаётся через контекст (contextvar), поэтому сигнатуры
+send_* функций не меняются:
+
+    with send_priority(PRIORITY_BROADCAST):
+        await send_message(chat_id, text)
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config.settings import (
+    TG_GLOBAL_RATE,
+    TG_CHAT_RATE,
+    TG_CHAT_BURST,
+    TG_GROUP_RATE_PER_MIN,
+    TG_GROUP_BURST,
+    TG_MAX_RETRIES,
+)
+from services.logger import get_logger
+
+
+log = get_logger("send_queue")
+
+
+# ====== Приоритеты ======
+
+PRIORITY_INTERACTIVE = 0  # Ответы пользователю на его действие
+PRIORITY_NOTIFY = 1       # Уведомления менеджерам, напоминания
+PRIORITY_BROADCAST = 2    # Массовые рассылки
+
+_priority: ContextVar[int] = ContextVar("tg_send_priority", default=PRIORITY_INTERACTIVE)
+
+# Методы, которые считаются отправкой сообщения в чат
+RATE_LIMITED_METHODS = {
+    "sendMessage",
+    "sendDocument",
+    "sendPhoto",
+    "sendVideo",
+    "sendMediaGroup",
+    "editMessageText",
+}
+
+# Сколько держим bucket неактивного чата
+_CHAT_IDLE_TTL = 600
+
+
+def set_send_priority(priority: int) -> None:
+    """Устанавливает приоритет отправки для текущей задачи."""
+    _priority.set(priority)
+
+
+@contextmanager
+def send_priority(priority: int):
+    """Временно меняет приоритет отправки в блоке with."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+# ====== Token bucket ======
+
+class TokenBucket:
+    """Простой token bucket: rate токенов/сек, не больше capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> float:
+        """
+        Пытается забрать токен.
+
+        Returns:
+            0 — токен забран; иначе сколько секунд подождать до следующей попытки
+        """
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def block(self, seconds: float) -> None:
+        """Запрещает выдачу токенов на seconds (после 429)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class PriorityLimiter:
+    """Глобальный лимитер: выдаёт слоты сначала по приоритету, затем по очереди."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.bucket = TokenBucket(rate, capacity)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int) -> None:
+        """Ждёт глобальный слот на отправку."""
+        if not self._waiters and self.bucket.try_take() == 0:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self) -> None:
+        while self._waiters:
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+                continue
+
+            wait = self.bucket.try_take()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Ожидающий отменён — возвращаем токен
+                self.bucket.tokens += 1
+                continue
+            future.set_result(None)
+
+
+class _ChatSlot:
+    """Состояние отправки в один чат: порядок (lock) и лимит (bucket)."""
+
+    def __init__(self, chat_id: Any):
+        if _is_group(chat_id):
+            self.bucket = TokenBucket(TG_GROUP_RATE_PER_MIN / 60.0, TG_GROUP_BURST)
+        else:
+            self.bucket = TokenBucket(TG_CHAT_RATE, TG_CHAT_BURST)
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+def _is_group(chat_id: Any) -> bool:
+    """Группы и каналы в Telegram имеют отрицательный chat_id (или @username)."""
+    if isinstance(chat_id, str):
+        return chat_id.startswith("@") or chat_id.startswith("-")
+    return isinstance(chat_id, int) and chat_id < 0
+
+
+# ====== Диспетчер ======
+
+_global = PriorityLimiter(TG_GLOBAL_RATE, TG_GLOBAL_RATE)
+_chats: Dict[Any, _ChatSlot] = {}
+
+_stats = {
+    "sent": 0,
+    "failed": 0,
+    "throttled": 0,
+    "in_flight": 0,
+}
+
+
+def _get_chat_slot(chat_id: Any) -> _ChatSlot:
+    slot = _chats.get(chat_id)
+    if slot is None:
+        _prune_idle_chats()
+        slot = _ChatSlot(chat_id)
+        _chats[chat_id] = slot
+    slot.last_used = time.monotonic()
+    return slot
+
+
+def _prune_idle_chats() -> None:
+    """Удаляет состояние давно неактивных чатов."""
+    if len(_chats) < 1000:
+        return
+    now = time.monotonic()
+    for chat_id, slot in list(_chats.items()):
+        if now - slot.last_used > _CHAT_IDLE_TTL and not slot.lock.locked():
+            del _chats[chat_id]
+
+
+def _retry_after(result: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Извлекает retry_after из ответа 429."""
+    if not result or result.get("error_code") != 429:
+        return None
+    params = result.get("parameters") or {}
+    return float(params.get("retry_after", 1))
+
+
+async def dispatch(
+    chat_id: Any,
+    request: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    priority: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Отправляет запрос в чат с соблюдением лимитов.
+
+    Args:
+        chat_id: Чат-получатель (для per-chat лимита и порядка)
+        request: Корутина-фабрика, выполняющая сам HTTP-вызов
+        priority: Приоритет (по умолчанию — из контекста)
+
+    Returns:
+        Ответ Bot API (последней попытки)
+    """
+    if priority is None:
+        priority = _priority.get()
+
+    slot = _get_chat_slot(chat_id)
+    _stats["in_flight"] += 1
+
+    try:
+        # Lock сохраняет порядок сообщений внутри чата
+        async with slot.lock:
+            result = None
+            for attempt in range(TG_MAX_RETRIES + 1):
+                wait = slot.bucket.try_take()
+                while wait > 0:
+                    await asyncio.sleep(wait)
+                    wait = slot.bucket.try_take()
+
+                await _global.acquire(priority)
+                result = await request()
+
+                retry_after = _retry_after(result)
+                if retry_after is None:
+                    break
+
+                _stats["throttled"] += 1
+                log.warning("429", chat_id=chat_id, retry_after=retry_after, attempt=attempt + 1)
+                slot.bucket.block(retry_after)
+
+            if result and result.get("ok"):
+                _stats["sent"] += 1
+            else:
+                _stats["failed"] += 1
+            return result
+    finally:
+        slot.last_used = time.monotonic()
+        _stats["in_flight"] -= 1
+
+
+def get_queue_stats() -> Dict[str, int]:
+    """Статистика диспетчера для мониторинга."""
+    return {
+        **_stats,
+        "waiting_global": len(_global),
+        "chats": len(_chats),
+    }
@@ -1,15 +1,48 @@
 """
 Сервис отправки сообщений в Telegram.
+
+Все вызовы Bot API идут через одну долгоживущую aiohttp-сессию
+с общим пулом keep-alive соединений (см. get_session), отправка
+сообщений — через диспетчер лимитов services.send_queue.
+
+Файлы (send_document, send_photo, send_media_group) принимаются как путь,
+bytes/memoryview или файловый объект (BytesIO из генераторов документов,
+см. services/doc_output.py) — multipart собирается прямо из памяти.
 """
 
 import os
 import json
 import asyncio
-from typing import Dict, Any, List, Optional
+import hashlib
+import io
+import mimetypes
+import threading
+import time
+from typing import Dict, Any, BinaryIO, List, Optional, Tuple, Union
+
+import aiohttp
+
+from config.settings import (
+    TELEGRAM_BOT_TOKEN,
+    TG_API,
+    TG_POOL_SIZE,
+    TG_CONNECT_TIMEOUT,
+    TG_REQUEST_TIMEOUT,
+    TG_KEEPALIVE_TIMEOUT,
+    TG_FILE_ID_CACHE_PATH,
+)
+from services.send_queue import RATE_LIMITED_METHODS, dispatch
+from services import webhook_reply
+from services.logger import get_logger
+
 
-import requests
+log = get_logger("tg")
 
-from config.settings import TELEGRAM_BOT_TOKEN, TG_API
+
+# ====== Общий клиент Bot API ======
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
 
 
 def get_token() -> str:
@@ -17,6 +50,426 @@ def get_token() -> str:
     return TELEGRAM_BOT_TOKEN or os.getenv("TELEGRAM_TOKEN", "")
 
 
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Возвращает общую aiohttp-сессию для Bot API.
+
+    Сессия создаётся лениво в текущем event loop и переиспользуется
+    всеми вызовами: TCP+TLS соединения держатся в пуле (keep-alive).
+    """
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=TG_POOL_SIZE,
+            keepalive_timeout=TG_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=TG_REQUEST_TIMEOUT, connect=TG_CONNECT_TIMEOUT),
+        )
+        _session_loop = loop
+        log.info("сессия Bot API создана", pool=TG_POOL_SIZE)
+
+    return _session
+
+
+async def close_session() -> None:
+    """Закрывает общую сессию (при остановке приложения)."""
+    global _session, _session_loop
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+def _form_value(value: Any) -> str:
+    """Приводит значение параметра к строке для multipart-формы."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+async def api_request(
+    method: str,
+    payload: Optional[Dict[str, Any]] = None,
+    files: Optional[Dict[str, Tuple[str, Any, Optional[str]]]] = None,
+    timeout: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Вызывает метод Bot API через общий пул соединений.
+
+    Отправка сообщений в чат (sendMessage, sendDocument, ...) проходит
+    через диспетчер services.send_queue: лимиты, приоритеты, retry_after.
+
+    Args:
+        method: Имя метода (sendMessage, sendDocument, ...)
+        payload: Параметры метода
+        files: {поле: (имя файла, путь / bytes / файловый объект, content-type)} для multipart
+        timeout: Общий таймаут запроса в секундах
+
+    Returns:
+        JSON-ответ Telegram ({"ok": ..., ...}) или None при сетевой ошибке
+    """
+    chat_id = (payload or {}).get("chat_id")
+    if method in RATE_LIMITED_METHODS and chat_id is not None:
+        return await dispatch(chat_id, lambda: _request(method, payload, files, timeout))
+
+    return await _request(method, payload, files, timeout)
+
+
+async def _request(
+    method: str,
+    payload: Optional[Dict[str, Any]] = None,
+    files: Optional[Dict[str, Tuple[str, Any, Optional[str]]]] = None,
+    timeout: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """Один HTTP-вызов Bot API без очереди."""
+    token = get_token()
+    if not token:
+        log.error("TELEGRAM_BOT_TOKEN не задан")
+        return None
+
+    url = f"https://api.telegram.org/bot{token}/{method}"
+    request_timeout = aiohttp.ClientTimeout(
+        total=timeout or TG_REQUEST_TIMEOUT,
+        connect=TG_CONNECT_TIMEOUT,
+    )
+
+    chat_id = (payload or {}).get("chat_id")
+    started = time.monotonic()
+    # Файлы по пути открываются на каждую попытку: aiohttp закрывает
+    # файл после отправки, а при повторе после 429 он нужен снова
+    opened = []
+    try:
+        if files:
+            form = aiohttp.FormData()
+            for key, value in (payload or {}).items():
+                if value is not None:
+                    form.add_field(key, _form_value(value))
+            for field, (filename, fileobj, content_type) in files.items():
+                if _is_path(fileobj):
+                    fileobj = open(fileobj, "rb")
+                    opened.append(fileobj)
+                elif hasattr(fileobj, "seek"):
+                    fileobj.seek(0)
+                form.add_field(field, fileobj, filename=filename, content_type=content_type)
+            body: Dict[str, Any] = {"data": form}
+        else:
+            body = {"json": payload or {}}
+
+        session = await get_session()
+        async with session.post(url, timeout=request_timeout, **body) as resp:
+            try:
+                result = await resp.json(content_type=None)
+            except Exception:
+                result = {"ok": False, "error_code": resp.status, "description": await resp.text()}
+    except Exception as e:
+        log.error("ошибка запроса", method=method, chat_id=chat_id, error=repr(e))
+        return None
+    finally:
+        for f in opened:
+            f.close()
+
+    log.debug(
+        method,
+        chat_id=chat_id,
+        ms=int((time.monotonic() - started) * 1000),
+        ok=bool(result.get("ok")),
+        payload=payload,
+        response=result,
+    )
+    return result
+
+
+def _is_ok(result: Optional[Dict[str, Any]], what: str, chat_id: Any = None) -> bool:
+    """Проверяет ответ Bot API и логирует ошибку."""
+    if result and result.get("ok"):
+        return True
+    if result is not None:
+        log.warning(
+            f"ошибка {what}",
+            chat_id=chat_id,
+            error_code=result.get("error_code"),
+            description=result.get("description"),
+        )
+    return False
+
+
+# ====== Кеш file_id ======
+#
+# Telegram возвращает file_id на каждый загруженный файл, и повторная
+# отправка по file_id — это маленький JSON-запрос без загрузки байтов.
+# Ключ кеша: id бота + тип (document/video/photo) + sha256 содержимого,
+# поэтому перегенерированный файл с теми же байтами тоже попадает в кеш.
+
+_file_ids: Optional[Dict[str, str]] = None
+# (путь, размер, mtime) -> sha256, чтобы не хешировать неизменённый файл повторно
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+# Изменения кеша копятся в памяти и пишутся на диск пачкой
+FILE_ID_SAVE_DELAY = 5.0  # сек
+_file_ids_dirty = False
+_save_task: Optional[asyncio.Task] = None
+_save_lock = threading.Lock()
+
+
+def _load_file_ids() -> Dict[str, str]:
+    global _file_ids
+    if _file_ids is None:
+        try:
+            with open(TG_FILE_ID_CACHE_PATH, "r", encoding="utf-8") as f:
+                _file_ids = json.load(f)
+        except FileNotFoundError:
+            _file_ids = {}
+        except Exception as e:
+            log.warning("кеш file_id повреждён, начинаю заново", error=repr(e))
+            _file_ids = {}
+    return _file_ids
+
+
+def _save_file_ids(file_ids: Dict[str, str]) -> None:
+    """Атомарно сохраняет кеш file_id на диск (в потоке, не в event loop)."""
+    tmp_path = f"{TG_FILE_ID_CACHE_PATH}.tmp"
+    with _save_lock:
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(file_ids, f)
+            os.replace(tmp_path, TG_FILE_ID_CACHE_PATH)
+        except Exception as e:
+            log.warning("не удалось сохранить кеш file_id", error=repr(e))
+
+
+async def _save_file_ids_later() -> None:
+    global _save_task
+    try:
+        await asyncio.sleep(FILE_ID_SAVE_DELAY)
+        await flush_file_ids()
+    finally:
+        if _save_task is asyncio.current_task():
+            _save_task = None
+    # Изменения, пришедшие во время записи, — следующей пачкой
+    if _file_ids_dirty:
+        _mark_file_ids_dirty()
+
+
+def _mark_file_ids_dirty() -> None:
+    """Кеш изменился: запись на диск — одна на пачку загрузок, через FILE_ID_SAVE_DELAY."""
+    global _file_ids_dirty, _save_task
+    _file_ids_dirty = True
+    if _save_task is not None and not _save_task.done():
+        return
+    try:
+        _save_task = asyncio.get_running_loop().create_task(_save_file_ids_later())
+    except RuntimeError:
+        # Вызов не из event loop — пишем сразу
+        _file_ids_dirty = False
+        _save_file_ids(dict(_file_ids))
+
+
+async def flush_file_ids() -> None:
+    """Сохраняет несохранённые изменения кеша file_id (и при остановке приложения)."""
+    global _file_ids_dirty
+    if not _file_ids_dirty:
+        return
+    _file_ids_dirty = False
+    # Снимок — в event loop, где меняется словарь; запись — в потоке
+    await asyncio.to_thread(_save_file_ids, dict(_file_ids))
+
+
+# ====== Источники файлов ======
+
+# Путь, содержимое в памяти или файловый объект (BytesIO, открытый файл)
+FileSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# Буферы больше этого хешируются не в event loop
+_HASH_INLINE_MAX = 1024 * 1024
+
+
+def _is_path(source: FileSource) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def _source_name(source: FileSource, default: str) -> str:
+    """Имя файла для Telegram: basename пути или атрибут name буфера."""
+    if _is_path(source):
+        return os.path.basename(source)
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and name:
+        return os.path.basename(name)
+    return default
+
+
+def _source_exists(chat_id: Any, source: FileSource) -> bool:
+    """Проверяет, что файл по пути существует (буферы — всегда True)."""
+    if _is_path(source) and not os.path.exists(source):
+        log.warning("файл не найден", chat_id=chat_id, path=os.fspath(source))
+        return False
+    return True
+
+
+def _read_all(source: BinaryIO) -> bytes:
+    """Всё содержимое файлового объекта (позиция сохраняется)."""
+    position = source.tell()
+    source.seek(0)
+    try:
+        return source.read()
+    finally:
+        source.seek(position)
+
+
+async def _upload_value(source: FileSource) -> Any:
+    """
+    Значение для multipart.
+
+    Путь отдаётся как есть — _request открывает файл на каждую попытку.
+    Файловые объекты отдаются содержимым: aiohttp закрывает их после
+    отправки, а при повторе после 429 они нужны снова. BytesIO — через
+    getvalue() без копирования, остальные читаются не в event loop.
+    Поток без seek повторить нельзя — отдаётся как есть.
+    """
+    if isinstance(source, io.BytesIO):
+        return source.getvalue()
+    if not _is_path(source) and hasattr(source, "seekable") and source.seekable():
+        return await asyncio.to_thread(_read_all, source)
+    return source
+
+
+def _hash_file(filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_buffer(source: FileSource) -> Optional[str]:
+    """sha256 буфера или файлового объекта (None — поток без seek)."""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, io.BytesIO):
+        with source.getbuffer() as view:
+            digest.update(view)
+    elif hasattr(source, "seekable") and source.seekable():
+        position = source.tell()
+        source.seek(0)
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+        source.seek(position)
+    else:
+        return None
+    return digest.hexdigest()
+
+
+def _buffer_size(source: FileSource) -> Optional[int]:
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if isinstance(source, memoryview):
+        return source.nbytes
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer().nbytes
+    return None
+
+
+async def _file_cache_key(kind: str, source: FileSource) -> Optional[str]:
+    """Ключ кеша file_id для файла (None, если содержимое не прочитать)."""
+    loop = asyncio.get_running_loop()
+    if _is_path(source):
+        filepath = os.fspath(source)
+        try:
+            st = os.stat(filepath)
+            stat_key = (filepath, st.st_size, st.st_mtime_ns)
+            file_hash = _file_hashes.get(stat_key)
+            if file_hash is None:
+                # Большие видео хешируются не в event loop
+                file_hash = await loop.run_in_executor(None, _hash_file, filepath)
+                _file_hashes[stat_key] = file_hash
+        except OSError as e:
+            log.warning("не удалось прочитать файл", path=filepath, error=repr(e))
+            return None
+    else:
+        size = _buffer_size(source)
+        if size is not None and size <= _HASH_INLINE_MAX:
+            file_hash = _hash_buffer(source)
+        else:
+            file_hash = await loop.run_in_executor(None, _hash_buffer, source)
+        if file_hash is None:
+            return None
+
+    bot_id = get_token().split(":", 1)[0]
+    return f"{bot_id}:{kind}:{file_hash}"
+
+
+def _extract_file_id(kind: str, message: Dict[str, Any]) -> Optional[str]:
+    """Достаёт file_id из отправленного сообщения."""
+    if kind == "photo":
+        sizes = message.get("photo") or []
+        return sizes[-1]["file_id"] if sizes else None
+    # Видео, которое Telegram не смог обработать, приходит как document
+    media = message.get(kind) or message.get("document") or {}
+    return media.get("file_id")
+
+
+def _remember_file_id(key: Optional[str], kind: str, result: Optional[Dict[str, Any]]) -> None:
+    if not key or not result or not result.get("ok"):
+        return
+    file_id = _extract_file_id(kind, result.get("result") or {})
+    if file_id:
+        _load_file_ids()[key] = file_id
+        _mark_file_ids_dirty()
+
+
+def _forget_file_id(key: str) -> None:
+    if _load_file_ids().pop(key, None) is not None:
+        _mark_file_ids_dirty()
+
+
+async def _send_file(
+    method: str,
+    kind: str,
+    source: FileSource,
+    data: Dict[str, Any],
+    content_type: Optional[str],
+    timeout: float,
+    filename: str,
+) -> Optional[Dict[str, Any]]:
+    """
+    Отправляет файл: по file_id из кеша, если он есть, иначе загрузкой
+    (с диска или прямо из буфера).
+    """
+    key = await _file_cache_key(kind, source)
+    file_id = _load_file_ids().get(key) if key else None
+
+    if file_id:
+        result = await api_request(method, {**data, kind: file_id})
+        if result and result.get("ok"):
+            log.info(f"{method} (file_id из кеша)", chat_id=data.get("chat_id"), file=filename)
+            return result
+        if result is None:
+            return None
+        # file_id больше не принимается — загружаем файл заново
+        log.info("file_id отклонён, загружаю файл", chat_id=data.get("chat_id"), description=result.get("description"))
+        _forget_file_id(key)
+
+    result = await api_request(
+        method,
+        data,
+        files={kind: (filename, await _upload_value(source), content_type)},
+        timeout=timeout,
+    )
+
+    _remember_file_id(key, kind, result)
+    return result
+
+
+# ====== Сообщения ======
+
 async def send_message(
     chat_id: int,
     text: str,
@@ -26,23 +479,16 @@ async def send_message(
     disable_web_page_preview: bool = False,
 ) -> bool:
     """Отправляет сообщение в Telegram."""
-    token = get_token()
-    if not token:
-        print("⚠️ TELEGRAM_BOT_TOKEN не задан")
-        return False
-    
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    
     payload: Dict[str, Any] = {
         "chat_id": chat_id,
         "text": text,
         "parse_mode": parse_mode,
         "disable_web_page_preview": disable_web_page_preview,
     }
-    
+
     if with_keyboard and buttons:
         reply_markup: Dict[str, Any] = {"resize_keyboard": True}
-        
+
         keyboard_rows = []
         for row in buttons:
             keyboard_row = []
@@ -52,28 +498,17 @@ async def send_message(
                 else:
                     keyboard_row.append({"text": button})
             keyboard_rows.append(keyboard_row)
-        
+
         reply_markup["keyboard"] = keyboard_rows
         payload["reply_markup"] = json.dumps(reply_markup)
     elif with_keyboard:
         payload["reply_markup"] = json.dumps({"resize_keyboard": True})
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                r = requests.post(url, json=payload, timeout=10)
-                r.raise_for_status()
-                return True
-            except Exception as e:
-                print(f"⚠️ Ошибка отправки в Telegram: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"⚠️ Общая ошибка в send_message: {e}")
-        return False
+
+    if await webhook_reply.capture("sendMessage", payload):
+        return True
+
+    result = await api_request("sendMessage", payload)
+    return _is_ok(result, "отправки в Telegram", chat_id)
 
 
 async def send_message_inline(
@@ -84,91 +519,99 @@ async def send_message_inline(
     disable_web_page_preview: bool = False,
 ) -> bool:
     """Отправляет сообщение с inline-кнопками."""
-    token = get_token()
-    if not token:
-        print("⚠️ TELEGRAM_BOT_TOKEN не задан")
-        return False
-    
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    
     payload: Dict[str, Any] = {
         "chat_id": chat_id,
         "text": text,
         "parse_mode": parse_mode,
         "disable_web_page_preview": disable_web_page_preview,
     }
-    
+
     if inline_buttons:
         reply_markup = {"inline_keyboard": inline_buttons}
         payload["reply_markup"] = json.dumps(reply_markup)
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                r = requests.post(url, json=payload, timeout=10)
-                r.raise_for_status()
-                return True
-            except Exception as e:
-                print(f"⚠️ Ошибка отправки inline в Telegram: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"⚠️ Общая ошибка в send_message_inline: {e}")
-        return False
+
+    if await webhook_reply.capture("sendMessage", payload):
+        return True
+
+    result = await api_request("sendMessage", payload)
+    return _is_ok(result, "отправки inline в Telegram", chat_id)
 
 
+# ====== Файлы ======
+
 async def send_document(
     chat_id: int,
-    filepath: str,
+    filepath: FileSource,
     caption: Optional[str] = None,
+    filename: Optional[str] = None,
 ) -> bool:
-    """Отправляет документ (PDF и т.д.)."""
-    token = get_token()
-    if not token:
-        print("⚠️ TELEGRAM_BOT_TOKEN не задан")
-        return False
-    
-    if not os.path.exists(filepath):
-        print(f"⚠️ Файл не найден: {filepath}")
+    """
+    Отправляет документ (PDF, XLSX и т.д.).
+
+    Args:
+        filepath: Путь, bytes/memoryview или файловый объект (BytesIO)
+        filename: Имя файла в чате (по умолчанию — из пути или buf.name)
+    """
+    if not _source_exists(chat_id, filepath):
         return False
-    
-    url = f"https://api.telegram.org/bot{token}/sendDocument"
-    filename = os.path.basename(filepath)
-    
+
+    filename = filename or _source_name(filepath, "document.pdf")
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    data: Dict[str, Any] = {"chat_id": chat_id}
+    if caption:
+        data["caption"] = caption
+        data["parse_mode"] = "HTML"
+
+    result = await _send_file("sendDocument", "document", filepath, data, content_type, 120, filename)
+
+    ok = _is_ok(result, "отправки документа", chat_id)
+    if ok:
+        log.info("sendDocument ok", chat_id=chat_id, file=filename)
+    return ok
+
+
+_video_sizes: Dict[Tuple[str, int, int], Tuple[Optional[int], Optional[int]]] = {}
+
+
+async def _probe_video_size(filepath: str) -> Tuple[Optional[int], Optional[int]]:
+    """Получает размеры видео через ffprobe (без блокировки event loop)."""
     try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                with open(filepath, "rb") as f:
-                    data = {"chat_id": chat_id}
-                    if caption:
-                        data["caption"] = caption
-                        data["parse_mode"] = "HTML"
-                    
-                    r = requests.post(
-                        url,
-                        data=data,
-                        files={"document": (filename, f, "application/pdf")},
-                        timeout=120,
-                    )
-                    r.raise_for_status()
-                    print(f"[TG] sendDocument {filename} status={r.status_code}")
-                    return True
-            except Exception as e:
-                print(f"⚠️ Ошибка отправки документа: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"⚠️ Общая ошибка в send_document: {e}")
-        return False
+        st = os.stat(filepath)
+        stat_key = (filepath, st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None, None
 
+    if stat_key not in _video_sizes:
+        _video_sizes[stat_key] = await _run_ffprobe(filepath)
+    return _video_sizes[stat_key]
 
 
+async def _run_ffprobe(filepath: str) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height", "-of", "csv=p=0", filepath,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+        output = stdout.decode().strip()
+        if proc.returncode == 0 and output:
+            parts = output.split(',')
+            if len(parts) == 2:
+                width, height = int(parts[0]), int(parts[1])
+                log.debug("размеры видео", path=filepath, width=width, height=height)
+                return width, height
+    except Exception as e:
+        log.warning("ffprobe: ошибка, продолжаем без размеров", path=filepath, error=repr(e))
+
+    return None, None
+
 
 async def send_video(
     chat_id: int,
@@ -176,317 +619,196 @@ async def send_video(
     caption: Optional[str] = None,
 ) -> bool:
     """Отправляет видео с превью в чате."""
-    token = get_token()
-    if not token:
-        print("⚠️ TELEGRAM_BOT_TOKEN не задан")
-        return False
-    
     if not os.path.exists(filepath):
-        print(f"⚠️ Файл не найден: {filepath}")
+        log.warning("файл не найден", chat_id=chat_id, path=filepath)
         return False
-    
-    url = f"https://api.telegram.org/bot{token}/sendVideo"
+
     filename = os.path.basename(filepath)
-    
+
     # Получаем размеры видео через ffprobe
-    width, height = None, None
-    try:
-        import subprocess
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-select_streams", "v:0",
-             "-show_entries", "stream=width,height", "-of", "csv=p=0", filepath],
-            capture_output=True, text=True, timeout=10
-        )
-        if result.returncode == 0 and result.stdout.strip():
-            parts = result.stdout.strip().split(',')
-            if len(parts) == 2:
-                width, height = int(parts[0]), int(parts[1])
-                print(f"[TG] Video dimensions: {width}x{height}")
-    except Exception as e:
-        print(f"⚠️ ffprobe error (продолжаем без размеров): {e}")
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                with open(filepath, "rb") as f:
-                    data = {"chat_id": chat_id, "supports_streaming": True}
-                    if caption:
-                        data["caption"] = caption
-                        data["parse_mode"] = "HTML"
-                    if width and height:
-                        data["width"] = width
-                        data["height"] = height
-                    
-                    r = requests.post(
-                        url,
-                        data=data,
-                        files={"video": (filename, f)},
-                        timeout=300,
-                    )
-                    r.raise_for_status()
-                    print(f"[TG] sendVideo {filename} status={r.status_code}")
-                    return True
-            except Exception as e:
-                print(f"⚠️ Ошибка отправки видео: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"⚠️ send_video error: {e}")
-        return False
+    width, height = await _probe_video_size(filepath)
+
+    data: Dict[str, Any] = {"chat_id": chat_id, "supports_streaming": True}
+    if caption:
+        data["caption"] = caption
+        data["parse_mode"] = "HTML"
+    if width and height:
+        data["width"] = width
+        data["height"] = height
+
+    result = await _send_file("sendVideo", "video", filepath, data, None, 300, filename)
+
+    ok = _is_ok(result, "отправки видео", chat_id)
+    if ok:
+        log.info("sendVideo ok", chat_id=chat_id, file=filename)
+    return ok
+
+
 async def answer_callback_query(callback_id: str, text: Optional[str] = None) -> bool:
     """Отвечает на callback query (убирает часики на кнопке)."""
-    token = get_token()
-    if not token:
-        return False
-    
-    url = f"https://api.telegram.org/bot{token}/answerCallbackQuery"
-    
+    if not text and webhook_reply.consume_callback_answer(callback_id):
+        # Уже ответили в теле ответа webhook
+        return True
+
     payload: Dict[str, Any] = {"callback_query_id": callback_id}
     if text:
         payload["text"] = text
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                r = requests.post(url, json=payload, timeout=5)
-                return r.status_code == 200
-            except Exception as e:
-                print(f"[CALLBACK] Error: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception:
-        return False
+
+    result = await api_request("answerCallbackQuery", payload, timeout=5)
+    return bool(result and result.get("ok"))
 
 
 async def send_photo(
     chat_id: int,
-    filepath: str,
+    filepath: FileSource,
     caption: Optional[str] = None,
 ) -> bool:
-    """Отправляет фото (JPG/PNG)."""
-    token = get_token()
-    if not token:
-        print("⚠️ TELEGRAM_BOT_TOKEN не задан")
-        return False
-    
-    if not os.path.exists(filepath):
-        print(f"⚠️ Файл не найден: {filepath}")
-        return False
-    
-    url = f"https://api.telegram.org/bot{token}/sendPhoto"
-    filename = os.path.basename(filepath)
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                with open(filepath, "rb") as f:
-                    data = {"chat_id": chat_id, "parse_mode": "HTML"}
-                    if caption:
-                        data["caption"] = caption
-                    
-                    r = requests.post(
-                        url,
-                        data=data,
-                        files={"photo": (filename, f, "image/jpeg")},
-                        timeout=60,
-                    )
-                    r.raise_for_status()
-                    print(f"[TG] sendPhoto {filename} status={r.status_code}")
-                    return True
-            except Exception as e:
-                print(f"⚠️ Ошибка отправки фото: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"⚠️ Общая ошибка в send_photo: {e}")
+    """Отправляет фото (JPG/PNG): путь, bytes/memoryview или файловый объект."""
+    if not _source_exists(chat_id, filepath):
         return False
 
+    filename = _source_name(filepath, "photo.jpg")
+    data: Dict[str, Any] = {"chat_id": chat_id, "parse_mode": "HTML"}
+    if caption:
+        data["caption"] = caption
+
+    result = await _send_file("sendPhoto", "photo", filepath, data, "image/jpeg", 60, filename)
+
+    ok = _is_ok(result, "отправки фото", chat_id)
+    if ok:
+        log.info("sendPhoto ok", chat_id=chat_id, file=filename)
+    return ok
+
 
 async def send_photo_inline(
     chat_id: int,
-    filepath: str,
+    filepath: FileSource,
     caption: Optional[str] = None,
     inline_buttons: Optional[List[List[Dict[str, str]]]] = None,
 ) -> bool:
     """Отправляет фото с caption и inline-кнопками."""
-    token = get_token()
-    if not token:
-        print("⚠️ TELEGRAM_BOT_TOKEN не задан")
-        return False
-    
-    if not os.path.exists(filepath):
-        print(f"⚠️ Файл не найден: {filepath}")
-        return False
-    
-    url = f"https://api.telegram.org/bot{token}/sendPhoto"
-    filename = os.path.basename(filepath)
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                with open(filepath, "rb") as f:
-                    data = {"chat_id": chat_id, "parse_mode": "HTML"}
-                    if caption:
-                        data["caption"] = caption
-                    if inline_buttons:
-                        reply_markup = {"inline_keyboard": inline_buttons}
-                        data["reply_markup"] = json.dumps(reply_markup)
-                    
-                    r = requests.post(
-                        url,
-                        data=data,
-                        files={"photo": (filename, f, "image/jpeg")},
-                        timeout=60,
-                    )
-                    r.raise_for_status()
-                    print(f"[TG] sendPhoto+inline {filename} status={r.status_code}")
-                    return True
-            except Exception as e:
-                print(f"⚠️ Ошибка отправки фото с кнопками: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"⚠️ Общая ошибка в send_photo_inline: {e}")
+    if not _source_exists(chat_id, filepath):
         return False
 
+    filename = _source_name(filepath, "photo.jpg")
+    data: Dict[str, Any] = {"chat_id": chat_id, "parse_mode": "HTML"}
+    if caption:
+        data["caption"] = caption
+    if inline_buttons:
+        data["reply_markup"] = json.dumps({"inline_keyboard": inline_buttons})
+
+    result = await _send_file("sendPhoto", "photo", filepath, data, "image/jpeg", 60, filename)
+
+    ok = _is_ok(result, "отправки фото с кнопками", chat_id)
+    if ok:
+        log.info("sendPhoto+inline ok", chat_id=chat_id, file=filename)
+    return ok
+
 
 async def send_media_group(
     chat_id: int,
-    filepaths: List[str],
+    filepaths: List[FileSource],
     caption: Optional[str] = None,
 ) -> bool:
-    """Отправляет альбом фото (до 10 штук)."""
-    token = get_token()
-    if not token:
-        print("⚠️ TELEGRAM_BOT_TOKEN не задан")
-        return False
-    
+    """Отправляет альбом фото (до 10 штук): пути, bytes или BytesIO."""
     if not filepaths:
         return False
-    
-    filepaths = filepaths[:10]
-    
-    url = f"https://api.telegram.org/bot{token}/sendMediaGroup"
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                files = {}
-                media = []
-                
-                for i, filepath in enumerate(filepaths):
-                    if not os.path.exists(filepath):
-                        print(f"⚠️ Файл не найден: {filepath}")
-                        continue
-                    
-                    attach_name = f"photo{i}"
-                    files[attach_name] = open(filepath, "rb")
-                    
-                    item = {
-                        "type": "photo",
-                        "media": f"attach://{attach_name}",
-                    }
-                    
-                    if i == 0 and caption:
-                        item["caption"] = caption
-                        item["parse_mode"] = "HTML"
-                    
-                    media.append(item)
-                
-                if not media:
-                    return False
-                
-                data = {
-                    "chat_id": chat_id,
-                    "media": json.dumps(media),
-                }
-                
-                r = requests.post(url, data=data, files=files, timeout=120)
-                
-                for f in files.values():
-                    f.close()
-                
-                r.raise_for_status()
-                print(f"[TG] sendMediaGroup {len(media)} photos, status={r.status_code}")
-                return True
-                
-            except Exception as e:
-                print(f"⚠️ Ошибка отправки альбома: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"⚠️ Общая ошибка в send_media_group: {e}")
+
+    filepaths = [source for source in filepaths[:10] if _source_exists(chat_id, source)]
+    if not filepaths:
         return False
 
+    keys = [await _file_cache_key("photo", p) for p in filepaths]
+    result = await _send_media_group_once(chat_id, filepaths, keys, caption, use_cache=True)
+
+    if result is not None and not result.get("ok") and any(k in _load_file_ids() for k in keys if k):
+        # Один из file_id больше не принимается — загружаем альбом целиком
+        for key in keys:
+            if key:
+                _forget_file_id(key)
+        result = await _send_media_group_once(chat_id, filepaths, keys, caption, use_cache=False)
+
+    ok = _is_ok(result, "отправки альбома", chat_id)
+    if ok:
+        for key, message in zip(keys, result.get("result") or []):
+            if key and key not in _load_file_ids():
+                _remember_file_id(key, "photo", {"ok": True, "result": message})
+        log.info("sendMediaGroup ok", chat_id=chat_id, photos=len(filepaths))
+    return ok
+
+
+async def _send_media_group_once(
+    chat_id: int,
+    filepaths: List[FileSource],
+    keys: List[Optional[str]],
+    caption: Optional[str],
+    use_cache: bool,
+) -> Optional[Dict[str, Any]]:
+    file_ids = _load_file_ids() if use_cache else {}
+    files = {}
+    media = []
+
+    for i, (source, key) in enumerate(zip(filepaths, keys)):
+        file_id = file_ids.get(key) if key else None
+        if file_id:
+            item = {"type": "photo", "media": file_id}
+        else:
+            attach_name = f"photo{i}"
+            filename = _source_name(source, f"{attach_name}.jpg")
+            files[attach_name] = (filename, await _upload_value(source), "image/jpeg")
+            item = {"type": "photo", "media": f"attach://{attach_name}"}
+
+        if i == 0 and caption:
+            item["caption"] = caption
+            item["parse_mode"] = "HTML"
+
+        media.append(item)
+
+    return await api_request(
+        "sendMediaGroup",
+        {"chat_id": chat_id, "media": json.dumps(media)},
+        files=files or None,
+        timeout=120,
+    )
+
 
 async def download_file(file_id: str, save_path: str) -> Optional[str]:
     """
     Скачивает файл из Telegram по file_id.
-    
+
     Args:
         file_id: ID файла в Telegram
         save_path: Путь для сохранения файла
-    
+
     Returns:
         Путь к сохранённому файлу или None при ошибке
     """
-    token = get_token()
-    if not token:
-        print("⚠️ TELEGRAM_BOT_TOKEN не задан")
+    # Получаем информацию о файле
+    result = await api_request("getFile", {"file_id": file_id})
+    if not result or not result.get("ok"):
+        log.warning("getFile: ошибка", file_id=file_id, response=result)
         return None
-    
+
+    file_path = result["result"]["file_path"]
+
     try:
-        loop = asyncio.get_event_loop()
-        
-        def _download():
-            try:
-                # Получаем информацию о файле
-                url = f"https://api.telegram.org/bot{token}/getFile"
-                r = requests.post(url, json={"file_id": file_id}, timeout=10)
-                r.raise_for_status()
-                
-                result = r.json()
-                if not result.get("ok"):
-                    print(f"[TG] getFile error: {result}")
-                    return None
-                
-                file_path = result["result"]["file_path"]
-                
-                # Скачиваем файл
-                download_url = f"https://api.telegram.org/file/bot{token}/{file_path}"
-                r = requests.get(download_url, timeout=30)
-                r.raise_for_status()
-                
-                # Сохраняем файл
-                os.makedirs(os.path.dirname(save_path), exist_ok=True)
-                with open(save_path, "wb") as f:
-                    f.write(r.content)
-                
-                print(f"[TG] Downloaded file to {save_path}")
-                return save_path
-                
-            except Exception as e:
-                print(f"⚠️ Ошибка скачивания файла: {e}")
-                return None
-        
-        return await loop.run_in_executor(None, _download)
+        # Скачиваем файл
+        download_url = f"https://api.telegram.org/file/bot{get_token()}/{file_path}"
+        session = await get_session()
+        async with session.get(download_url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+            resp.raise_for_status()
+            content = await resp.read()
+
+        # Сохраняем файл
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with open(save_path, "wb") as f:
+            f.write(content)
+
+        log.info("файл скачан", path=save_path)
+        return save_path
+
     except Exception as e:
-        print(f"⚠️ Общая ошибка в download_file: {e}")
+        log.error("ошибка скачивания файла", file_id=file_id, error=repr(e))
         return None
 
 
@@ -497,35 +819,19 @@ async def send_message_inline_return_id(
     parse_mode: str = "HTML",
 ) -> Optional[int]:
     """Отправляет сообщение с inline-кнопками и возвращает message_id."""
-    token = get_token()
-    if not token:
-        return None
-    
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    
     payload = {
         "chat_id": chat_id,
         "text": text,
         "parse_mode": parse_mode,
     }
-    
+
     if inline_buttons:
         payload["reply_markup"] = json.dumps({"inline_keyboard": inline_buttons})
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            r = requests.post(url, json=payload, timeout=10)
-            r.raise_for_status()
-            return r.json()
-        
-        result = await loop.run_in_executor(None, _post)
-        if result.get("ok"):
-            return result["result"]["message_id"]
-    except Exception as e:
-        print(f"[TG] Error send_message_inline_return_id: {e}")
-    
+
+    result = await api_request("sendMessage", payload)
+    if _is_ok(result, "send_message_inline_return_id", chat_id):
+        return result["result"]["message_id"]
+
     return None
 
 
@@ -537,33 +843,24 @@ async def edit_message_inline(
     parse_mode: str = "HTML",
 ) -> bool:
     """Редактирует сообщение с inline-кнопками."""
-    token = get_token()
-    if not token:
-        return False
-    
-    url = f"https://api.telegram.org/bot{token}/editMessageText"
-    
     payload = {
         "chat_id": chat_id,
         "message_id": message_id,
         "text": text,
         "parse_mode": parse_mode,
     }
-    
+
     if inline_buttons:
         payload["reply_markup"] = json.dumps({"inline_keyboard": inline_buttons})
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            r = requests.post(url, json=payload, timeout=10)
-            return r.status_code == 200
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"[TG] Error edit_message_inline: {e}")
-        return False
+
+    result = await api_request("editMessageText", payload)
+    return bool(result and result.get("ok"))
+
+
+async def delete_message(chat_id: int, message_id: int) -> bool:
+    """Удаляет сообщение (например, «⏳ Создаю...» после отправки документа)."""
+    result = await api_request("deleteMessage", {"chat_id": chat_id, "message_id": message_id})
+    return bool(result and result.get("ok"))
 
 
 async def send_message_keyboard(
@@ -575,38 +872,18 @@ async def send_message_keyboard(
     """
     Отправляет сообщение с ReplyKeyboard (для request_contact и т.д.).
     """
-    token = get_token()
-    if not token:
-        return False
-    
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    
     reply_markup = {
         "keyboard": keyboard,
         "one_time_keyboard": one_time,
         "resize_keyboard": True
     }
-    
+
     payload = {
         "chat_id": chat_id,
         "text": text,
         "parse_mode": "HTML",
         "reply_markup": json.dumps(reply_markup)
     }
-    
-    try:
-        loop = asyncio.get_event_loop()
-        
-        def _post():
-            try:
-                r = requests.post(url, json=payload, timeout=10)
-                r.raise_for_status()
-                return True
-            except Exception as e:
-                print(f"[TG] send_message_keyboard error: {e}")
-                return False
-        
-        return await loop.run_in_executor(None, _post)
-    except Exception as e:
-        print(f"[TG] send_message_keyboard error: {e}")
-        return False
+
+    result = await api_request("sendMessage", payload)
+    return _is_ok(result, "send_message_keyboard", chat_id)
@@ -0,0 +1,199 @@
+"""
+История цен и статусов лотов и лента изменений.
+
+Синхронизация с rclick (services/parser_rclick.py) пишет в unit_changes
+properties.db по строке на каждое изменившееся поле лота — с номером
+синхронизации (units_sync.version) и временем. Отсюда:
+
+- запросы истории: за период, по лоту, по корпусу, по полю
+- лента изменений в процессе бота: когда каталог лотов перечитывает
+  БД (services/units_db.py), новые строки unit_changes рассылаются
+  подписчикам — кеши сбрасывают только затронутое, а не всё
+
+    from services import unit_history
+
+    unit_history.get_changes(since=datetime.now() - timedelta(days=1), field="price_rub")
+    unit_history.get_lot_history("В708")
+    unit_history.subscribe(on_changes)   # on_changes(ChangeBatch)
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+
+from services import db, units_db
+from services.logger import get_logger
+from services.lot_codes import code_variants
+
+
+log = get_logger("unit_history")
+
+TimePoint = Union[datetime, int, float, None]
+
+_COLUMNS = "sync_id, unit_id, field, code, building, old_value, new_value, ts"
+
+_subscribers: List[Callable[["ChangeBatch"], None]] = []
+_last_sync_id: Optional[int] = None
+_last_catalog_version: Optional[int] = None
+_poll_lock = threading.Lock()
+
+
+class ChangeBatch:
+    """Изменения одной или нескольких синхронизаций, попавшие в новую версию каталога."""
+
+    __slots__ = ("catalog_version", "previous_version", "sync_ids", "changes")
+
+    def __init__(self, catalog_version: int, previous_version: Optional[int], changes: List[Dict[str, Any]]):
+        self.catalog_version = catalog_version
+        # Версия каталога до этих изменений: кеш, собранный по ней, можно
+        # обновить частично, по более старой — только целиком
+        self.previous_version = previous_version
+        self.changes = changes
+        self.sync_ids = sorted({c["sync_id"] for c in changes})
+
+    def buildings(self) -> Set[Any]:
+        """Затронутые корпуса (при переносе лота — оба)."""
+        result = {c["building"] for c in self.changes}
+        for c in self.changes:
+            if c["field"] == "building":
+                result.update((c["old_value"], c["new_value"]))
+        return result
+
+    def codes(self) -> Set[str]:
+        return {c["code"] for c in self.changes if c["code"]}
+
+    def fields(self) -> Set[str]:
+        return {c["field"] for c in self.changes}
+
+
+def _timestamp(value: TimePoint) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+def _rows(sql: str, params: tuple) -> List[Dict[str, Any]]:
+    try:
+        rows = db.fetchall(units_db.DB_PATH, sql, params, row=True)
+    except sqlite3.OperationalError as e:
+        # Таблицы ещё нет — синхронизаций с изменениями не было
+        if "no such table" in str(e):
+            return []
+        raise
+    return [dict(row) for row in rows]
+
+
+# ====== Запросы ======
+
+def get_changes(
+    since: TimePoint = None,
+    until: TimePoint = None,
+    code: Optional[str] = None,
+    building: Optional[int] = None,
+    field: Optional[str] = None,
+    limit: int = 500,
+) -> List[Dict[str, Any]]:
+    """
+    Изменения лотов, новые первыми.
+
+    Параметры:
+        since, until: границы по времени (datetime или unix time)
+        code: код лота (кириллица/латиница)
+        building: номер корпуса
+        field: колонка units ("price_rub", "status", ...) или "unit"
+
+    Returns:
+        [{"sync_id", "unit_id", "field", "code", "building",
+          "old_value", "new_value", "ts"}, ...]
+    """
+    where, params = [], []
+    if code:
+        where.append("code IN (?, ?)")
+        params.extend(code_variants(code))
+    if building is not None:
+        where.append("building = ?")
+        params.append(building)
+    if field:
+        where.append("field = ?")
+        params.append(field)
+    if since is not None:
+        where.append("ts >= ?")
+        params.append(_timestamp(since))
+    if until is not None:
+        where.append("ts < ?")
+        params.append(_timestamp(until))
+
+    sql = f"SELECT {_COLUMNS} FROM unit_changes"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY ts DESC, sync_id DESC LIMIT ?"
+    return _rows(sql, (*params, limit))
+
+
+def get_lot_history(code: str, since: TimePoint = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """История одного лота (все корпуса с этим кодом), новые первыми."""
+    return get_changes(since=since, code=code, limit=limit)
+
+
+def get_changes_after(sync_id: int) -> List[Dict[str, Any]]:
+    """Все изменения синхронизаций после sync_id, по порядку."""
+    return _rows(
+        f"SELECT {_COLUMNS} FROM unit_changes WHERE sync_id > ? ORDER BY sync_id, unit_id, field",
+        (sync_id,),
+    )
+
+
+def get_last_sync_id() -> int:
+    try:
+        row = db.fetchone(units_db.DB_PATH, "SELECT COALESCE(MAX(sync_id), 0) FROM unit_changes")
+    except sqlite3.OperationalError:
+        return 0
+    return row[0]
+
+
+# ====== Лента изменений ======
+
+def subscribe(callback: Callable[[ChangeBatch], None]) -> None:
+    """
+    callback(batch) для каждой новой версии каталога с изменениями лотов.
+
+    Вызывается в потоке, перечитавшем каталог; callback должен быть
+    быстрым (сбросить записи кеша), без запросов к сети.
+    """
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+    units_db.add_reload_callback(_on_catalog_reload)
+
+
+def unsubscribe(callback: Callable[[ChangeBatch], None]) -> None:
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def _on_catalog_reload(catalog) -> None:
+    """Каталог перечитан — рассылаем строки unit_changes, которых ещё не видели."""
+    global _last_sync_id, _last_catalog_version
+
+    with _poll_lock:
+        previous_version, _last_catalog_version = _last_catalog_version, catalog.version
+        if _last_sync_id is None:
+            # Первая загрузка: история до старта бота — не новости
+            _last_sync_id = get_last_sync_id()
+            return
+        changes = get_changes_after(_last_sync_id)
+        if not changes:
+            return
+        _last_sync_id = changes[-1]["sync_id"]
+
+    batch = ChangeBatch(catalog.version, previous_version, changes)
+    log.info("изменения лотов", syncs=batch.sync_ids, changes=len(changes),
+             buildings=sorted(b for b in batch.buildings() if b is not None), catalog_version=catalog.version)
+    for callback in list(_subscribers):
+        try:
+            callback(batch)
+        except Exception as e:
+            log.error("ошибка подписчика ленты изменений",
+                      callback=getattr(callback, "__qualname__", repr(callback)), error=repr(e))
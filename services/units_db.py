@@ -3,52 +3,46 @@
 Единый источник данных для расчётов и КП.
 
 v2.1.0 — Все 348 лотов, фильтрация по корпусам/этажам
+v2.2.0 — Каталог в памяти (LotCatalog), перечитывается при изменении БД
+v2.3.0 — Диапазоны через bisect, k ближайших по площади/цене
 """
 
+import os
 import sqlite3
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
+from config.settings import CATALOG_CHECK_INTERVAL
+from services import db
+from services.logger import get_logger
+from services.lot_codes import code_key, code_variants
+
+
+log = get_logger("units_db")
+
 # Путь к БД
 DB_PATH = Path(__file__).parent.parent / "properties.db"
 
-# Таблица транслитерации кириллица ↔ латиница
-CYRILLIC_TO_LATIN = {
-    "А": "A", "В": "B", "Е": "E", "К": "K",
-    "М": "M", "Н": "H", "О": "O", "Р": "P",
-    "С": "S", "Т": "T", "У": "Y", "Х": "X",
-}
-LATIN_TO_CYRILLIC = {v: k for k, v in CYRILLIC_TO_LATIN.items()}
-
 
 def get_db_connection():
-    """Возвращает соединение с БД."""
-    return sqlite3.connect(str(DB_PATH))
+    """Возвращает постоянное соединение с БД (services/db.py, не закрывать)."""
+    return db.get_connection(DB_PATH)
 
 
 def normalize_code(code: str) -> Tuple[str, str]:
     """
-    Нормализует код лота.
-    Возвращает (код_кириллица, код_латиница) для поиска в БД.
+    Нормализует код лота (services/lot_codes.py).
+    Возвращает (код_кириллица, код_латиница).
     
     Примеры:
         "В708" → ("В708", "B708")
         "B708" → ("В708", "B708")
         "в708" → ("В708", "B708")
     """
-    code = code.strip().upper()
-    
-    # Создаём оба варианта
-    code_cyrillic = code
-    code_latin = code
-    
-    for cyr, lat in CYRILLIC_TO_LATIN.items():
-        code_latin = code_latin.replace(cyr, lat)
-    
-    for lat, cyr in LATIN_TO_CYRILLIC.items():
-        code_cyrillic = code_cyrillic.replace(lat, cyr)
-    
-    return code_cyrillic, code_latin
+    return code_variants(code)
 
 
 def parse_floor_query(floor_query: str) -> List[int]:
@@ -86,6 +80,307 @@ def parse_floor_query(floor_query: str) -> List[int]:
             return []
 
 
+# ==================== КАТАЛОГ В ПАМЯТИ ====================
+#
+# Таблица units маленькая (~350 строк) и меняется раз в день (синхронизация
+# с rclick), а читается на каждое нажатие кнопки. Поэтому она целиком
+# держится в памяти как неизменяемый снимок с готовыми индексами; все
+# get_* ниже — чистые выборки из него, без SQLite.
+#
+# Снимок перечитывается, когда меняется properties.db (mtime/размер
+# сверяются не чаще раза в CATALOG_CHECK_INTERVAL сек) или когда
+# синхронизация в этом процессе вызвала bump_catalog_version().
+# Новый снимок строится целиком и подменяется одним присваиванием —
+# читатели видят либо старый, либо новый, но не смесь.
+
+COLUMNS = ['code', 'building', 'floor', 'rooms', 'area', 'price',
+           'layout_url', 'block_section', 'status']
+
+BUILDING_NAMES = {1: "Family", 2: "Business"}
+
+
+def _nulls_first(value) -> Tuple[bool, Any]:
+    """Ключ сортировки как в SQLite: NULL раньше любых значений."""
+    return (value is not None, value)
+
+
+class LotCatalog:
+    """
+    Неизменяемый снимок таблицы units с индексами.
+
+    Словари лотов наружу не отдаются — get_* возвращают копии.
+    """
+
+    __slots__ = (
+        "version", "loaded_at", "lots", "by_building", "by_floor", "by_code",
+        "by_price", "price_keys", "price_nulls", "by_area", "area_keys",
+        "floors", "building_stats", "stats", "unique_lots",
+    )
+
+    def __init__(self, rows: List[tuple], version: int):
+        self.version = version
+        self.loaded_at = time.time()
+
+        # rows — в порядке rowid (как их вернул бы запрос без ORDER BY)
+        in_rowid_order = [dict(zip(COLUMNS, row)) for row in rows]
+
+        # корпус → этаж → код
+        self.lots = tuple(sorted(
+            in_rowid_order,
+            key=lambda l: (_nulls_first(l["building"]), _nulls_first(l["floor"]), _nulls_first(l["code"])),
+        ))
+
+        by_building: Dict[int, List[dict]] = {}
+        for lot in self.lots:
+            by_building.setdefault(lot["building"], []).append(lot)
+        self.by_building = {b: tuple(lots) for b, lots in by_building.items()}
+
+        # (корпус, этаж) → лоты по площади, цене
+        by_floor: Dict[Tuple[int, int], List[dict]] = {}
+        for lot in self.lots:
+            by_floor.setdefault((lot["building"], lot["floor"]), []).append(lot)
+        self.by_floor = {
+            key: tuple(sorted(lots, key=lambda l: (_nulls_first(l["area"]), _nulls_first(l["price"]))))
+            for key, lots in by_floor.items()
+        }
+
+        # code_key → лоты в порядке rowid (В708 и B708 — в одной корзине)
+        by_code: Dict[str, List[dict]] = {}
+        for lot in in_rowid_order:
+            if lot["code"]:
+                by_code.setdefault(code_key(lot["code"]), []).append(lot)
+        self.by_code = {code: tuple(lots) for code, lots in by_code.items()}
+
+        # По цене (затем площади) — порядок get_lots_filtered; NULL-цены в начале
+        self.by_price = tuple(sorted(
+            in_rowid_order,
+            key=lambda l: (_nulls_first(l["price"]), _nulls_first(l["area"])),
+        ))
+        self.price_nulls = sum(1 for l in self.by_price if l["price"] is None)
+        self.price_keys = [l["price"] for l in self.by_price[self.price_nulls:]]
+
+        # По площади (затем цене), без NULL — для поиска по площади
+        self.by_area = tuple(sorted(
+            (l for l in in_rowid_order if l["area"] is not None),
+            key=lambda l: (l["area"], _nulls_first(l["price"])),
+        ))
+        self.area_keys = [l["area"] for l in self.by_area]
+
+        self.floors = self._build_floors()
+        self.building_stats = self._build_building_stats()
+        self.stats = self._build_stats(in_rowid_order)
+        self.unique_lots = self._build_unique_lots(in_rowid_order)
+
+    def _build_floors(self) -> Dict[int, List[Dict[str, Any]]]:
+        floors: Dict[int, List[Dict[str, Any]]] = {}
+        for building, lots in self.by_building.items():
+            grouped: Dict[int, List[dict]] = {}
+            for lot in lots:
+                grouped.setdefault(lot["floor"], []).append(lot)
+            floors[building] = [
+                {"floor": floor, "count": len(items), "min_price": _min(l["price"] for l in items)}
+                for floor, items in grouped.items()
+            ]
+        return floors
+
+    def _build_building_stats(self) -> List[Dict[str, Any]]:
+        stats = []
+        for building in sorted(self.by_building, key=_nulls_first):
+            lots = self.by_building[building]
+            prices = [l["price"] for l in lots]
+            areas = [l["area"] for l in lots]
+            floors = [l["floor"] for l in lots]
+            stats.append({
+                "building": building,
+                "name": BUILDING_NAMES.get(building, f"Корпус {building}"),
+                "count": len(lots),
+                "min_price": _min(prices),
+                "max_price": _max(prices),
+                "min_area": _min(areas),
+                "max_area": _max(areas),
+                "floors": list(range(_min(floors), _max(floors) + 1)),
+            })
+        return stats
+
+    def _build_stats(self, lots: List[dict]) -> Dict[str, Any]:
+        prices = [l["price"] for l in lots]
+        areas = [l["area"] for l in lots]
+        return {
+            'total_lots': len(lots),
+            'unique_areas': len({a for a in areas if a is not None}),
+            'min_price': _min(prices),
+            'max_price': _max(prices),
+            'min_area': _min(areas),
+            'max_area': _max(areas),
+        }
+
+    def _build_unique_lots(self, lots: List[dict]) -> List[dict]:
+        # Для каждой площади — первый (по rowid) лот с минимальной ценой
+        cheapest: Dict[float, dict] = {}
+        for lot in lots:
+            area, price = lot["area"], lot["price"]
+            if area is None or price is None:
+                continue
+            best = cheapest.get(area)
+            if best is None or price < best["price"]:
+                cheapest[area] = lot
+        return [cheapest[area] for area in sorted(cheapest)]
+
+    def find_by_code(self, code: str) -> Tuple[dict, ...]:
+        """Лоты с кодом (в любом написании) в порядке rowid."""
+        return self.by_code.get(code_key(code), ())
+
+    def price_bounds(self, min_price=None, max_price=None) -> Tuple[int, int]:
+        """Границы [start, end) диапазона цен в by_price — O(log n)."""
+        start, end = 0, len(self.by_price)
+        if min_price is not None or max_price is not None:
+            # NULL-цены не попадают ни в какой диапазон
+            start = self.price_nulls
+        if min_price is not None:
+            start = self.price_nulls + bisect_left(self.price_keys, min_price)
+        if max_price is not None:
+            end = self.price_nulls + bisect_right(self.price_keys, max_price)
+        return start, max(start, end)
+
+    def area_bounds(self, min_area=None, max_area=None) -> Tuple[int, int]:
+        """Границы [start, end) диапазона площадей в by_area — O(log n)."""
+        start = 0 if min_area is None else bisect_left(self.area_keys, min_area)
+        end = len(self.by_area) if max_area is None else bisect_right(self.area_keys, max_area)
+        return start, max(start, end)
+
+
+def _min(values):
+    """MIN() как в SQL: NULL пропускаются, для пустого набора — None."""
+    return min((v for v in values if v is not None), default=None)
+
+
+def _max(values):
+    return max((v for v in values if v is not None), default=None)
+
+
+_catalog: Optional[LotCatalog] = None
+_catalog_signature: Optional[tuple] = None
+_catalog_checked_at = 0.0
+_catalog_version = 0
+_catalog_lock = threading.Lock()
+_reload_callbacks: List[Callable[[LotCatalog], None]] = []
+
+
+def _db_signature() -> tuple:
+    """mtime/размер properties.db (и WAL, если есть) — признак изменения данных."""
+    signature = []
+    for path in (DB_PATH, DB_PATH.with_name(DB_PATH.name + "-wal")):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            signature.append(None)
+            continue
+        signature.append((st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _load_catalog(signature: tuple) -> LotCatalog:
+    global _catalog, _catalog_signature, _catalog_version
+
+    rows = db.fetchall(DB_PATH, """
+        SELECT code, building, floor, rooms, area_m2, price_rub,
+               layout_url, block_section, COALESCE(status, 'available')
+        FROM units
+        ORDER BY rowid
+    """)
+
+    # Каждый снимок — новая версия: по ней кешируют производные данные
+    # (ответы /api/lots, services/lots_api.py)
+    _catalog_version += 1
+    catalog = LotCatalog(rows, _catalog_version)
+    _catalog, _catalog_signature = catalog, signature
+    log.info("каталог лотов загружен", lots=len(catalog.lots), version=catalog.version)
+    return catalog
+
+
+def get_catalog() -> LotCatalog:
+    """
+    Текущий снимок каталога.
+
+    Между проверками (CATALOG_CHECK_INTERVAL) — без системных вызовов:
+    только чтение глобальной переменной.
+    """
+    global _catalog_checked_at
+
+    catalog = _catalog
+    now = time.monotonic()
+    if catalog is not None and now - _catalog_checked_at < CATALOG_CHECK_INTERVAL:
+        return catalog
+
+    with _catalog_lock:
+        catalog = _catalog
+        if catalog is not None and now - _catalog_checked_at < CATALOG_CHECK_INTERVAL:
+            return catalog
+
+        signature = _db_signature()
+        _catalog_checked_at = now
+        if catalog is not None and signature == _catalog_signature and catalog.version == _catalog_version:
+            return catalog
+
+        try:
+            catalog = _load_catalog(signature)
+        except sqlite3.Error as e:
+            if catalog is None:
+                raise
+            # Файл мог быть в процессе замены — работаем со старым снимком
+            log.warning("каталог лотов не перечитан, оставлен прежний", error=repr(e), version=catalog.version)
+            return catalog
+
+    # Вне блокировки: слушатели могут сами читать каталог
+    for callback in list(_reload_callbacks):
+        try:
+            callback(catalog)
+        except Exception as e:
+            log.error("ошибка обработчика перезагрузки каталога",
+                      callback=getattr(callback, "__qualname__", repr(callback)), error=repr(e))
+    return catalog
+
+
+def add_reload_callback(callback: Callable[[LotCatalog], None]) -> None:
+    """
+    callback(catalog) после каждого перечитывания каталога (новая версия).
+    Используется services/unit_history.py для ленты изменений.
+    """
+    if callback not in _reload_callbacks:
+        _reload_callbacks.append(callback)
+
+
+def bump_catalog_version() -> int:
+    """
+    Помечает каталог устаревшим: следующее чтение перечитает properties.db.
+
+    Вызывается синхронизацией после записи в units (в том же процессе
+    mtime может не успеть поменяться или проверка ещё не наступила).
+    """
+    global _catalog_version, _catalog_checked_at
+    with _catalog_lock:
+        _catalog_version += 1
+        _catalog_checked_at = 0.0
+        return _catalog_version
+
+
+def get_catalog_info() -> Dict[str, Any]:
+    """Версия и размер текущего снимка (для /metrics)."""
+    catalog = _catalog
+    if catalog is None:
+        return {"loaded": False, "version": _catalog_version}
+    return {
+        "loaded": True,
+        "version": catalog.version,
+        "lots": len(catalog.lots),
+        "loaded_at": catalog.loaded_at,
+    }
+
+
+def _copies(lots) -> List[Dict[str, Any]]:
+    return [dict(lot) for lot in lots]
+
+
 # ==================== ОСНОВНЫЕ ФУНКЦИИ ====================
 
 def get_all_available_lots() -> List[Dict[str, Any]]:
@@ -93,69 +388,24 @@ def get_all_available_lots() -> List[Dict[str, Any]]:
     Возвращает ВСЕ доступные лоты (348 шт).
     Сортировка: корпус → этаж → код.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT code, building, floor, rooms, area_m2, price_rub, 
-               layout_url, block_section
-        FROM units
-        ORDER BY building, floor, code
-    """)
-    
-    columns = ['code', 'building', 'floor', 'rooms', 'area', 'price', 
-               'layout_url', 'block_section']
-    lots = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
-    
-    return lots
+    return _copies(get_catalog().lots)
 
 
 def get_lots_by_building(building: int) -> List[Dict[str, Any]]:
     """
     Возвращает лоты по номеру корпуса.
     building: 1 или 2
+    Сортировка: этаж → код.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT code, building, floor, rooms, area_m2, price_rub, 
-               layout_url, block_section
-        FROM units
-        WHERE building = ?
-        ORDER BY floor, code
-    """, (building,))
-    
-    columns = ['code', 'building', 'floor', 'rooms', 'area', 'price', 
-               'layout_url', 'block_section']
-    lots = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
-    
-    return lots
+    return _copies(get_catalog().by_building.get(building, ()))
 
 
 def get_lots_by_floor(building: int, floor: int) -> List[Dict[str, Any]]:
     """
     Возвращает лоты по корпусу и этажу.
+    Сортировка: площадь → цена.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT code, building, floor, rooms, area_m2, price_rub, 
-               layout_url, block_section
-        FROM units
-        WHERE building = ? AND floor = ?
-        ORDER BY area_m2, price_rub
-    """, (building, floor))
-    
-    columns = ['code', 'building', 'floor', 'rooms', 'area', 'price', 
-               'layout_url', 'block_section']
-    lots = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
-    
-    return lots
+    return _copies(get_catalog().by_floor.get((building, floor), ()))
 
 
 def get_lots_filtered(
@@ -176,57 +426,110 @@ def get_lots_filtered(
         min_price, max_price: диапазон цены в рублях
         min_area, max_area: диапазон площади в м²
         limit: максимум записей
+
+    Сортировка: цена → площадь.
+
+    Диапазоны цены и площади — срезы отсортированных списков каталога
+    (bisect); перебирается более узкий из них.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = """
-        SELECT code, building, floor, rooms, area_m2, price_rub, 
-               layout_url, block_section
-        FROM units
-        WHERE 1=1
-    """
-    params = []
-    
-    if building is not None:
-        query += " AND building = ?"
-        params.append(building)
-    
-    if floors:
-        placeholders = ",".join("?" * len(floors))
-        query += f" AND floor IN ({placeholders})"
-        params.extend(floors)
-    
-    if min_price is not None:
-        query += " AND price_rub >= ?"
-        params.append(min_price)
-    
-    if max_price is not None:
-        query += " AND price_rub <= ?"
-        params.append(max_price)
-    
-    if min_area is not None:
-        query += " AND area_m2 >= ?"
-        params.append(min_area)
-    
-    if max_area is not None:
-        query += " AND area_m2 <= ?"
-        params.append(max_area)
-    
-    query += " ORDER BY price_rub, area_m2"
-    if limit:
-        query += f" LIMIT {limit}"
-    
-    cursor.execute(query, params)
-    
-    columns = ['code', 'building', 'floor', 'rooms', 'area', 'price', 
-               'layout_url', 'block_section']
-    lots = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
-    
+    catalog = get_catalog()
+    floor_set = set(floors) if floors else None
+
+    def matches(lot: dict) -> bool:
+        if building is not None and lot["building"] != building:
+            return False
+        if floor_set is not None and lot["floor"] not in floor_set:
+            return False
+        area = lot["area"]
+        if min_area is not None and (area is None or area < min_area):
+            return False
+        if max_area is not None and (area is None or area > max_area):
+            return False
+        price = lot["price"]
+        if min_price is not None and (price is None or price < min_price):
+            return False
+        if max_price is not None and (price is None or price > max_price):
+            return False
+        return True
+
+    # Диапазоны цены и площади — срезы отсортированных списков (bisect);
+    # перебираем более узкий
+    price_start, price_end = catalog.price_bounds(min_price, max_price)
+    if min_area is not None or max_area is not None:
+        area_start, area_end = catalog.area_bounds(min_area, max_area)
+        if area_end - area_start < price_end - price_start:
+            lots = [lot for lot in catalog.by_area[area_start:area_end] if matches(lot)]
+            # Порядок как при переборе по цене: цена → площадь → rowid
+            lots.sort(key=lambda l: (_nulls_first(l["price"]), l["area"]))
+            return _copies(lots[:limit] if limit else lots)
+
+    lots = []
+    for i in range(price_start, price_end):
+        lot = catalog.by_price[i]
+        if not matches(lot):
+            continue
+        lots.append(dict(lot))
+        if limit and len(lots) >= limit:
+            break
+
     return lots
 
 
+def _nearest(lots, keys: List, target, k: int, tolerance, accept) -> List[dict]:
+    """
+    k ближайших к target по отсортированному списку keys (lots[i] ↔ keys[i]):
+    bisect и расширение в обе стороны, O(log n + k).
+    При равном расстоянии — порядок списка (меньшее значение раньше).
+    """
+    if k <= 0:
+        return []
+    picked: List[Tuple[Any, int]] = []
+    right = bisect_left(keys, target)
+    left = right - 1
+    while left >= 0 or right < len(keys):
+        left_dist = target - keys[left] if left >= 0 else None
+        right_dist = keys[right] - target if right < len(keys) else None
+        if right_dist is None or (left_dist is not None and left_dist <= right_dist):
+            i, dist, left = left, left_dist, left - 1
+        else:
+            i, dist, right = right, right_dist, right + 1
+        # Взяли ближайший из двух кандидатов — дальше только дальше
+        if tolerance is not None and dist > tolerance:
+            break
+        # Набрали k — дочитываем лишь равноудалённые (порядок внутри них)
+        if len(picked) >= k and dist > picked[-1][0]:
+            break
+        if accept(lots[i]):
+            picked.append((dist, i))
+    picked.sort()
+    return [lots[i] for _, i in picked[:k]]
+
+
+def get_nearest_by_area(
+    area: float, k: int = 5, tolerance: Optional[float] = None, building: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    k лотов с площадью, ближайшей к area (|Δ| ≤ tolerance, если задан).
+    Порядок — по удалённости; одинаковые площади — по цене.
+    """
+    catalog = get_catalog()
+    accept = (lambda lot: lot["building"] == building) if building is not None else (lambda lot: True)
+    return _copies(_nearest(catalog.by_area, catalog.area_keys, area, k, tolerance, accept))
+
+
+def get_nearest_by_price(
+    price: int, k: int = 5, tolerance: Optional[int] = None, building: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    k лотов с ценой, ближайшей к price (|Δ| ≤ tolerance, если задан).
+    Порядок — по удалённости; одинаковые цены — по площади.
+    """
+    catalog = get_catalog()
+    priced = catalog.by_price[catalog.price_nulls:]
+    accept = (lambda lot: lot["building"] == building) if building is not None else (lambda lot: True)
+    return _copies(_nearest(priced, catalog.price_keys, price, k, tolerance, accept))
+
+
 def get_lot_by_code(code: str, building: int = None) -> Optional[Dict[str, Any]]:
     """
     Находит лот по коду.
@@ -236,36 +539,9 @@ def get_lot_by_code(code: str, building: int = None) -> Optional[Dict[str, Any]]
         code: код лота (В708, A101 и т.д.)
         building: номер корпуса (1 или 2), если нужен конкретный
     """
-    code_cyr, code_lat = normalize_code(code)
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    if building is not None:
-        cursor.execute("""
-            SELECT code, building, floor, rooms, area_m2, price_rub, 
-                   layout_url, block_section
-            FROM units
-            WHERE (code = ? OR code = ?) AND building = ?
-            LIMIT 1
-        """, (code_cyr, code_lat, building))
-    else:
-        cursor.execute("""
-            SELECT code, building, floor, rooms, area_m2, price_rub, 
-                   layout_url, block_section
-            FROM units
-            WHERE code = ? OR code = ?
-            LIMIT 1
-        """, (code_cyr, code_lat))
-    
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        columns = ['code', 'building', 'floor', 'rooms', 'area', 'price', 
-                   'layout_url', 'block_section']
-        return dict(zip(columns, row))
-    
+    for lot in get_catalog().find_by_code(code):
+        if building is None or lot["building"] == building:
+            return dict(lot)
     return None
 
 
@@ -274,53 +550,27 @@ def get_lots_by_code(code: str) -> List[Dict[str, Any]]:
     Находит ВСЕ лоты по коду (может быть в нескольких корпусах).
     Возвращает список лотов.
     """
-    code_cyr, code_lat = normalize_code(code)
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT code, building, floor, rooms, area_m2, price_rub, 
-               layout_url, block_section
-        FROM units
-        WHERE code = ? OR code = ?
-        ORDER BY building
-    """, (code_cyr, code_lat))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    columns = ['code', 'building', 'floor', 'rooms', 'area', 'price', 
-               'layout_url', 'block_section']
-    return [dict(zip(columns, row)) for row in rows]
+    lots = get_catalog().find_by_code(code)
+    return _copies(sorted(lots, key=lambda l: _nulls_first(l["building"])))
 
 
 def get_lot_by_area(area: float, tolerance: float = 0.05) -> Optional[Dict[str, Any]]:
     """
     Находит лот по площади (с допуском).
-    Возвращает первый найденный.
+    Возвращает самый дешёвый из подходящих.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT code, building, floor, rooms, area_m2, price_rub, 
-               layout_url, block_section
-        FROM units
-        WHERE ABS(area_m2 - ?) < ?
-        ORDER BY price_rub
-        LIMIT 1
-    """, (area, tolerance))
-    
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        columns = ['code', 'building', 'floor', 'rooms', 'area', 'price', 
-                   'layout_url', 'block_section']
-        return dict(zip(columns, row))
-    
-    return None
+    catalog = get_catalog()
+    lo, hi = catalog.area_bounds(area - tolerance, area + tolerance)
+
+    best = None
+    for lot in catalog.by_area[lo:hi]:
+        # Границы bisect — с точностью float; условие как в SQL
+        if abs(lot["area"] - area) >= tolerance:
+            continue
+        if best is None or _nulls_first(lot["price"]) < _nulls_first(best["price"]):
+            best = lot
+
+    return dict(best) if best else None
 
 
 # ==================== СТАТИСТИКА И НАВИГАЦИЯ ====================
@@ -332,22 +582,7 @@ def get_available_floors(building: int) -> List[Dict[str, Any]]:
     Returns:
         [{"floor": 1, "count": 12, "min_price": 15000000}, ...]
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT floor, COUNT(*) as count, MIN(price_rub) as min_price
-        FROM units
-        WHERE building = ?
-        GROUP BY floor
-        ORDER BY floor
-    """, (building,))
-    
-    floors = [{"floor": row[0], "count": row[1], "min_price": row[2]} 
-              for row in cursor.fetchall()]
-    conn.close()
-    
-    return floors
+    return _copies(get_catalog().floors.get(building, ()))
 
 
 def get_building_stats() -> List[Dict[str, Any]]:
@@ -357,76 +592,17 @@ def get_building_stats() -> List[Dict[str, Any]]:
     Returns:
         [{"building": 1, "name": "Family", "count": 180, "min_price": ..., "floors": [1,2,..]}, ...]
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            building,
-            COUNT(*) as count,
-            MIN(price_rub) as min_price,
-            MAX(price_rub) as max_price,
-            MIN(area_m2) as min_area,
-            MAX(area_m2) as max_area,
-            MIN(floor) as min_floor,
-            MAX(floor) as max_floor
-        FROM units
-        GROUP BY building
-        ORDER BY building
-    """)
-    
-    # Названия корпусов (из block_section логики)
-    building_names = {
-        1: "Family",
-        2: "Business"
-    }
-    
-    stats = []
-    for row in cursor.fetchall():
-        stats.append({
-            "building": row[0],
-            "name": building_names.get(row[0], f"Корпус {row[0]}"),
-            "count": row[1],
-            "min_price": row[2],
-            "max_price": row[3],
-            "min_area": row[4],
-            "max_area": row[5],
-            "floors": list(range(row[6], row[7] + 1))
-        })
-    
-    conn.close()
-    return stats
+    return [
+        {**stats, "floors": list(stats["floors"])}
+        for stats in get_catalog().building_stats
+    ]
 
 
 def get_stats() -> Dict[str, Any]:
     """
     Возвращает общую статистику по БД.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as total,
-            COUNT(DISTINCT area_m2) as unique_areas,
-            MIN(price_rub) as min_price,
-            MAX(price_rub) as max_price,
-            MIN(area_m2) as min_area,
-            MAX(area_m2) as max_area
-        FROM units
-    """)
-    
-    row = cursor.fetchone()
-    conn.close()
-    
-    return {
-        'total_lots': row[0],
-        'unique_areas': row[1],
-        'min_price': row[2],
-        'max_price': row[3],
-        'min_area': row[4],
-        'max_area': row[5],
-    }
+    return dict(get_catalog().stats)
 
 
 # ==================== LEGACY: для совместимости ====================
@@ -436,34 +612,7 @@ def get_unique_lots() -> List[Dict[str, Any]]:
     LEGACY: Возвращает уникальные типы лотов (по площади).
     Оставлено для обратной совместимости.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT 
-            u.code,
-            u.building,
-            u.floor,
-            u.rooms,
-            u.area_m2,
-            u.price_rub,
-            u.layout_url,
-            u.block_section
-        FROM units u
-        INNER JOIN (
-            SELECT area_m2, MIN(price_rub) as min_price
-            FROM units
-            GROUP BY area_m2
-        ) grouped ON u.area_m2 = grouped.area_m2 AND u.price_rub = grouped.min_price
-        GROUP BY u.area_m2
-        ORDER BY u.area_m2, u.price_rub
-    """)
-    
-    columns = ['code', 'building', 'floor', 'rooms', 'area', 'price', 'layout_url', 'block_section']
-    lots = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
-    
-    return lots
+    return _copies(get_catalog().unique_lots)
 
 
 def get_lots_by_area(min_area: float, max_area: float) -> List[Dict[str, Any]]:
@@ -490,8 +639,7 @@ def format_price_full(price: int) -> str:
 
 def get_building_name(building: int) -> str:
     """Возвращает название корпуса."""
-    names = {1: "Family", 2: "Business"}
-    return names.get(building, f"Корпус {building}")
+    return BUILDING_NAMES.get(building, f"Корпус {building}")
 
 
 # ==================== ТЕСТ ====================
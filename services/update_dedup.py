@@ -0,0 +1,183 @@
+"""
+Дедупликация update от Telegram по update_id.
+
+Telegram повторяет доставку update, если не получил ответ вовремя.
+Повтор не должен заново запускать весь конвейер (генерацию КП,
+запись брони и т.д.), поэтому каждый update_id проверяется здесь:
+- окно последних UPDATE_DEDUP_WINDOW id в памяти (кольцо + set)
+- опционально SQLite (UPDATE_DEDUP_DB), чтобы окно пережило рестарт;
+  запись — фоновой задачей пачками через db.run, проверка её не ждёт
+"""
+
+import asyncio
+import sqlite3
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+
+from config.settings import UPDATE_DEDUP_WINDOW, UPDATE_DEDUP_DB
+from services import db
+from services.logger import get_logger
+
+
+log = get_logger("dedup")
+
+
+_ring: Deque[int] = deque()
+_seen: Set[int] = set()
+_db_ok = True
+_loaded = False
+
+# Чистим SQLite не на каждой вставке, а раз в N новых update
+_PRUNE_EVERY = 500
+_inserts_since_prune = 0
+
+# Записи в SQLite ждут фоновую задачу: (вставка?, update_id)
+_pending: Deque[Tuple[bool, int]] = deque()
+_writer_task: Optional[asyncio.Task] = None
+
+_stats = {"unique": 0, "duplicates": 0}
+
+
+def _get_conn() -> Optional[sqlite3.Connection]:
+    """Соединение (services/db.py) с SQLite для хранения окна update_id."""
+    global _db_ok
+    if not UPDATE_DEDUP_DB or not _db_ok:
+        return None
+    try:
+        db.ensure_schema(
+            UPDATE_DEDUP_DB,
+            "CREATE TABLE IF NOT EXISTS seen_updates (update_id INTEGER PRIMARY KEY)",
+        )
+        return db.get_connection(UPDATE_DEDUP_DB)
+    except sqlite3.Error as e:
+        log.warning("SQLite недоступна, работаю только в памяти", db=UPDATE_DEDUP_DB, error=str(e))
+        _db_ok = False
+        return None
+
+
+def _remember(update_id: int) -> None:
+    _ring.append(update_id)
+    _seen.add(update_id)
+    while len(_ring) > UPDATE_DEDUP_WINDOW:
+        _seen.discard(_ring.popleft())
+
+
+def _load() -> None:
+    """Поднимает окно из SQLite при первом обращении."""
+    global _loaded
+    _loaded = True
+
+    conn = _get_conn()
+    if conn is None:
+        return
+
+    rows = conn.execute(
+        "SELECT update_id FROM seen_updates ORDER BY update_id DESC LIMIT ?",
+        (UPDATE_DEDUP_WINDOW,),
+    ).fetchall()
+    for (update_id,) in reversed(rows):
+        _remember(update_id)
+
+    if rows:
+        log.info("окно загружено", count=len(rows), db=UPDATE_DEDUP_DB)
+
+
+def _write(ops: List[Tuple[bool, int]], oldest: Optional[int]) -> None:
+    """Пачка записей окна одной транзакцией (в потоке db.run)."""
+    global _inserts_since_prune
+
+    conn = _get_conn()
+    if conn is None:
+        return
+
+    try:
+        with db.transaction(UPDATE_DEDUP_DB):
+            for insert, update_id in ops:
+                if insert:
+                    conn.execute("INSERT OR IGNORE INTO seen_updates (update_id) VALUES (?)", (update_id,))
+                    _inserts_since_prune += 1
+                else:
+                    conn.execute("DELETE FROM seen_updates WHERE update_id = ?", (update_id,))
+            if _inserts_since_prune >= _PRUNE_EVERY and oldest is not None:
+                conn.execute("DELETE FROM seen_updates WHERE update_id < ?", (oldest,))
+                _inserts_since_prune = 0
+    except sqlite3.Error as e:
+        log.error("ошибка записи", updates=len(ops), error=str(e))
+
+
+async def _writer() -> None:
+    """Сбрасывает накопленные записи, пока они есть; одна задача — порядок сохраняется."""
+    global _writer_task
+    try:
+        while _pending:
+            ops = list(_pending)
+            _pending.clear()
+            await db.run(_write, ops, _ring[0] if _ring else None)
+    finally:
+        if _writer_task is asyncio.current_task():
+            _writer_task = None
+
+
+def _persist(insert: bool, update_id: int) -> None:
+    """Ставит запись в очередь: быстрый ответ webhook не ждёт SQLite."""
+    global _writer_task
+
+    if not UPDATE_DEDUP_DB or not _db_ok:
+        return
+    _pending.append((insert, update_id))
+    if _writer_task is not None and not _writer_task.done():
+        return
+    try:
+        _writer_task = asyncio.get_running_loop().create_task(_writer())
+    except RuntimeError:
+        # Вызов не из event loop — пишем сразу
+        ops = list(_pending)
+        _pending.clear()
+        _write(ops, _ring[0] if _ring else None)
+
+
+async def flush_dedup() -> None:
+    """Дожидается записи окна в SQLite (при остановке приложения)."""
+    if _writer_task is not None:
+        await _writer_task
+
+
+def is_duplicate(update_id: Optional[int]) -> bool:
+    """
+    Проверяет update_id и запоминает его.
+
+    Returns:
+        True, если update уже приходил (обрабатывать не нужно)
+    """
+    if update_id is None:
+        return False
+
+    if not _loaded:
+        _load()
+
+    if update_id in _seen:
+        _stats["duplicates"] += 1
+        log.info("повтор update, пропускаю", update_id=update_id)
+        return True
+
+    _remember(update_id)
+    _persist(True, update_id)
+    _stats["unique"] += 1
+    return False
+
+
+def forget_update(update_id: int) -> None:
+    """Снимает отметку (update не принят в обработку и будет доставлен снова)."""
+    _seen.discard(update_id)
+    # Из кольца тоже: иначе его вытеснение позже снимет отметку с повторной доставки
+    try:
+        _ring.remove(update_id)
+    except ValueError:
+        pass
+    _stats["unique"] -= 1
+    _persist(False, update_id)
+
+
+def get_dedup_stats() -> dict:
+    """Счётчики уникальных и повторных update."""
+    return {**_stats, "window": len(_ring)}
@@ -0,0 +1,196 @@
+"""
+Очередь входящих update от Telegram с пулом воркеров.
+
+Webhook только кладёт update в очередь и сразу отвечает 200,
+обработка идёт в фоне:
+- параллельно для разных чатов (пул из UPDATE_WORKERS воркеров)
+- строго по порядку внутри одного чата
+- с ограничением общего числа ожидающих update (UPDATE_QUEUE_MAX)
+
+Простые update webhook может обработать сам (claim_chat / release_chat),
+порядок внутри чата при этом тоже сохраняется.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from config.settings import UPDATE_WORKERS, UPDATE_QUEUE_MAX
+from services.logger import get_logger
+
+
+log = get_logger("update_queue")
+
+
+# Порог, после которого ожидание в очереди логируется как медленное
+SLOW_WAIT_SEC = 5.0
+
+UpdateHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_handler: Optional[UpdateHandler] = None
+_workers: List[asyncio.Task] = []
+
+# chat_key -> update, ожидающие обработки (порядок поступления)
+_pending: Dict[Any, Deque[Tuple[Dict[str, Any], float]]] = {}
+# Чаты, готовые к обработке (ни один воркер их сейчас не держит)
+_ready: Optional[asyncio.Queue] = None
+
+_stats = {
+    "received": 0,
+    "processed": 0,
+    "errors": 0,
+    "rejected": 0,
+    "depth": 0,
+    "max_depth": 0,
+    "last_wait_ms": 0,
+    "avg_wait_ms": 0.0,
+    "max_wait_ms": 0,
+}
+
+
+def get_chat_key(update: Dict[str, Any]) -> Any:
+    """Определяет ключ очереди: чат, в котором нужно сохранить порядок."""
+    callback = update.get("callback_query")
+    if callback:
+        chat_id = (callback.get("message") or {}).get("chat", {}).get("id")
+        return chat_id or ("user", (callback.get("from") or {}).get("id"))
+
+    msg = update.get("message") or update.get("edited_message")
+    if msg:
+        return msg.get("chat", {}).get("id")
+
+    # Остальные типы update не зависят друг от друга
+    return ("update", update.get("update_id"))
+
+
+def submit_update(update: Dict[str, Any]) -> bool:
+    """
+    Ставит update в очередь.
+
+    Returns:
+        False, если очередь переполнена (Telegram повторит доставку позже)
+    """
+    if _ready is None:
+        raise RuntimeError("update_queue не запущена (start_workers)")
+
+    if _stats["depth"] >= UPDATE_QUEUE_MAX:
+        _stats["rejected"] += 1
+        log.warning("переполнение, отклоняю update", depth=_stats["depth"])
+        return False
+
+    chat_key = get_chat_key(update)
+    item = (update, time.monotonic())
+
+    _stats["received"] += 1
+    _stats["depth"] += 1
+    _stats["max_depth"] = max(_stats["max_depth"], _stats["depth"])
+
+    pending = _pending.get(chat_key)
+    if pending is not None:
+        # Чат уже в работе или в очереди — воркер заберёт update по порядку
+        pending.append(item)
+    else:
+        _pending[chat_key] = deque([item])
+        _ready.put_nowait(chat_key)
+
+    return True
+
+
+def claim_chat(update: Dict[str, Any]) -> Optional[Any]:
+    """
+    Занимает чат update для обработки вне очереди (прямо в webhook).
+
+    Returns:
+        Ключ чата или None, если у чата есть необработанные update
+        (тогда update нужно ставить в очередь, чтобы не нарушить порядок)
+    """
+    chat_key = get_chat_key(update)
+    if chat_key in _pending:
+        return None
+    # Пустая очередь чата: новые update встанут за текущим, но воркер их не возьмёт
+    _pending[chat_key] = deque()
+    return chat_key
+
+
+def release_chat(chat_key: Any) -> None:
+    """Освобождает чат после claim_chat; накопившиеся update уходят воркерам."""
+    if _pending.get(chat_key):
+        _ready.put_nowait(chat_key)
+    else:
+        _pending.pop(chat_key, None)
+
+
+def _record_wait(wait_ms: int) -> None:
+    _stats["last_wait_ms"] = wait_ms
+    _stats["max_wait_ms"] = max(_stats["max_wait_ms"], wait_ms)
+    # Экспоненциальное скользящее среднее
+    _stats["avg_wait_ms"] = round(_stats["avg_wait_ms"] * 0.9 + wait_ms * 0.1, 1)
+
+
+async def _worker(worker_id: int) -> None:
+    while True:
+        chat_key = await _ready.get()
+        pending = _pending[chat_key]
+        update, enqueued_at = pending.popleft()
+
+        wait_ms = int((time.monotonic() - enqueued_at) * 1000)
+        _record_wait(wait_ms)
+        if wait_ms > SLOW_WAIT_SEC * 1000:
+            log.warning("долгое ожидание в очереди", wait_ms=wait_ms, chat_id=chat_key)
+
+        try:
+            await _handler(update)
+            _stats["processed"] += 1
+        except Exception as e:
+            _stats["errors"] += 1
+            log.exception(
+                "ошибка обработки update",
+                worker=worker_id,
+                update_id=update.get("update_id"),
+                chat_id=chat_key,
+                error=repr(e),
+            )
+        finally:
+            _stats["depth"] -= 1
+            if pending:
+                # Следующий update этого чата — снова в общую очередь,
+                # чтобы один активный чат не занимал воркер монопольно
+                _ready.put_nowait(chat_key)
+            else:
+                del _pending[chat_key]
+
+
+def start_workers(handler: UpdateHandler, workers: int = UPDATE_WORKERS) -> None:
+    """Запускает пул воркеров (вызывать в startup приложения)."""
+    global _handler, _ready
+
+    _handler = handler
+    _ready = asyncio.Queue()
+    for i in range(workers):
+        _workers.append(asyncio.create_task(_worker(i)))
+    log.info("воркеры запущены", workers=workers, queue_max=UPDATE_QUEUE_MAX)
+
+
+async def stop_workers(drain_timeout: float = 10.0) -> None:
+    """Дожидается обработки очереди (не дольше drain_timeout) и останавливает воркеры."""
+    deadline = time.monotonic() + drain_timeout
+    while _stats["depth"] > 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+
+    if _stats["depth"]:
+        log.warning("остановка с необработанными update", depth=_stats["depth"])
+
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+def get_queue_stats() -> Dict[str, Any]:
+    """Метрики очереди: глубина, время ожидания, счётчики."""
+    return {
+        **_stats,
+        "active_chats": len(_pending),
+        "workers": len(_workers),
+    }
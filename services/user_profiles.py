@@ -2,23 +2,20 @@
 Управление профилями риэлторов.
 """
 
-import sqlite3
 from typing import Optional, Dict
 from datetime import datetime
 
+from services import db
+
 DB_PATH = "/opt/bot/properties.db"
 
 
 def get_profile(user_id: int) -> Optional[Dict]:
     """Получает профиль пользователя."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    row = db.fetchone(DB_PATH, """
         SELECT user_id, name, phone, timezone, created_at, updated_at
         FROM user_profiles WHERE user_id = ?
     """, (user_id,))
-    row = cursor.fetchone()
-    conn.close()
     
     if row:
         return {
@@ -34,9 +31,6 @@ def get_profile(user_id: int) -> Optional[Dict]:
 
 def save_profile(user_id: int, name: str = None, phone: str = None, timezone: str = None):
     """Создаёт или обновляет профиль."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     existing = get_profile(user_id)
     now = datetime.now().isoformat()
     
@@ -59,18 +53,15 @@ def save_profile(user_id: int, name: str = None, phone: str = None, timezone: st
             values.append(now)
             values.append(user_id)
             
-            cursor.execute(f"""
+            db.execute(DB_PATH, f"""
                 UPDATE user_profiles SET {', '.join(updates)} WHERE user_id = ?
             """, values)
     else:
         # Создаём новый
-        cursor.execute("""
+        db.execute(DB_PATH, """
             INSERT INTO user_profiles (user_id, name, phone, timezone, created_at)
             VALUES (?, ?, ?, ?, ?)
         """, (user_id, name, phone, timezone or "altai", now))
-    
-    conn.commit()
-    conn.close()
 
 
 def convert_time(time_str: str, from_tz: str, to_tz: str) -> str:
@@ -0,0 +1,151 @@
+"""
+Прогрев бота при старте.
+
+Многие ветки импортируют тяжёлые модули внутри функций (генераторы
+PDF/XLSX, reportlab, openpyxl, Whisper), и первый пользователь после
+рестарта ждал эти импорты. Прогрев делает это заранее — в startup
+приложения, до того как uvicorn начнёт принимать webhook:
+
+- импорт тяжёлых модулей (WARMUP_MODULES)
+- шрифты и картинки шаблонов (services/assets.py), регистрация шрифтов reportlab
+- каталог лотов в памяти (services/units_db.py) и ответ /api/lots
+
+Редкие подсистемы (Корпус 3, новости, domoplaner) сюда не входят —
+они грузятся лениво (services/lazy.py).
+
+Время каждого шага — в логе и в /metrics/startup; профиль импортов
+самого app — scripts/profile_startup.py.
+"""
+
+import asyncio
+import importlib
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from config.settings import WARMUP_ENABLED, WARMUP_TIMEOUT
+from services.logger import get_logger
+
+
+log = get_logger("startup")
+
+# Модули, которые иначе импортируются на первом запросе
+WARMUP_MODULES = (
+    # Генераторы документов
+    "services.kp_pdf_generator",
+    "services.compare_pdf_generator",
+    "services.calc_xlsx_generator",
+    "services.calc_docx",
+    "services.investment_calc",
+    "reportlab.pdfgen.canvas",
+    # Голосовые сообщения и секретарь
+    "services.speech",
+    "services.secretary_ai",
+    "services.secretary_db",
+)
+
+_state: Dict[str, Any] = {
+    "ready": False,
+    "warmup_ms": None,
+    "steps": {},
+}
+
+
+# ====== Шаги прогрева ======
+
+def _load_assets() -> None:
+    from services import assets
+    assets.load_all()
+
+
+def _register_pdf_fonts() -> None:
+    from services.calculations import register_pdf_fonts
+    register_pdf_fonts()
+
+
+def _load_lot_catalog() -> None:
+    from services.units_db import get_catalog
+    get_catalog()
+
+
+def _prebuild_lots_api() -> None:
+    from services.lots_api import prebuild
+    prebuild()
+
+
+def _prestart_pdf_worker() -> None:
+    # Первый КП после рестарта не ждёт запуска wkhtmltopdf
+    from services import pdf_workers
+    from services.kp_pdf_generator import KP_PDF_OPTIONS
+    pdf_workers.prestart(KP_PDF_OPTIONS)
+
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("assets", _load_assets),
+    ("pdf_fonts", _register_pdf_fonts),
+    ("lot_catalog", _load_lot_catalog),
+    ("lots_api", _prebuild_lots_api),
+    ("pdf_worker", _prestart_pdf_worker),
+]
+
+
+def _timed(name: str, func: Callable[[], None]) -> None:
+    started = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        # Без прогрева шаг просто выполнится на первом запросе
+        _state["steps"][name] = f"error: {e!r}"
+        log.warning("шаг прогрева не выполнен", step=name, error=repr(e))
+        return
+    _state["steps"][name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _run_steps() -> None:
+    for module in WARMUP_MODULES:
+        if module not in sys.modules:
+            _timed(f"import {module}", lambda: importlib.import_module(module))
+    for name, func in WARMUP_STEPS:
+        _timed(name, func)
+
+
+# ====== Запуск ======
+
+async def run_warmup(timeout: float = WARMUP_TIMEOUT) -> None:
+    """
+    Выполняет прогрев (в отдельном потоке) и отмечает бота готовым.
+
+    Вызывается в startup приложения до запуска воркеров очереди update.
+    Если прогрев не уложился в timeout, бот стартует без него —
+    оставшиеся шаги догружаются в фоне.
+    """
+    if not WARMUP_ENABLED:
+        _state["ready"] = True
+        return
+
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(asyncio.to_thread(_run_steps), timeout)
+    except asyncio.TimeoutError:
+        log.warning("прогрев не уложился в таймаут, стартую без него", timeout=timeout)
+
+    _state["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _state["ready"] = True
+
+    timings = {name: ms for name, ms in _state["steps"].items() if isinstance(ms, float)}
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:5]
+    log.info("прогрев завершён", ms=_state["warmup_ms"], steps=len(_state["steps"]), slowest=dict(slowest))
+
+
+def is_ready() -> bool:
+    """True после прогрева."""
+    return _state["ready"]
+
+
+def get_startup_stats() -> Dict[str, Any]:
+    """Время прогрева по шагам."""
+    return {
+        "ready": _state["ready"],
+        "warmup_ms": _state["warmup_ms"],
+        "steps": dict(_state["steps"]),
+    }
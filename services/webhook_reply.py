@@ -0,0 +1,182 @@
+"""
+Ответ на update прямо в теле ответа webhook.
+
+Telegram позволяет вернуть один вызов Bot API в ответе на webhook —
+это экономит отдельный исходящий HTTP-запрос на самых частых нажатиях:
+
+- callback query: webhook сразу возвращает answerCallbackQuery,
+  а сама обработка кнопки идёт в очереди как обычно
+- простые ответы (главное меню, «Назад», /help): handler помечается
+  @inline_returnable, его первое сообщение перехватывается и уходит
+  в ответе webhook, если handler уложился в WEBHOOK_INLINE_TIMEOUT
+
+Если после перехваченного сообщения handler отправляет что-то ещё,
+перехваченное сначала отправляется обычным запросом — порядок
+сообщений в чате не меняется.
+"""
+
+import asyncio
+import time
+import traceback
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config.settings import WEBHOOK_INLINE_TIMEOUT
+from services.logger import get_logger
+
+
+log = get_logger("webhook")
+
+
+class _Slot:
+    """Место под один ответ для текущего update."""
+
+    __slots__ = ("method", "payload", "closed")
+
+    def __init__(self):
+        self.method: Optional[str] = None
+        self.payload: Optional[Dict[str, Any]] = None
+        self.closed = False
+
+
+_slot: ContextVar[Optional[_Slot]] = ContextVar("webhook_reply_slot", default=None)
+_returnable: ContextVar[bool] = ContextVar("webhook_reply_returnable", default=False)
+
+# callback_query_id, на которые уже ответили в теле webhook
+_answered_callbacks: Dict[str, float] = {}
+_ANSWERED_TTL = 60
+
+_stats = {"inline_replies": 0, "inline_callbacks": 0, "flushed": 0, "timeouts": 0}
+
+
+# ====== Разметка handler'ов ======
+
+def inline_returnable(func: Callable[..., Awaitable[Any]]):
+    """Помечает handler: его первое сообщение можно вернуть в ответе webhook."""
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _returnable.set(True)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _returnable.reset(token)
+
+    return wrapper
+
+
+async def capture(method: str, payload: Dict[str, Any]) -> bool:
+    """
+    Пытается отложить вызов Bot API до ответа webhook.
+
+    Returns:
+        True — вызов перехвачен (отправлять самому не нужно)
+    """
+    slot = _slot.get()
+    if slot is None or slot.closed:
+        return False
+
+    if slot.payload is None and _returnable.get():
+        slot.method = method
+        slot.payload = payload
+        return True
+
+    # Второе сообщение (или handler без пометки) — больше ничего не перехватываем,
+    # а уже перехваченное отправляем первым, чтобы сохранить порядок
+    await _flush(slot)
+    return False
+
+
+async def _flush(slot: _Slot) -> None:
+    """Отправляет перехваченный вызов обычным запросом."""
+    slot.closed = True
+    if slot.payload is None:
+        return
+
+    method, payload = slot.method, slot.payload
+    slot.payload = None
+    _stats["flushed"] += 1
+
+    from services.telegram import api_request
+    await api_request(method, payload)
+
+
+# ====== Выполнение в webhook ======
+
+def _log_task_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        exc = task.exception()
+        log.error(
+            "ошибка обработки update",
+            error=repr(exc),
+            exc="".join(traceback.format_exception(exc)),
+        )
+
+
+async def run_inline(
+    handler: Callable[[], Awaitable[Any]],
+    on_done: Optional[Callable[[], None]] = None,
+    timeout: float = WEBHOOK_INLINE_TIMEOUT,
+) -> Optional[Dict[str, Any]]:
+    """
+    Выполняет handler внутри запроса webhook.
+
+    Args:
+        handler: Корутина-фабрика обработки update
+        on_done: Вызывается, когда handler завершится (в т.ч. после таймаута)
+        timeout: Сколько ждать handler, прежде чем ответить webhook без него
+
+    Returns:
+        Тело ответа webhook ({"method": ..., ...}) или None, если вернуть нечего
+        (handler не успел или ничего не перехвачено)
+    """
+    slot = _Slot()
+    token = _slot.set(slot)
+    try:
+        # Задача наследует контекст с slot
+        task = asyncio.create_task(handler())
+    finally:
+        _slot.reset(token)
+    task.add_done_callback(_log_task_error)
+    if on_done is not None:
+        task.add_done_callback(lambda _: on_done())
+
+    done, _ = await asyncio.wait({task}, timeout=timeout)
+    if not done:
+        # Не успели: дальше handler работает в фоне, ответ — обычным запросом
+        _stats["timeouts"] += 1
+        await _flush(slot)
+        return None
+
+    if slot.closed or slot.payload is None:
+        return None
+
+    slot.closed = True
+    _stats["inline_replies"] += 1
+    return {"method": slot.method, **slot.payload}
+
+
+# ====== Callback query ======
+
+def answer_callback_inline(callback_id: str) -> Dict[str, Any]:
+    """Тело ответа webhook с answerCallbackQuery (и отметка, что ответ уже дан)."""
+    now = time.monotonic()
+    if len(_answered_callbacks) > 1000:
+        for key, ts in list(_answered_callbacks.items()):
+            if now - ts > _ANSWERED_TTL:
+                del _answered_callbacks[key]
+
+    _answered_callbacks[callback_id] = now
+    _stats["inline_callbacks"] += 1
+    return {"method": "answerCallbackQuery", "callback_query_id": callback_id}
+
+
+def consume_callback_answer(callback_id: str) -> bool:
+    """True, если на callback уже ответили в теле webhook."""
+    return _answered_callbacks.pop(callback_id, None) is not None
+
+
+def get_reply_stats() -> Dict[str, int]:
+    """Счётчики ответов через тело webhook."""
+    return dict(_stats)
@@ -25,7 +25,9 @@ DEV_COUNT=$(sqlite3 properties.db "SELECT COUNT(*) FROM units;")
 echo "$(date): DEV synced: $DEV_COUNT lots" >> "$LOG_FILE"
 
 # Синхронизация PROD (копируем базу из DEV)
-cp /opt/bot-dev/properties.db /opt/bot/properties.db
+# Через backup API, а не cp: боты держат БД в режиме WAL (services/db.py),
+# cp поверх открытой базы теряет WAL DEV и портит -wal/-shm PROD
+sqlite3 /opt/bot-dev/properties.db ".backup /opt/bot/properties.db"
 echo "$(date): PROD database updated from DEV" >> "$LOG_FILE"
 
 # Перезапуск ботов для применения новых данных